@@ -0,0 +1,161 @@
+"""
+Banco de pruebas del catálogo de historias con miles de entradas.
+
+Genera un CSV sintético con N historias y mide el tiempo de carga, la
+memoria, el coste de buscar una historia por id y el de servir una página
+con StoryCatalog (desde el CSV y desde el formato compilado). Si pandas está
+instalado se mide también el método anterior (read_csv y filtrado con una
+máscara booleana en cada búsqueda) como referencia.
+
+Uso:
+
+    python benchmarks/catalog_bench.py --stories 50000 --output catalog.json
+"""
+from typing import Callable, Dict
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from load_test import git_commit  # noqa: E402  (añade src al sys.path)
+from engine.story_catalog import StoryCatalog  # noqa: E402
+
+WORDS = "dragón torre luna bosque espada sombra reino guardián cristal abismo eco fuego río niebla".split()
+
+
+def write_catalog(path: str, stories: int, chapters: int, seed: int) -> None:
+    """
+    Escribe un CSV sintético con el mismo formato que historias_fantasticas.csv.
+
+    Parámetros
+    ----------
+    path : str
+        Archivo de salida.
+    stories : int
+        Número de historias.
+    chapters : int
+        Capítulos por historia.
+    seed : int
+        Semilla del generador aleatorio.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "titulo", "sinopsis", *(f"cap_{n}" for n in range(1, chapters + 1))])
+        for story_id in range(1, stories + 1):
+            title = " ".join(rng.choice(WORDS) for _ in range(4)).capitalize()
+            synopsis = " ".join(rng.choice(WORDS) for _ in range(30)).capitalize() + "."
+            writer.writerow([story_id, title, synopsis,
+                             *(" ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(chapters))])
+
+
+def measure_load(loader: Callable) -> Dict:
+    """
+    Mide el tiempo y la memoria de una carga.
+
+    Parámetros
+    ----------
+    loader : Callable
+        Función que carga el catálogo.
+
+    Retorna
+    -------
+    Dict
+        Segundos, memoria máxima reservada en MB y el objeto cargado.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = loader()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak / 1e6, "object": result}
+
+
+def per_call_us(fn: Callable, calls: int) -> float:
+    """
+    Mide el tiempo medio por llamada en microsegundos.
+
+    Parámetros
+    ----------
+    fn : Callable
+        Función a medir; recibe el índice de la llamada.
+    calls : int
+        Número de llamadas.
+
+    Retorna
+    -------
+    float
+        Microsegundos por llamada.
+    """
+    start = time.perf_counter()
+    for index in range(calls):
+        fn(index)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Carga y búsquedas del catálogo de historias.")
+    parser.add_argument("--stories", type=int, default=20000)
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    story_ids = [rng.randint(1, args.stories) for _ in range(args.lookups)]
+    results: Dict = {"benchmark": "catalog", "git_commit": git_commit(), "config": vars(args).copy()}
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "historias.csv")
+        write_catalog(csv_path, args.stories, args.chapters, args.seed)
+        results["csv_mb"] = os.path.getsize(csv_path) / 1e6
+
+        loaded = measure_load(lambda: StoryCatalog.from_csv(csv_path))
+        catalog = loaded.pop("object")
+        loaded["lookup_us"] = per_call_us(lambda i: catalog.get(story_ids[i]).chapter(1), args.lookups)
+        loaded["page_us"] = per_call_us(lambda i: catalog.page(i % catalog.page_count(20), 20), args.lookups)
+        results["catalog_csv"] = loaded
+
+        start = time.perf_counter()
+        compiled_path = StoryCatalog.compile(csv_path)
+        results["compile_seconds"] = time.perf_counter() - start
+        loaded = measure_load(lambda: StoryCatalog.load(csv_path))
+        compiled = loaded.pop("object")
+        assert compiled.compiled, "El catálogo compilado debería estar al día"
+        loaded["lookup_us"] = per_call_us(lambda i: compiled.get(story_ids[i]).chapter(1), args.lookups)
+        loaded["page_us"] = per_call_us(lambda i: compiled.page(i % compiled.page_count(20), 20), args.lookups)
+        loaded["file_mb"] = os.path.getsize(compiled_path) / 1e6
+        results["catalog_compiled"] = loaded
+        compiled.close()
+
+        try:
+            import pandas as pd
+        except ImportError:
+            pd = None
+        if pd is not None:
+            loaded = measure_load(lambda: pd.read_csv(csv_path))
+            df = loaded.pop("object")
+            chapter_columns = [column for column in df.columns if column.startswith("cap_")]
+
+            def pandas_lookup(index: int) -> None:
+                # Método anterior: máscara booleana y to_dict en cada búsqueda
+                row = df[df["id"] == story_ids[index]].iloc[0]
+                row[chapter_columns].to_dict()
+
+            loaded["lookup_us"] = per_call_us(pandas_lookup, min(args.lookups, 500))
+            results["pandas_baseline"] = loaded
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
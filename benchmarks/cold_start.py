@@ -0,0 +1,111 @@
+"""
+Banco de pruebas del arranque en frío: latencia del primer capítulo con y sin precarga.
+
+1. Descarga el modelo (keep_alive=0) y narra el primer capítulo: arranque en frío.
+2. Descarga el modelo, lo precarga con ModelWarmup y narra el primer capítulo.
+
+Por defecto se usa el servidor simulado con un tiempo de carga configurable
+(--mock-load-seconds); con --url se mide un Ollama real. Los resultados se
+guardan en JSON para seguir su evolución (--output).
+
+Uso:
+
+    python benchmarks/cold_start.py --mock-load-seconds 3
+    python benchmarks/cold_start.py --url http://localhost:11434/v1 --repeat 3 --output cold.json
+"""
+from typing import Dict, List
+import argparse
+import json
+
+from load_test import describe, git_commit, timed  # noqa: E402  (añade src al sys.path)
+from agents.llm import Llm  # noqa: E402
+from agents.response_cache import ResponseCache  # noqa: E402
+from agents.warmup import ModelWarmup  # noqa: E402
+from config.model_config import ModelConfig  # noqa: E402
+from data.sys_prompts import story_teller  # noqa: E402
+from engine.game_engine import GameEngine  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+
+def first_chapter(engine: GameEngine, story_number: int) -> Dict:
+    """
+    Narra el primer capítulo de una partida nueva midiendo sus tiempos.
+
+    Parámetros
+    ----------
+    engine : GameEngine
+        Motor de juego.
+    story_number : int
+        Historia a jugar.
+
+    Retorna
+    -------
+    Dict
+        Latencia total y tiempo hasta el primer token.
+    """
+    return timed(engine.start_stream(engine.new_session(story_number)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latencia del primer capítulo en frío y con precarga.")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de cada medida.")
+    parser.add_argument("--story", type=int, default=1)
+    parser.add_argument("--url", default=None, help="Backend real; si se omite se usa el servidor simulado.")
+    parser.add_argument("--api-key", default="ollama")
+    parser.add_argument("--mock-load-seconds", type=float, default=3.0)
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    # Sin caché de respuestas: el primer capítulo tiene que llegar siempre al backend
+    ModelConfig.shared().parser.set("Cache", "enabled", "false")
+    ResponseCache.reset_shared()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = MockOpenAIServer(("127.0.0.1", 0), ttft=0.2, tokens_per_second=200.0,
+                                  load_seconds=args.mock_load_seconds)
+        server.start_background()
+        url = server.url
+
+    engine = GameEngine(model=Llm(url=url, api_key=args.api_key, system_prompt=story_teller))
+    warmup = ModelWarmup(url=url, api_key=args.api_key, refresh_seconds=0)
+    cold: List[Dict] = []
+    warm: List[Dict] = []
+    warmups: List[float] = []
+    for _ in range(args.repeat):
+        warmup.unload()
+        cold.append(first_chapter(engine, args.story))
+        warmup.unload()
+        warmups.append(warmup.warm())
+        warm.append(first_chapter(engine, args.story))
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    results = {
+        "benchmark": "cold_start",
+        "git_commit": git_commit(),
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "model": warmup.model,
+        "cold_first_chapter": {
+            "latency_s": describe([r["latency"] for r in cold]),
+            "ttft_s": describe([r["ttft"] for r in cold if r["ttft"] is not None]),
+        },
+        "warm_first_chapter": {
+            "latency_s": describe([r["latency"] for r in warm]),
+            "ttft_s": describe([r["ttft"] for r in warm if r["ttft"] is not None]),
+        },
+        "warmup_s": describe(warmups),
+        "load_seconds": warmup.load_seconds,
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"TTFT del primer capítulo: {results['cold_first_chapter']['ttft_s']['p50']:.3f}s en frío -> "
+          f"{results['warm_first_chapter']['ttft_s']['p50']:.3f}s con precarga")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
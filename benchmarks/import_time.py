@@ -0,0 +1,145 @@
+"""
+Presupuesto de tiempo de importación de los módulos de la app.
+
+Importa cada módulo en un intérprete nuevo con `python -X importtime` y
+toma su tiempo acumulado (el mínimo de varias repeticiones, para descontar
+el ruido y la primera compilación a .pyc). El presupuesto se aplica al
+tiempo propio: el total menos las dependencias pesadas que la app necesita
+de todos modos (openai, streamlit), que varían mucho entre máquinas y
+ejecuciones. Además comprueba que ningún módulo arrastre dependencias que
+solo hacen falta en cuadernos o en herramientas (IPython, pandas). Termina
+con código 1 si algún módulo se pasa del presupuesto, de modo que se puede
+usar como comprobación antes de fusionar cambios.
+
+Los presupuestos están medidos en una máquina de desarrollo; en máquinas
+más lentas se pueden escalar con --scale.
+
+Uso:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --scale 2 --output imports.json
+"""
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from load_test import ROOT, git_commit  # noqa: E402
+
+# Milisegundos máximos de importación por módulo, sin contar REQUIRED
+BUDGETS_MS: Dict[str, float] = {
+    "engine.story_catalog": 30.0,
+    "agents.llm": 80.0,
+    "engine.game_engine": 100.0,
+    "engine.http_api": 120.0,
+    "ui.streamlit_ui": 150.0,
+}
+
+# Dependencias pesadas imprescindibles: se informan pero no cuentan en el presupuesto
+REQUIRED = ("openai", "streamlit")
+
+# Módulos que no deben cargarse al importar la app
+FORBIDDEN = ("IPython", "pandas")
+
+
+def import_time_ms(module: str) -> Tuple[float, float]:
+    """
+    Mide el tiempo de importación de un módulo en un proceso nuevo.
+
+    Parámetros
+    ----------
+    module : str
+        Módulo a importar (relativo a src).
+
+    Retorna
+    -------
+    Tuple[float, float]
+        Milisegundos acumulados del módulo según `-X importtime` y, de ellos,
+        los que corresponden a las dependencias de REQUIRED.
+
+    Raises
+    ------
+    RuntimeError
+        Si la importación falla o el módulo no aparece en la salida.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.join(ROOT, "src"), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr[-2000:]}")
+    required_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue
+        if parts[2] in REQUIRED:
+            required_us += int(parts[1])
+        elif parts[2] == module:
+            return int(parts[1]) / 1000, required_us / 1000
+    raise RuntimeError(f"No se encontró {module} en la salida de -X importtime")
+
+
+def loaded_forbidden(module: str) -> List[str]:
+    """
+    Devuelve los módulos prohibidos que se cargan al importar un módulo.
+
+    Parámetros
+    ----------
+    module : str
+        Módulo a importar (relativo a src).
+
+    Retorna
+    -------
+    List[str]
+        Módulos de FORBIDDEN presentes en sys.modules tras la importación.
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(set(sys.modules) & {set(FORBIDDEN)!r})))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(ROOT, "src"),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Comprueba el presupuesto de tiempo de importación.")
+    parser.add_argument("--repeat", type=int, default=3, help="Importaciones por módulo (se toma el mínimo).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Factor que multiplica los presupuestos.")
+    parser.add_argument("--module", action="append", default=None,
+                        help="Módulo a medir (se puede repetir). Por defecto todos los del presupuesto.")
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    modules = args.module or list(BUDGETS_MS)
+    results: Dict = {"benchmark": "import_time", "git_commit": git_commit(),
+                     "python": sys.version.split()[0], "config": vars(args).copy(), "modules": {}}
+    failures: List[str] = []
+    for module in modules:
+        samples = [import_time_ms(module) for _ in range(args.repeat)]
+        total = min(total for total, _ in samples)
+        own = min(total - required for total, required in samples)
+        budget: Optional[float] = BUDGETS_MS.get(module)
+        if budget is not None:
+            budget *= args.scale
+        forbidden = loaded_forbidden(module)
+        ok = (budget is None or own <= budget) and not forbidden
+        results["modules"][module] = {"total_ms": round(total, 1), "own_ms": round(own, 1),
+                                      "budget_ms": budget, "forbidden": forbidden, "ok": ok}
+        status = "ok" if ok else "FALLO"
+        print(f"{module:<24} {own:7.1f} ms propios / {total:7.1f} ms en total  "
+              f"(presupuesto {budget if budget is not None else '-'} ms)  {status}"
+              + (f"  importa {', '.join(forbidden)}" if forbidden else ""))
+        if not ok:
+            failures.append(module)
+
+    results["ok"] = not failures
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+    if failures:
+        print(f"[Error] Se supera el presupuesto de importación en: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
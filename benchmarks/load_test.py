@@ -0,0 +1,403 @@
+"""
+Banco de pruebas de carga del bucle de narración.
+
+Simula N jugadores que completan partidas de 10 capítulos a través del motor
+headless (GameEngine + Llm) y mide capítulos por segundo, latencia por
+capítulo (p50/p95/p99), tiempo hasta el primer token y peticiones al backend.
+Por defecto arranca un servidor OpenAI simulado en el mismo proceso; con
+--url se puede apuntar a un Ollama real. Los resultados se escriben en JSON
+para compararlos entre commits (--output / --compare).
+
+Con el servidor simulado, `backend.generated_tokens` cuenta los tokens que
+el backend llegó a enviar; `--mock-tail-tokens` hace que el modelo siga
+escribiendo tras las opciones y `--no-early-stop` desactiva el corte, para
+medir los tokens ahorrados por capítulo. `--mock-parallel` limita las
+respuestas que el servidor genera a la vez, como una GPU real, y
+`--no-scheduler` desactiva el planificador para medir su efecto.
+
+Uso:
+
+    python benchmarks/load_test.py --players 20 --think-time 0.5 --output results.json
+    python benchmarks/load_test.py --players 20 --compare results.json
+    python benchmarks/load_test.py --mock-tail-tokens 80 --no-early-stop
+    python benchmarks/load_test.py --speculate --mock-parallel 4 --no-scheduler
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from agents.llm import Llm  # noqa: E402
+from agents.speculation import BranchSpeculator  # noqa: E402
+from agents.telemetry import Telemetry  # noqa: E402
+from config.model_config import ModelConfig  # noqa: E402
+from data.sys_prompts import story_teller  # noqa: E402
+from engine.game_engine import GameEngine  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+
+class PlayerStats:
+    """
+    Mediciones acumuladas de todos los jugadores simulados.
+
+    Atributos
+    ----------
+    latencies : List[float]
+        Segundos desde la decisión hasta el capítulo completo.
+    ttfts : List[float]
+        Segundos desde la decisión hasta el primer token.
+    chapters : int
+        Capítulos generados con éxito.
+    errors : int
+        Capítulos que fallaron.
+    games : int
+        Partidas completadas.
+    """
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.chapters = 0
+        self.errors = 0
+        self.games = 0
+        self.__lock = threading.Lock()
+
+    def add_chapter(self, latency: float, ttft: Optional[float]) -> None:
+        """
+        Registra un capítulo generado.
+
+        Parámetros
+        ----------
+        latency : float
+            Latencia completa del capítulo.
+        ttft : float or None
+            Tiempo hasta el primer token.
+        """
+        with self.__lock:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.ttfts.append(ttft)
+            self.chapters += 1
+
+    def add_error(self) -> None:
+        """
+        Registra un capítulo fallido.
+        """
+        with self.__lock:
+            self.errors += 1
+
+    def add_game(self) -> None:
+        """
+        Registra una partida completada.
+        """
+        with self.__lock:
+            self.games += 1
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Calcula un percentil por interpolación lineal.
+
+    Parámetros
+    ----------
+    values : List[float]
+        Muestras.
+    q : float
+        Percentil entre 0 y 100.
+
+    Retorna
+    -------
+    float or None
+        Valor del percentil, o None si no hay muestras.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def describe(values: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Resume una lista de tiempos.
+
+    Parámetros
+    ----------
+    values : List[float]
+        Muestras en segundos.
+
+    Retorna
+    -------
+    Dict[str, float or None]
+        Media y percentiles 50, 95 y 99.
+    """
+    return {
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "count": len(values),
+    }
+
+
+def timed(stream) -> Dict[str, Optional[float]]:
+    """
+    Consume un stream de tokens midiendo el primer token y el total.
+
+    Parámetros
+    ----------
+    stream : Iterator[str]
+        Tokens del capítulo.
+
+    Retorna
+    -------
+    Dict[str, float or None]
+        Latencia total y tiempo hasta el primer token.
+    """
+    start = time.perf_counter()
+    ttft = None
+    for _ in stream:
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return {"latency": time.perf_counter() - start, "ttft": ttft}
+
+
+def play_game(engine: GameEngine, story_number: int, chapters: int, think_time: float,
+              speculate: bool, stats: PlayerStats, rng: random.Random) -> None:
+    """
+    Juega una partida completa eligiendo opciones al azar.
+
+    Parámetros
+    ----------
+    engine : GameEngine
+        Motor de juego.
+    story_number : int
+        Historia a jugar.
+    chapters : int
+        Capítulos máximos por partida.
+    think_time : float
+        Segundos que el jugador "lee" cada capítulo antes de decidir.
+    speculate : bool
+        Si es True se pre-generan las ramas A/B mientras lee.
+    stats : PlayerStats
+        Acumulador de mediciones.
+    rng : random.Random
+        Generador aleatorio del jugador.
+    """
+    session = engine.new_session(story_number)
+    speculator = BranchSpeculator() if speculate else None
+    try:
+        result = timed(engine.start_stream(session))
+    except Exception as e:
+        print(f"[Error] Capítulo 1 fallido: {e}")
+        stats.add_error()
+        return
+    stats.add_chapter(result["latency"], result["ttft"])
+
+    while not session.finished and session.chapter <= chapters:
+        engine.prepare_next(session, speculator)
+        if think_time:
+            time.sleep(rng.uniform(0.5, 1.5) * think_time)
+        try:
+            result = timed(engine.choose_stream(session, rng.choice("AB"), speculator))
+        except Exception as e:
+            print(f"[Error] Capítulo {session.chapter} fallido: {e}")
+            stats.add_error()
+            return
+        stats.add_chapter(result["latency"], result["ttft"])
+    stats.add_game()
+
+
+def backend_stats(url: str, server: Optional[MockOpenAIServer]) -> Optional[Dict[str, int]]:
+    """
+    Lee los contadores del backend simulado, si existe.
+
+    Parámetros
+    ----------
+    url : str
+        URL base (/v1) del backend.
+    server : MockOpenAIServer or None
+        Servidor simulado en el mismo proceso.
+
+    Retorna
+    -------
+    Dict[str, int] or None
+        Contadores del backend, o None si no es un servidor simulado.
+    """
+    if server is not None:
+        return server.snapshot()
+    try:
+        with urllib.request.urlopen(url.rsplit("/v1", 1)[0] + "/stats", timeout=2) as response:
+            return json.loads(response.read())
+    except Exception:
+        return None
+
+
+def git_commit() -> Optional[str]:
+    """
+    Devuelve el commit actual del repositorio, si se puede obtener.
+
+    Retorna
+    -------
+    str or None
+        Hash corto del commit.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict:
+    """
+    Ejecuta el banco de pruebas.
+
+    Parámetros
+    ----------
+    args : argparse.Namespace
+        Opciones de línea de comandos.
+
+    Retorna
+    -------
+    Dict
+        Resultados en formato JSON.
+    """
+    server = None
+    url = args.url
+    ModelConfig.shared().parser.set("Pipeline", "early_stop", str(not args.no_early_stop).lower())
+    if args.no_scheduler:
+        ModelConfig.shared().parser.set("Scheduler", "enabled", "false")
+    if url is None:
+        server = MockOpenAIServer(("127.0.0.1", 0), ttft=args.mock_ttft, tokens_per_second=args.mock_tps,
+                                  tokens=args.mock_tokens, tail_tokens=args.mock_tail_tokens,
+                                  error_rate=args.mock_error_rate, seed=args.seed, parallel=args.mock_parallel)
+        server.start_background()
+        url = server.url
+
+    model = Llm(url=url, api_key=args.api_key, system_prompt=story_teller)
+    engine = GameEngine(model=model)
+    story_ids = [int(story["id"]) for story in engine.stories()]
+    before = backend_stats(url, server) or {}
+    stats = PlayerStats()
+    rng = random.Random(args.seed)
+    seeds = [rng.random() for _ in range(args.players)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency or args.players) as pool:
+        futures = [
+            pool.submit(play_game, engine, story_ids[i % len(story_ids)], args.chapters, args.think_time,
+                        args.speculate, stats, random.Random(seeds[i]))
+            for i in range(args.players)
+        ]
+        for future in futures:
+            future.result()
+    duration = time.perf_counter() - start
+
+    if server is not None:
+        # Los streamings cortados por el cliente terminan en el servidor un poco después
+        server.wait_idle()
+    after = backend_stats(url, server)
+    backend = None
+    if after is not None:
+        backend = {name: value - before.get(name, 0) for name, value in after.items()}
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        "benchmark": "load_test",
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+        "duration_s": duration,
+        "games": stats.games,
+        "chapters": stats.chapters,
+        "errors": stats.errors,
+        "chapters_per_sec": stats.chapters / duration if duration else None,
+        "chapter_latency_s": describe(stats.latencies),
+        "ttft_s": describe(stats.ttfts),
+        "backend": backend,
+        "generated_tokens_per_chapter": (backend["generated_tokens"] / stats.chapters
+                                         if backend and "generated_tokens" in backend and stats.chapters else None),
+        "cache": model.cache_stats(),
+        "coalescing": model.flights.stats() if model.flights else None,
+        "llm_calls": Telemetry.shared().summary(),
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> None:
+    """
+    Imprime la variación de las métricas principales respecto a otra ejecución.
+
+    Parámetros
+    ----------
+    current : Dict
+        Resultados actuales.
+    baseline : Dict
+        Resultados de referencia.
+    """
+    rows = [("chapters_per_sec", None), ("chapter_latency_s", "p50"), ("chapter_latency_s", "p95"),
+            ("chapter_latency_s", "p99"), ("ttft_s", "p50"), ("ttft_s", "p95"), ("generated_tokens_per_chapter", None)]
+    print(f"Comparación con {baseline.get('git_commit')}:")
+    for name, field in rows:
+        old = baseline.get(name) if field is None else (baseline.get(name) or {}).get(field)
+        new = current.get(name) if field is None else (current.get(name) or {}).get(field)
+        label = name if field is None else f"{name}.{field}"
+        if old and new is not None:
+            print(f"  {label:24s} {old:10.4f} -> {new:10.4f} ({(new - old) / old * 100:+.1f}%)")
+    old_requests = (baseline.get("backend") or {}).get("requests")
+    new_requests = (current.get("backend") or {}).get("requests")
+    if old_requests is not None and new_requests is not None:
+        print(f"  {'backend.requests':24s} {old_requests:10d} -> {new_requests:10d}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banco de pruebas de carga del bucle de narración.")
+    parser.add_argument("--players", type=int, default=10, help="Jugadores simulados.")
+    parser.add_argument("--concurrency", type=int, default=0, help="Jugadores simultáneos (0 = todos).")
+    parser.add_argument("--chapters", type=int, default=10, help="Capítulos por partida.")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Segundos medios de lectura por capítulo.")
+    parser.add_argument("--speculate", action="store_true", help="Pre-genera las ramas A/B mientras se lee.")
+    parser.add_argument("--url", default=None, help="Backend real; si se omite se usa el servidor simulado.")
+    parser.add_argument("--api-key", default="ollama")
+    parser.add_argument("--mock-ttft", type=float, default=0.2)
+    parser.add_argument("--mock-tps", type=float, default=200.0)
+    parser.add_argument("--mock-tokens", type=int, default=120)
+    parser.add_argument("--mock-tail-tokens", type=int, default=0)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-parallel", type=int, default=0,
+                        help="Respuestas que el servidor simulado genera a la vez (0 = sin límite).")
+    parser.add_argument("--no-scheduler", action="store_true",
+                        help="Desactiva el planificador de llamadas al modelo ([Scheduler]).")
+    parser.add_argument("--no-early-stop", action="store_true",
+                        help="Lee cada capítulo entero en lugar de cortar tras las opciones ([Pipeline] early_stop).")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    parser.add_argument("--compare", default=None, help="Resultados JSON previos con los que comparar.")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
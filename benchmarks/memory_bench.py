@@ -0,0 +1,209 @@
+"""
+Banco de pruebas de la memoria de la partida (sección [Pipeline], opción summary_mode).
+
+Juega las mismas partidas con `summary_mode=prefetch` (un resumen del modelo
+por capítulo), `fold` (el capítulo anterior tal cual) y `rolling` (memoria
+incremental acotada, `StoryMemory`) contra el servidor simulado, y compara
+las llamadas de resumen por partida y los tokens del prompt de narración por
+capítulo. Después alarga una partida a `--long-chapters` capítulos solo con
+la memoria incremental para comprobar que su tamaño no crece con la partida,
+ni tampoco el de los pasajes recordados de capítulos anteriores ([Recall],
+`StoryRecall`) que se añaden al prompt.
+
+Uso:
+
+    python benchmarks/memory_bench.py --games 3
+    python benchmarks/memory_bench.py --games 5 --long-chapters 60 --output memoria.json
+"""
+from typing import Dict, List
+import argparse
+import json
+import time
+
+from load_test import describe, git_commit, timed  # noqa: E402  (añade src al sys.path)
+from agents.llm import Llm  # noqa: E402
+from agents.response_cache import ResponseCache  # noqa: E402
+from agents.telemetry import Telemetry  # noqa: E402
+from config.model_config import ModelConfig  # noqa: E402
+from data.sys_prompts import story_teller  # noqa: E402
+from engine.game_engine import GameEngine  # noqa: E402
+from engine.story_memory import StoryMemory  # noqa: E402
+from engine.story_recall import StoryRecall  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+MODES = ("prefetch", "fold", "rolling")
+
+
+def play(engine: GameEngine, story_number: int) -> List[str]:
+    """
+    Juega una partida completa eligiendo siempre la opción A.
+
+    Parámetros
+    ----------
+    engine : GameEngine
+        Motor de juego.
+    story_number : int
+        Historia a jugar.
+
+    Retorna
+    -------
+    List[str]
+        Textos de los capítulos narrados.
+    """
+    session = engine.new_session(story_number)
+    timed(engine.start_stream(session))
+    while not session.finished:
+        engine.prepare_next(session)
+        timed(engine.choose_stream(session, "A"))
+    return session.chapters
+
+
+def run_mode(mode: str, url: str, games: int) -> Dict:
+    """
+    Juega las partidas con un modo de resumen.
+
+    Parámetros
+    ----------
+    mode : str
+        "prefetch", "fold" o "rolling".
+    url : str
+        URL base del servidor simulado.
+    games : int
+        Partidas a jugar (una historia distinta por partida).
+
+    Retorna
+    -------
+    Dict
+        Llamadas de resumen y tokens de prompt de esta configuración.
+    """
+    ModelConfig.shared().parser.set("Pipeline", "summary_mode", mode)
+    telemetry = Telemetry.shared()
+    telemetry.reset()
+    engine = GameEngine(model=Llm(url=url, api_key="mock", system_prompt=story_teller))
+    story_ids = [int(story["id"]) for story in engine.stories()]
+    chapters = 0
+    start = time.perf_counter()
+    for game in range(games):
+        chapters += len(play(engine, story_ids[game % len(story_ids)]))
+    duration = time.perf_counter() - start
+
+    narrations = [record["attributes"] for record in telemetry.recent(limit=telemetry.max_records, kind="span")
+                  if record["name"] == "narrate"]
+    # El primer capítulo no lleva memoria ni resumen: se compara a partir del segundo
+    prompt_tokens = [float(attributes["prompt_tokens"]) for attributes in narrations
+                     if attributes.get("chapter", 1) > 1 and "prompt_tokens" in attributes]
+    summary = telemetry.summary().get("summary", {})
+    summary_tokens = (summary.get("prompt_tokens", 0) + summary.get("completion_tokens", 0)) / max(games, 1)
+    return {
+        "duration_s": duration,
+        "chapters": chapters,
+        "summary_calls_per_game": summary.get("calls", 0) / max(games, 1),
+        "summary_tokens_per_game": summary_tokens,
+        "narration_prompt_tokens": describe(prompt_tokens),
+        # Tokens que el backend procesa por partida para mantener el contexto: prompts de narración más resúmenes
+        "context_tokens_per_game": sum(prompt_tokens) / max(games, 1) + summary_tokens,
+    }
+
+
+def run_long(url: str, chapters: int) -> Dict:
+    """
+    Alarga una partida con la memoria incremental y mide su tamaño capítulo a capítulo.
+
+    Las historias tienen un número fijo de capítulos, así que se juega una
+    partida normal y después se vuelven a añadir sus capítulos a la memoria,
+    en bucle, hasta llegar a `chapters`.
+
+    Parámetros
+    ----------
+    url : str
+        URL base del servidor simulado.
+    chapters : int
+        Capítulos de la partida alargada.
+
+    Retorna
+    -------
+    Dict
+        Tokens de la memoria, condensaciones hechas por el modelo y tokens y
+        pasajes de los recuerdos (vacío si [Recall] está desactivado).
+    """
+    ModelConfig.shared().parser.set("Pipeline", "summary_mode", "rolling")
+    telemetry = Telemetry.shared()
+    engine = GameEngine(model=Llm(url=url, api_key="mock", system_prompt=story_teller))
+    story_number = int(engine.stories()[0]["id"])
+    texts = play(engine, story_number)
+    telemetry.reset()
+    store = StoryMemory.shared()
+    recall = StoryRecall.shared()
+    memory = ""
+    played: List[str] = []
+    sizes: List[float] = []
+    recalled: List[float] = []
+    for chapter in range(2, chapters + 1):
+        previous = texts[(chapter - 2) % len(texts)]
+        played.append(previous)
+        memory = engine.narrator.memory_for(story_number, chapter, memory, previous, "A")
+        sizes.append(float(store.count(memory)))
+        if recall is not None:
+            recalled.append(float(store.count(recall.recall("memory_bench", played))))
+    result = {
+        "chapters": chapters,
+        "max_tokens": store.max_tokens,
+        "memory_tokens": describe(sizes),
+        "memory_tokens_max": max(sizes, default=0.0),
+        "compactions": telemetry.summary().get("summary", {}).get("calls", 0),
+    }
+    if recall is not None:
+        result["recall_tokens"] = describe(recalled)
+        result["recall_tokens_max"] = max(recalled, default=0.0)
+        result["recall"] = recall.stats()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara los modos de resumen prefetch, fold y rolling.")
+    parser.add_argument("--games", type=int, default=3, help="Partidas por modo.")
+    parser.add_argument("--long-chapters", type=int, default=40, help="Capítulos de la partida alargada.")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens por respuesta del servidor simulado.")
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    # Cada capítulo debe llegar al backend, y los spans de todas las partidas caber en la telemetría
+    config = ModelConfig.shared()
+    config.parser.set("Cache", "enabled", "false")
+    config.parser.set("Prerender", "enabled", "false")
+    config.parser.set("Telemetry", "max_records", str(max(args.games, 1) * 200 + args.long_chapters * 10))
+    ResponseCache.reset_shared()
+    Telemetry.reset_shared()
+
+    server = MockOpenAIServer(("127.0.0.1", 0), ttft=0.01, tokens_per_second=5000.0, tokens=args.tokens)
+    server.start_background()
+    results = {
+        "benchmark": "memory_bench",
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "modes": {mode: run_mode(mode, server.url, args.games) for mode in MODES},
+        "long_game": run_long(server.url, args.long_chapters),
+    }
+    server.shutdown()
+    server.server_close()
+
+    for mode, result in results["modes"].items():
+        tokens = result["narration_prompt_tokens"]
+        print(f"{mode:<9} resúmenes por partida {result['summary_calls_per_game']:5.1f}  "
+              f"tokens de resumen por partida {result['summary_tokens_per_game']:7.0f}  "
+              f"prompt de narración p50 {tokens['p50'] or 0:6.0f} p99 {tokens['p99'] or 0:6.0f}  "
+              f"total por partida {result['context_tokens_per_game']:7.0f} tokens")
+    long_game = results["long_game"]
+    print(f"Partida de {long_game['chapters']} capítulos: memoria máx {long_game['memory_tokens_max']:.0f} "
+          f"tokens (límite {long_game['max_tokens']}), {long_game['compactions']} condensaciones")
+    if "recall" in long_game:
+        print(f"Recuerdos: máx {long_game['recall_tokens_max']:.0f} tokens por prompt entre "
+              f"{long_game['recall']['passages']} pasajes indexados ({long_game['recall']['bytes']} B de vectores)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+"""
+Servidor de pruebas compatible con la API de OpenAI (/v1/chat/completions).
+
+Sustituye a Ollama en los bancos de pruebas: genera capítulos sintéticos que
+terminan con las opciones A/B, con tiempo hasta el primer token, velocidad de
+generación y tasa de errores configurables, y cuenta las peticiones recibidas
+(GET /stats). Opcionalmente simula la evaluación del prompt con caché KV de
+prefijos, como llama.cpp/Ollama: solo se "evalúan" los caracteres que no
+coinciden con el prompt anterior de alguna de sus ranuras. También puede
+simular la carga del modelo en memoria (--load-seconds) y la API nativa de
+Ollama (/api/generate con prompt vacío y keep_alive) para medir arranques en frío,
+y una GPU que solo genera `--parallel` respuestas a la vez (el resto espera).
+
+Uso:
+
+    python benchmarks/mock_openai_server.py --port 8089 --ttft 0.3 --tps 40
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+WORDS = (
+    "el viento susurra entre las torres de piedra mientras la niebla cubre el valle "
+    "y una luz antigua despierta en el bosque donde los guardianes esperan al viajero "
+    "con espadas de plata y promesas olvidadas bajo la luna"
+).split()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP que imita la API de chat de OpenAI con latencias configurables.
+
+    Atributos
+    ----------
+    ttft : float
+        Segundos hasta el primer token.
+    tokens_per_second : float
+        Velocidad de generación.
+    tokens : int
+        Tokens narrativos de cada respuesta (antes de las opciones).
+    tail_tokens : int
+        Tokens que el modelo "sigue escribiendo" después de las opciones.
+    error_rate : float
+        Probabilidad de responder con un error 500.
+    prompt_tokens_per_second : float
+        Velocidad de evaluación del prompt (0 = no se simula).
+    kv_slots : int
+        Ranuras de caché KV (prompts anteriores cuyo prefijo se reutiliza).
+    load_seconds : float
+        Segundos que tarda en "cargarse" el modelo en la primera petición tras arrancar o descargarse.
+    slots : threading.Semaphore or None
+        Turnos de generación simultánea (--parallel), o None sin límite.
+    stats : Dict[str, int]
+        Contadores de peticiones recibidas. `completion_tokens` son los
+        tokens que se habrían generado; `generated_tokens` los que llegaron a
+        enviarse antes de que el cliente cerrara la conexión.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], ttft: float = 0.2, tokens_per_second: float = 50.0,
+                 tokens: int = 120, tail_tokens: int = 0, error_rate: float = 0.0, seed: Optional[int] = None,
+                 prompt_tokens_per_second: float = 0.0, kv_slots: int = 1, load_seconds: float = 0.0,
+                 parallel: int = 0):
+        """
+        Inicializa la clase MockOpenAIServer.
+
+        Parámetros
+        ----------
+        address : Tuple[str, int]
+            Host y puerto donde escuchar (puerto 0 = libre).
+        ttft : float, opcional
+            Segundos hasta el primer token. Por defecto es 0.2.
+        tokens_per_second : float, opcional
+            Velocidad de generación. Por defecto es 50.
+        tokens : int, opcional
+            Tokens narrativos por respuesta. Por defecto es 120.
+        tail_tokens : int, opcional
+            Tokens sobrantes tras las opciones. Por defecto es 0.
+        error_rate : float, opcional
+            Probabilidad de error 500. Por defecto es 0.
+        seed : int, opcional
+            Semilla del generador aleatorio.
+        prompt_tokens_per_second : float, opcional
+            Velocidad de evaluación del prompt; 0 desactiva la simulación. Por defecto es 0.
+        kv_slots : int, opcional
+            Ranuras de caché KV. Por defecto es 1 (como Ollama con OLLAMA_NUM_PARALLEL=1).
+        load_seconds : float, opcional
+            Tiempo de carga simulado del modelo. Por defecto es 0 (siempre cargado).
+        parallel : int, opcional
+            Peticiones que se generan a la vez; las demás esperan. Por defecto es 0 (sin límite).
+        """
+        super().__init__(address, MockOpenAIHandler)
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.tail_tokens = tail_tokens
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.kv_slots = kv_slots
+        self.load_seconds = load_seconds
+        self.slots = threading.Semaphore(parallel) if parallel > 0 else None
+        self.stats: Dict[str, int] = {
+            "requests": 0, "stream_requests": 0, "errors": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "generated_tokens": 0, "open_streams": 0,
+            "prompt_cached_tokens": 0, "prompt_eval_ms": 0, "model_loads": 0,
+        }
+        self.__lock = threading.Lock()
+        self.__counter = 0
+        self.__slots: List[str] = []
+        self.__loaded = False
+        self.__load_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """
+        str: Obtiene la URL base (/v1) del servidor.
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, **deltas: int) -> int:
+        """
+        Suma valores a los contadores y devuelve el número de petición.
+
+        Parámetros
+        ----------
+        **deltas : int
+            Incrementos de cada contador.
+
+        Retorna
+        -------
+        int
+            Número de orden de la petición (para variar el texto generado).
+        """
+        with self.__lock:
+            for name, delta in deltas.items():
+                self.stats[name] = self.stats.get(name, 0) + delta
+            self.__counter += 1
+            return self.__counter
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Devuelve una copia de los contadores.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Contadores de peticiones.
+        """
+        with self.__lock:
+            return dict(self.stats)
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """
+        Espera a que terminen los streamings en curso, para leer contadores completos.
+
+        Parámetros
+        ----------
+        timeout : float, opcional
+            Segundos máximos de espera. Por defecto es 5.
+
+        Retorna
+        -------
+        bool
+            True si no queda ningún streaming abierto.
+        """
+        deadline = time.monotonic() + timeout
+        while self.snapshot()["open_streams"] > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def reset_stats(self) -> None:
+        """
+        Pone a cero los contadores y vacía la caché KV simulada.
+        """
+        with self.__lock:
+            for name in self.stats:
+                self.stats[name] = 0
+            self.__slots.clear()
+
+    def handle_error(self, request, client_address) -> None:
+        # Los clientes que cancelan un stream cierran la conexión: no es un error del servidor
+        error = sys.exc_info()[1]
+        if isinstance(error, (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def prompt_eval(self, prompt: str) -> Tuple[int, float]:
+        """
+        Simula la evaluación de un prompt reutilizando el prefijo más largo en caché.
+
+        La ranura con el prefijo común más largo se sustituye por este prompt;
+        si ninguna comparte nada se reemplaza la usada hace más tiempo.
+
+        Parámetros
+        ----------
+        prompt : str
+            Prompt completo (mensajes concatenados).
+
+        Retorna
+        -------
+        Tuple[int, float]
+            Tokens reutilizados de la caché y segundos de evaluación simulados.
+        """
+        if self.prompt_tokens_per_second <= 0:
+            return 0, 0.0
+        with self.__lock:
+            best, best_index = 0, None
+            for index, cached in enumerate(self.__slots):
+                common = os.path.commonprefix([cached, prompt])
+                if len(common) > best:
+                    best, best_index = len(common), index
+            if best_index is not None:
+                self.__slots.pop(best_index)
+            elif len(self.__slots) >= self.kv_slots:
+                self.__slots.pop(0)
+            self.__slots.append(prompt)
+        cached_tokens = best // 4
+        seconds = max(0, len(prompt) // 4 - cached_tokens) / self.prompt_tokens_per_second
+        self.count(prompt_cached_tokens=cached_tokens, prompt_eval_ms=int(seconds * 1000))
+        return cached_tokens, seconds
+
+    def load_model(self) -> float:
+        """
+        Simula la carga del modelo si no está en memoria.
+
+        Retorna
+        -------
+        float
+            Segundos de carga (0 si ya estaba cargado).
+        """
+        if self.load_seconds <= 0:
+            return 0.0
+        with self.__load_lock:
+            if self.__loaded:
+                return 0.0
+            time.sleep(self.load_seconds)
+            self.__loaded = True
+        self.count(model_loads=1)
+        return self.load_seconds
+
+    def unload_model(self) -> None:
+        """
+        Simula la descarga del modelo (keep_alive=0) y vacía la caché KV.
+        """
+        with self.__load_lock:
+            self.__loaded = False
+        with self.__lock:
+            self.__slots.clear()
+
+    def start_background(self) -> threading.Thread:
+        """
+        Arranca el servidor en un hilo en segundo plano.
+
+        Retorna
+        -------
+        threading.Thread
+            Hilo que ejecuta el servidor.
+        """
+        thread = threading.Thread(target=self.serve_forever, name="mock-openai", daemon=True)
+        thread.start()
+        return thread
+
+    def completion_tokens(self, number: int) -> List[str]:
+        """
+        Construye los tokens de un capítulo sintético.
+
+        Parámetros
+        ----------
+        number : int
+            Número de petición, para que cada respuesta sea distinta.
+
+        Retorna
+        -------
+        List[str]
+            Tokens de la respuesta (narración, opciones y texto sobrante).
+        """
+        rng = random.Random(number)
+        body = [rng.choice(WORDS) + " " for _ in range(self.tokens)]
+        body[0] = f"[{number}] "
+        options = ["\n\nA - ", "Cruzar ", "el ", "puente\n", "B - ", "Volver ", "al ", "bosque\n"]
+        tail = [rng.choice(WORDS) + " " for _ in range(self.tail_tokens)]
+        return body + options + tail
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """
+    Manejador de las rutas /v1/models, /v1/chat/completions y /stats.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/stats":
+            self.__send_json(200, self.server.snapshot())
+        elif self.path.rstrip("/") == "/v1/models":
+            self.__send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self.__send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") == "/stats/reset":
+            self.server.reset_stats()
+            self.__send_json(200, {})
+            return
+        if self.path.rstrip("/") == "/api/generate":
+            self.__ollama_generate()
+            return
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.__send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server: MockOpenAIServer = self.server
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in request.get("messages", [])) // 4
+        stream = bool(request.get("stream"))
+        number = server.count(requests=1, stream_requests=int(stream), prompt_tokens=prompt_tokens)
+
+        if server.random.random() < server.error_rate:
+            server.count(errors=1)
+            self.__send_json(500, {"error": {"message": "injected error", "type": "server_error"}})
+            return
+
+        # Con --parallel las peticiones que no caben esperan su turno, como en Ollama con OLLAMA_NUM_PARALLEL
+        if server.slots is not None:
+            server.slots.acquire()
+        try:
+            self.__complete(request, number, prompt_tokens, stream)
+        finally:
+            if server.slots is not None:
+                server.slots.release()
+
+    def __complete(self, request: Dict, number: int, prompt_tokens: int, stream: bool) -> None:
+        """
+        Genera la respuesta de una petición de chat, completa o en streaming.
+
+        Parámetros
+        ----------
+        request : Dict
+            Cuerpo de la petición.
+        number : int
+            Número de orden de la petición.
+        prompt_tokens : int
+            Tokens estimados del prompt.
+        stream : bool
+            Si se responde en streaming.
+        """
+        server: MockOpenAIServer = self.server
+        prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in request.get("messages", []))
+        server.load_model()
+        _, prompt_seconds = server.prompt_eval(prompt)
+
+        tokens = self.__apply_limits(server.completion_tokens(number), request)
+        server.count(completion_tokens=len(tokens))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        model = request.get("model", "mock")
+        delay = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+
+        time.sleep(server.ttft + prompt_seconds)
+        if not stream:
+            server.count(generated_tokens=len(tokens))
+            time.sleep(delay * len(tokens))
+            self.__send_json(200, {
+                "id": f"chatcmpl-{number}", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        server.count(open_streams=1)
+        try:
+            for token in tokens:
+                self.__send_event({"id": f"chatcmpl-{number}", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                   "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+                sent += 1
+                time.sleep(delay)
+            self.__send_event({"id": f"chatcmpl-{number}", "object": "chat.completion.chunk", "created": 0, "model": model,
+                               "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                self.__send_event({"id": f"chatcmpl-{number}", "object": "chat.completion.chunk", "created": 0, "model": model,
+                                   "choices": [], "usage": usage})
+            self.__send_chunk(b"data: [DONE]\n\n")
+            self.__send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cerró el stream antes de tiempo (cancelación o corte tras las opciones)
+            server.count(cancelled=1)
+        finally:
+            server.count(generated_tokens=sent, open_streams=-1)
+
+    def __ollama_generate(self) -> None:
+        """
+        Imita /api/generate de Ollama con prompt vacío: carga o descarga el modelo.
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server: MockOpenAIServer = self.server
+        if request.get("keep_alive") in (0, "0", "0s"):
+            server.unload_model()
+            self.__send_json(200, {"model": request.get("model"), "done": True, "done_reason": "unload"})
+            return
+        load_seconds = server.load_model()
+        self.__send_json(200, {"model": request.get("model"), "response": "", "done": True,
+                               "done_reason": "load", "load_duration": int(load_seconds * 1e9)})
+
+    @staticmethod
+    def __apply_limits(tokens: List[str], request: Dict) -> List[str]:
+        """
+        Aplica `max_tokens` y las secuencias `stop` de la petición, como haría el backend.
+
+        Parámetros
+        ----------
+        tokens : List[str]
+            Tokens que se generarían sin límites.
+        request : Dict
+            Cuerpo de la petición.
+
+        Retorna
+        -------
+        List[str]
+            Tokens realmente emitidos.
+        """
+        stops = request.get("stop") or []
+        if isinstance(stops, str):
+            stops = [stops]
+        if stops:
+            text = ""
+            for index, token in enumerate(tokens):
+                text += token
+                if any(stop in text for stop in stops):
+                    tokens = tokens[:index]
+                    break
+        max_tokens = request.get("max_tokens") or request.get("max_completion_tokens")
+        if max_tokens:
+            tokens = tokens[:int(max_tokens)]
+        return tokens
+
+    def __send_event(self, payload: Dict) -> None:
+        self.__send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def __send_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def __send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor OpenAI simulado para bancos de pruebas.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Segundos hasta el primer token.")
+    parser.add_argument("--tps", type=float, default=50.0, help="Tokens por segundo.")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens narrativos por respuesta.")
+    parser.add_argument("--tail-tokens", type=int, default=0, help="Tokens sobrantes tras las opciones.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de error 500.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--prompt-tps", type=float, default=0.0,
+                        help="Tokens de prompt evaluados por segundo (0 = sin simular la caché KV).")
+    parser.add_argument("--kv-slots", type=int, default=1, help="Ranuras de caché KV de prefijos.")
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="Tiempo de carga simulado del modelo.")
+    parser.add_argument("--parallel", type=int, default=0, help="Peticiones generadas a la vez (0 = sin límite).")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer((args.host, args.port), ttft=args.ttft, tokens_per_second=args.tps,
+                              tokens=args.tokens, tail_tokens=args.tail_tokens,
+                              error_rate=args.error_rate, seed=args.seed,
+                              prompt_tokens_per_second=args.prompt_tps, kv_slots=args.kv_slots,
+                              load_seconds=args.load_seconds, parallel=args.parallel)
+    print(f"Servidor simulado en {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
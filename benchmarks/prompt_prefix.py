@@ -0,0 +1,149 @@
+"""
+Banco de pruebas de la disposición de los prompts y la caché KV del backend.
+
+Juega las mismas partidas con `prompt_layout=legacy` y `prompt_layout=prefix`
+(sección [Pipeline] de model.config) y compara el tiempo de evaluación del
+prompt por capítulo. Contra el servidor simulado (por defecto) se usa su
+simulación de caché KV de prefijos y se informa de los tokens reutilizados;
+contra un backend real (--url) se mide el tiempo hasta el primer token, que
+en Ollama/llama.cpp está dominado por la evaluación del prompt.
+
+Uso:
+
+    python benchmarks/prompt_prefix.py --games 3 --chapters 10
+    python benchmarks/prompt_prefix.py --url http://localhost:11434/v1 --games 1
+"""
+from typing import Dict, List, Optional
+import argparse
+import json
+import time
+
+from load_test import describe, git_commit, timed  # noqa: E402  (añade src al sys.path)
+from agents.llm import Llm  # noqa: E402
+from agents.response_cache import ResponseCache  # noqa: E402
+from config.model_config import ModelConfig  # noqa: E402
+from data.sys_prompts import story_teller  # noqa: E402
+from engine.game_engine import GameEngine  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+LAYOUTS = ("legacy", "prefix")
+
+
+def play(engine: GameEngine, story_number: int, chapters: int, ttfts: List[float]) -> None:
+    """
+    Juega una partida eligiendo siempre la opción A, guardando el TTFT de cada capítulo.
+
+    Parámetros
+    ----------
+    engine : GameEngine
+        Motor de juego.
+    story_number : int
+        Historia a jugar.
+    chapters : int
+        Capítulos máximos.
+    ttfts : List[float]
+        Lista donde se añaden los tiempos hasta el primer token.
+    """
+    session = engine.new_session(story_number)
+    result = timed(engine.start_stream(session))
+    ttfts.append(result["ttft"])
+    while not session.finished and session.chapter <= chapters:
+        engine.prepare_next(session)
+        result = timed(engine.choose_stream(session, "A"))
+        if result["ttft"] is not None:
+            ttfts.append(result["ttft"])
+
+
+def run_layout(layout: str, url: str, api_key: str, games: int, chapters: int,
+               server: Optional[MockOpenAIServer]) -> Dict:
+    """
+    Ejecuta las partidas con una disposición de prompt.
+
+    Parámetros
+    ----------
+    layout : str
+        "legacy" o "prefix".
+    url : str
+        URL base del backend.
+    api_key : str
+        Clave de la API.
+    games : int
+        Partidas a jugar (una historia distinta por partida).
+    chapters : int
+        Capítulos por partida.
+    server : MockOpenAIServer or None
+        Servidor simulado, si se usa.
+
+    Retorna
+    -------
+    Dict
+        Tiempos y contadores de esta disposición.
+    """
+    ModelConfig.shared().parser.set("Pipeline", "prompt_layout", layout)
+    if server is not None:
+        server.reset_stats()
+    engine = GameEngine(model=Llm(url=url, api_key=api_key, system_prompt=story_teller))
+    story_ids = [int(story["id"]) for story in engine.stories()]
+    ttfts: List[float] = []
+    start = time.perf_counter()
+    for game in range(games):
+        play(engine, story_ids[game % len(story_ids)], chapters, ttfts)
+    result = {"duration_s": time.perf_counter() - start, "ttft_s": describe(ttfts)}
+
+    if server is not None:
+        stats = server.snapshot()
+        result["backend"] = stats
+        result["prompt_eval_s_per_request"] = stats["prompt_eval_ms"] / 1000 / max(stats["requests"], 1)
+        result["prompt_cached_ratio"] = stats["prompt_cached_tokens"] / max(stats["prompt_tokens"], 1)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara las disposiciones de prompt legacy y prefix.")
+    parser.add_argument("--games", type=int, default=3, help="Partidas por disposición.")
+    parser.add_argument("--chapters", type=int, default=10, help="Capítulos por partida.")
+    parser.add_argument("--url", default=None, help="Backend real; si se omite se usa el servidor simulado.")
+    parser.add_argument("--api-key", default="ollama")
+    parser.add_argument("--mock-prompt-tps", type=float, default=400.0, help="Tokens de prompt por segundo simulados.")
+    parser.add_argument("--mock-kv-slots", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    # Se desactiva la caché de respuestas para que cada capítulo llegue al backend
+    config = ModelConfig.shared()
+    config.parser.set("Cache", "enabled", "false")
+    ResponseCache.reset_shared()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = MockOpenAIServer(("127.0.0.1", 0), ttft=0.05, tokens_per_second=2000.0, tokens=120,
+                                  prompt_tokens_per_second=args.mock_prompt_tps, kv_slots=args.mock_kv_slots)
+        server.start_background()
+        url = server.url
+
+    results = {
+        "benchmark": "prompt_prefix",
+        "git_commit": git_commit(),
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "layouts": {layout: run_layout(layout, url, args.api_key, args.games, args.chapters, server)
+                    for layout in LAYOUTS},
+    }
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    legacy, prefix = results["layouts"]["legacy"], results["layouts"]["prefix"]
+    print(f"TTFT p50: {legacy['ttft_s']['p50']:.3f}s -> {prefix['ttft_s']['p50']:.3f}s")
+    if server is not None:
+        print(f"Evaluación del prompt por petición: {legacy['prompt_eval_s_per_request']:.3f}s -> "
+              f"{prefix['prompt_eval_s_per_request']:.3f}s "
+              f"(reutilizado {legacy['prompt_cached_ratio']:.0%} -> {prefix['prompt_cached_ratio']:.0%})")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
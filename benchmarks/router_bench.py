@@ -0,0 +1,190 @@
+"""
+Banco de pruebas del router de backends (LlmRouter).
+
+Arranca varios servidores OpenAI simulados en el mismo proceso: `--fast`
+rápidos, `--slow` lentos (tiempo hasta el primer token `--slow-ttft`) y,
+opcionalmente, uno que devuelve errores 500 (`--flaky-error-rate`) y una URL
+sin servidor detrás (`--dead`). Lanza `--requests` peticiones en streaming
+con `--concurrency` simultáneas, primero sin peticiones duplicadas y después
+con ellas (`hedge=True`), y compara la latencia (p50/p95/p99), los errores
+y el reparto por backend.
+
+Uso:
+
+    python benchmarks/router_bench.py
+    python benchmarks/router_bench.py --requests 400 --concurrency 16 --dead --output router.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import argparse
+import json
+import socket
+import threading
+import time
+
+from load_test import describe, git_commit  # noqa: E402
+from agents.router import LlmRouter  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+
+def free_url() -> str:
+    """
+    Devuelve la URL de un puerto local en el que no escucha nadie.
+
+    Retorna
+    -------
+    str
+        URL base (/v1) que rechaza las conexiones.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def start_servers(args: argparse.Namespace) -> List[MockOpenAIServer]:
+    """
+    Arranca los servidores simulados del escenario.
+
+    Parámetros
+    ----------
+    args : argparse.Namespace
+        Opciones de línea de comandos.
+
+    Retorna
+    -------
+    List[MockOpenAIServer]
+        Servidores rápidos, lentos y, si se pide, el que falla.
+    """
+    servers = []
+    ttfts = [args.ttft] * args.fast + [args.slow_ttft] * args.slow
+    for index, ttft in enumerate(ttfts):
+        servers.append(MockOpenAIServer(("127.0.0.1", 0), ttft=ttft, tokens_per_second=args.tps,
+                                        tokens=args.tokens, seed=args.seed + index))
+    if args.flaky_error_rate:
+        servers.append(MockOpenAIServer(("127.0.0.1", 0), ttft=args.ttft, tokens_per_second=args.tps,
+                                        tokens=args.tokens, error_rate=args.flaky_error_rate,
+                                        seed=args.seed + len(servers)))
+    for server in servers:
+        server.start_background()
+    return servers
+
+
+def run_scenario(args: argparse.Namespace, hedge: bool) -> Dict:
+    """
+    Ejecuta las peticiones contra un router nuevo.
+
+    Parámetros
+    ----------
+    args : argparse.Namespace
+        Opciones de línea de comandos.
+    hedge : bool
+        Si se envían peticiones duplicadas.
+
+    Retorna
+    -------
+    Dict
+        Latencias, errores y estadísticas por backend.
+    """
+    servers = start_servers(args)
+    urls = [server.url for server in servers] + ([free_url()] if args.dead else [])
+    router = LlmRouter(urls, "mock", timeout=args.timeout, max_retries=args.max_retries, backoff=args.backoff,
+                       health_interval=0, hedge=hedge, hedge_percentile=args.hedge_percentile,
+                       hedge_min_samples=args.hedge_min_samples, hedge_min_seconds=args.hedge_min_seconds)
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one(number: int) -> None:
+        messages = [{"role": "user", "content": f"Petición {number}"}]
+        start = time.perf_counter()
+        ttft: Optional[float] = None
+        try:
+            for chunk in router.stream(model="mock", messages=messages):
+                if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+                    ttft = time.perf_counter() - start
+        except Exception as e:
+            print(f"[Error] Petición {number} fallida: {e}")
+            with lock:
+                errors[0] += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            if ttft is not None:
+                ttfts.append(ttft)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    duration = time.perf_counter() - start
+    backends = router.stats()
+    router.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    return {
+        "hedge": hedge,
+        "duration_s": duration,
+        "errors": errors[0],
+        "latency_s": describe(latencies),
+        "ttft_s": describe(ttfts),
+        "backends": backends,
+    }
+
+
+def print_scenario(result: Dict) -> None:
+    """
+    Imprime el resumen de un escenario.
+
+    Parámetros
+    ----------
+    result : Dict
+        Resultado de `run_scenario`.
+    """
+    latency, ttft = result["latency_s"], result["ttft_s"]
+    print(f"hedge={result['hedge']}: {latency['count']} correctas, {result['errors']} errores en "
+          f"{result['duration_s']:.1f}s; latencia p50 {latency['p50'] or 0:.3f}s p95 {latency['p95'] or 0:.3f}s "
+          f"p99 {latency['p99'] or 0:.3f}s; TTFT p95 {ttft['p95'] or 0:.3f}s")
+    for backend in result["backends"]:
+        print(f"  {backend['url']:<28} peticiones {backend['requests']:4d}  errores {backend['errors']:3d}  "
+              f"reintentos {backend['retries']:3d}  duplicadas {backend['hedges']:3d} "
+              f"(ganadas {backend['hedge_wins']:3d})  sano {backend['healthy'] and not backend['cooling_down']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara el router de backends con y sin peticiones duplicadas.")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones en streaming por escenario.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones simultáneas.")
+    parser.add_argument("--fast", type=int, default=2, help="Backends rápidos.")
+    parser.add_argument("--slow", type=int, default=1, help="Backends lentos.")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Tiempo hasta el primer token de los rápidos.")
+    parser.add_argument("--slow-ttft", type=float, default=1.0, help="Tiempo hasta el primer token de los lentos.")
+    parser.add_argument("--tps", type=float, default=400.0, help="Tokens por segundo de los backends.")
+    parser.add_argument("--tokens", type=int, default=40, help="Tokens por respuesta.")
+    parser.add_argument("--flaky-error-rate", type=float, default=0.0,
+                        help="Si no es 0, añade un backend que falla con esta probabilidad.")
+    parser.add_argument("--dead", action="store_true", help="Añade una URL sin servidor.")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--backoff", type=float, default=0.05)
+    parser.add_argument("--hedge-percentile", type=float, default=75.0)
+    parser.add_argument("--hedge-min-samples", type=int, default=20)
+    parser.add_argument("--hedge-min-seconds", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    results: Dict = {"benchmark": "router_bench", "git_commit": git_commit(),
+                     "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args).copy(), "scenarios": []}
+    for hedge in (False, True):
+        result = run_scenario(args, hedge)
+        results["scenarios"].append(result)
+        print_scenario(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
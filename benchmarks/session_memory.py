@@ -0,0 +1,225 @@
+"""
+Banco de pruebas de la memoria por partida abierta.
+
+Crea 10, 100 y 1000 partidas simuladas con capítulos y resúmenes de tamaño
+realista y mide con tracemalloc los bytes que ocupa cada una en dos
+representaciones:
+
+- `plain`: listas de textos sin comprimir, como el diccionario de
+  `GameSession.to_dict` (así se guardaba antes el estado en memoria).
+- `compact`: `GameSession`, con `__slots__` y los capítulos y resúmenes
+  anteriores al último comprimidos.
+
+Los textos se generan con el vocabulario de las sinopsis del catálogo; el
+texto del servidor simulado usa muy pocas palabras y se comprimiría mucho
+mejor que una narración real. También mide lo que queda en memoria por cada
+re-ejecución de Streamlit (`Llm`, `Ui` y `GameEngine`, que comparten cliente
+y catálogo con el resto del proceso) y el coste de leer el último capítulo
+y la partida completa.
+
+Uso:
+
+    python benchmarks/session_memory.py
+    python benchmarks/session_memory.py --sessions 10 100 1000 --chapters 10 --output sesiones.json
+"""
+from typing import Callable, Dict, List
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from load_test import git_commit  # noqa: E402  (añade src al sys.path)
+from agents.llm import Llm  # noqa: E402
+from data.sys_prompts import story_teller  # noqa: E402
+from engine.game_engine import GameEngine  # noqa: E402
+from engine.game_session import GameSession  # noqa: E402
+from engine.story_catalog import StoryCatalog  # noqa: E402
+
+# Palabras aproximadas de un capítulo (con sus opciones) y de un resumen
+CHAPTER_WORDS = 350
+SUMMARY_WORDS = 120
+
+
+def make_state(rng: random.Random, vocabulary: List[str], story_number: int, chapters: int) -> Dict:
+    """
+    Genera el estado de una partida terminada, con el formato de `GameSession.to_dict`.
+
+    Parámetros
+    ----------
+    rng : random.Random
+        Generador de números aleatorios.
+    vocabulary : List[str]
+        Palabras con las que se escriben los textos.
+    story_number : int
+        Historia de la partida.
+    chapters : int
+        Capítulos narrados.
+
+    Retorna
+    -------
+    Dict
+        Estado de la partida.
+    """
+    def text(words: int) -> str:
+        return " ".join(rng.choice(vocabulary) for _ in range(words)) + "."
+
+    return {
+        "story_number": story_number,
+        "chapter": chapters + 1,
+        "chapters": [text(CHAPTER_WORDS) + "\n\nA - Cruzar el puente\nB - Volver al bosque" for _ in range(chapters)],
+        "choices": [rng.choice("AB") for _ in range(chapters - 1)],
+        "summaries": [text(SUMMARY_WORDS) for _ in range(chapters - 1)],
+        "finished": True,
+    }
+
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    """
+    Mide los bytes que siguen reservados tras construir un objeto.
+
+    Parámetros
+    ----------
+    build : Callable[[], object]
+        Función que construye el objeto; se mantiene vivo durante la medición.
+
+    Retorna
+    -------
+    int
+        Bytes reservados por la construcción.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = build()
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def per_call_us(fn: Callable[[int], object], calls: int) -> float:
+    """
+    Mide el tiempo medio por llamada en microsegundos.
+
+    Parámetros
+    ----------
+    fn : Callable[[int], object]
+        Función a medir; recibe el índice de la llamada.
+    calls : int
+        Número de llamadas.
+
+    Retorna
+    -------
+    float
+        Microsegundos por llamada.
+    """
+    start = time.perf_counter()
+    for index in range(calls):
+        fn(index)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run_sessions(states: List[Dict], count: int) -> Dict:
+    """
+    Mide los bytes por partida de las dos representaciones con `count` partidas abiertas.
+
+    Cada partida recibe su propia copia de los textos (como al leerla del
+    almacén), para que no se compartan cadenas entre partidas.
+
+    Parámetros
+    ----------
+    states : List[Dict]
+        Estados de partida de los que se copian los textos.
+    count : int
+        Partidas abiertas a la vez.
+
+    Retorna
+    -------
+    Dict
+        Bytes por partida en cada representación, ahorro y tiempos de lectura.
+    """
+    encoded = [json.dumps(states[index % len(states)], ensure_ascii=False) for index in range(count)]
+    plain = retained_bytes(lambda: [json.loads(state) for state in encoded]) / count
+    compact = retained_bytes(lambda: [GameSession.from_dict(json.loads(state)) for state in encoded]) / count
+    sessions = [GameSession.from_dict(json.loads(state)) for state in encoded]
+    return {
+        "sessions": count,
+        "plain_bytes_per_session": plain,
+        "compact_bytes_per_session": compact,
+        "saving": 1 - compact / plain if plain else None,
+        "story_text_us": per_call_us(lambda i: sessions[i % count].story_text, 10000),
+        "chapters_us": per_call_us(lambda i: sessions[i % count].chapters, min(count, 1000)),
+    }
+
+
+def rerun_bytes(reruns: int) -> float:
+    """
+    Mide lo que queda en memoria por cada re-ejecución de Streamlit.
+
+    Construye `Llm`, `Ui` y `GameEngine` como `Di_and_Da.py` y los mantiene
+    vivos, como si cada uno perteneciera a una sesión distinta.
+
+    Parámetros
+    ----------
+    reruns : int
+        Re-ejecuciones simuladas.
+
+    Retorna
+    -------
+    float
+        Bytes por re-ejecución.
+    """
+    from ui.streamlit_ui import Ui
+
+    def build() -> List:
+        pages = []
+        for _ in range(reruns):
+            model = Llm(url="http://127.0.0.1:9/v1", api_key="mock", system_prompt=story_teller)
+            pages.append((model, Ui(model=model), GameEngine(model=model)))
+        return pages
+
+    # La primera construcción carga el cliente y el catálogo compartidos; no cuentan por sesión
+    build()
+    return retained_bytes(build) / reruns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bytes por partida abierta, con y sin el estado compacto.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Partidas abiertas a la vez en cada medición.")
+    parser.add_argument("--chapters", type=int, default=10, help="Capítulos narrados por partida.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    catalog = StoryCatalog.shared()
+    vocabulary = [word.strip(".,;:¡!¿?\"'()").lower() for story in catalog for word in story.sinopsis.split()]
+    vocabulary = [word for word in vocabulary if word]
+    rng = random.Random(args.seed)
+    story_ids = [story.id for story in catalog]
+    states = [make_state(rng, vocabulary, story_ids[index % len(story_ids)], args.chapters) for index in range(50)]
+
+    results = {
+        "benchmark": "session_memory",
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {name: value for name, value in vars(args).items() if name != "output"},
+        "runs": [run_sessions(states, count) for count in args.sessions],
+        "rerun_bytes": rerun_bytes(100),
+    }
+
+    for run in results["runs"]:
+        print(f"{run['sessions']:>5} partidas  plain {run['plain_bytes_per_session']:8.0f} B/partida  "
+              f"compact {run['compact_bytes_per_session']:8.0f} B/partida  ahorro {run['saving']:6.1%}  "
+              f"story_text {run['story_text_us']:5.2f} us  chapters {run['chapters_us']:7.1f} us")
+    print(f"Llm + Ui + GameEngine por re-ejecución: {results['rerun_bytes']:.0f} B")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
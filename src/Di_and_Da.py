@@ -1,59 +1,145 @@
 import streamlit as st
 from ui.streamlit_ui import Ui
 from agents.llm import Llm
+from agents.scheduler import SchedulerBusy
+from agents.speculation import BranchSpeculator
+from agents.telemetry import Telemetry
+from agents.warmup import ModelWarmup
+from config.model_config import ModelConfig
 from data.sys_prompts import story_teller
+from engine.game_engine import GameEngine
+from engine.session_store import SqliteSessionStore
 
 # --- Inicialización ---
-model = Llm(url='http://localhost:11434/v1', api_key="ollama", system_prompt=story_teller)
+# Llm, Ui y GameEngine son baratos de construir: reutilizan el cliente OpenAI, la
+# configuración y el catálogo de historias compartidos por el proceso entre re-ejecuciones.
+OLLAMA_URL = 'http://localhost:11434/v1'
+model = Llm(url=OLLAMA_URL, api_key="ollama", system_prompt=story_teller)
 interface = Ui(model=model)
+engine = GameEngine(model=model)
+config = ModelConfig.shared()
+# Partidas guardadas en disco ([Sessions]); None si está desactivado
+store = SqliteSessionStore.shared()
+
+# Métricas en formato Prometheus en http://127.0.0.1:<metrics_port>/metrics (0 = desactivado)
+metrics_port = config.getint("Telemetry", "metrics_port", fallback=0)
+if metrics_port:
+    Telemetry.shared().serve_metrics(port=metrics_port)
+
+# Precarga los modelos de los perfiles en cada backend al arrancar y los mantiene cargados entre
+# jugadores ([Warmup]); la pantalla de espera sigue al modelo de narración en el backend principal
+warmups = ModelWarmup.start_all(model.backends, "ollama") if ModelWarmup.enabled() else []
+warmup = warmups[0] if warmups else None
 
 # --- Estado de la sesión ---
-if "story_number" not in st.session_state:
-    st.session_state.story_number = None
-if "chapter" not in st.session_state:
-    st.session_state.chapter = 1
-if "user_choice" not in st.session_state:
-    st.session_state.user_choice = None
-if "story_text" not in st.session_state:
-    st.session_state.story_text = ""
+# La partida (GameSession) la gestiona el motor; Streamlit solo la guarda y la muestra.
+# Su identificador va en la URL (?partida=...), así que tras recargar la página o
+# reiniciar el servidor se retoma desde el almacén sin volver a narrar nada.
+if "game" not in st.session_state:
+    token = st.query_params.get("partida")
+    st.session_state.game = store.get(token) if store is not None and token else None
+    if st.session_state.game is not None and engine.narrator.chapter_count(st.session_state.game.story_number) == 0:
+        # Partida guardada de una historia que ya no está en el catálogo: no se puede retomar
+        st.session_state.missing_story = st.session_state.game.story_number
+        st.session_state.game = None
+        del st.query_params["partida"]
+if "speculator" not in st.session_state:
+    # Pre-generación opcional de las ramas A/B mientras el jugador lee ([Speculation] en model.config)
+    st.session_state.speculator = BranchSpeculator() if BranchSpeculator.enabled() else None
 
 # --- Interfaz de usuario ---
+# Solo se vuelve a pintar en las re-ejecuciones completas (al cargar la página o cambiar de historia):
+# pulsar A/B vuelve a ejecutar únicamente el fragmento de la partida
 interface.header()
 interface.explanations()
-interface.show_stories()
+if "missing_story" in st.session_state:
+    st.error(f"La historia {st.session_state.missing_story} de la partida guardada ya no existe; "
+             "se ha empezado una partida nueva.")
+if config.getboolean("Telemetry", "debug_panel", fallback=False):
+    interface.debug_panel()
+
+# --- Disponibilidad del modelo ---
+if warmup is not None and not warmup.ready:
+    if config.getboolean("Warmup", "gate_ui", fallback=False):
+        with st.spinner(f"Despertando al narrador ({warmup.model})..."):
+            warmup.wait_ready()
+    else:
+        st.info(f"El narrador se está preparando ({warmup.model}); el primer capítulo puede tardar un poco más.")
+    if warmup.state == "failed":
+        st.warning(f"No se pudo precargar el modelo: {warmup.error}")
 
 # --- Selección de historia ---
-selected_story = interface.user_story_selection()
-if selected_story != st.session_state.story_number:
-    st.session_state.story_number = selected_story
-    st.session_state.chapter = 1
-    st.session_state.user_choice = None
-    st.session_state.story_text = ""
+# El catálogo es un fragmento: cambiar de página no vuelve a ejecutar la página. Al elegir otra
+# historia deja la elección en st.session_state.selected_story y vuelve a ejecutar la página entera.
+game = st.session_state.game
+selected_story = st.session_state.pop("selected_story", None)
+if selected_story and (game is None or selected_story != game.story_number):
+    if game is not None:
+        # El aviso de la partida que no se pudo retomar se mantiene hasta que el jugador cambia de historia
+        st.session_state.pop("missing_story", None)
+    if st.session_state.speculator:
+        st.session_state.speculator.cancel()
+    game = st.session_state.game = engine.new_session(selected_story)
+    st.query_params["partida"] = game.session_id
+interface.story_browser(current=game.story_number if game else None)
+
 
 # --- Lógica del juego ---
-if st.session_state.story_number:
-    interface.chapter = st.session_state.chapter
-
-    if st.session_state.chapter == 1 and not st.session_state.story_text:
-        # Inicia el primer capítulo
-        st.session_state.story_text = interface.narrate(st.session_state.story_number)
-        st.session_state.chapter += 1
-
-    # Muestra el texto de la historia
-    if st.session_state.story_text:
-        st.write(st.session_state.story_text)
-
-    # Muestra los botones de elección
-    choice = interface.button_choice()
-    if choice:
-        st.session_state.user_choice = choice
-        st.session_state.story_text = interface.narrate(
-            st.session_state.story_number,
-            text_response_ai=st.session_state.story_text,
-            user_response=st.session_state.user_choice
-        )
-        st.session_state.chapter += 1
-        # Vuelve a ejecutar para mostrar el nuevo texto
-        st.rerun()
-        
-        
+@st.fragment
+def game_panel() -> None:
+    """
+    Muestra el capítulo actual y los botones de elección como un fragmento de Streamlit.
+
+    Al pulsar A o B solo se vuelve a ejecutar este fragmento: la cabecera, las
+    explicaciones y el catálogo no se vuelven a pintar.
+    """
+    game = st.session_state.game
+    if game is None:
+        return
+
+    # El planificador ([Scheduler]) avisa cuando la cola de llamadas al modelo está llena
+    interface.busy_notice()
+
+    # Contenedor del capítulo, para poder reemplazarlo mientras llega el siguiente en streaming
+    story_area = st.empty()
+
+    if not game.started:
+        # Inicia el primer capítulo mostrando los tokens según llegan
+        try:
+            with story_area.container():
+                st.write_stream(engine.start_stream(game))
+        except SchedulerBusy:
+            # La partida no avanza: el jugador puede volver a intentarlo en unos segundos
+            story_area.warning("El narrador está atendiendo a demasiados jugadores. "
+                               "Vuelve a intentarlo en unos segundos.")
+            st.stop()
+        if store is not None:
+            store.put(game)
+    else:
+        # Muestra el texto de la historia
+        story_area.write(game.story_text)
+
+    if game.finished:
+        # Partida terminada: sin botones ni más llamadas al modelo
+        interface.game_over()
+    else:
+        # Mientras el jugador lee, se adelanta el resumen y, si está activado, las dos ramas posibles
+        engine.prepare_next(game, st.session_state.speculator)
+
+        # Muestra los botones de elección
+        choice = interface.button_choice()
+        if choice:
+            try:
+                with story_area.container():
+                    st.write_stream(engine.choose_stream(game, choice, st.session_state.speculator))
+            except SchedulerBusy:
+                story_area.warning("El narrador está atendiendo a demasiados jugadores. "
+                                   "Vuelve a elegir en unos segundos.")
+                st.stop()
+            if store is not None:
+                store.put(game)
+            # Vuelve a ejecutar solo el fragmento para mostrar el nuevo texto
+            st.rerun(scope="fragment")
+
+
+game_panel()
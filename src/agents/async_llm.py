@@ -0,0 +1,658 @@
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from openai import AsyncOpenAI
+from configparser import NoSectionError, NoOptionError
+from config.model_config import ModelConfig
+from agents.context_budget import ContextBudget
+from agents.profiles import ModelProfile
+from agents.scheduler import LlmScheduler, SchedulerBusy
+from agents.response_cache import ResponseCache
+from agents.single_flight import SingleFlight
+from agents.telemetry import Telemetry
+import asyncio
+import time
+
+
+class AsyncLlm:
+    """
+    Versión asíncrona de Llm para servir muchas partidas desde un solo proceso.
+
+    A diferencia de Llm no guarda un prompt de sistema mutable: cada petición
+    recibe el suyo, de modo que una única instancia puede atender a la vez a
+    todas las sesiones. Un semáforo limita las peticiones en vuelo contra el
+    backend y cada llamada admite un tiempo máximo propio; al cancelar la
+    tarea que espera se cancela también la petición HTTP. Las peticiones
+    iguales simultáneas comparten una sola llamada al backend (`SingleFlight`),
+    que solo se cancela si la abandonan todas.
+
+    Como Llm, cada llamada se atiende con el perfil de su propósito
+    (`ModelProfile`): modelo, backend, límite de tokens y temperatura, y
+    pide turno al planificador compartido (`LlmScheduler`) antes del semáforo.
+
+    Notas
+    -----
+    A diferencia de Llm no pasa por `LlmRouter`: habla directamente con `url`
+    (o con la del perfil) mediante un `AsyncOpenAI`, así que no reparte entre
+    los backends de [Router], no aplica sus tiempos máximos, reintentos ni
+    peticiones duplicadas, y no salta a otro backend si este falla. El único
+    límite de tiempo es el `timeout` de la llamada y los reintentos son los
+    del propio cliente de OpenAI.
+
+    Atributos
+    ----------
+    model : str
+        Nombre del modelo por defecto (el de los perfiles que no indican otro).
+    url : str
+        URL base de la API compatible con OpenAI.
+    max_concurrency : int
+        Máximo de peticiones simultáneas contra el backend.
+    timeout : float or None
+        Tiempo máximo por defecto de cada llamada, en segundos.
+    in_flight : int
+        Peticiones que se están ejecutando ahora mismo.
+    waiting : int
+        Peticiones esperando un hueco en el semáforo.
+    """
+
+    def __init__(self, url: str, api_key: str, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """
+        Inicializa la clase AsyncLlm.
+
+        Parámetros
+        ----------
+        url : str
+            URL base de la API compatible con OpenAI.
+        api_key : str
+            Clave de API para autenticar las solicitudes.
+        max_concurrency : int, opcional
+            Máximo de peticiones simultáneas. Si es None se lee de la sección
+            [Async] de model.config.
+        timeout : float, opcional
+            Tiempo máximo por defecto de cada llamada en segundos. Si es None
+            se lee de la sección [Async] de model.config (0 = sin límite).
+        """
+        config = ModelConfig.shared()
+        # El modelo por defecto se lee de [Model] name en cada uso, para seguir los cambios de model.config
+        self.__url = url
+        self.__api_key = api_key
+        self.__client = AsyncOpenAI(base_url=url, api_key=api_key)
+        # Clientes de los perfiles con backend propio, creados al usarlos por primera vez
+        self.__profile_clients: Dict[str, AsyncOpenAI] = {}
+        if max_concurrency is None:
+            max_concurrency = config.getint("Async", "max_concurrency", fallback=16)
+        if timeout is None:
+            timeout = config.getfloat("Async", "timeout_seconds", fallback=0.0) or None
+        self.__max_concurrency = max_concurrency
+        self.__timeout = timeout
+        self.__semaphore: Optional[asyncio.Semaphore] = None
+        self.__cache: Optional[ResponseCache] = ResponseCache.shared()
+        self.__context: Optional[ContextBudget] = ContextBudget.shared()
+        self.__flights: Optional[SingleFlight] = SingleFlight.shared()
+        self.__in_flight = 0
+        self.__waiting = 0
+
+    @property
+    def model(self) -> str:
+        """
+        str: Obtiene el nombre del modelo por defecto (el de [Model] name, que sigue los cambios del archivo).
+        """
+        return self.__set_model()
+
+    @property
+    def url(self) -> str:
+        """
+        str: Obtiene la URL base de la API.
+        """
+        return self.__url
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        int: Obtiene el máximo de peticiones simultáneas.
+        """
+        return self.__max_concurrency
+
+    @property
+    def timeout(self) -> Optional[float]:
+        """
+        float or None: Obtiene el tiempo máximo por defecto de cada llamada.
+        """
+        return self.__timeout
+
+    @property
+    def in_flight(self) -> int:
+        """
+        int: Obtiene el número de peticiones en ejecución.
+        """
+        return self.__in_flight
+
+    @property
+    def waiting(self) -> int:
+        """
+        int: Obtiene el número de peticiones esperando turno.
+        """
+        return self.__waiting
+
+    async def close(self) -> None:
+        """
+        Cierra los clientes HTTP asíncronos.
+        """
+        await self.__client.close()
+        for client in self.__profile_clients.values():
+            await client.close()
+        self.__profile_clients.clear()
+
+    def profile(self, purpose: str) -> ModelProfile:
+        """
+        Devuelve el perfil con el que se atienden las llamadas de un propósito.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada ("narration", "speculation", "summary"...).
+
+        Retorna
+        -------
+        ModelProfile
+            Perfil leído de la configuración actual.
+        """
+        return ModelProfile.for_task(purpose, self.model)
+
+    async def generate_response(self, user_message: str, system_prompt: str = "",
+                                timeout: Optional[float] = None, use_cache: bool = True,
+                                max_age: Optional[float] = None, purpose: str = "chat",
+                                max_tokens: Optional[int] = None) -> str:
+        """
+        Genera una respuesta del modelo.
+
+        Parámetros
+        ----------
+        user_message : str
+            Mensaje del usuario.
+        system_prompt : str, opcional
+            Mensaje de sistema de esta petición. Por defecto es "".
+        timeout : float, opcional
+            Tiempo máximo en segundos, incluida la espera de turno. Si es None
+            se usa el de la instancia.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas. Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo. Por defecto no hay límite.
+
+        Retorna
+        -------
+        str
+            Respuesta generada por el modelo.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Si la llamada supera el tiempo máximo.
+        """
+        messages = self.__build_messages(user_message, system_prompt)
+        return await self.__complete(messages, timeout, use_cache, max_age, purpose, max_tokens)
+
+    async def chat(self, message: str, history: List[Dict[str, str]], system_prompt: str = "",
+                   timeout: Optional[float] = None, use_cache: bool = True,
+                   max_age: Optional[float] = None, purpose: str = "chat") -> str:
+        """
+        Envía un mensaje al modelo, incluyendo el historial de chat.
+
+        Parámetros
+        ----------
+        message : str
+            Mensaje del usuario.
+        history : List[Dict[str, str]]
+            Historial de mensajes previos. Si hay presupuesto de contexto
+            ([Context] en model.config) se recortan los más antiguos.
+        system_prompt : str, opcional
+            Mensaje de sistema de esta petición. Por defecto es "".
+        timeout : float, opcional
+            Tiempo máximo en segundos. Si es None se usa el de la instancia.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas. Por defecto es "chat".
+
+        Retorna
+        -------
+        str
+            Respuesta generada por el modelo.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Si la llamada supera el tiempo máximo.
+        """
+        system = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        tail = [{"role": "user", "content": message}]
+        if self.__context is None:
+            messages = system + history + tail
+        else:
+            messages = self.__context.fit(system, history, tail)
+        return await self.__complete(messages, timeout, use_cache, max_age, purpose)
+
+    async def generate_response_stream(self, user_message: str, system_prompt: str = "",
+                                       timeout: Optional[float] = None, use_cache: bool = True,
+                                       max_age: Optional[float] = None, purpose: str = "chat",
+                                       max_tokens: Optional[int] = None,
+                                       cutoff: Optional[Callable[[], Callable[[str], Optional[int]]]] = None
+                                       ) -> AsyncIterator[str]:
+        """
+        Genera una respuesta del modelo devolviendo los tokens según llegan.
+
+        El tiempo máximo se aplica a la respuesta completa; si se agota se
+        cierra la conexión y se lanza asyncio.TimeoutError.
+
+        Parámetros
+        ----------
+        user_message : str
+            Mensaje del usuario.
+        system_prompt : str, opcional
+            Mensaje de sistema de esta petición. Por defecto es "".
+        timeout : float, opcional
+            Tiempo máximo en segundos. Si es None se usa el de la instancia.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas. Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo. Por defecto no hay límite.
+        cutoff : Callable, opcional
+            Crea, para cada petición al backend, un detector de final de
+            respuesta como el de `Llm.generate_response_stream`. Por defecto
+            se lee la respuesta entera.
+
+        Retorna
+        -------
+        AsyncIterator[str]
+            Fragmentos de texto de la respuesta.
+        """
+        messages = self.__build_messages(user_message, system_prompt)
+        telemetry = Telemetry.shared()
+        start = time.perf_counter()
+        profile = self.profile(purpose)
+        cache = self.__cache if use_cache else None
+        flights = self.__flights if use_cache else None
+        key = (ResponseCache.make_key(profile.model, messages, profile.options(max_tokens), cutoff is not None)
+               if cache or flights else None)
+        if cache:
+            cached = cache.get(key, max_age=max_age)
+            if cached is not None:
+                elapsed = time.perf_counter() - start
+                telemetry.record_llm_call(purpose, profile.model, elapsed, ttft=elapsed, cache="hit", stream=True)
+                yield cached
+                return
+
+        timeout = self.__timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        live = partial(self.__live_stream, messages, profile, deadline, cache, key, purpose, start, max_tokens,
+                       cutoff)
+        if flights is None:
+            tokens, shared = live(), False
+        else:
+            tokens, shared = flights.stream_async(LlmScheduler.flight_key(key, purpose), live)
+        status = "error"
+        ttft = None
+        try:
+            iterator = tokens.__aiter__()
+            while True:
+                try:
+                    token = await asyncio.wait_for(iterator.__anext__(), self.__remaining(deadline))
+                except StopAsyncIteration:
+                    break
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                yield token
+            status = "ok"
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        finally:
+            await tokens.aclose()
+            if shared:
+                telemetry.record_llm_call(purpose, profile.model, time.perf_counter() - start, ttft=ttft,
+                                          cache="coalesced", stream=True, status=status)
+
+    async def __live_stream(self, messages: List[Dict[str, str]], profile: ModelProfile, deadline: Optional[float],
+                            cache: Optional[ResponseCache], key: Optional[str], purpose: str,
+                            start: float, max_tokens: Optional[int] = None,
+                            cutoff: Optional[Callable[[], Callable[[str], Optional[int]]]] = None
+                            ) -> AsyncIterator[str]:
+        """
+        Abre un streaming en el backend y guarda la respuesta en la caché al terminar.
+
+        Si `cutoff` detecta que la respuesta ya está completa se cierra el
+        streaming y se guarda el texto recortado; si el backend no informa de
+        los tokens generados se cuenta uno por fragmento.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        profile : ModelProfile
+            Perfil con el que se atiende la llamada.
+        deadline : float or None
+            Instante (time.monotonic) límite de la respuesta completa.
+        cache : ResponseCache or None
+            Caché donde guardar la respuesta.
+        key : str or None
+            Clave de la petición en la caché.
+        purpose : str
+            Propósito de la llamada para las métricas.
+        start : float
+            Instante (time.perf_counter) en que se pidió la respuesta.
+        max_tokens : int, opcional
+            Tokens generados como máximo.
+        cutoff : Callable, opcional
+            Fábrica del detector de final de respuesta.
+
+        Retorna
+        -------
+        AsyncIterator[str]
+            Fragmentos de texto de la respuesta.
+        """
+        telemetry = Telemetry.shared()
+        parts = []
+        status = "error"
+        usage = None
+        ttft = None
+        chunks = 0
+        early_stop = False
+        stop = cutoff() if cutoff is not None else None
+        try:
+            async with self.__slot(purpose, deadline):
+                stream = await asyncio.wait_for(
+                    self.__client_for(profile).chat.completions.create(model=profile.model, messages=messages,
+                                                                       stream=True,
+                                                                       stream_options={"include_usage": True},
+                                                                       **profile.options(max_tokens)),
+                    self.__remaining(deadline),
+                )
+                try:
+                    iterator = stream.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(iterator.__anext__(), self.__remaining(deadline))
+                        except StopAsyncIteration:
+                            break
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if not token:
+                            continue
+                        chunks += 1
+                        if stop is not None:
+                            keep = stop(token)
+                            if keep is not None:
+                                token = token[:keep]
+                                early_stop = True
+                        if token:
+                            if ttft is None:
+                                ttft = time.perf_counter() - start
+                            parts.append(token)
+                            yield token
+                        if early_stop:
+                            break
+                    status = "ok"
+                except (GeneratorExit, asyncio.CancelledError):
+                    status = "cancelled"
+                    raise
+                finally:
+                    await stream.close()
+        except SchedulerBusy:
+            status = "shed"
+            raise
+        finally:
+            telemetry.record_llm_call(
+                purpose, profile.model, time.perf_counter() - start, ttft=ttft,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", chunks or None),
+                cache="miss" if cache else "bypass", stream=True, status=status, early_stop=early_stop,
+            )
+        if cache and parts:
+            cache.set(key, "".join(parts))
+
+    async def __complete(self, messages: List[Dict[str, str]], timeout: Optional[float],
+                         use_cache: bool, max_age: Optional[float], purpose: str = "chat",
+                         max_tokens: Optional[int] = None) -> str:
+        """
+        Resuelve una petición completa respetando caché, concurrencia y tiempo máximo.
+
+        Si hay otra petición igual en curso se espera a su respuesta en lugar
+        de repetirla.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        timeout : float or None
+            Tiempo máximo de la llamada.
+        use_cache : bool
+            Si es False no se consulta ni se actualiza la caché.
+        max_age : float or None
+            Antigüedad máxima aceptada para una respuesta cacheada.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas. Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo.
+
+        Retorna
+        -------
+        str
+            Respuesta del modelo.
+        """
+        telemetry = Telemetry.shared()
+        start = time.perf_counter()
+        profile = self.profile(purpose)
+        cache = self.__cache if use_cache else None
+        flights = self.__flights if use_cache else None
+        key = (ResponseCache.make_key(profile.model, messages, profile.options(max_tokens))
+               if cache or flights else None)
+        if cache:
+            cached = cache.get(key, max_age=max_age)
+            if cached is not None:
+                elapsed = time.perf_counter() - start
+                telemetry.record_llm_call(purpose, profile.model, elapsed, ttft=elapsed, cache="hit")
+                return cached
+
+        timeout = self.__timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        request = partial(self.__request, messages, profile, deadline, cache, key, purpose, start, max_tokens)
+        if flights is None:
+            return await request()
+        content, shared = await asyncio.wait_for(flights.call_async(LlmScheduler.flight_key(key, purpose), request),
+                                                 self.__remaining(deadline))
+        if shared:
+            elapsed = time.perf_counter() - start
+            telemetry.record_llm_call(purpose, profile.model, elapsed, ttft=elapsed, cache="coalesced")
+        return content
+
+    async def __request(self, messages: List[Dict[str, str]], profile: ModelProfile, deadline: Optional[float],
+                        cache: Optional[ResponseCache], key: Optional[str], purpose: str, start: float,
+                        max_tokens: Optional[int] = None) -> str:
+        """
+        Envía una petición completa al backend respetando la concurrencia y el tiempo máximo.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        profile : ModelProfile
+            Perfil con el que se atiende la llamada.
+        deadline : float or None
+            Instante (time.monotonic) límite de la llamada.
+        cache : ResponseCache or None
+            Caché donde guardar la respuesta.
+        key : str or None
+            Clave de la petición en la caché.
+        purpose : str
+            Propósito de la llamada para las métricas.
+        start : float
+            Instante (time.perf_counter) en que se pidió la respuesta.
+        max_tokens : int, opcional
+            Tokens generados como máximo.
+
+        Retorna
+        -------
+        str
+            Respuesta del modelo.
+        """
+        telemetry = Telemetry.shared()
+        try:
+            async with self.__slot(purpose, deadline):
+                response = await asyncio.wait_for(
+                    self.__client_for(profile).chat.completions.create(model=profile.model, messages=messages,
+                                                                       **profile.options(max_tokens)),
+                    self.__remaining(deadline),
+                )
+        except BaseException as e:
+            status = ("cancelled" if isinstance(e, asyncio.CancelledError)
+                      else "shed" if isinstance(e, SchedulerBusy) else "error")
+            telemetry.record_llm_call(purpose, profile.model, time.perf_counter() - start,
+                                      cache="miss" if cache else "bypass", status=status)
+            raise
+        elapsed = time.perf_counter() - start
+        usage = getattr(response, "usage", None)
+        telemetry.record_llm_call(
+            purpose, profile.model, elapsed, ttft=elapsed,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cache="miss" if cache else "bypass",
+        )
+        content = response.choices[0].message.content
+        if cache and content:
+            cache.set(key, content)
+        return content
+
+    def __client_for(self, profile: ModelProfile) -> AsyncOpenAI:
+        """
+        Elige el cliente de una llamada según su perfil.
+
+        Parámetros
+        ----------
+        profile : ModelProfile
+            Perfil de la llamada.
+
+        Retorna
+        -------
+        AsyncOpenAI
+            Cliente del backend propio del perfil, o el de la instancia.
+        """
+        if not profile.url or profile.url == self.__url:
+            return self.__client
+        client = self.__profile_clients.get(profile.url)
+        if client is None:
+            client = self.__profile_clients[profile.url] = AsyncOpenAI(base_url=profile.url, api_key=self.__api_key)
+        return client
+
+    @asynccontextmanager
+    async def __slot(self, purpose: str, deadline: Optional[float]) -> AsyncIterator[None]:
+        """
+        Ocupa un turno del planificador y un hueco de concurrencia mientras dura la petición.
+
+        La espera por el turno y por el hueco cuenta dentro del tiempo máximo de la llamada.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada, que decide su prioridad en el planificador.
+        deadline : float or None
+            Instante (time.monotonic) límite para obtener el hueco.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Si no queda hueco antes del límite.
+        SchedulerBusy
+            Si el planificador rechaza la llamada porque el backend está saturado.
+        """
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.__max_concurrency)
+        semaphore = self.__semaphore
+        scheduler = LlmScheduler.shared()
+
+        async with (scheduler.slot_async(purpose, self.__remaining(deadline))
+                    if scheduler is not None else nullcontext()):
+            self.__waiting += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.__remaining(deadline))
+            finally:
+                self.__waiting -= 1
+
+            self.__in_flight += 1
+            try:
+                yield
+            finally:
+                self.__in_flight -= 1
+                semaphore.release()
+
+    @staticmethod
+    def __remaining(deadline: Optional[float]) -> Optional[float]:
+        """
+        Calcula el tiempo que queda hasta el límite.
+
+        Parámetros
+        ----------
+        deadline : float or None
+            Instante límite.
+
+        Retorna
+        -------
+        float or None
+            Segundos restantes (nunca negativos), o None si no hay límite.
+        """
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    @staticmethod
+    def __build_messages(user_message: str, system_prompt: str) -> List[Dict[str, str]]:
+        """
+        Construye la lista de mensajes, con el de sistema solo si está definido.
+
+        Parámetros
+        ----------
+        user_message : str
+            Mensaje del usuario.
+        system_prompt : str
+            Mensaje de sistema de la petición.
+
+        Retorna
+        -------
+        List[Dict[str, str]]
+            Mensajes listos para enviar a la API.
+        """
+        messages = [{"role": "user", "content": user_message}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        return messages
+
+    @staticmethod
+    def __set_model() -> str:
+        """
+        Lee el modelo desde la configuración compartida del proceso.
+
+        Retorna
+        -------
+        str
+            Nombre del modelo especificado en el archivo de configuración.
+        """
+        try:
+            return ModelConfig.shared().get("Model", "name")
+        except (FileNotFoundError, NoSectionError, NoOptionError) as e:
+            print(f"[Error] {e}")
+            raise
+
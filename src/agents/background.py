@@ -0,0 +1,73 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from config.model_config import ModelConfig
+from agents.scheduler import LlmScheduler
+import threading
+
+
+class BackgroundPool:
+    """
+    Pool de hilos compartido por el proceso para el trabajo en segundo plano.
+
+    Lo usan las tareas que no están en el camino crítico del jugador (por
+    ejemplo la pre-generación especulativa de capítulos). El número de hilos
+    se lee de la sección [Background] de model.config, de modo que el trabajo
+    de fondo de todas las sesiones queda acotado.
+    """
+
+    __executor: Optional[ThreadPoolExecutor] = None
+    __lock = threading.Lock()
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        """
+        Devuelve el pool compartido, creándolo la primera vez.
+
+        Retorna
+        -------
+        ThreadPoolExecutor
+            Pool de hilos del proceso.
+        """
+        executor = cls.__executor
+        if executor is None:
+            with cls.__lock:
+                executor = cls.__executor
+                if executor is None:
+                    max_workers = ModelConfig.shared().getint("Background", "max_workers", fallback=4)
+                    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="background")
+                    cls.__executor = executor
+        return executor
+
+    @classmethod
+    def submit(cls, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Encola una tarea en el pool compartido.
+
+        La tarea hereda el contexto de planificación del llamante (sesión y
+        evento de promoción, ver `LlmScheduler.context`), de modo que sus
+        llamadas al modelo cuentan para la sesión que la lanzó.
+
+        Parámetros
+        ----------
+        fn : Callable
+            Función a ejecutar.
+        *args, **kwargs
+            Argumentos de la función.
+
+        Retorna
+        -------
+        Future
+            Futuro con el resultado de la tarea.
+        """
+        return cls.executor().submit(LlmScheduler.bind(fn), *args, **kwargs)
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """
+        Cancela las tareas pendientes y cierra el pool compartido.
+        """
+        with cls.__lock:
+            executor = cls.__executor
+            cls.__executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
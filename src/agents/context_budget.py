@@ -0,0 +1,336 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from config.model_config import ModelConfig
+import re
+import threading
+
+# Tokens que añade la plantilla de chat por cada mensaje (rol y separadores)
+MESSAGE_OVERHEAD = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Fin de frase: puntuación tras una letra (no corta "Capítulo 3. ...")
+_SENTENCE_END = re.compile(r"(?<=[^\W\d][.!?…])\s")
+
+
+def approximate_tokens(text: str) -> int:
+    """
+    Estima el número de tokens de un texto sin tokenizador del modelo.
+
+    Cada signo de puntuación cuenta como un token y cada palabra como un
+    token por cada cuatro caracteres, lo que en español se queda algo por
+    encima de los tokenizadores de Gemma y Llama. Sobrestimar es preferible:
+    el historial se recorta un poco antes en lugar de desbordar el contexto.
+
+    Parámetros
+    ----------
+    text : str
+        Texto a medir.
+
+    Retorna
+    -------
+    int
+        Tokens estimados.
+    """
+    return sum(1 + (len(token) - 1) // 4 for token in _TOKEN_PATTERN.findall(text))
+
+
+class ContextBudget:
+    """
+    Ajusta el historial de un chat a un presupuesto de tokens.
+
+    El mensaje de sistema, el mensaje nuevo y los `keep_recent` mensajes más
+    recientes se conservan siempre; del resto del historial se descartan los
+    más antiguos hasta que el prompt cabe en `max_tokens`. En modo "compact"
+    los mensajes descartados se sustituyen por un único mensaje de sistema
+    con la primera frase de cada uno (lo que quepa en `compact_tokens`); en
+    modo "trim" simplemente se eliminan.
+
+    El corte avanza de `trim_step` en `trim_step` mensajes, de modo que el
+    principio del prompt no cambia en cada turno y el backend puede seguir
+    reutilizando su caché KV de prefijos entre turnos.
+
+    Los tokens se cuentan con el tokenizador indicado o, por defecto, con una
+    estimación que funciona sin conexión (`approximate_tokens`). El recuento
+    de cada mensaje se guarda en una caché LRU, así que volver a medir el
+    historial en cada turno solo cuenta los mensajes nuevos.
+
+    Atributos
+    ----------
+    max_tokens : int
+        Tokens máximos del prompt (mensajes de entrada).
+    keep_recent : int
+        Mensajes del historial que se conservan siempre.
+    mode : str
+        "compact" o "trim".
+    compact_tokens : int
+        Tokens máximos del mensaje que resume lo descartado.
+    trim_step : int
+        Granularidad del corte, en mensajes.
+    """
+
+    __shared: Optional["ContextBudget"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, max_tokens: int = 3072, keep_recent: int = 4, mode: str = "compact",
+                 compact_tokens: int = 256, trim_step: int = 8,
+                 tokenizer: Optional[Callable[[str], int]] = None, max_cached: int = 4096):
+        """
+        Inicializa la clase ContextBudget.
+
+        Parámetros
+        ----------
+        max_tokens : int, opcional
+            Tokens máximos del prompt. Por defecto es 3072.
+        keep_recent : int, opcional
+            Mensajes recientes que se conservan siempre. Por defecto es 4 (dos turnos).
+        mode : str, opcional
+            "compact" (resume lo descartado) o "trim" (lo elimina). Por defecto es "compact".
+        compact_tokens : int, opcional
+            Tokens máximos del resumen de lo descartado. Por defecto es 256.
+        trim_step : int, opcional
+            Mensajes que avanza el corte cada vez. Por defecto es 8.
+        tokenizer : Callable[[str], int], opcional
+            Función que cuenta los tokens de un texto. Por defecto `approximate_tokens`.
+        max_cached : int, opcional
+            Recuentos de mensajes guardados en la caché. Por defecto es 4096.
+
+        Raises
+        ------
+        ValueError
+            Si el modo no es "compact" ni "trim".
+        """
+        if mode not in ("compact", "trim"):
+            print(f"[Error] Modo de contexto desconocido: {mode}")
+            raise ValueError(f"Modo de contexto desconocido: {mode}")
+        self.__max_tokens = max_tokens
+        self.__keep_recent = max(keep_recent, 0)
+        self.__mode = mode
+        self.__compact_tokens = compact_tokens
+        self.__trim_step = max(trim_step, 1)
+        self.__tokenizer = tokenizer or approximate_tokens
+        self.__max_cached = max_cached
+        self.__counts: "OrderedDict[str, int]" = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__count_hits = 0
+        self.__count_misses = 0
+        self.__fits = 0
+        self.__trims = 0
+        self.__dropped = 0
+
+    @property
+    def max_tokens(self) -> int:
+        """
+        int: Obtiene los tokens máximos del prompt.
+        """
+        return self.__max_tokens
+
+    @property
+    def keep_recent(self) -> int:
+        """
+        int: Obtiene los mensajes recientes que se conservan siempre.
+        """
+        return self.__keep_recent
+
+    @property
+    def mode(self) -> str:
+        """
+        str: Obtiene el modo de ajuste ("compact" o "trim").
+        """
+        return self.__mode
+
+    @property
+    def compact_tokens(self) -> int:
+        """
+        int: Obtiene los tokens máximos del resumen de lo descartado.
+        """
+        return self.__compact_tokens
+
+    @property
+    def trim_step(self) -> int:
+        """
+        int: Obtiene la granularidad del corte en mensajes.
+        """
+        return self.__trim_step
+
+    @classmethod
+    def shared(cls) -> Optional["ContextBudget"]:
+        """
+        Devuelve el presupuesto configurado en la sección [Context] de model.config.
+
+        Retorna
+        -------
+        ContextBudget or None
+            Presupuesto del proceso, o None si está desactivado.
+        """
+        config = ModelConfig.shared()
+        if not config.getboolean("Context", "enabled", fallback=False):
+            return None
+        instance = cls.__shared
+        if instance is None:
+            with cls.__shared_lock:
+                instance = cls.__shared
+                if instance is None:
+                    instance = cls(
+                        max_tokens=config.getint("Context", "max_tokens", fallback=3072),
+                        keep_recent=config.getint("Context", "keep_recent", fallback=4),
+                        mode=config.get("Context", "mode", fallback="compact"),
+                        compact_tokens=config.getint("Context", "compact_tokens", fallback=256),
+                        trim_step=config.getint("Context", "trim_step", fallback=8),
+                    )
+                    cls.__shared = instance
+        return instance
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Descarta el presupuesto compartido para que se cree de nuevo con la configuración actual.
+        """
+        with cls.__shared_lock:
+            cls.__shared = None
+
+    def count(self, text: str) -> int:
+        """
+        Cuenta los tokens de un texto, usando la caché de recuentos.
+
+        Parámetros
+        ----------
+        text : str
+            Texto a medir.
+
+        Retorna
+        -------
+        int
+            Tokens del texto.
+        """
+        with self.__lock:
+            tokens = self.__counts.get(text)
+            if tokens is not None:
+                self.__counts.move_to_end(text)
+                self.__count_hits += 1
+                return tokens
+            self.__count_misses += 1
+        tokens = self.__tokenizer(text)
+        with self.__lock:
+            self.__counts[text] = tokens
+            if len(self.__counts) > self.__max_cached:
+                self.__counts.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Cuenta los tokens de una lista de mensajes, incluida la plantilla de chat.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes con "role" y "content".
+
+        Retorna
+        -------
+        int
+            Tokens estimados del prompt.
+        """
+        return sum(self.count(message.get("content") or "") + MESSAGE_OVERHEAD for message in messages)
+
+    def fit(self, head: List[Dict[str, str]], history: List[Dict[str, str]],
+            tail: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Construye los mensajes de una petición ajustando el historial al presupuesto.
+
+        Parámetros
+        ----------
+        head : List[Dict[str, str]]
+            Mensajes fijos del principio (el de sistema).
+        history : List[Dict[str, str]]
+            Historial de la conversación, del más antiguo al más reciente.
+        tail : List[Dict[str, str]]
+            Mensajes fijos del final (el mensaje nuevo del usuario).
+
+        Retorna
+        -------
+        List[Dict[str, str]]
+            `head`, el historial recortado (con el resumen de lo descartado en
+            modo "compact") y `tail`. Si ni siquiera los mensajes fijos y los
+            recientes caben, se devuelven igualmente.
+        """
+        fixed = self.count_messages(head) + self.count_messages(tail)
+        sizes = [self.count(message.get("content") or "") + MESSAGE_OVERHEAD for message in history]
+        with self.__lock:
+            self.__fits += 1
+        if fixed + sum(sizes) <= self.__max_tokens:
+            return head + history + tail
+
+        # Primer mensaje que se conserva: múltiplo de trim_step, sin tocar los recientes
+        protected = max(len(history) - self.__keep_recent, 0)
+        available = self.__max_tokens - fixed
+        if self.__mode == "compact":
+            available -= self.__compact_tokens + MESSAGE_OVERHEAD
+        suffix = [0] * (len(history) + 1)
+        for index in range(len(history) - 1, -1, -1):
+            suffix[index] = suffix[index + 1] + sizes[index]
+        cut = 0
+        while cut < protected and suffix[cut] > available:
+            cut = min(cut + self.__trim_step, protected)
+
+        dropped = history[:cut]
+        kept = history[cut:]
+        with self.__lock:
+            self.__trims += 1
+            self.__dropped += len(dropped)
+        if self.__mode == "compact" and dropped:
+            return head + [self.__digest(dropped)] + kept + tail
+        return head + kept + tail
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores del presupuesto.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Ajustes realizados, recortes, mensajes descartados y aciertos y
+            fallos de la caché de recuentos.
+        """
+        with self.__lock:
+            return {
+                "fits": self.__fits,
+                "trims": self.__trims,
+                "dropped_messages": self.__dropped,
+                "count_hits": self.__count_hits,
+                "count_misses": self.__count_misses,
+                "cached_counts": len(self.__counts),
+            }
+
+    def __digest(self, dropped: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Resume los mensajes descartados en un mensaje de sistema.
+
+        Se toma la primera frase de cada mensaje, empezando por los más
+        recientes, hasta llenar `compact_tokens`, y se presentan en orden.
+
+        Parámetros
+        ----------
+        dropped : List[Dict[str, str]]
+            Mensajes descartados, del más antiguo al más reciente.
+
+        Retorna
+        -------
+        Dict[str, str]
+            Mensaje de sistema con el resumen.
+        """
+        header = "Resumen de la conversación anterior:"
+        budget = self.__compact_tokens - self.count(header)
+        lines: List[str] = []
+        for message in reversed(dropped):
+            content = " ".join((message.get("content") or "").split())
+            if not content:
+                continue
+            sentence = _SENTENCE_END.split(content, maxsplit=1)[0]
+            line = f"- {message.get('role', 'user')}: {sentence}"
+            tokens = self.count(line)
+            if tokens > budget:
+                break
+            budget -= tokens
+            lines.append(line)
+        lines.reverse()
+        return {"role": "system", "content": "\n".join([header, *lines])}
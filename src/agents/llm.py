@@ -1,8 +1,16 @@
-from IPython.display import display, Markdown
-from typing import List, Dict
-from openai import OpenAI
-from configparser import ConfigParser, NoSectionError, NoOptionError
-import os
+from typing import Callable, List, Dict, Iterator, Optional
+from configparser import NoSectionError, NoOptionError
+from config.model_config import ModelConfig
+from agents.context_budget import ContextBudget
+from agents.profiles import ModelProfile
+from agents.response_cache import ResponseCache
+from agents.router import LlmRouter
+from agents.scheduler import LlmScheduler, SchedulerBusy
+from agents.single_flight import SingleFlight
+from agents.telemetry import Telemetry
+from contextlib import nullcontext
+from functools import partial
+import time
 
 class Llm:
     """
@@ -14,16 +22,53 @@ class Llm:
     Atributos
     ----------
     model : str
-        Nombre del modelo de OpenAI a utilizar.
+        Nombre del modelo por defecto (el de los perfiles que no indican otro).
     url : str
         URL base de la API de OpenAI.
+    backends : List[str]
+        URLs de todos los backends entre los que se reparten las peticiones.
     api_key : str
         Clave de API para autenticar las solicitudes a OpenAI.
     system_prompt : str
         Mensaje de sistema opcional para orientar el comportamiento del modelo.
+    last_ttft : float or None
+        Tiempo hasta el primer token (en segundos) de la última respuesta en streaming.
+    cache : ResponseCache or None
+        Caché de respuestas compartida, si está activada en model.config.
+    context : ContextBudget or None
+        Presupuesto de tokens que recorta el historial de `chat`, si está activado.
+    flights : SingleFlight or None
+        Agrupador de peticiones idénticas simultáneas, si está activado.
+    router : LlmRouter
+        Router que envía las peticiones a los backends.
+
+    Notas
+    -----
+    Las peticiones pasan por un `LlmRouter` compartido entre instancias con
+    los mismos backends y clave, de modo que los clientes de OpenAI (y su
+    pool de conexiones HTTP keep-alive) y las estadísticas de cada backend
+    sobreviven a las re-ejecuciones de Streamlit. Si no se indican backends
+    se usan los de la sección [Router] de model.config o, si está vacía,
+    solo `url`. `reset_shared_clients` y `ModelConfig.invalidate` fuerzan a
+    recrearlos y a releer la configuración.
+
+    Las peticiones que pueden usar la caché y coinciden con otra que aún
+    está en curso (mismo modelo y mensajes) no llegan al backend: esperan a
+    la primera y comparten su respuesta o su streaming (`SingleFlight`).
+
+    Cada llamada se atiende con el perfil de su propósito (`ModelProfile`,
+    secciones [Profile.<tarea>] de model.config): modelo, backend, límite de
+    tokens y temperatura. Así los resúmenes pueden ir a un modelo pequeño y
+    rápido mientras la narración usa el principal. Los perfiles se leen en
+    cada llamada y siguen los cambios del archivo sin reiniciar.
+
+    Antes de llegar al backend cada llamada pide turno al planificador
+    compartido (`LlmScheduler`, sección [Scheduler]): la narración pasa por
+    delante de los resúmenes y estos del trabajo de fondo, y si el backend
+    está saturado la llamada se rechaza con `SchedulerBusy`.
     """
 
-    def __init__(self, url: str, api_key: str, system_prompt: str = ""):
+    def __init__(self, url: str, api_key: str, system_prompt: str = "", backends: Optional[List[str]] = None):
         """
         Inicializa la clase Llm.
 
@@ -35,19 +80,27 @@ class Llm:
             Clave de API para autenticar las solicitudes a OpenAI.
         system_prompt : str, opcional
             Mensaje de sistema para orientar el modelo. Por defecto es "".
+        backends : List[str], opcional
+            URLs de los backends. Por defecto las de [Router] backends o solo `url`.
         """
-        self.__model = self.__set_model()
+        # Sin modelo fijado se lee [Model] name en cada uso, para seguir los cambios de model.config
+        self.__model: Optional[str] = None
         self.__url = url
         self.__api_key = api_key
         self.__system_prompt = system_prompt
-        self.__client = self.__load_openai()
+        self.__backends = list(backends) if backends else self.__configured_backends(url)
+        self.__router = LlmRouter.shared(self.__backends, api_key)
+        self.__last_ttft: Optional[float] = None
+        self.__cache: Optional[ResponseCache] = ResponseCache.shared()
+        self.__context: Optional[ContextBudget] = ContextBudget.shared()
+        self.__flights: Optional[SingleFlight] = SingleFlight.shared()
 
     @property
     def model(self) -> str:
         """
-        str: Obtiene o establece el modelo de OpenAI a utilizar.
+        str: Obtiene o establece el modelo por defecto. Si no se establece se usa el de [Model] name.
         """
-        return self.__model
+        return self.__model or self.__set_model()
 
     @model.setter
     def model(self, value: str):
@@ -63,7 +116,22 @@ class Llm:
     @url.setter
     def url(self, value: str):
         self.__url = value
-        self.__client = self.__load_openai()
+        self.__backends = self.__configured_backends(value)
+        self.__router = LlmRouter.shared(self.__backends, self.__api_key)
+
+    @property
+    def backends(self) -> List[str]:
+        """
+        List[str]: Obtiene las URLs de los backends.
+        """
+        return list(self.__backends)
+
+    @property
+    def router(self) -> LlmRouter:
+        """
+        LlmRouter: Obtiene el router que envía las peticiones a los backends.
+        """
+        return self.__router
 
     @property
     def system_prompt(self) -> str:
@@ -76,20 +144,101 @@ class Llm:
     def system_prompt(self, new_sys_prompt: str):
         self.__system_prompt = new_sys_prompt
 
-    def __load_openai(self) -> OpenAI:
+    @property
+    def last_ttft(self) -> Optional[float]:
+        """
+        float or None: Segundos hasta el primer token de la última respuesta en streaming.
+        """
+        return self.__last_ttft
+
+    @property
+    def cache(self) -> Optional[ResponseCache]:
+        """
+        ResponseCache or None: Obtiene la caché de respuestas compartida.
+        """
+        return self.__cache
+
+    @property
+    def context(self) -> Optional[ContextBudget]:
+        """
+        ContextBudget or None: Obtiene el presupuesto de tokens del historial de chat.
+        """
+        return self.__context
+
+    @property
+    def flights(self) -> Optional[SingleFlight]:
+        """
+        SingleFlight or None: Obtiene el agrupador de peticiones idénticas simultáneas.
+        """
+        return self.__flights
+
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores de aciertos y fallos de la caché de respuestas.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Contadores de la caché, o un diccionario vacío si está desactivada.
+        """
+        return self.__cache.stats() if self.__cache else {}
+
+    def backend_stats(self) -> List[Dict]:
+        """
+        Devuelve el estado, los contadores y las latencias de cada backend.
+
+        Retorna
+        -------
+        List[Dict]
+            Un diccionario por backend (ver `LlmRouter.stats`).
+        """
+        return self.__router.stats()
+
+    def profile(self, purpose: str) -> ModelProfile:
+        """
+        Devuelve el perfil con el que se atienden las llamadas de un propósito.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada ("narration", "speculation", "summary"...).
+
+        Retorna
+        -------
+        ModelProfile
+            Perfil leído de la configuración actual.
+        """
+        return ModelProfile.for_task(purpose, self.model)
+
+    @classmethod
+    def reset_shared_clients(cls) -> None:
+        """
+        Cierra y descarta los routers (y sus clientes) compartidos para que se creen de nuevo.
+        """
+        LlmRouter.reset_shared()
+
+    @staticmethod
+    def __configured_backends(url: str) -> List[str]:
         """
-        Carga e inicializa el cliente de OpenAI.
+        Lee los backends de la sección [Router] de model.config.
+
+        Parámetros
+        ----------
+        url : str
+            URL principal, que se usa si no hay backends configurados.
 
         Retorna
         -------
-        OpenAI
-            Instancia del cliente de la API de OpenAI.
+        List[str]
+            URLs de los backends, con `url` la primera.
         """
-        return OpenAI(base_url=self.__url, api_key=self.__api_key)
+        value = ModelConfig.shared().get("Router", "backends", fallback="")
+        urls = [part.strip() for part in value.split(",") if part.strip()]
+        return [url] + [other for other in urls if other != url]
 
     def __set_model(self) -> str:
         """
-        Lee el modelo desde el archivo de configuración.
+        Lee el modelo desde la configuración compartida del proceso.
 
         Retorna
         -------
@@ -106,12 +255,7 @@ class Llm:
             Si la opción 'name' no se encuentra en la sección 'Model'.
         """
         try:
-            config = ConfigParser()
-            config_path = "src/config/model.config"
-            if not os.path.exists(config_path):
-                raise FileNotFoundError(f"El archivo '{config_path}' no existe.")
-            config.read(config_path)
-            return config.get("Model", "name")
+            return ModelConfig.shared().get("Model", "name")
         except (FileNotFoundError, NoSectionError, NoOptionError) as e:
             print(f"[Error] {e}")
             raise
@@ -132,18 +276,27 @@ class Llm:
         """
         return [{"role": "user", "content": user_message}]
 
-    def __format_sys_prompt(self) -> List[Dict[str, str]]:
+    def __format_sys_prompt(self, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
         """
         Formatea el mensaje de sistema para la API de OpenAI.
 
+        Parámetros
+        ----------
+        system_prompt : str, opcional
+            Mensaje de sistema para esta llamada. Si es None se usa el de la instancia.
+
         Retorna
         -------
         List[Dict[str, str]]
             Lista de diccionarios con el mensaje de sistema formateado.
         """
-        return [{"role": "system", "content": self.__system_prompt}]
+        if system_prompt is None:
+            system_prompt = self.__system_prompt
+        return [{"role": "system", "content": system_prompt}]
 
-    def generate_response(self, user_message: str) -> str:
+    def generate_response(self, user_message: str, system_prompt: Optional[str] = None,
+                          use_cache: bool = True, max_age: Optional[float] = None, purpose: str = "chat",
+                          max_tokens: Optional[int] = None) -> str:
         """
         Genera una respuesta del modelo de OpenAI.
 
@@ -151,24 +304,65 @@ class Llm:
         ----------
         user_message : str
             Mensaje del usuario.
+        system_prompt : str, opcional
+            Mensaje de sistema solo para esta llamada, sin modificar el de la
+            instancia. Si es None se usa `self.system_prompt`.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable
+            para esta llamada. Por defecto se usa el TTL de la caché.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas ("narration", "summary"...). Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo. Por defecto no hay límite.
 
         Retorna
         -------
         str
             Respuesta generada por el modelo.
         """
-        if not self.__system_prompt:
-            messages = self.__format_message(user_message)
-        else:
-            messages = self.__format_sys_prompt() + self.__format_message(user_message)
-        
-        response = self.__client.chat.completions.create(
-            model=self.__model,
-            messages=messages
-        )
-        return response.choices[0].message.content
+        messages = self.__build_messages(user_message, system_prompt)
+        return self.__complete(messages, use_cache, max_age, purpose, max_tokens)
+
+    def generate_response_stream(self, user_message: str, system_prompt: Optional[str] = None,
+                                 use_cache: bool = True, max_age: Optional[float] = None,
+                                 purpose: str = "chat", max_tokens: Optional[int] = None,
+                                 cutoff: Optional[Callable[[], Callable[[str], Optional[int]]]] = None) -> Iterator[str]:
+        """
+        Genera una respuesta del modelo devolviendo los tokens según llegan.
+
+        Parámetros
+        ----------
+        user_message : str
+            Mensaje del usuario.
+        system_prompt : str, opcional
+            Mensaje de sistema solo para esta llamada. Si es None se usa `self.system_prompt`.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas ("narration", "summary"...). Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo. Por defecto no hay límite.
+        cutoff : Callable, opcional
+            Crea, para cada petición al backend, un detector que recibe los
+            fragmentos y devuelve cuántos caracteres conservar cuando la
+            respuesta ya está completa (por ejemplo `OptionsCutoff`). Al
+            cortar se cierra el streaming y se guarda en la caché el texto
+            recortado. Por defecto se lee la respuesta entera.
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto de la respuesta en el orden en que se generan.
+        """
+        return self.__stream(self.__build_messages(user_message, system_prompt), use_cache, max_age, purpose,
+                             max_tokens, cutoff)
 
-    def chat(self, message: str, history: List[Dict[str, str]]):
+    def chat(self, message: str, history: List[Dict[str, str]], system_prompt: Optional[str] = None,
+             use_cache: bool = True, max_age: Optional[float] = None, purpose: str = "chat"):
         """
         Envía un mensaje al modelo, incluyendo el historial de chat.
 
@@ -177,19 +371,402 @@ class Llm:
         message : str
             Mensaje del usuario.
         history : List[Dict[str, str]]
-            Historial de mensajes previos.
+            Historial de mensajes previos. Si hay presupuesto de contexto
+            ([Context] en model.config) se recortan los más antiguos.
+        system_prompt : str, opcional
+            Mensaje de sistema solo para esta llamada. Si es None se usa `self.system_prompt`.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas ("narration", "summary"...). Por defecto es "chat".
 
         Retorna
         -------
         str
             Respuesta generada por el modelo.
         """
-        messages = self.__format_sys_prompt() + history + self.__format_message(message)
-        response = self.__client.chat.completions.create(
-            model=self.__model,
-            messages=messages
+        messages = self.__chat_messages(message, history, system_prompt)
+        return self.__complete(messages, use_cache, max_age, purpose)
+
+    def chat_stream(self, message: str, history: List[Dict[str, str]], system_prompt: Optional[str] = None,
+                    use_cache: bool = True, max_age: Optional[float] = None, purpose: str = "chat") -> Iterator[str]:
+        """
+        Envía un mensaje con historial y devuelve los tokens según llegan.
+
+        Parámetros
+        ----------
+        message : str
+            Mensaje del usuario.
+        history : List[Dict[str, str]]
+            Historial de mensajes previos. Si hay presupuesto de contexto
+            ([Context] en model.config) se recortan los más antiguos.
+        system_prompt : str, opcional
+            Mensaje de sistema solo para esta llamada. Si es None se usa `self.system_prompt`.
+        use_cache : bool, opcional
+            Si es False la petición ignora la caché de respuestas. Por defecto es True.
+        max_age : float, opcional
+            Antigüedad máxima (segundos) de una respuesta cacheada aceptable.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas ("narration", "summary"...). Por defecto es "chat".
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto de la respuesta en el orden en que se generan.
+        """
+        messages = self.__chat_messages(message, history, system_prompt)
+        return self.__stream(messages, use_cache, max_age, purpose)
+
+    def __chat_messages(self, message: str, history: List[Dict[str, str]],
+                        system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Construye los mensajes de un chat, ajustando el historial al presupuesto de contexto.
+
+        Parámetros
+        ----------
+        message : str
+            Mensaje del usuario.
+        history : List[Dict[str, str]]
+            Historial de mensajes previos.
+        system_prompt : str, opcional
+            Mensaje de sistema para esta llamada. Si es None se usa el de la instancia.
+
+        Retorna
+        -------
+        List[Dict[str, str]]
+            Mensajes listos para enviar a la API.
+        """
+        head = self.__format_sys_prompt(system_prompt)
+        tail = self.__format_message(message)
+        if self.__context is None:
+            return head + history + tail
+        return self.__context.fit(head, history, tail)
+
+    def __build_messages(self, user_message: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Construye la lista de mensajes, con el de sistema solo si está definido.
+
+        Parámetros
+        ----------
+        user_message : str
+            Mensaje del usuario.
+        system_prompt : str, opcional
+            Mensaje de sistema para esta llamada. Si es None se usa el de la instancia.
+
+        Retorna
+        -------
+        List[Dict[str, str]]
+            Mensajes listos para enviar a la API.
+        """
+        if system_prompt is None:
+            system_prompt = self.__system_prompt
+        if not system_prompt:
+            return self.__format_message(user_message)
+        return self.__format_sys_prompt(system_prompt) + self.__format_message(user_message)
+
+    def __complete(self, messages: List[Dict[str, str]], use_cache: bool, max_age: Optional[float],
+                   purpose: str = "chat", max_tokens: Optional[int] = None) -> str:
+        """
+        Resuelve una petición completa, consultando antes la caché de respuestas.
+
+        Si hay otra petición igual en curso se espera a su respuesta en lugar
+        de repetirla.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        use_cache : bool
+            Si es False no se consulta ni se actualiza la caché ni se comparte la petición.
+        max_age : float or None
+            Antigüedad máxima aceptada para una respuesta cacheada.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas. Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo.
+
+        Retorna
+        -------
+        str
+            Respuesta del modelo.
+        """
+        telemetry = Telemetry.shared()
+        start = time.perf_counter()
+        profile = self.profile(purpose)
+        cache = self.__cache if use_cache else None
+        flights = self.__flights if use_cache else None
+        key = (ResponseCache.make_key(profile.model, messages, profile.options(max_tokens))
+               if cache or flights else None)
+        if cache:
+            cached = cache.get(key, max_age=max_age)
+            if cached is not None:
+                elapsed = time.perf_counter() - start
+                telemetry.record_llm_call(purpose, profile.model, elapsed, ttft=elapsed, cache="hit")
+                return cached
+        request = partial(self.__request, messages, profile, cache, key, purpose, start, max_tokens)
+        if flights is None:
+            return request()
+
+        # Si falla, el error lo registra la petición que llegó al backend
+        content, shared = flights.call(LlmScheduler.flight_key(key, purpose), request)
+        if shared:
+            elapsed = time.perf_counter() - start
+            telemetry.record_llm_call(purpose, profile.model, elapsed, ttft=elapsed, cache="coalesced")
+        return content
+
+    def __request(self, messages: List[Dict[str, str]], profile: ModelProfile, cache: Optional[ResponseCache],
+                  key: Optional[str], purpose: str, start: float, max_tokens: Optional[int] = None) -> str:
+        """
+        Envía una petición completa al backend y guarda la respuesta en la caché.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        profile : ModelProfile
+            Perfil con el que se atiende la llamada.
+        cache : ResponseCache or None
+            Caché donde guardar la respuesta.
+        key : str or None
+            Clave de la petición en la caché.
+        purpose : str
+            Propósito de la llamada para las métricas.
+        start : float
+            Instante (time.perf_counter) en que se pidió la respuesta.
+        max_tokens : int, opcional
+            Tokens generados como máximo; tiene prioridad sobre el del perfil.
+
+        Retorna
+        -------
+        str
+            Respuesta del modelo.
+        """
+        telemetry = Telemetry.shared()
+        try:
+            with self.__slot(purpose):
+                response = self.__router_for(profile).create(
+                    model=profile.model,
+                    messages=messages,
+                    **profile.options(max_tokens)
+                )
+        except Exception as e:
+            telemetry.record_llm_call(purpose, profile.model, time.perf_counter() - start,
+                                      cache="miss" if cache else "bypass",
+                                      status="shed" if isinstance(e, SchedulerBusy) else "error")
+            raise
+        elapsed = time.perf_counter() - start
+        usage = getattr(response, "usage", None)
+        telemetry.record_llm_call(
+            purpose, profile.model, elapsed, ttft=elapsed,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            cache="miss" if cache else "bypass",
         )
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        if cache and content:
+            cache.set(key, content)
+        return content
+
+    def __stream(self, messages: List[Dict[str, str]], use_cache: bool, max_age: Optional[float],
+                 purpose: str = "chat", max_tokens: Optional[int] = None,
+                 cutoff: Optional[Callable[[], Callable[[str], Optional[int]]]] = None) -> Iterator[str]:
+        """
+        Lanza una petición en streaming y emite el contenido de cada fragmento.
+
+        Si la respuesta está en caché se emite completa de una vez; si hay
+        otra petición igual en curso se comparte su streaming (primero los
+        fragmentos que ya han llegado); si no, se abre uno nuevo con
+        `__live_stream`.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        use_cache : bool
+            Si es False no se consulta ni se actualiza la caché ni se comparte la petición.
+        max_age : float or None
+            Antigüedad máxima aceptada para una respuesta cacheada.
+        purpose : str, opcional
+            Propósito de la llamada para las métricas. Por defecto es "chat".
+        max_tokens : int, opcional
+            Tokens generados como máximo.
+        cutoff : Callable, opcional
+            Fábrica del detector de final de respuesta (ver `generate_response_stream`).
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto no vacíos de la respuesta.
+        """
+        telemetry = Telemetry.shared()
+        self.__last_ttft = None
+        start = time.perf_counter()
+        profile = self.profile(purpose)
+        cache = self.__cache if use_cache else None
+        flights = self.__flights if use_cache else None
+        key = (ResponseCache.make_key(profile.model, messages, profile.options(max_tokens), cutoff is not None)
+               if cache or flights else None)
+        if cache:
+            cached = cache.get(key, max_age=max_age)
+            if cached is not None:
+                self.__last_ttft = time.perf_counter() - start
+                telemetry.record_llm_call(purpose, profile.model, self.__last_ttft, ttft=self.__last_ttft,
+                                          cache="hit", stream=True)
+                yield cached
+                return
+
+        live = partial(self.__live_stream, messages, profile, cache, key, purpose, start, max_tokens, cutoff)
+        if flights is None:
+            tokens, shared = live(), False
+        else:
+            tokens, shared = flights.stream(LlmScheduler.flight_key(key, purpose), live)
+        status = "error"
+        try:
+            for token in tokens:
+                if self.__last_ttft is None:
+                    self.__last_ttft = time.perf_counter() - start
+                yield token
+            status = "ok"
+        except GeneratorExit:
+            status = "cancelled"
+            raise
+        finally:
+            tokens.close()
+            if shared:
+                telemetry.record_llm_call(purpose, profile.model, time.perf_counter() - start,
+                                          ttft=self.__last_ttft, cache="coalesced", stream=True, status=status)
+
+    def __live_stream(self, messages: List[Dict[str, str]], profile: ModelProfile, cache: Optional[ResponseCache],
+                      key: Optional[str], purpose: str, start: float, max_tokens: Optional[int] = None,
+                      cutoff: Optional[Callable[[], Callable[[str], Optional[int]]]] = None) -> Iterator[str]:
+        """
+        Abre un streaming en el backend y guarda la respuesta en la caché al terminar.
+
+        La respuesta solo se guarda si se lee entera o hasta el corte de
+        `cutoff`. Se pide al backend el recuento de tokens en el último
+        fragmento (`stream_options.include_usage`) para las métricas; si no
+        llega (corte anticipado o cancelación) se cuenta un token por
+        fragmento recibido.
+
+        Parámetros
+        ----------
+        messages : List[Dict[str, str]]
+            Mensajes a enviar a la API.
+        profile : ModelProfile
+            Perfil con el que se atiende la llamada.
+        cache : ResponseCache or None
+            Caché donde guardar la respuesta.
+        key : str or None
+            Clave de la petición en la caché.
+        purpose : str
+            Propósito de la llamada para las métricas.
+        start : float
+            Instante (time.perf_counter) en que se pidió la respuesta.
+        max_tokens : int, opcional
+            Tokens generados como máximo; tiene prioridad sobre el del perfil.
+        cutoff : Callable, opcional
+            Fábrica del detector de final de respuesta (ver `generate_response_stream`).
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto no vacíos de la respuesta.
+        """
+        telemetry = Telemetry.shared()
+        status = "error"
+        usage = None
+        ttft = None
+        chunks = 0
+        early_stop = False
+        stop = cutoff() if cutoff is not None else None
+        try:
+            with self.__slot(purpose):
+                stream = self.__router_for(profile).stream(
+                    model=profile.model,
+                    messages=messages,
+                    stream_options={"include_usage": True},
+                    **profile.options(max_tokens)
+                )
+                parts = []
+                try:
+                    for chunk in stream:
+                        if getattr(chunk, "usage", None) is not None:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        token = chunk.choices[0].delta.content
+                        if not token:
+                            continue
+                        chunks += 1
+                        if stop is not None:
+                            keep = stop(token)
+                            if keep is not None:
+                                token = token[:keep]
+                                early_stop = True
+                        if token:
+                            if ttft is None:
+                                ttft = time.perf_counter() - start
+                            parts.append(token)
+                            yield token
+                        if early_stop:
+                            break
+                    status = "ok"
+                except GeneratorExit:
+                    status = "cancelled"
+                    raise
+                finally:
+                    # Cierra la conexión si el consumidor abandona el generador antes de tiempo
+                    stream.close()
+        except SchedulerBusy:
+            status = "shed"
+            raise
+        finally:
+            telemetry.record_llm_call(
+                purpose, profile.model, time.perf_counter() - start, ttft=ttft,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", chunks or None),
+                cache="miss" if cache else "bypass", stream=True, status=status, early_stop=early_stop,
+            )
+        if cache and parts:
+            cache.set(key, "".join(parts))
+
+    @staticmethod
+    def __slot(purpose: str):
+        """
+        Pide turno al planificador compartido para una llamada al backend.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada, que decide su prioridad.
+
+        Retorna
+        -------
+        ContextManager
+            Bloque durante el que se tiene el turno (sin efecto si el planificador está desactivado).
+        """
+        scheduler = LlmScheduler.shared()
+        return scheduler.slot(purpose) if scheduler is not None else nullcontext()
+
+    def __router_for(self, profile: ModelProfile) -> LlmRouter:
+        """
+        Elige el router de una llamada según su perfil.
+
+        Parámetros
+        ----------
+        profile : ModelProfile
+            Perfil de la llamada.
+
+        Retorna
+        -------
+        LlmRouter
+            Router compartido del backend propio del perfil, o el de la instancia.
+        """
+        if not profile.url:
+            return self.__router
+        return LlmRouter.shared([profile.url], self.__api_key)
 
     def visualize_response(self, response: str) -> None:
         """
@@ -199,5 +776,20 @@ class Llm:
         ----------
         response : str
             Respuesta generada por el modelo.
+
+        Raises
+        ------
+        ImportError
+            Si IPython no está instalado.
+
+        Notas
+        -----
+        IPython se importa aquí y no al cargar el módulo: solo hace falta en
+        cuadernos y su importación retrasa el arranque de la app y de la API.
         """
+        try:
+            from IPython.display import display, Markdown
+        except ImportError:
+            print("[Error] visualize_response necesita IPython (pip install ipython).")
+            raise
         display(Markdown(response))
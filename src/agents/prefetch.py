@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from agents.background import BackgroundPool
+from agents.scheduler import LlmScheduler
+import threading
+
+
+class SummaryPrefetcher:
+    """
+    Calcula en segundo plano los resúmenes de la historia y los comparte por clave.
+
+    El resumen de un capítulo solo depende de su texto, que se conoce en cuanto
+    se muestra al jugador. `prefetch` lo lanza en ese momento para que, cuando
+    el jugador elige, la narración del siguiente capítulo no tenga que esperar
+    a una segunda llamada al modelo. Las ramas especulativas y la narración
+    normal comparten el mismo resultado.
+
+    Los resúmenes adelantados esperan en el planificador como trabajo de
+    resumen; si la narración llega a necesitar uno que aún está en cola, se
+    promociona para que no la retrase.
+
+    Atributos
+    ----------
+    max_entries : int
+        Número máximo de resúmenes recordados.
+    """
+
+    __shared: Optional["SummaryPrefetcher"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Inicializa la clase SummaryPrefetcher.
+
+        Parámetros
+        ----------
+        max_entries : int, opcional
+            Número máximo de resúmenes recordados. Por defecto es 256.
+        """
+        self.__max_entries = max_entries
+        self.__futures: "OrderedDict[str, Future]" = OrderedDict()
+        # Evento de cada resumen adelantado que lo promociona en el planificador cuando hace falta ya
+        self.__needed: Dict[str, threading.Event] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        """
+        int: Obtiene el número máximo de resúmenes recordados.
+        """
+        return self.__max_entries
+
+    @classmethod
+    def shared(cls) -> "SummaryPrefetcher":
+        """
+        Devuelve la instancia compartida por el proceso.
+
+        Retorna
+        -------
+        SummaryPrefetcher
+            Prefetcher compartido.
+        """
+        instance = cls.__shared
+        if instance is None:
+            with cls.__shared_lock:
+                instance = cls.__shared
+                if instance is None:
+                    instance = cls()
+                    cls.__shared = instance
+        return instance
+
+    def prefetch(self, key: str, summarize: Callable[[], str]) -> Future:
+        """
+        Lanza el resumen en segundo plano si aún no existe para la clave.
+
+        Parámetros
+        ----------
+        key : str
+            Clave del texto a resumir.
+        summarize : Callable[[], str]
+            Función que calcula el resumen.
+
+        Retorna
+        -------
+        Future
+            Futuro con el resumen.
+        """
+        with self.__lock:
+            future = self.__futures.get(key)
+            if future is not None:
+                self.__futures.move_to_end(key)
+                return future
+            needed = threading.Event()
+            with LlmScheduler.context(promote=needed):
+                future = BackgroundPool.submit(summarize)
+            self.__store(key, future)
+            self.__needed[key] = needed
+            return future
+
+    def get(self, key: str, summarize: Callable[[], str]) -> str:
+        """
+        Devuelve el resumen de la clave, esperándolo o calculándolo si hace falta.
+
+        Si no se había lanzado, se calcula en el hilo que llama (sin pasar por
+        el pool) para no hacer cola detrás del trabajo en segundo plano.
+
+        Parámetros
+        ----------
+        key : str
+            Clave del texto a resumir.
+        summarize : Callable[[], str]
+            Función que calcula el resumen.
+
+        Retorna
+        -------
+        str
+            Resumen de la historia.
+        """
+        with self.__lock:
+            future = self.__futures.get(key)
+            owner = future is None
+            needed = self.__needed.pop(key, None)
+            if needed is not None:
+                needed.set()
+            if owner:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self.__store(key, future)
+
+        if not owner:
+            try:
+                return future.result()
+            except Exception as e:
+                print(f"[Error] Fallo en el resumen adelantado, se recalcula: {e}")
+                self.discard(key)
+                return summarize()
+
+        try:
+            resume = summarize()
+        except Exception as e:
+            future.set_exception(e)
+            self.discard(key)
+            raise
+        future.set_result(resume)
+        return resume
+
+    def discard(self, key: str) -> None:
+        """
+        Olvida el resumen de una clave.
+
+        Parámetros
+        ----------
+        key : str
+            Clave a descartar.
+        """
+        with self.__lock:
+            self.__futures.pop(key, None)
+            self.__needed.pop(key, None)
+
+    def __store(self, key: str, future: Future) -> None:
+        """
+        Guarda un futuro respetando el tamaño máximo (se descartan los más antiguos).
+
+        Parámetros
+        ----------
+        key : str
+            Clave del resumen.
+        future : Future
+            Futuro con el resumen.
+        """
+        self.__futures[key] = future
+        while len(self.__futures) > self.__max_entries:
+            oldest, _ = self.__futures.popitem(last=False)
+            self.__needed.pop(oldest, None)
@@ -0,0 +1,213 @@
+from typing import Dict, List, Optional, Union
+from config.model_config import ModelConfig
+
+# Prefijo de las secciones de perfil en model.config ([Profile.narration], [Profile.summary]...)
+SECTION_PREFIX = "Profile."
+
+# Propósitos que usan el perfil de otra tarea: la especulación genera el mismo capítulo que la narración
+ALIASES = {"speculation": "narration"}
+
+
+class ModelProfile:
+    """
+    Modelo, backend y parámetros de generación con los que se atiende una tarea.
+
+    Cada perfil es una sección [Profile.<tarea>] de model.config con las
+    opciones `model`, `url`, `max_tokens` y `temperature`. Las que se dejan
+    vacías (o la sección entera, si no existe) heredan el comportamiento
+    general: el modelo de [Model] name, los backends del Llm, sin límite de
+    tokens y la temperatura por defecto del backend. Las llamadas al modelo
+    eligen el perfil por su propósito ("narration", "summary", "warmup"...);
+    "speculation" usa el de la narración.
+
+    El perfil se lee de la configuración en cada llamada, de modo que un
+    cambio en model.config se aplica sin reiniciar (ver `ModelConfig.shared`).
+
+    Atributos
+    ----------
+    task : str
+        Tarea del perfil.
+    model : str
+        Modelo con el que se atiende la tarea.
+    url : str or None
+        Backend propio de la tarea, o None para usar los del Llm.
+    max_tokens : int or None
+        Tokens generados como máximo, o None sin límite.
+    temperature : float or None
+        Temperatura de muestreo, o None para la del backend.
+    """
+
+    def __init__(self, task: str, model: str, url: Optional[str] = None, max_tokens: Optional[int] = None,
+                 temperature: Optional[float] = None):
+        """
+        Inicializa la clase ModelProfile.
+
+        Parámetros
+        ----------
+        task : str
+            Tarea del perfil.
+        model : str
+            Modelo con el que se atiende la tarea.
+        url : str, opcional
+            Backend propio de la tarea. Por defecto se usan los del Llm.
+        max_tokens : int, opcional
+            Tokens generados como máximo. Por defecto no hay límite.
+        temperature : float, opcional
+            Temperatura de muestreo. Por defecto la del backend.
+        """
+        self.__task = task
+        self.__model = model
+        self.__url = url
+        self.__max_tokens = max_tokens
+        self.__temperature = temperature
+
+    @property
+    def task(self) -> str:
+        """
+        str: Obtiene la tarea del perfil.
+        """
+        return self.__task
+
+    @property
+    def model(self) -> str:
+        """
+        str: Obtiene el modelo con el que se atiende la tarea.
+        """
+        return self.__model
+
+    @property
+    def url(self) -> Optional[str]:
+        """
+        str or None: Obtiene el backend propio de la tarea.
+        """
+        return self.__url
+
+    @property
+    def max_tokens(self) -> Optional[int]:
+        """
+        int or None: Obtiene los tokens generados como máximo.
+        """
+        return self.__max_tokens
+
+    @property
+    def temperature(self) -> Optional[float]:
+        """
+        float or None: Obtiene la temperatura de muestreo.
+        """
+        return self.__temperature
+
+    @classmethod
+    def for_task(cls, task: str, default_model: Optional[str] = None) -> "ModelProfile":
+        """
+        Lee el perfil de una tarea de la configuración actual.
+
+        Parámetros
+        ----------
+        task : str
+            Tarea o propósito de la llamada ("narration", "speculation", "summary"...).
+        default_model : str, opcional
+            Modelo si el perfil no indica ninguno. Por defecto el de [Model] name.
+
+        Retorna
+        -------
+        ModelProfile
+            Perfil de la tarea, o el perfil por defecto si no tiene sección.
+        """
+        config = ModelConfig.shared()
+        task = ALIASES.get(task, task)
+        section = SECTION_PREFIX + task
+        model = default_model or config.get("Model", "name")
+        if not config.parser.has_section(section):
+            return cls(task, model)
+        max_tokens = cls.__number(config.get(section, "max_tokens", fallback=""), int)
+        return cls(
+            task,
+            config.get(section, "model", fallback="").strip() or model,
+            url=config.get(section, "url", fallback="").strip() or None,
+            max_tokens=max_tokens or None,
+            temperature=cls.__number(config.get(section, "temperature", fallback=""), float),
+        )
+
+    @classmethod
+    def configured(cls, default_model: Optional[str] = None) -> List["ModelProfile"]:
+        """
+        Lee todos los perfiles definidos en model.config.
+
+        Parámetros
+        ----------
+        default_model : str, opcional
+            Modelo de los perfiles que no indican ninguno. Por defecto el de [Model] name.
+
+        Retorna
+        -------
+        List[ModelProfile]
+            Un perfil por sección [Profile.<tarea>], en el orden del archivo.
+        """
+        sections = ModelConfig.shared().parser.sections()
+        return [cls.for_task(section[len(SECTION_PREFIX):], default_model)
+                for section in sections if section.startswith(SECTION_PREFIX)]
+
+    def options(self, max_tokens: Optional[int] = None) -> Dict[str, Union[int, float]]:
+        """
+        Construye los argumentos de generación de una petición con este perfil.
+
+        Parámetros
+        ----------
+        max_tokens : int, opcional
+            Límite de esta llamada; tiene prioridad sobre el del perfil.
+
+        Retorna
+        -------
+        Dict[str, int or float]
+            `max_tokens` y `temperature`, solo los que están definidos.
+        """
+        options: Dict[str, Union[int, float]] = {}
+        limit = max_tokens or self.__max_tokens
+        if limit:
+            options["max_tokens"] = limit
+        if self.__temperature is not None:
+            options["temperature"] = self.__temperature
+        return options
+
+    def describe(self) -> Dict:
+        """
+        Devuelve el perfil como diccionario, para el panel de depuración y las métricas.
+
+        Retorna
+        -------
+        Dict
+            Tarea, modelo, backend, límite de tokens y temperatura.
+        """
+        return {"task": self.__task, "model": self.__model, "url": self.__url,
+                "max_tokens": self.__max_tokens, "temperature": self.__temperature}
+
+    @staticmethod
+    def __number(value: str, kind: type) -> Optional[Union[int, float]]:
+        """
+        Convierte una opción numérica que puede estar vacía.
+
+        Parámetros
+        ----------
+        value : str
+            Valor leído del archivo.
+        kind : type
+            `int` o `float`.
+
+        Retorna
+        -------
+        int or float or None
+            Valor convertido, o None si está vacío.
+
+        Raises
+        ------
+        ValueError
+            Si el valor no es un número.
+        """
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            return kind(value)
+        except ValueError:
+            print(f"[Error] Valor no numérico en un perfil de modelo: {value!r}.")
+            raise
@@ -0,0 +1,372 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+from config.model_config import ModelConfig
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Caché de respuestas del modelo en dos niveles: memoria (LRU) y disco (SQLite).
+
+    La clave se calcula a partir del nombre del modelo, de la lista completa
+    de mensajes (incluido el de sistema) y de las opciones de generación
+    (límite de tokens, temperatura y corte tras las opciones), por lo que
+    solo comparten respuesta las peticiones idénticas. El nivel en memoria expulsa por tamaño y por
+    antigüedad; el de disco es opcional y, al ser un archivo SQLite, lo pueden
+    compartir varios procesos del servidor. Las filas caducadas del disco se
+    borran al abrirlo y, después, cada `purge_interval` segundos al guardar.
+
+    Atributos
+    ----------
+    max_entries : int
+        Número máximo de respuestas en memoria.
+    ttl : float
+        Segundos que una respuesta se considera válida.
+    disk_path : str or None
+        Ruta del archivo SQLite del nivel en disco, o None si está desactivado.
+    purge_interval : float
+        Segundos entre borrados de las filas caducadas del disco (0 = solo al abrirlo).
+    hits : int
+        Consultas resueltas desde la caché.
+    misses : int
+        Consultas que no estaban en la caché.
+    """
+
+    __shared: Optional["ResponseCache"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600.0, disk_path: Optional[str] = None,
+                 purge_interval: float = 600.0):
+        """
+        Inicializa la clase ResponseCache.
+
+        Parámetros
+        ----------
+        max_entries : int, opcional
+            Número máximo de respuestas en memoria. Por defecto es 512.
+        ttl : float, opcional
+            Segundos que una respuesta se considera válida. Por defecto es 3600.
+        disk_path : str, opcional
+            Ruta del archivo SQLite para el nivel en disco. Por defecto es None.
+        purge_interval : float, opcional
+            Segundos entre borrados de las filas caducadas del disco; se
+            comprueba al guardar. Por defecto es 600.
+        """
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__disk_path = disk_path
+        self.__purge_interval = max(purge_interval, 0.0)
+        self.__memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__last_purge = time.monotonic()
+        self.__purged = 0
+        self.__disk = self.__open_disk() if disk_path else None
+        self.__hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+
+    @property
+    def max_entries(self) -> int:
+        """
+        int: Obtiene el número máximo de respuestas en memoria.
+        """
+        return self.__max_entries
+
+    @property
+    def ttl(self) -> float:
+        """
+        float: Obtiene los segundos de validez de una respuesta.
+        """
+        return self.__ttl
+
+    @property
+    def disk_path(self) -> Optional[str]:
+        """
+        str or None: Obtiene la ruta del nivel en disco.
+        """
+        return self.__disk_path
+
+    @property
+    def purge_interval(self) -> float:
+        """
+        float: Obtiene los segundos entre borrados de las filas caducadas del disco.
+        """
+        return self.__purge_interval
+
+    @property
+    def hits(self) -> int:
+        """
+        int: Obtiene las consultas resueltas desde la caché.
+        """
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """
+        int: Obtiene las consultas que no estaban en la caché.
+        """
+        return self.__misses
+
+    @classmethod
+    def shared(cls) -> Optional["ResponseCache"]:
+        """
+        Devuelve la caché compartida configurada en la sección [Cache] de model.config.
+
+        Retorna
+        -------
+        ResponseCache or None
+            Caché del proceso, o None si está desactivada.
+        """
+        config = ModelConfig.shared()
+        if not config.getboolean("Cache", "enabled", fallback=False):
+            return None
+        instance = cls.__shared
+        if instance is None:
+            with cls.__shared_lock:
+                instance = cls.__shared
+                if instance is None:
+                    instance = cls(
+                        max_entries=config.getint("Cache", "max_entries", fallback=512),
+                        ttl=config.getfloat("Cache", "ttl_seconds", fallback=3600.0),
+                        disk_path=config.get("Cache", "disk_path", fallback="") or None,
+                        purge_interval=config.getfloat("Cache", "purge_seconds", fallback=600.0),
+                    )
+                    cls.__shared = instance
+        return instance
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Descarta la caché compartida para que se cree de nuevo con la configuración actual.
+        """
+        with cls.__shared_lock:
+            cls.__shared = None
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], options: Optional[Dict[str, Union[int, float]]] = None,
+                 cutoff: bool = False) -> str:
+        """
+        Calcula la clave de una petición.
+
+        Una respuesta generada con menos tokens o cortada tras las opciones
+        no sirve para una petición sin esos límites, así que las opciones de
+        generación forman parte de la clave.
+
+        Parámetros
+        ----------
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición, incluido el de sistema.
+        options : Dict[str, int or float], opcional
+            Opciones de generación efectivas (`ModelProfile.options`: `max_tokens`, `temperature`).
+        cutoff : bool, opcional
+            Si la respuesta se corta al detectar su final. Por defecto es False.
+
+        Retorna
+        -------
+        str
+            Resumen SHA-256 del modelo, los mensajes y las opciones.
+        """
+        payload = json.dumps([model, messages, options or {}, cutoff], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        Busca una respuesta, primero en memoria y después en disco.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        max_age : float, opcional
+            Antigüedad máxima aceptada en segundos para esta consulta. Si es
+            None se usa el TTL de la caché.
+
+        Retorna
+        -------
+        str or None
+            Respuesta guardada, o None si no existe o es demasiado antigua.
+        """
+        limit = self.__ttl if max_age is None else min(max_age, self.__ttl)
+        now = time.time()
+        with self.__lock:
+            entry = self.__memory.get(key)
+            if entry is not None and now - entry[0] <= self.__ttl:
+                self.__memory.move_to_end(key)
+                if now - entry[0] <= limit:
+                    self.__hits += 1
+                    return entry[1]
+            elif entry is not None:
+                del self.__memory[key]
+
+        entry = self.__disk_get(key)
+        with self.__lock:
+            if entry is not None and now - entry[0] <= limit:
+                self.__hits += 1
+                self.__disk_hits += 1
+                self.__remember(key, entry)
+                return entry[1]
+            self.__misses += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Guarda una respuesta en ambos niveles.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        value : str
+            Respuesta del modelo.
+        """
+        entry = (time.time(), value)
+        with self.__lock:
+            self.__remember(key, entry)
+        self.__disk_set(key, entry)
+        if self.__purge_interval and time.monotonic() - self.__last_purge >= self.__purge_interval:
+            self.purge()
+
+    def purge(self) -> int:
+        """
+        Borra del nivel en disco las respuestas más antiguas que el TTL.
+
+        Retorna
+        -------
+        int
+            Filas borradas.
+        """
+        self.__last_purge = time.monotonic()
+        if self.__disk is None:
+            return 0
+        try:
+            with self.__lock:
+                removed = self.__disk.execute("DELETE FROM responses WHERE created < ?",
+                                              (time.time() - self.__ttl,)).rowcount
+                self.__disk.commit()
+                self.__purged += removed
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo purgando la caché en disco: {e}")
+            return 0
+        return removed
+
+    def clear(self) -> None:
+        """
+        Vacía ambos niveles y reinicia los contadores.
+        """
+        with self.__lock:
+            self.__memory.clear()
+            self.__hits = self.__disk_hits = self.__misses = 0
+            if self.__disk is not None:
+                self.__disk.execute("DELETE FROM responses")
+                self.__disk.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores de la caché.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Aciertos (totales y de disco), fallos, entradas en memoria y filas
+            caducadas borradas del disco.
+        """
+        with self.__lock:
+            return {
+                "hits": self.__hits,
+                "disk_hits": self.__disk_hits,
+                "misses": self.__misses,
+                "entries": len(self.__memory),
+                "purged": self.__purged,
+            }
+
+    def __remember(self, key: str, entry: Tuple[float, str]) -> None:
+        """
+        Inserta en memoria expulsando las entradas menos usadas si no caben.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        entry : Tuple[float, str]
+            Marca de tiempo y respuesta.
+        """
+        self.__memory[key] = entry
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.__max_entries:
+            self.__memory.popitem(last=False)
+
+    def __open_disk(self) -> sqlite3.Connection:
+        """
+        Abre (y crea si hace falta) el archivo SQLite del nivel en disco.
+
+        Retorna
+        -------
+        sqlite3.Connection
+            Conexión compartida por los hilos del proceso.
+        """
+        directory = os.path.dirname(self.__disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.__disk_path, timeout=5.0, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self.__purged += connection.execute("DELETE FROM responses WHERE created < ?",
+                                            (time.time() - self.__ttl,)).rowcount
+        connection.commit()
+        return connection
+
+    def __disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Lee una entrada del nivel en disco.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+
+        Retorna
+        -------
+        Tuple[float, str] or None
+            Marca de tiempo y respuesta, o None si no existe.
+        """
+        if self.__disk is None:
+            return None
+        try:
+            with self.__lock:
+                row = self.__disk.execute("SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo leyendo la caché en disco: {e}")
+            return None
+        return (row[0], row[1]) if row else None
+
+    def __disk_set(self, key: str, entry: Tuple[float, str]) -> None:
+        """
+        Escribe una entrada en el nivel en disco.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        entry : Tuple[float, str]
+            Marca de tiempo y respuesta.
+        """
+        if self.__disk is None:
+            return
+        try:
+            with self.__lock:
+                self.__disk.execute(
+                    "INSERT OR REPLACE INTO responses (key, created, value) VALUES (?, ?, ?)",
+                    (key, entry[0], entry[1]),
+                )
+                self.__disk.commit()
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo escribiendo la caché en disco: {e}")
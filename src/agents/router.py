@@ -0,0 +1,897 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+from openai import APIConnectionError, InternalServerError, OpenAI, RateLimitError, Timeout
+from config.model_config import ModelConfig
+import math
+import queue
+import random
+import threading
+import time
+
+# Errores tras los que se reintenta en otro backend: conexión, tiempo agotado, 429 y 5xx
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+# Muestras de latencia que se guardan por backend y para el umbral de las peticiones duplicadas
+LATENCY_WINDOW = 200
+
+
+def percentile(values: Sequence[float], percent: float) -> Optional[float]:
+    """
+    Calcula un percentil (método del rango más cercano).
+
+    Parámetros
+    ----------
+    values : Sequence[float]
+        Muestras.
+    percent : float
+        Percentil entre 0 y 100.
+
+    Retorna
+    -------
+    float or None
+        Valor del percentil, o None si no hay muestras.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class _Backend:
+    """
+    Estado de un backend del router: cliente, peticiones en curso, salud y latencias.
+
+    Atributos
+    ----------
+    url : str
+        URL base (/v1) del backend.
+    client : OpenAI
+        Cliente con los tiempos máximos del router y sin reintentos propios.
+    outstanding : int
+        Peticiones en curso.
+    healthy : bool
+        Resultado de la última comprobación de salud.
+    down_until : float
+        Instante (time.monotonic) hasta el que se evita tras fallos seguidos.
+    """
+
+    def __init__(self, url: str, client: OpenAI):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.healthy = True
+        self.down_until = 0.0
+        self.failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.last_error: Optional[str] = None
+        self.last_check: Optional[float] = None
+        self.durations: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.ttfts: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def available(self, now: float) -> bool:
+        """
+        Indica si el backend puede recibir peticiones.
+
+        Parámetros
+        ----------
+        now : float
+            Instante actual (time.monotonic).
+
+        Retorna
+        -------
+        bool
+            True si está sano y no está en enfriamiento.
+        """
+        return self.healthy and now >= self.down_until
+
+    def stats(self) -> Dict:
+        """
+        Devuelve los contadores y latencias del backend.
+
+        Retorna
+        -------
+        Dict
+            Estado serializable del backend.
+        """
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "cooling_down": time.monotonic() < self.down_until,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_s": percentile(self.durations, 50),
+            "p95_s": percentile(self.durations, 95),
+            "ttft_p50_s": percentile(self.ttfts, 50),
+            "ttft_p95_s": percentile(self.ttfts, 95),
+            "last_error": self.last_error,
+        }
+
+
+class LlmRouter:
+    """
+    Reparte las peticiones de chat entre varios backends compatibles con OpenAI.
+
+    - Cada petición va al backend sano con menos peticiones en curso (los
+      empates se reparten por turnos).
+    - Un hilo comprueba periódicamente `GET /models` en cada backend; además,
+      tras `max_failures` errores seguidos un backend se deja de usar durante
+      `cooldown` segundos aunque no haya comprobaciones activas.
+    - Los errores de conexión, tiempo agotado, 429 y 5xx se reintentan en
+      otro backend con espera exponencial y jitter. En streaming solo se
+      reintenta si aún no ha llegado ningún fragmento.
+    - Con `hedge=True`, si una petición tarda más que el percentil
+      `hedge_percentile` de las anteriores (en streaming, el tiempo hasta el
+      primer fragmento con texto), se lanza un duplicado en otro backend y se
+      usa la respuesta que llegue antes. En streaming la perdedora se cierra;
+      una petición completa perdedora termina en segundo plano.
+
+    Los clientes tienen un tiempo máximo por lectura (`timeout`) y de
+    conexión (`connect_timeout`), de modo que un nodo atascado no bloquea
+    indefinidamente a los jugadores que lo usan.
+
+    Atributos
+    ----------
+    urls : List[str]
+        URLs base (/v1) de los backends.
+    timeout : float
+        Segundos máximos de espera por lectura.
+    max_retries : int
+        Reintentos tras el primer intento.
+    hedge : bool
+        Si se envían peticiones duplicadas cuando se supera el percentil.
+    """
+
+    __instances: Dict[Tuple[Tuple[str, ...], str], "LlmRouter"] = {}
+    __instances_lock = threading.Lock()
+
+    def __init__(self, urls: Sequence[str], api_key: str, timeout: float = 120.0, connect_timeout: float = 5.0,
+                 max_retries: int = 2, backoff: float = 0.5, backoff_max: float = 8.0,
+                 health_interval: float = 15.0, max_failures: int = 3, cooldown: float = 30.0,
+                 hedge: bool = False, hedge_percentile: float = 95.0, hedge_min_samples: int = 20,
+                 hedge_min_seconds: float = 1.0):
+        """
+        Inicializa la clase LlmRouter.
+
+        Parámetros
+        ----------
+        urls : Sequence[str]
+            URLs base (/v1) de los backends.
+        api_key : str
+            Clave de API (la misma para todos los backends).
+        timeout : float, opcional
+            Segundos máximos de espera por lectura. Por defecto es 120.
+        connect_timeout : float, opcional
+            Segundos máximos para conectar. Por defecto es 5.
+        max_retries : int, opcional
+            Reintentos tras el primer intento. Por defecto es 2.
+        backoff : float, opcional
+            Espera base entre reintentos (se duplica en cada uno). Por defecto es 0.5.
+        backoff_max : float, opcional
+            Espera máxima entre reintentos. Por defecto es 8.
+        health_interval : float, opcional
+            Segundos entre comprobaciones de salud (0 = sin hilo). Por defecto es 15.
+        max_failures : int, opcional
+            Errores seguidos que dejan un backend en enfriamiento. Por defecto es 3.
+        cooldown : float, opcional
+            Segundos de enfriamiento. Por defecto es 30.
+        hedge : bool, opcional
+            Si se envían peticiones duplicadas. Por defecto es False.
+        hedge_percentile : float, opcional
+            Percentil de latencia a partir del cual se duplica. Por defecto es 95.
+        hedge_min_samples : int, opcional
+            Muestras necesarias antes de duplicar. Por defecto es 20.
+        hedge_min_seconds : float, opcional
+            Espera mínima antes de duplicar. Por defecto es 1.
+
+        Raises
+        ------
+        ValueError
+            Si no se indica ningún backend.
+        """
+        urls = [url.strip() for url in urls if url and url.strip()]
+        if not urls:
+            print("[Error] LlmRouter necesita al menos un backend.")
+            raise ValueError("LlmRouter necesita al menos un backend.")
+        client_timeout = Timeout(timeout, connect=connect_timeout)
+        self.__backends = [_Backend(url, OpenAI(base_url=url, api_key=api_key, timeout=client_timeout, max_retries=0))
+                           for url in urls]
+        self.__timeout = timeout
+        self.__max_retries = max(max_retries, 0)
+        self.__backoff = backoff
+        self.__backoff_max = backoff_max
+        self.__health_interval = health_interval
+        self.__max_failures = max(max_failures, 1)
+        self.__cooldown = cooldown
+        self.__hedge = hedge
+        self.__hedge_percentile = hedge_percentile
+        self.__hedge_min_samples = hedge_min_samples
+        self.__hedge_min_seconds = hedge_min_seconds
+        self.__durations: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.__ttfts: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.__lock = threading.Lock()
+        self.__turn = 0
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__stop_event = threading.Event()
+        self.__health_thread: Optional[threading.Thread] = None
+
+    @property
+    def urls(self) -> List[str]:
+        """
+        List[str]: Obtiene las URLs de los backends.
+        """
+        return [backend.url for backend in self.__backends]
+
+    @property
+    def timeout(self) -> float:
+        """
+        float: Obtiene los segundos máximos de espera por lectura.
+        """
+        return self.__timeout
+
+    @property
+    def max_retries(self) -> int:
+        """
+        int: Obtiene los reintentos tras el primer intento.
+        """
+        return self.__max_retries
+
+    @property
+    def hedge(self) -> bool:
+        """
+        bool: Indica si se envían peticiones duplicadas.
+        """
+        return self.__hedge
+
+    @classmethod
+    def from_config(cls, urls: Sequence[str], api_key: str) -> "LlmRouter":
+        """
+        Crea un router con los parámetros de la sección [Router] de model.config.
+
+        Parámetros
+        ----------
+        urls : Sequence[str]
+            URLs base (/v1) de los backends.
+        api_key : str
+            Clave de API.
+
+        Retorna
+        -------
+        LlmRouter
+            Router configurado.
+        """
+        config = ModelConfig.shared()
+        return cls(
+            urls, api_key,
+            timeout=config.getfloat("Router", "timeout_seconds", fallback=120.0),
+            connect_timeout=config.getfloat("Router", "connect_timeout_seconds", fallback=5.0),
+            max_retries=config.getint("Router", "max_retries", fallback=2),
+            backoff=config.getfloat("Router", "backoff_seconds", fallback=0.5),
+            backoff_max=config.getfloat("Router", "backoff_max_seconds", fallback=8.0),
+            health_interval=config.getfloat("Router", "health_interval_seconds", fallback=15.0),
+            max_failures=config.getint("Router", "max_failures", fallback=3),
+            cooldown=config.getfloat("Router", "cooldown_seconds", fallback=30.0),
+            hedge=config.getboolean("Router", "hedge", fallback=False),
+            hedge_percentile=config.getfloat("Router", "hedge_percentile", fallback=95.0),
+            hedge_min_samples=config.getint("Router", "hedge_min_samples", fallback=20),
+            hedge_min_seconds=config.getfloat("Router", "hedge_min_seconds", fallback=1.0),
+        )
+
+    @classmethod
+    def shared(cls, urls: Sequence[str], api_key: str) -> "LlmRouter":
+        """
+        Devuelve el router del proceso para un conjunto de backends, creándolo la primera vez.
+
+        Los clientes (y su pool de conexiones keep-alive) y las estadísticas
+        se comparten así entre todas las instancias de Llm y sobreviven a las
+        re-ejecuciones de Streamlit.
+
+        Parámetros
+        ----------
+        urls : Sequence[str]
+            URLs base (/v1) de los backends.
+        api_key : str
+            Clave de API.
+
+        Retorna
+        -------
+        LlmRouter
+            Router compartido, con las comprobaciones de salud en marcha si hay varios backends.
+        """
+        key = (tuple(urls), api_key)
+        instance = cls.__instances.get(key)
+        if instance is None:
+            with cls.__instances_lock:
+                instance = cls.__instances.get(key)
+                if instance is None:
+                    instance = cls.from_config(urls, api_key)
+                    if len(instance.urls) > 1:
+                        instance.start_health_checks()
+                    cls.__instances[key] = instance
+        return instance
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Cierra y descarta los routers compartidos para que se creen de nuevo.
+        """
+        with cls.__instances_lock:
+            instances = list(cls.__instances.values())
+            cls.__instances.clear()
+        for instance in instances:
+            instance.close()
+
+    def start_health_checks(self) -> "LlmRouter":
+        """
+        Lanza el hilo que comprueba periódicamente la salud de los backends.
+
+        Retorna
+        -------
+        LlmRouter
+            La propia instancia.
+        """
+        with self.__lock:
+            if self.__health_thread is None and self.__health_interval > 0:
+                self.__health_thread = threading.Thread(target=self.__health_loop, name="llm-router-health",
+                                                        daemon=True)
+                self.__health_thread.start()
+        return self
+
+    def check_health(self) -> Dict[str, bool]:
+        """
+        Comprueba una vez la salud de todos los backends (`GET /models`).
+
+        Retorna
+        -------
+        Dict[str, bool]
+            Salud de cada backend por URL.
+        """
+        results = {}
+        for backend in self.__backends:
+            try:
+                backend.client.with_options(timeout=min(self.__timeout, 5.0)).models.list()
+                healthy = True
+                error = None
+            except Exception as e:
+                healthy = False
+                error = str(e)
+            with self.__lock:
+                backend.healthy = healthy
+                backend.last_check = time.time()
+                if healthy:
+                    backend.failures = 0
+                    backend.down_until = 0.0
+                else:
+                    backend.last_error = error
+            results[backend.url] = healthy
+        return results
+
+    def stats(self) -> List[Dict]:
+        """
+        Devuelve el estado y los contadores de cada backend.
+
+        Retorna
+        -------
+        List[Dict]
+            Un diccionario por backend.
+        """
+        with self.__lock:
+            return [backend.stats() for backend in self.__backends]
+
+    def close(self) -> None:
+        """
+        Detiene las comprobaciones de salud y cierra los clientes.
+        """
+        self.__stop_event.set()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+        for backend in self.__backends:
+            backend.client.close()
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs):
+        """
+        Envía una petición de chat completa con reintentos y, si está activado, duplicado.
+
+        Parámetros
+        ----------
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición.
+        **kwargs
+            Argumentos adicionales de `chat.completions.create`.
+
+        Retorna
+        -------
+        ChatCompletion
+            Respuesta del backend que contestó.
+
+        Raises
+        ------
+        Exception
+            El último error si fallan todos los intentos, o el primero que no se puede reintentar.
+        """
+        last_error: Optional[Exception] = None
+        for backend in self.__attempts():
+            try:
+                return self.__create_hedged(backend, model, messages, kwargs)
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+        raise last_error
+
+    def stream(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Iterator:
+        """
+        Abre una petición de chat en streaming con reintentos y, si está activado, duplicado.
+
+        Parámetros
+        ----------
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición.
+        **kwargs
+            Argumentos adicionales de `chat.completions.create` (stream=True se añade aquí).
+
+        Retorna
+        -------
+        Iterator
+            Fragmentos (ChatCompletionChunk) del backend elegido. Al cerrar el
+            generador se cierra la conexión.
+
+        Raises
+        ------
+        Exception
+            El último error si fallan todos los intentos antes del primer
+            fragmento, o cualquier error posterior.
+        """
+        last_error: Optional[Exception] = None
+        for backend in self.__attempts():
+            chunks = self.__stream_hedged(backend, model, messages, kwargs)
+            started = False
+            try:
+                for chunk in chunks:
+                    started = True
+                    yield chunk
+                return
+            except RETRYABLE_ERRORS as e:
+                if started:
+                    raise
+                last_error = e
+            finally:
+                chunks.close()
+        raise last_error
+
+    def __attempts(self) -> Iterator[_Backend]:
+        """
+        Genera el backend de cada intento, esperando entre reintentos.
+
+        Retorna
+        -------
+        Iterator[_Backend]
+            Backend del primer intento y de cada reintento (distinto de los
+            ya probados mientras quede alguno).
+        """
+        tried = set()
+        for attempt in range(self.__max_retries + 1):
+            if attempt:
+                delay = min(self.__backoff_max, self.__backoff * 2 ** (attempt - 1))
+                time.sleep(delay * random.uniform(0.5, 1.5))
+            backend = self.__pick(exclude=tried)
+            if attempt:
+                with self.__lock:
+                    backend.retries += 1
+            tried.add(backend.url)
+            yield backend
+
+    def __pick(self, exclude: Sequence[str] = ()) -> _Backend:
+        """
+        Elige el backend con menos peticiones en curso.
+
+        Parámetros
+        ----------
+        exclude : Sequence[str], opcional
+            URLs a evitar si hay alternativa.
+
+        Retorna
+        -------
+        _Backend
+            Backend elegido.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            candidates = [b for b in self.__backends if b.url not in exclude and b.available(now)]
+            if not candidates:
+                # Sin backends sanos: mejor intentarlo en alguno que fallar sin intentarlo
+                candidates = [b for b in self.__backends if b.url not in exclude] or self.__backends
+            self.__turn += 1
+            start = self.__turn % len(candidates)
+            rotated = candidates[start:] + candidates[:start]
+            return min(rotated, key=lambda backend: backend.outstanding)
+
+    def __hedge_target(self, primary: _Backend, samples: Deque[float]) -> Tuple[Optional[float], Optional[_Backend]]:
+        """
+        Decide si una petición puede duplicarse, tras cuánto tiempo y en qué backend.
+
+        Parámetros
+        ----------
+        primary : _Backend
+            Backend de la petición original.
+        samples : Deque[float]
+            Latencias anteriores con las que calcular el umbral.
+
+        Retorna
+        -------
+        Tuple[float or None, _Backend or None]
+            Segundos de espera antes de duplicar y backend del duplicado, o
+            (None, None) si no se duplica.
+        """
+        if not self.__hedge or len(self.__backends) < 2:
+            return None, None
+        with self.__lock:
+            if len(samples) < self.__hedge_min_samples:
+                return None, None
+            threshold = percentile(samples, self.__hedge_percentile)
+        backend = self.__pick(exclude=(primary.url,))
+        if backend is primary:
+            return None, None
+        return max(self.__hedge_min_seconds, threshold), backend
+
+    def __pool(self) -> ThreadPoolExecutor:
+        """
+        Devuelve el pool de hilos de las peticiones duplicadas, creándolo la primera vez.
+
+        Retorna
+        -------
+        ThreadPoolExecutor
+            Pool propio del router (no el de segundo plano, para no hacer cola
+            detrás de la especulación).
+        """
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=8 * len(self.__backends),
+                                                     thread_name_prefix="llm-router")
+            return self.__executor
+
+    def __create_once(self, backend: _Backend, model: str, messages: List[Dict[str, str]], kwargs: Dict):
+        """
+        Envía una petición completa a un backend, registrando sus estadísticas.
+
+        Parámetros
+        ----------
+        backend : _Backend
+            Backend destino.
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición.
+        kwargs : Dict
+            Argumentos adicionales de `chat.completions.create`.
+
+        Retorna
+        -------
+        ChatCompletion
+            Respuesta del backend.
+        """
+        self.__begin(backend)
+        start = time.perf_counter()
+        try:
+            response = backend.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        except Exception as e:
+            self.__end(backend, time.perf_counter() - start, error=e)
+            raise
+        self.__end(backend, time.perf_counter() - start)
+        return response
+
+    def __create_hedged(self, primary: _Backend, model: str, messages: List[Dict[str, str]], kwargs: Dict):
+        """
+        Envía una petición completa y, si tarda más que el umbral, un duplicado en otro backend.
+
+        Parámetros
+        ----------
+        primary : _Backend
+            Backend de la petición original.
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición.
+        kwargs : Dict
+            Argumentos adicionales de `chat.completions.create`.
+
+        Retorna
+        -------
+        ChatCompletion
+            La primera respuesta correcta.
+        """
+        delay, secondary = self.__hedge_target(primary, self.__durations)
+        if delay is None:
+            return self.__create_once(primary, model, messages, kwargs)
+
+        pool = self.__pool()
+        futures: Dict[Future, _Backend] = {pool.submit(self.__create_once, primary, model, messages, kwargs): primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            with self.__lock:
+                secondary.hedges += 1
+            futures[pool.submit(self.__create_once, secondary, model, messages, kwargs)] = secondary
+        pending = set(futures)
+        first_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if futures[future] is secondary:
+                        with self.__lock:
+                            secondary.hedge_wins += 1
+                    return future.result()
+                first_error = first_error or error
+        raise first_error
+
+    def __stream_once(self, backend: _Backend, model: str, messages: List[Dict[str, str]], kwargs: Dict,
+                      cancel: Optional[threading.Event] = None,
+                      opened: Optional[Callable[[object], None]] = None) -> Iterator:
+        """
+        Abre una petición en streaming en un backend, registrando sus estadísticas.
+
+        Una petición cancelada (el generador se cierra, o falla después de
+        activar `cancel` porque otro hilo cerró su respuesta) no cuenta como
+        error ni como éxito del backend.
+
+        Parámetros
+        ----------
+        backend : _Backend
+            Backend destino.
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición.
+        kwargs : Dict
+            Argumentos adicionales de `chat.completions.create`.
+        cancel : threading.Event, opcional
+            Se activa cuando otro hilo cancela la petición. Por defecto es None.
+        opened : Callable[[object], None], opcional
+            Recibe la respuesta en cuanto se abre, para poder cerrarla desde
+            otro hilo. Por defecto es None.
+
+        Retorna
+        -------
+        Iterator
+            Fragmentos de la respuesta; al cerrar el generador se cierra la conexión.
+        """
+        self.__begin(backend)
+        start = time.perf_counter()
+        ttft = None
+        error: Optional[BaseException] = None
+        cancelled = False
+        try:
+            stream = backend.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+            if opened is not None:
+                opened(stream)
+            try:
+                for chunk in stream:
+                    if ttft is None and _has_content(chunk):
+                        ttft = time.perf_counter() - start
+                    yield chunk
+            finally:
+                stream.close()
+        except GeneratorExit:
+            cancelled = True
+            raise
+        except Exception as e:
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+            else:
+                error = e
+            raise
+        finally:
+            # Las respuestas sin texto no dan un tiempo hasta el primer token comparable
+            self.__end(backend, time.perf_counter() - start, ttft=ttft, error=error,
+                       record=ttft is not None, cancelled=cancelled)
+
+    def __stream_hedged(self, primary: _Backend, model: str, messages: List[Dict[str, str]],
+                        kwargs: Dict) -> Iterator:
+        """
+        Abre un streaming y, si el primer texto tarda más que el umbral, un duplicado en otro backend.
+
+        Cada petición se lee en un hilo que deja los fragmentos en una cola; la
+        primera que entrega texto gana y la respuesta de la otra se cierra en
+        ese momento, aunque su hilo siga esperando el siguiente fragmento.
+
+        Parámetros
+        ----------
+        primary : _Backend
+            Backend de la petición original.
+        model : str
+            Nombre del modelo.
+        messages : List[Dict[str, str]]
+            Mensajes de la petición.
+        kwargs : Dict
+            Argumentos adicionales de `chat.completions.create`.
+
+        Retorna
+        -------
+        Iterator
+            Fragmentos de la petición ganadora.
+        """
+        delay, secondary = self.__hedge_target(primary, self.__ttfts)
+        if delay is None:
+            chunks = self.__stream_once(primary, model, messages, kwargs)
+            try:
+                yield from chunks
+            finally:
+                chunks.close()
+            return
+
+        events: "queue.Queue[Tuple[int, str, object]]" = queue.Queue()
+        cancels = [threading.Event(), threading.Event()]
+        backends = [primary, secondary]
+        streams: List[Optional[object]] = [None, None]
+        streams_lock = threading.Lock()
+
+        def opened(index: int, stream) -> None:
+            with streams_lock:
+                streams[index] = stream
+                cancelled = cancels[index].is_set()
+            if cancelled:
+                stream.close()
+
+        def stop(index: int) -> None:
+            with streams_lock:
+                cancels[index].set()
+                stream = streams[index]
+            if stream is not None:
+                stream.close()
+
+        def read(index: int) -> None:
+            chunks = self.__stream_once(backends[index], model, messages, kwargs, cancel=cancels[index],
+                                        opened=lambda stream: opened(index, stream))
+            try:
+                for chunk in chunks:
+                    if cancels[index].is_set():
+                        return
+                    events.put((index, "chunk", chunk))
+                events.put((index, "done", None))
+            except Exception as e:
+                if not cancels[index].is_set():
+                    events.put((index, "error", e))
+            finally:
+                chunks.close()
+
+        pool = self.__pool()
+        pool.submit(read, 0)
+        launched = 1
+        finished = set()
+        buffers: List[List] = [[], []]
+        winner: Optional[int] = None
+        try:
+            while True:
+                try:
+                    index, kind, payload = events.get(timeout=delay if launched == 1 and winner is None else None)
+                except queue.Empty:
+                    with self.__lock:
+                        secondary.hedges += 1
+                    pool.submit(read, 1)
+                    launched = 2
+                    continue
+                if winner is None:
+                    if kind == "chunk":
+                        buffers[index].append(payload)
+                        if not _has_content(payload):
+                            continue
+                    elif kind == "error":
+                        finished.add(index)
+                        if len(finished) < launched:
+                            continue
+                        raise payload
+                    winner = index
+                    for other in range(len(cancels)):
+                        if other != winner:
+                            stop(other)
+                    if winner == 1:
+                        with self.__lock:
+                            secondary.hedge_wins += 1
+                    yield from buffers[winner]
+                    if kind == "done":
+                        return
+                    continue
+                if index != winner:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            for index in range(len(cancels)):
+                stop(index)
+
+    def __begin(self, backend: _Backend) -> None:
+        """
+        Registra el inicio de una petición en un backend.
+
+        Parámetros
+        ----------
+        backend : _Backend
+            Backend destino.
+        """
+        with self.__lock:
+            backend.outstanding += 1
+            backend.requests += 1
+
+    def __end(self, backend: _Backend, duration: float, ttft: Optional[float] = None,
+              error: Optional[BaseException] = None, record: bool = True, cancelled: bool = False) -> None:
+        """
+        Registra el final de una petición y actualiza la salud del backend.
+
+        Parámetros
+        ----------
+        backend : _Backend
+            Backend de la petición.
+        duration : float
+            Segundos que duró.
+        ttft : float, opcional
+            Segundos hasta el primer fragmento con texto (streaming).
+        error : BaseException, opcional
+            Error de la petición, si falló.
+        record : bool, opcional
+            Si es False no se guardan las latencias. Por defecto es True.
+        cancelled : bool, opcional
+            Si es True la petición se canceló: no cuenta como error ni como
+            éxito, así que no toca los fallos seguidos del backend. Por defecto es False.
+        """
+        with self.__lock:
+            backend.outstanding -= 1
+            if cancelled:
+                return
+            if error is not None:
+                backend.errors += 1
+                backend.last_error = str(error)
+                if isinstance(error, RETRYABLE_ERRORS):
+                    backend.failures += 1
+                    if backend.failures >= self.__max_failures:
+                        backend.down_until = time.monotonic() + self.__cooldown
+                return
+            backend.failures = 0
+            if not record:
+                return
+            if ttft is not None:
+                backend.ttfts.append(ttft)
+                self.__ttfts.append(ttft)
+            else:
+                backend.durations.append(duration)
+                self.__durations.append(duration)
+
+    def __health_loop(self) -> None:
+        """
+        Bucle del hilo de comprobaciones de salud.
+        """
+        while not self.__stop_event.wait(self.__health_interval):
+            self.check_health()
+
+
+def _has_content(chunk) -> bool:
+    """
+    Indica si un fragmento de streaming trae texto.
+
+    Parámetros
+    ----------
+    chunk : ChatCompletionChunk
+        Fragmento de la respuesta.
+
+    Retorna
+    -------
+    bool
+        True si el primer `choice` tiene contenido.
+    """
+    choices = getattr(chunk, "choices", None)
+    return bool(choices) and bool(getattr(choices[0].delta, "content", None))
@@ -0,0 +1,657 @@
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from config.model_config import ModelConfig
+from agents.telemetry import Telemetry
+import asyncio
+import itertools
+import threading
+import time
+
+INTERACTIVE = 0
+SUMMARY = 1
+BACKGROUND = 2
+
+# Nombre de cada clase de prioridad, en orden (para métricas y estadísticas)
+PRIORITY_NAMES = ("interactive", "summary", "background")
+
+# Clase de prioridad de cada propósito de llamada; los que no aparecen son interactivos
+PURPOSE_PRIORITIES = {"narration": INTERACTIVE, "chat": INTERACTIVE, "summary": SUMMARY,
+                      "speculation": BACKGROUND, "prerender": BACKGROUND}
+
+# Segundos durante los que se sigue avisando de saturación tras descartar una petición
+BUSY_HOLD_SECONDS = 10.0
+
+# Evento siempre activo: promociona las llamadas de las que depende un jugador que está esperando
+_WAITING = threading.Event()
+_WAITING.set()
+
+# Sesión de las llamadas del hilo o tarea actual y evento que las promociona a interactivas
+_request_context: ContextVar[Tuple[Optional[str], Optional[threading.Event]]] = ContextVar(
+    "rol_game_scheduling", default=(None, None))
+
+
+class SchedulerBusy(RuntimeError):
+    """
+    Petición descartada por el planificador: la cola estaba llena o se agotó su espera.
+    """
+
+
+class _Ticket:
+    """
+    Turno de una llamada al modelo en la cola del planificador.
+
+    Atributos
+    ----------
+    priority : int
+        Clase de prioridad (INTERACTIVE, SUMMARY o BACKGROUND).
+    session : str or None
+        Sesión que hizo la llamada, para repartir los turnos con justicia.
+    promote : threading.Event or None
+        Si se activa mientras espera, el turno pasa a tratarse como interactivo.
+    order : int
+        Número de llegada, para desempatar.
+    enqueued : float
+        Instante (time.perf_counter) en que entró en la cola.
+    state : str
+        "queued", "granted", "rejected" o "withdrawn".
+    error : SchedulerBusy or None
+        Motivo del rechazo.
+    """
+
+    def __init__(self, priority: int, session: Optional[str], promote: Optional[threading.Event], order: int):
+        self.priority = priority
+        self.session = session
+        self.promote = promote
+        self.order = order
+        self.enqueued = time.perf_counter()
+        self.state = "queued"
+        self.error: Optional[SchedulerBusy] = None
+        self.event = threading.Event()
+        self.callbacks: List[Callable[[], None]] = []
+
+    @property
+    def urgent(self) -> bool:
+        """
+        bool: Indica si el turno se ha promocionado a interactivo.
+        """
+        return self.promote is not None and self.promote.is_set()
+
+
+class LlmScheduler:
+    """
+    Planificador de las llamadas al modelo: prioridades, reparto justo entre sesiones y control de admisión.
+
+    Todas las llamadas de Llm y AsyncLlm piden un turno antes de llegar al
+    backend y lo devuelven al terminar (en streaming, al cerrar el
+    streaming). Como mucho hay `max_concurrency` llamadas en curso; el resto
+    espera en una cola acotada y se atiende por clase de prioridad: primero
+    la narración interactiva, después los resúmenes y por último el trabajo
+    de fondo (especulación, pre-generación). Dentro de cada clase los turnos
+    se reparten por rondas entre sesiones, de modo que un jugador con muchas
+    peticiones no retrasa a los demás. Una rama especulativa que el jugador
+    acaba de elegir se promociona a interactiva.
+
+    Cuando la cola está llena, una llamada nueva desplaza a la última de una
+    clase inferior; si no la hay, se rechaza con `SchedulerBusy`. Los
+    resúmenes y el trabajo de fondo tienen además una espera máxima. La
+    profundidad de la cola y los tiempos de espera se exportan en la
+    telemetría, y `busy` sirve de aviso de saturación para la interfaz.
+
+    Atributos
+    ----------
+    max_concurrency : int
+        Llamadas simultáneas como máximo contra el backend.
+    max_queue : int
+        Llamadas en espera como máximo.
+    busy_queue : int
+        Llamadas en espera a partir de las cuales se avisa de saturación.
+    in_flight : int
+        Llamadas en curso.
+    queued : int
+        Llamadas en espera.
+    busy : bool
+        Si la cola está por encima de `busy_queue` o se ha descartado una llamada hace poco.
+    """
+
+    __shared: Optional["LlmScheduler"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 64, busy_queue: int = 16,
+                 max_wait: Tuple[Optional[float], Optional[float], Optional[float]] = (None, 60.0, 20.0)):
+        """
+        Inicializa la clase LlmScheduler.
+
+        Parámetros
+        ----------
+        max_concurrency : int, opcional
+            Llamadas simultáneas como máximo contra el backend. Por defecto es 4.
+        max_queue : int, opcional
+            Llamadas en espera como máximo. Por defecto es 64.
+        busy_queue : int, opcional
+            Llamadas en espera a partir de las cuales se avisa de saturación. Por defecto es 16.
+        max_wait : Tuple[float or None, float or None, float or None], opcional
+            Espera máxima en segundos de cada clase (interactiva, resumen,
+            fondo); None espera sin límite. Por defecto (None, 60, 20).
+
+        Raises
+        ------
+        ValueError
+            Si `max_concurrency` es menor que 1 o `max_queue` negativo.
+        """
+        if max_concurrency < 1 or max_queue < 0:
+            print("[Error] LlmScheduler necesita max_concurrency >= 1 y max_queue >= 0.")
+            raise ValueError("LlmScheduler necesita max_concurrency >= 1 y max_queue >= 0.")
+        self.__max_concurrency = max_concurrency
+        self.__max_queue = max_queue
+        self.__busy_queue = busy_queue
+        self.__max_wait = max_wait
+        self.__lock = threading.Lock()
+        # Por clase: sesión -> turnos en espera, en el orden de la ronda
+        self.__queues: List["OrderedDict[Optional[str], Deque[_Ticket]]"] = [
+            OrderedDict() for _ in PRIORITY_NAMES]
+        self.__queued = 0
+        self.__in_flight = 0
+        self.__order = itertools.count()
+        self.__last_shed = float("-inf")
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        int: Obtiene el máximo de llamadas simultáneas contra el backend.
+        """
+        return self.__max_concurrency
+
+    @property
+    def max_queue(self) -> int:
+        """
+        int: Obtiene el máximo de llamadas en espera.
+        """
+        return self.__max_queue
+
+    @property
+    def busy_queue(self) -> int:
+        """
+        int: Obtiene el umbral de la cola a partir del cual se avisa de saturación.
+        """
+        return self.__busy_queue
+
+    @property
+    def in_flight(self) -> int:
+        """
+        int: Obtiene las llamadas en curso.
+        """
+        return self.__in_flight
+
+    @property
+    def queued(self) -> int:
+        """
+        int: Obtiene las llamadas en espera.
+        """
+        return self.__queued
+
+    @property
+    def busy(self) -> bool:
+        """
+        bool: Indica si el backend está saturado y las llamadas van a tardar.
+        """
+        return self.__queued >= self.__busy_queue or time.monotonic() - self.__last_shed < BUSY_HOLD_SECONDS
+
+    @classmethod
+    def shared(cls) -> Optional["LlmScheduler"]:
+        """
+        Devuelve el planificador configurado en la sección [Scheduler] de model.config.
+
+        Retorna
+        -------
+        LlmScheduler or None
+            Planificador compartido, o None si está desactivado.
+        """
+        if cls.__shared is None:
+            with cls.__shared_lock:
+                if cls.__shared is None:
+                    config = ModelConfig.shared()
+                    if not config.getboolean("Scheduler", "enabled", fallback=False):
+                        return None
+                    cls.__shared = cls(
+                        max_concurrency=config.getint("Scheduler", "max_concurrency", fallback=4),
+                        max_queue=config.getint("Scheduler", "max_queue", fallback=64),
+                        busy_queue=config.getint("Scheduler", "busy_queue", fallback=16),
+                        max_wait=(None,
+                                  config.getfloat("Scheduler", "summary_wait_seconds", fallback=60.0) or None,
+                                  config.getfloat("Scheduler", "background_wait_seconds", fallback=20.0) or None),
+                    )
+        return cls.__shared
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Descarta el planificador compartido para que se vuelva a leer la configuración.
+        """
+        with cls.__shared_lock:
+            cls.__shared = None
+
+    @staticmethod
+    def priority_of(purpose: str) -> int:
+        """
+        Devuelve la clase de prioridad de un propósito de llamada.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada ("narration", "summary", "speculation"...).
+
+        Retorna
+        -------
+        int
+            INTERACTIVE, SUMMARY o BACKGROUND.
+        """
+        return PURPOSE_PRIORITIES.get(purpose, INTERACTIVE)
+
+    @classmethod
+    def flight_key(cls, key: str, purpose: str) -> str:
+        """
+        Devuelve la clave con la que `SingleFlight` agrupa una petición.
+
+        Con el planificador activado solo se agrupan peticiones de la misma
+        clase de prioridad: una narración interactiva que se uniera a una
+        rama especulativa de otra partida esperaría con la prioridad (y el
+        límite de espera) del trabajo de fondo.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición (`ResponseCache.make_key`).
+        purpose : str
+            Propósito de la llamada.
+
+        Retorna
+        -------
+        str
+            Clave de agrupación.
+        """
+        if cls.shared() is None:
+            return key
+        return f"{key}:{PRIORITY_NAMES[cls.priority_of(purpose)]}"
+
+    @staticmethod
+    @contextmanager
+    def context(session: Optional[str] = None, promote: Optional[threading.Event] = None,
+                urgent: bool = False) -> Iterator[None]:
+        """
+        Asocia las llamadas del hilo o tarea actual a una sesión y, opcionalmente, a un evento de promoción.
+
+        Los valores que no se indican se heredan del contexto exterior.
+        `BackgroundPool.submit` copia este contexto a sus tareas.
+
+        Parámetros
+        ----------
+        session : str, opcional
+            Identificador de la sesión (GameSession.session_id).
+        promote : threading.Event, opcional
+            Evento que, al activarse, convierte en interactivas las llamadas en espera.
+        urgent : bool, opcional
+            Si es True las llamadas se tratan desde el principio como
+            interactivas: el jugador está esperando su resultado (por ejemplo
+            un resumen que la narración necesita ya). Por defecto es False.
+
+        Retorna
+        -------
+        Iterator[None]
+            Bloque durante el que rige el contexto.
+        """
+        outer_session, outer_promote = _request_context.get()
+        promote = _WAITING if urgent else promote
+        token = _request_context.set((session or outer_session, promote or outer_promote))
+        try:
+            yield
+        finally:
+            try:
+                _request_context.reset(token)
+            except ValueError:
+                # Un generador cerrado desde otro contexto no puede restaurar el anterior
+                pass
+
+    @staticmethod
+    def bind(fn: Callable) -> Callable:
+        """
+        Envuelve una función para que se ejecute con el contexto de planificación actual.
+
+        Parámetros
+        ----------
+        fn : Callable
+            Función que se ejecutará en otro hilo.
+
+        Retorna
+        -------
+        Callable
+            Función que restablece la sesión y la promoción del llamante.
+        """
+        session, promote = _request_context.get()
+        if session is None and promote is None:
+            return fn
+
+        def bound(*args, **kwargs):
+            with LlmScheduler.context(session, promote):
+                return fn(*args, **kwargs)
+        return bound
+
+    @contextmanager
+    def slot(self, purpose: str) -> Iterator[None]:
+        """
+        Ocupa un turno del backend mientras dura el bloque, esperando en la cola si hace falta.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada, que decide su prioridad.
+
+        Retorna
+        -------
+        Iterator[None]
+            Bloque durante el que se tiene el turno.
+
+        Raises
+        ------
+        SchedulerBusy
+            Si la cola está llena o se agota la espera máxima de su clase.
+        """
+        ticket = self.__enqueue(purpose)
+        if not ticket.event.wait(self.__max_wait[ticket.priority]):
+            self.__withdraw(ticket, "timeout")
+        if ticket.state != "granted":
+            raise ticket.error
+        try:
+            yield
+        finally:
+            self.__release()
+
+    @asynccontextmanager
+    async def slot_async(self, purpose: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Versión asyncio de `slot`: espera el turno sin bloquear el bucle de eventos.
+
+        Si la tarea se cancela mientras espera, el turno se retira de la cola.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada.
+        timeout : float, opcional
+            Espera máxima de esta llamada; se usa la menor entre esta y la de su clase.
+
+        Retorna
+        -------
+        AsyncIterator[None]
+            Bloque durante el que se tiene el turno.
+
+        Raises
+        ------
+        SchedulerBusy
+            Si la cola está llena o se agota la espera máxima de su clase.
+        asyncio.TimeoutError
+            Si se agota `timeout`.
+        """
+        ticket = self.__enqueue(purpose)
+        if ticket.state == "queued":
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+
+            def wake() -> None:
+                loop.call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(None))
+
+            with self.__lock:
+                if ticket.state == "queued":
+                    ticket.callbacks.append(wake)
+                else:
+                    waiter.set_result(None)
+            limits = [value for value in (timeout, self.__max_wait[ticket.priority]) if value is not None]
+            try:
+                await asyncio.wait_for(waiter, min(limits) if limits else None)
+            except asyncio.TimeoutError:
+                self.__withdraw(ticket, "timeout")
+                if ticket.state != "granted" and timeout is not None and timeout == min(limits):
+                    raise
+            except BaseException:
+                self.__withdraw(ticket, "cancelled")
+                if ticket.state == "granted":
+                    self.__release()
+                raise
+        if ticket.state != "granted":
+            raise ticket.error
+        try:
+            yield
+        finally:
+            self.__release()
+
+    def stats(self) -> Dict:
+        """
+        Devuelve el estado actual de la cola.
+
+        Retorna
+        -------
+        Dict
+            Llamadas en curso, en espera (total y por clase), sesiones en espera y aviso de saturación.
+        """
+        with self.__lock:
+            queued = {name: sum(len(tickets) for tickets in queue.values())
+                      for name, queue in zip(PRIORITY_NAMES, self.__queues)}
+            sessions = len({session for queue in self.__queues for session in queue})
+            in_flight = self.__in_flight
+        return {"in_flight": in_flight, "max_concurrency": self.__max_concurrency, "queued": sum(queued.values()),
+                "queued_by_priority": queued, "waiting_sessions": sessions, "busy": self.busy}
+
+    def __enqueue(self, purpose: str) -> _Ticket:
+        """
+        Pide un turno: lo concede si hay hueco o lo pone en la cola, desplazando si hace falta a uno menos prioritario.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada.
+
+        Retorna
+        -------
+        _Ticket
+            Turno concedido o en espera.
+
+        Raises
+        ------
+        SchedulerBusy
+            Si la cola está llena de llamadas de igual o mayor prioridad.
+        """
+        session, promote = _request_context.get()
+        ticket = _Ticket(self.priority_of(purpose), session, promote, next(self.__order))
+        shed: Optional[_Ticket] = None
+        with self.__lock:
+            if self.__in_flight < self.__max_concurrency and not self.__queued:
+                self.__in_flight += 1
+                ticket.state = "granted"
+                ticket.event.set()
+            else:
+                if self.__queued >= self.__max_queue:
+                    shed = self.__lowest_below(ticket.priority)
+                    if shed is None:
+                        self.__last_shed = time.monotonic()
+                        ticket.state = "rejected"
+                    else:
+                        self.__remove(shed)
+                        shed.state = "rejected"
+                        shed.error = SchedulerBusy("Cola del modelo llena: petición desplazada por otra prioritaria.")
+                        self.__last_shed = time.monotonic()
+                if ticket.state == "queued":
+                    queue = self.__queues[ticket.priority]
+                    queue.setdefault(session, deque()).append(ticket)
+                    self.__queued += 1
+        if shed is not None:
+            self.__finish(shed, "shed")
+        if ticket.state == "rejected":
+            self.__observe(ticket, "shed")
+            raise SchedulerBusy("Cola del modelo llena: inténtalo de nuevo en unos segundos.")
+        if ticket.state == "granted":
+            self.__observe(ticket, "admitted")
+        else:
+            self.__publish()
+        return ticket
+
+    def __release(self) -> None:
+        """
+        Devuelve un turno y se lo concede a la siguiente llamada de la cola.
+        """
+        with self.__lock:
+            self.__in_flight -= 1
+            granted = self.__dispatch()
+        for ticket in granted:
+            self.__finish(ticket, "admitted")
+        self.__publish()
+
+    def __withdraw(self, ticket: _Ticket, reason: str) -> None:
+        """
+        Retira de la cola un turno que ya no espera (espera agotada o tarea cancelada).
+
+        Si se concedió justo antes, se deja concedido: quien lo pidió lo usará o lo devolverá.
+
+        Parámetros
+        ----------
+        ticket : _Ticket
+            Turno a retirar.
+        reason : str
+            "timeout" o "cancelled".
+        """
+        with self.__lock:
+            if ticket.state != "queued":
+                return
+            self.__remove(ticket)
+            ticket.state = "withdrawn"
+            ticket.error = SchedulerBusy("El modelo está saturado: se agotó la espera en la cola.")
+        self.__observe(ticket, reason)
+        self.__publish()
+
+    def __dispatch(self) -> List[_Ticket]:
+        """
+        Concede los huecos libres a los siguientes turnos (con el cerrojo tomado).
+
+        Orden: turnos promocionados, y después por clase de prioridad con
+        rondas entre las sesiones de cada clase.
+
+        Retorna
+        -------
+        List[_Ticket]
+            Turnos concedidos.
+        """
+        granted = []
+        while self.__in_flight < self.__max_concurrency and self.__queued:
+            ticket = self.__next_urgent() or self.__next_in_rounds()
+            self.__remove(ticket)
+            ticket.state = "granted"
+            self.__in_flight += 1
+            granted.append(ticket)
+        return granted
+
+    def __next_urgent(self) -> Optional[_Ticket]:
+        """
+        Busca el turno promocionado más antiguo de las clases no interactivas.
+
+        Retorna
+        -------
+        _Ticket or None
+            Turno promocionado, o None si no hay ninguno.
+        """
+        urgent = [ticket for queue in self.__queues[INTERACTIVE + 1:] for tickets in queue.values()
+                  for ticket in tickets if ticket.urgent]
+        return min(urgent, key=lambda ticket: ticket.order) if urgent else None
+
+    def __next_in_rounds(self) -> _Ticket:
+        """
+        Toma el primer turno de la sesión a la que le toca en la clase más prioritaria con espera.
+
+        Retorna
+        -------
+        _Ticket
+            Siguiente turno.
+        """
+        for queue in self.__queues:
+            if queue:
+                session = next(iter(queue))
+                # La sesión atendida pasa al final de la ronda
+                queue.move_to_end(session)
+                return queue[session][0]
+        raise RuntimeError("Cola vacía con turnos pendientes.")
+
+    def __lowest_below(self, priority: int) -> Optional[_Ticket]:
+        """
+        Busca el último turno en espera de la clase menos prioritaria que `priority`.
+
+        Parámetros
+        ----------
+        priority : int
+            Clase de la llamada que quiere entrar.
+
+        Retorna
+        -------
+        _Ticket or None
+            Turno a desplazar, o None si todos son de igual o mayor prioridad.
+        """
+        for queue in reversed(self.__queues[priority + 1:]):
+            tickets = [ticket for waiting in queue.values() for ticket in waiting if not ticket.urgent]
+            if tickets:
+                return max(tickets, key=lambda ticket: ticket.order)
+        return None
+
+    def __remove(self, ticket: _Ticket) -> None:
+        """
+        Quita un turno de su cola (con el cerrojo tomado).
+
+        Parámetros
+        ----------
+        ticket : _Ticket
+            Turno en espera.
+        """
+        queue = self.__queues[ticket.priority]
+        tickets = queue[ticket.session]
+        tickets.remove(ticket)
+        if not tickets:
+            del queue[ticket.session]
+        self.__queued -= 1
+
+    def __finish(self, ticket: _Ticket, status: str) -> None:
+        """
+        Despierta a quien espera un turno ya resuelto (concedido o desplazado).
+
+        Parámetros
+        ----------
+        ticket : _Ticket
+            Turno resuelto.
+        status : str
+            "admitted" o "shed", para las métricas.
+        """
+        ticket.event.set()
+        for callback in ticket.callbacks:
+            callback()
+        self.__observe(ticket, status)
+
+    def __observe(self, ticket: _Ticket, status: str) -> None:
+        """
+        Registra en la telemetría cuánto esperó un turno y cómo terminó.
+
+        Parámetros
+        ----------
+        ticket : _Ticket
+            Turno resuelto.
+        status : str
+            "admitted", "shed", "timeout" o "cancelled".
+        """
+        Telemetry.shared().record_queue_wait(PRIORITY_NAMES[ticket.priority],
+                                             time.perf_counter() - ticket.enqueued, status)
+
+    def __publish(self) -> None:
+        """
+        Publica en la telemetría la profundidad de la cola y las llamadas en curso.
+        """
+        stats = self.stats()
+        telemetry = Telemetry.shared()
+        telemetry.set_gauge("rol_scheduler_in_flight", stats["in_flight"], "Llamadas al modelo en curso.")
+        for name, depth in stats["queued_by_priority"].items():
+            telemetry.set_gauge("rol_scheduler_queue_depth", depth, "Llamadas al modelo en espera.", priority=name)
+        telemetry.set_gauge("rol_scheduler_busy", int(stats["busy"]), "1 si el modelo está saturado.")
@@ -0,0 +1,465 @@
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from config.model_config import ModelConfig
+import asyncio
+import threading
+
+T = TypeVar("T")
+
+# Marca de "este consumidor debe leer el siguiente fragmento del origen"
+_PULL = object()
+
+
+class _StreamFlight:
+    """
+    Streaming compartido entre varios consumidores.
+
+    Los fragmentos ya recibidos se guardan para que quien se une tarde los
+    vea desde el principio. No hay un hilo lector: cuando un consumidor ha
+    leído todo lo recibido y nadie más está leyendo del origen, lee él el
+    siguiente fragmento, de modo que el streaming sigue aunque se vaya quien
+    lo empezó.
+
+    Atributos
+    ----------
+    source : Iterator or AsyncIterator
+        Generador de la petición real.
+    chunks : List
+        Fragmentos recibidos hasta ahora.
+    done : bool
+        Si el origen ha terminado (bien, con error o cancelado).
+    error : BaseException or None
+        Error del origen, si falló.
+    producing : bool
+        Si algún consumidor está leyendo del origen ahora mismo.
+    subscribers : int
+        Consumidores activos.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.chunks: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.producing = False
+        self.subscribers = 0
+        self.condition = threading.Condition()
+        self.changed: Optional[asyncio.Event] = None
+        self.pull: Optional[asyncio.Future] = None
+
+
+class SingleFlight:
+    """
+    Agrupa las peticiones idénticas que están en curso a la vez ("single flight").
+
+    Cuando varios jugadores empiezan la misma historia a la vez, todos piden
+    el mismo capítulo 1. Con SingleFlight solo el primero (el líder) llama al
+    backend y los demás esperan su resultado; en streaming, todos reciben los
+    mismos fragmentos según llegan, y quien se une tarde recibe primero los
+    que ya han llegado. Los errores del líder se propagan a todos.
+
+    Funciona con hilos (`call`, `stream`) y con asyncio (`call_async`,
+    `stream_async`); las peticiones asyncio solo se agrupan dentro del mismo
+    bucle de eventos. La petición compartida solo se cancela cuando la
+    abandonan todos sus consumidores. Una vez terminada se olvida: las
+    peticiones posteriores las resuelve la caché de respuestas.
+
+    Atributos
+    ----------
+    leaders : int
+        Peticiones que llegaron al backend.
+    coalesced : int
+        Peticiones ahorradas porque se unieron a otra en curso.
+    in_flight : int
+        Peticiones compartibles en curso ahora mismo.
+    """
+
+    __shared: Optional["SingleFlight"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self):
+        """
+        Inicializa la clase SingleFlight.
+        """
+        self.__lock = threading.Lock()
+        self.__calls: Dict[str, Future] = {}
+        self.__streams: Dict[str, _StreamFlight] = {}
+        self.__async_calls: Dict[Tuple[int, str], List] = {}
+        self.__async_streams: Dict[Tuple[int, str], _StreamFlight] = {}
+        self.__leaders = 0
+        self.__coalesced = 0
+
+    @property
+    def leaders(self) -> int:
+        """
+        int: Obtiene las peticiones que llegaron al backend.
+        """
+        return self.__leaders
+
+    @property
+    def coalesced(self) -> int:
+        """
+        int: Obtiene las peticiones ahorradas.
+        """
+        return self.__coalesced
+
+    @property
+    def in_flight(self) -> int:
+        """
+        int: Obtiene las peticiones compartibles en curso.
+        """
+        with self.__lock:
+            return len(self.__calls) + len(self.__streams) + len(self.__async_calls) + len(self.__async_streams)
+
+    @classmethod
+    def shared(cls) -> Optional["SingleFlight"]:
+        """
+        Devuelve el agrupador configurado en la sección [Coalescing] de model.config.
+
+        Retorna
+        -------
+        SingleFlight or None
+            Agrupador del proceso, o None si está desactivado.
+        """
+        if not ModelConfig.shared().getboolean("Coalescing", "enabled", fallback=False):
+            return None
+        instance = cls.__shared
+        if instance is None:
+            with cls.__shared_lock:
+                instance = cls.__shared
+                if instance is None:
+                    instance = cls()
+                    cls.__shared = instance
+        return instance
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Descarta el agrupador compartido para que se cree de nuevo.
+        """
+        with cls.__shared_lock:
+            cls.__shared = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores del agrupador.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Peticiones al backend, peticiones ahorradas y peticiones en curso.
+        """
+        in_flight = self.in_flight
+        with self.__lock:
+            return {"leaders": self.__leaders, "coalesced": self.__coalesced, "in_flight": in_flight}
+
+    def call(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """
+        Ejecuta `fn` o, si ya hay una petición igual en curso, espera su resultado.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición (por ejemplo `ResponseCache.make_key`).
+        fn : Callable[[], T]
+            Función que hace la petición real.
+
+        Retorna
+        -------
+        Tuple[T, bool]
+            Resultado y True si se ha compartido el de otra petición.
+
+        Raises
+        ------
+        Exception
+            El error de la petición compartida, si falla.
+        """
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__calls[key] = future
+                self.__leaders += 1
+            else:
+                self.__coalesced += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.__forget(self.__calls, key, future)
+            future.set_exception(e)
+            raise
+        self.__forget(self.__calls, key, future)
+        future.set_result(result)
+        return result, False
+
+    def stream(self, key: str, open_source: Callable[[], Iterator[T]]) -> Tuple[Iterator[T], bool]:
+        """
+        Abre un streaming o se une al que ya hay en curso con la misma clave.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        open_source : Callable[[], Iterator[T]]
+            Función que crea el generador de la petición real. Solo se llama
+            si no hay otra en curso.
+
+        Retorna
+        -------
+        Tuple[Iterator[T], bool]
+            Fragmentos de la respuesta y True si se comparte otra petición.
+            Al cerrar el iterador se abandona el streaming; la petición real
+            se cierra cuando la abandonan todos.
+        """
+        with self.__lock:
+            flight = self.__streams.get(key)
+            shared = flight is not None
+            if shared:
+                self.__coalesced += 1
+            else:
+                flight = _StreamFlight(open_source())
+                self.__streams[key] = flight
+                self.__leaders += 1
+            flight.subscribers += 1
+        return self.__follow(key, flight), shared
+
+    async def call_async(self, key: str, factory: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Versión asyncio de `call`.
+
+        La petición real se ejecuta en una tarea propia; cancelar a un
+        consumidor no la cancela mientras queden otros esperando.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        factory : Callable[[], Awaitable[T]]
+            Función que crea la corrutina de la petición real.
+
+        Retorna
+        -------
+        Tuple[T, bool]
+            Resultado y True si se ha compartido el de otra petición.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        with self.__lock:
+            entry = self.__async_calls.get(flight_key)
+            shared = entry is not None
+            if shared:
+                self.__coalesced += 1
+            else:
+                entry = [loop.create_task(factory()), 0]
+                self.__async_calls[flight_key] = entry
+                self.__leaders += 1
+                entry[0].add_done_callback(lambda _: self.__forget(self.__async_calls, flight_key, entry))
+            entry[1] += 1
+        task = entry[0]
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            with self.__lock:
+                entry[1] -= 1
+                abandoned = entry[1] == 0
+            if abandoned:
+                task.cancel()
+            raise
+
+    def stream_async(self, key: str, open_source: Callable[[], AsyncIterator[T]]) -> Tuple[AsyncIterator[T], bool]:
+        """
+        Versión asyncio de `stream`.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        open_source : Callable[[], AsyncIterator[T]]
+            Función que crea el generador asíncrono de la petición real.
+
+        Retorna
+        -------
+        Tuple[AsyncIterator[T], bool]
+            Fragmentos de la respuesta y True si se comparte otra petición.
+        """
+        flight_key = (id(asyncio.get_running_loop()), key)
+        with self.__lock:
+            flight = self.__async_streams.get(flight_key)
+            shared = flight is not None
+            if shared:
+                self.__coalesced += 1
+            else:
+                flight = _StreamFlight(open_source())
+                flight.changed = asyncio.Event()
+                self.__async_streams[flight_key] = flight
+                self.__leaders += 1
+            flight.subscribers += 1
+        return self.__follow_async(flight_key, flight), shared
+
+    def __follow(self, key: str, flight: _StreamFlight) -> Iterator:
+        """
+        Recorre un streaming compartido desde el principio.
+
+        Parámetros
+        ----------
+        key : str
+            Clave de la petición.
+        flight : _StreamFlight
+            Streaming compartido.
+
+        Retorna
+        -------
+        Iterator
+            Fragmentos de la respuesta.
+        """
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    while index >= len(flight.chunks) and not flight.done and flight.producing:
+                        flight.condition.wait()
+                    if index < len(flight.chunks):
+                        chunk = flight.chunks[index]
+                        index += 1
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        # Nadie está leyendo del origen: lee este consumidor
+                        flight.producing = True
+                        chunk = _PULL
+                if chunk is not _PULL:
+                    yield chunk
+                    continue
+                try:
+                    chunk = next(flight.source)
+                except BaseException as e:
+                    self.__forget(self.__streams, key, flight)
+                    with flight.condition:
+                        flight.done = True
+                        flight.error = None if isinstance(e, StopIteration) else e
+                        flight.producing = False
+                        flight.condition.notify_all()
+                    continue
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.producing = False
+                    flight.condition.notify_all()
+        finally:
+            if self.__leave(self.__streams, key, flight):
+                flight.source.close()
+
+    async def __follow_async(self, flight_key: Tuple[int, str], flight: _StreamFlight) -> AsyncIterator:
+        """
+        Recorre un streaming asyncio compartido desde el principio.
+
+        Parámetros
+        ----------
+        flight_key : Tuple[int, str]
+            Bucle de eventos y clave de la petición.
+        flight : _StreamFlight
+            Streaming compartido.
+
+        Retorna
+        -------
+        AsyncIterator
+            Fragmentos de la respuesta.
+        """
+        index = 0
+        try:
+            while True:
+                if index < len(flight.chunks):
+                    index += 1
+                    yield flight.chunks[index - 1]
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                changed = flight.changed
+                if not flight.producing:
+                    # La lectura va en una tarea propia: cancelar a este consumidor no corta a los demás
+                    flight.producing = True
+                    flight.pull = asyncio.ensure_future(flight.source.__anext__())
+                    flight.pull.add_done_callback(lambda pull: self.__pulled(flight_key, flight, pull))
+                await changed.wait()
+        finally:
+            if self.__leave(self.__async_streams, flight_key, flight):
+                if flight.pull is not None and not flight.pull.done():
+                    flight.pull.cancel()
+                else:
+                    await flight.source.aclose()
+
+    def __pulled(self, flight_key: Tuple[int, str], flight: _StreamFlight, pull: asyncio.Future) -> None:
+        """
+        Guarda el fragmento leído del origen de un streaming asyncio y despierta a los consumidores.
+
+        Parámetros
+        ----------
+        flight_key : Tuple[int, str]
+            Bucle de eventos y clave de la petición.
+        flight : _StreamFlight
+            Streaming compartido.
+        pull : asyncio.Future
+            Lectura terminada.
+        """
+        flight.producing = False
+        error = None if pull.cancelled() else pull.exception()
+        if pull.cancelled() or error is not None:
+            self.__forget(self.__async_streams, flight_key, flight)
+            flight.done = True
+            flight.error = None if pull.cancelled() or isinstance(error, StopAsyncIteration) else error
+        else:
+            flight.chunks.append(pull.result())
+        changed, flight.changed = flight.changed, asyncio.Event()
+        changed.set()
+
+    def __leave(self, flights: Dict, key, flight: _StreamFlight) -> bool:
+        """
+        Da de baja a un consumidor de un streaming compartido.
+
+        Parámetros
+        ----------
+        flights : Dict
+            Tabla de streamings en curso.
+        key : str or Tuple[int, str]
+            Clave del streaming.
+        flight : _StreamFlight
+            Streaming compartido.
+
+        Retorna
+        -------
+        bool
+            True si era el último consumidor y el origen no había terminado,
+            es decir, si hay que cerrar la petición real.
+        """
+        with self.__lock:
+            flight.subscribers -= 1
+            if flight.subscribers > 0 or flight.done:
+                return False
+            flight.done = True
+            if flights.get(key) is flight:
+                del flights[key]
+            return True
+
+    def __forget(self, flights: Dict, key, value) -> None:
+        """
+        Quita una petición terminada de la tabla de peticiones en curso.
+
+        Parámetros
+        ----------
+        flights : Dict
+            Tabla de peticiones en curso.
+        key : str or Tuple[int, str]
+            Clave de la petición.
+        value : object
+            Entrada a quitar (solo se quita si sigue siendo la misma).
+        """
+        with self.__lock:
+            if flights.get(key) is value:
+                del flights[key]
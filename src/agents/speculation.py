@@ -0,0 +1,278 @@
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Optional, Set, Tuple
+from agents.background import BackgroundPool
+from agents.scheduler import LlmScheduler
+from config.model_config import ModelConfig
+import hashlib
+import threading
+
+# Función que genera un capítulo; recibe un evento que se activa si la rama se descarta
+BranchGenerator = Callable[[threading.Event], Optional[str]]
+
+
+class BranchSpeculator:
+    """
+    Pre-genera en segundo plano el siguiente capítulo de cada opción (A/B).
+
+    Mientras el jugador lee un capítulo se lanzan las dos ramas posibles en el
+    pool compartido. Cuando elige, `take` devuelve la rama elegida y cancela
+    la otra. Si la rama elegida aún no ha salido de la cola del pool se
+    cancela también y el capítulo se narra en vivo, sin esperar a trabajo de
+    fondo de otras sesiones; si ya está en curso se espera como mucho
+    `take_timeout` segundos. Cada instancia
+    pertenece a una sesión y está limitada a `max_inflight` tareas vivas;
+    además existe un límite global para todo el proceso, de modo que la
+    especulación nunca ocupa todo el backend. Se activa en la sección
+    [Speculation] de model.config.
+
+    Las ramas esperan en el planificador como trabajo de fondo; la que elige
+    el jugador se promociona, y si aún no había empezado pasa por delante.
+
+    Atributos
+    ----------
+    max_inflight : int
+        Máximo de tareas especulativas vivas para esta sesión.
+    take_timeout : float
+        Segundos máximos de espera de una rama que ya se está generando.
+    launched : int
+        Ramas lanzadas por esta sesión.
+    hits : int
+        Ramas especuladas que se han llegado a usar.
+    """
+
+    __total_slots: Optional[threading.BoundedSemaphore] = None
+    __total_lock = threading.Lock()
+
+    def __init__(self, max_inflight: Optional[int] = None, take_timeout: Optional[float] = None):
+        """
+        Inicializa la clase BranchSpeculator.
+
+        Parámetros
+        ----------
+        max_inflight : int, opcional
+            Máximo de tareas especulativas vivas para la sesión. Si es None se
+            lee de `max_inflight_per_session` en model.config.
+        take_timeout : float, opcional
+            Segundos máximos de espera de la rama elegida si ya se está
+            generando. Si es None se lee de `take_timeout_seconds` en model.config.
+        """
+        config = ModelConfig.shared()
+        if max_inflight is None:
+            max_inflight = config.getint("Speculation", "max_inflight_per_session", fallback=2)
+        if take_timeout is None:
+            take_timeout = config.getfloat("Speculation", "take_timeout_seconds", fallback=30.0)
+        self.__max_inflight = max_inflight
+        self.__take_timeout = take_timeout
+        self.__key: Optional[str] = None
+        self.__jobs: Dict[str, Tuple[Future, threading.Event, threading.Event]] = {}
+        self.__running: Set[Future] = set()
+        self.__lock = threading.RLock()
+        self.__launched = 0
+        self.__hits = 0
+
+    @property
+    def max_inflight(self) -> int:
+        """
+        int: Obtiene el máximo de tareas especulativas vivas de la sesión.
+        """
+        return self.__max_inflight
+
+    @property
+    def take_timeout(self) -> float:
+        """
+        float: Obtiene los segundos máximos de espera de una rama en curso.
+        """
+        return self.__take_timeout
+
+    @property
+    def launched(self) -> int:
+        """
+        int: Obtiene el número de ramas lanzadas.
+        """
+        return self.__launched
+
+    @property
+    def hits(self) -> int:
+        """
+        int: Obtiene el número de ramas especuladas que se han usado.
+        """
+        return self.__hits
+
+    @staticmethod
+    def enabled() -> bool:
+        """
+        Indica si la especulación está activada en model.config.
+
+        Retorna
+        -------
+        bool
+            True si `[Speculation] enabled` es verdadero.
+        """
+        return ModelConfig.shared().getboolean("Speculation", "enabled", fallback=False)
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Calcula la clave que identifica el estado desde el que se especula.
+
+        Parámetros
+        ----------
+        *parts
+            Valores que definen el estado (historia, capítulo, texto...).
+
+        Retorna
+        -------
+        str
+            Resumen hexadecimal de los valores.
+        """
+        digest = hashlib.sha1()
+        for part in parts:
+            digest.update(repr(part).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def start(self, key: str, generators: Dict[str, BranchGenerator]) -> int:
+        """
+        Lanza la generación de cada rama si aún no se hizo para esta clave.
+
+        Si había ramas de un estado anterior se cancelan. Las ramas que no
+        caben en los límites de sesión o globales simplemente no se lanzan.
+
+        Parámetros
+        ----------
+        key : str
+            Clave del estado actual, obtenida con `make_key`.
+        generators : Dict[str, BranchGenerator]
+            Función generadora para cada opción ("A", "B").
+
+        Retorna
+        -------
+        int
+            Número de ramas lanzadas en esta llamada.
+        """
+        with self.__lock:
+            if key == self.__key:
+                return 0
+            self.__cancel_jobs()
+            self.__key = key
+
+            started = 0
+            slots = self.__global_slots()
+            for choice, generator in generators.items():
+                if len(self.__running) >= self.__max_inflight:
+                    break
+                if not slots.acquire(blocking=False):
+                    break
+                cancel = threading.Event()
+                chosen = threading.Event()
+                with LlmScheduler.context(promote=chosen):
+                    future = BackgroundPool.submit(generator, cancel)
+                self.__running.add(future)
+                future.add_done_callback(self.__on_done)
+                self.__jobs[choice] = (future, cancel, chosen)
+                started += 1
+            self.__launched += started
+            return started
+
+    def take(self, key: str, choice: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Recupera la rama elegida y descarta las demás.
+
+        Si la rama elegida aún espera en la cola del pool se cancela y se
+        devuelve None: generarla en vivo no espera a trabajo de fondo de otras
+        sesiones. Si ya está en curso se promociona en el planificador y se
+        espera como mucho `timeout` segundos.
+
+        Parámetros
+        ----------
+        key : str
+            Clave del estado desde el que eligió el jugador.
+        choice : str
+            Opción elegida ("A" o "B").
+        timeout : float, opcional
+            Segundos máximos de espera si la rama aún se está generando. Por
+            defecto `take_timeout`.
+
+        Retorna
+        -------
+        str or None
+            Texto del capítulo, o None si no hay rama válida y hay que generarlo.
+        """
+        with self.__lock:
+            if key != self.__key:
+                return None
+            job = self.__jobs.pop(choice, None)
+            self.__cancel_jobs()
+            self.__key = None
+
+        if job is None:
+            return None
+        future, cancel, chosen = job
+        if future.cancel():
+            # No había empezado: se narra en vivo
+            cancel.set()
+            return None
+        chosen.set()
+        try:
+            result = future.result(timeout=self.__take_timeout if timeout is None else timeout)
+        except FutureTimeout:
+            cancel.set()
+            print(f"[Error] La rama especulativa {choice} no terminó a tiempo; se narra en vivo.")
+            return None
+        except Exception as e:
+            cancel.set()
+            print(f"[Error] Fallo en la rama especulativa {choice}: {e}")
+            return None
+        if result is not None:
+            self.__hits += 1
+        return result
+
+    def cancel(self) -> None:
+        """
+        Cancela todas las ramas de la sesión (por ejemplo al cambiar de historia).
+        """
+        with self.__lock:
+            self.__cancel_jobs()
+            self.__key = None
+
+    def __cancel_jobs(self) -> None:
+        """
+        Señala la cancelación de las ramas pendientes y las olvida.
+        """
+        for future, cancel, _ in self.__jobs.values():
+            cancel.set()
+            future.cancel()
+        self.__jobs.clear()
+
+    def __on_done(self, future: Future) -> None:
+        """
+        Libera la plaza de sesión y la global cuando termina (o se cancela) una tarea.
+
+        Parámetros
+        ----------
+        future : Future
+            Tarea finalizada.
+        """
+        with self.__lock:
+            self.__running.discard(future)
+        self.__global_slots().release()
+
+    @classmethod
+    def __global_slots(cls) -> threading.BoundedSemaphore:
+        """
+        Devuelve el semáforo que limita la especulación de todo el proceso.
+
+        Retorna
+        -------
+        threading.BoundedSemaphore
+            Semáforo con `max_inflight_total` plazas.
+        """
+        slots = cls.__total_slots
+        if slots is None:
+            with cls.__total_lock:
+                slots = cls.__total_slots
+                if slots is None:
+                    total = ModelConfig.shared().getint("Speculation", "max_inflight_total", fallback=8)
+                    slots = threading.BoundedSemaphore(total)
+                    cls.__total_slots = slots
+        return slots
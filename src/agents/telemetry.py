@@ -0,0 +1,549 @@
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from config.model_config import ModelConfig
+import json
+import threading
+import time
+import uuid
+
+# Límites superiores (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span activo en el hilo o tarea actual: (trace_id, span_id)
+_current_span: ContextVar[Optional[Tuple[str, str]]] = ContextVar("rol_game_span", default=None)
+
+
+class Telemetry:
+    """
+    Métricas y trazas de las llamadas al modelo y de las etapas del juego.
+
+    Cada llamada al modelo se registra con su propósito (narración, resumen,
+    especulación...), el tiempo total, el tiempo hasta el primer token, los
+    tokens de entrada y salida y si se resolvió desde la caché. Las etapas
+    (narrar, resumir) se registran como spans anidados que comparten trace_id.
+
+    Los registros recientes se guardan en memoria para el panel de depuración,
+    opcionalmente se añaden a un archivo JSONL y se agregan en contadores e
+    histogramas exportables en el formato de texto de Prometheus.
+
+    Atributos
+    ----------
+    enabled : bool
+        Si es False los registros se descartan.
+    max_records : int
+        Número de registros recientes que se guardan en memoria.
+    trace_path : str or None
+        Archivo JSONL donde se escribe cada registro, o None.
+    """
+
+    __shared: Optional["Telemetry"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, enabled: bool = True, max_records: int = 500, trace_path: Optional[str] = None):
+        """
+        Inicializa la clase Telemetry.
+
+        Parámetros
+        ----------
+        enabled : bool, opcional
+            Si es False los registros se descartan. Por defecto es True.
+        max_records : int, opcional
+            Registros recientes guardados en memoria. Por defecto es 500.
+        trace_path : str, opcional
+            Archivo JSONL de trazas. Por defecto es None.
+        """
+        self.__enabled = enabled
+        self.__max_records = max_records
+        self.__trace_path = trace_path
+        self.__records: Deque[Dict] = deque(maxlen=max_records)
+        self.__lock = threading.Lock()
+        self.__trace_file = open(trace_path, "a", encoding="utf-8") if (enabled and trace_path) else None
+        self.__metrics_server: Optional[ThreadingHTTPServer] = None
+        # Valores instantáneos (profundidad de la cola...): reflejan el estado actual y no se ponen a cero
+        self.__gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.__gauge_help: Dict[str, str] = {}
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        bool: Indica si se están registrando métricas.
+        """
+        return self.__enabled
+
+    @property
+    def max_records(self) -> int:
+        """
+        int: Obtiene el número de registros recientes guardados en memoria.
+        """
+        return self.__max_records
+
+    @property
+    def trace_path(self) -> Optional[str]:
+        """
+        str or None: Obtiene la ruta del archivo JSONL de trazas.
+        """
+        return self.__trace_path
+
+    @classmethod
+    def shared(cls) -> "Telemetry":
+        """
+        Devuelve la instancia del proceso configurada en la sección [Telemetry] de model.config.
+
+        Retorna
+        -------
+        Telemetry
+            Telemetría compartida (desactivada si así lo indica la configuración).
+        """
+        instance = cls.__shared
+        if instance is None:
+            with cls.__shared_lock:
+                instance = cls.__shared
+                if instance is None:
+                    config = ModelConfig.shared()
+                    instance = cls(
+                        enabled=config.getboolean("Telemetry", "enabled", fallback=True),
+                        max_records=config.getint("Telemetry", "max_records", fallback=500),
+                        trace_path=config.get("Telemetry", "trace_path", fallback="") or None,
+                    )
+                    cls.__shared = instance
+        return instance
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Cierra y descarta la instancia compartida para que se cree de nuevo.
+        """
+        with cls.__shared_lock:
+            instance = cls.__shared
+            cls.__shared = None
+        if instance is not None:
+            instance.close()
+
+    def reset(self) -> None:
+        """
+        Pone a cero los registros recientes y los agregados.
+        """
+        with self.__lock:
+            self.__records.clear()
+            self.__llm: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+            self.__latency: Dict[str, List[int]] = {}
+            self.__ttft: Dict[str, List[int]] = {}
+            self.__spans: Dict[Tuple[str, str], Dict[str, float]] = {}
+            self.__queue: Dict[Tuple[str, str], int] = {}
+            self.__queue_wait: Dict[str, List[int]] = {}
+
+    def close(self) -> None:
+        """
+        Cierra el archivo de trazas y el servidor de métricas, si existen.
+        """
+        with self.__lock:
+            if self.__trace_file is not None:
+                self.__trace_file.close()
+                self.__trace_file = None
+        if self.__metrics_server is not None:
+            self.__metrics_server.shutdown()
+            self.__metrics_server.server_close()
+            self.__metrics_server = None
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Dict]:
+        """
+        Mide una etapa del juego como un span de la traza actual.
+
+        Los spans y llamadas al modelo abiertos dentro (en el mismo hilo)
+        quedan como hijos suyos. Si la etapa lanza una excepción el span se
+        registra con estado "error" y la excepción se propaga.
+
+        Parámetros
+        ----------
+        name : str
+            Nombre de la etapa (por ejemplo "narrate" o "summarize").
+        **attributes
+            Atributos del span (historia, capítulo...).
+
+        Retorna
+        -------
+        Iterator[Dict]
+            Diccionario de atributos, que se puede completar dentro del bloque.
+        """
+        if not self.__enabled:
+            yield attributes
+            return
+
+        parent = _current_span.get()
+        trace_id = parent[0] if parent else uuid.uuid4().hex
+        span_id = uuid.uuid4().hex[:16]
+        token = _current_span.set((trace_id, span_id))
+        started = time.time()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield attributes
+        except GeneratorExit:
+            status = "cancelled"
+            raise
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Un generador cerrado desde otro contexto no puede restaurar el span padre
+                pass
+            duration = time.perf_counter() - start
+            self.__record({
+                "type": "span", "name": name, "trace_id": trace_id, "span_id": span_id,
+                "parent_id": parent[1] if parent else None, "start": started,
+                "duration_s": duration, "status": status, "attributes": attributes,
+            })
+            with self.__lock:
+                aggregate = self.__spans.setdefault((name, status), {"count": 0, "sum": 0.0})
+                aggregate["count"] += 1
+                aggregate["sum"] += duration
+
+    def record_llm_call(self, purpose: str, model: str, duration: float, ttft: Optional[float] = None,
+                        prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None,
+                        cache: str = "miss", stream: bool = False, status: str = "ok",
+                        early_stop: bool = False) -> None:
+        """
+        Registra una llamada al modelo.
+
+        Parámetros
+        ----------
+        purpose : str
+            Propósito de la llamada ("narration", "summary", "speculation"...).
+        model : str
+            Nombre del modelo.
+        duration : float
+            Segundos desde la petición hasta la respuesta completa.
+        ttft : float, opcional
+            Segundos hasta el primer token.
+        prompt_tokens : int, opcional
+            Tokens de entrada informados por el backend.
+        completion_tokens : int, opcional
+            Tokens generados informados por el backend.
+        cache : str, opcional
+            "hit", "miss", "bypass" o "coalesced" (compartió la respuesta de
+            otra petición en curso). Por defecto es "miss".
+        stream : bool, opcional
+            Si la llamada fue en streaming. Por defecto es False.
+        status : str, opcional
+            "ok", "error", "cancelled" o "shed" (rechazada por el planificador
+            con el backend saturado). Por defecto es "ok".
+        early_stop : bool, opcional
+            Si se cerró el streaming en cuanto la respuesta estuvo completa,
+            sin esperar al final del backend. Por defecto es False.
+        """
+        if not self.__enabled:
+            return
+        parent = _current_span.get()
+        self.__record({
+            "type": "llm_call", "purpose": purpose, "model": model,
+            "trace_id": parent[0] if parent else uuid.uuid4().hex, "parent_id": parent[1] if parent else None,
+            "start": time.time() - duration, "duration_s": duration, "ttft_s": ttft,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "cache": cache, "stream": stream, "status": status, "early_stop": early_stop,
+        })
+        with self.__lock:
+            aggregate = self.__llm.setdefault((purpose, cache, status), {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "duration_sum": 0.0, "early_stops": 0,
+            })
+            aggregate["calls"] += 1
+            aggregate["early_stops"] += int(early_stop)
+            aggregate["prompt_tokens"] += prompt_tokens or 0
+            aggregate["completion_tokens"] += completion_tokens or 0
+            aggregate["duration_sum"] += duration
+            if status == "ok" and cache not in ("hit", "coalesced"):
+                self.__observe(self.__latency, purpose, duration)
+                if ttft is not None:
+                    self.__observe(self.__ttft, purpose, ttft)
+
+    def record_queue_wait(self, priority: str, wait: float, status: str = "admitted") -> None:
+        """
+        Registra cuánto esperó una llamada en la cola del planificador y cómo terminó.
+
+        Parámetros
+        ----------
+        priority : str
+            Clase de prioridad ("interactive", "summary" o "background").
+        wait : float
+            Segundos en la cola.
+        status : str, opcional
+            "admitted", "shed" (descartada por cola llena), "timeout" o
+            "cancelled". Por defecto es "admitted".
+        """
+        if not self.__enabled:
+            return
+        with self.__lock:
+            self.__queue[(priority, status)] = self.__queue.get((priority, status), 0) + 1
+            if status == "admitted":
+                self.__observe(self.__queue_wait, priority, wait)
+
+    def set_gauge(self, name: str, value: float, help_text: str = "", **labels: str) -> None:
+        """
+        Fija el valor actual de una métrica instantánea.
+
+        Parámetros
+        ----------
+        name : str
+            Nombre de la métrica en Prometheus.
+        value : float
+            Valor actual.
+        help_text : str, opcional
+            Descripción de la métrica.
+        **labels : str
+            Etiquetas de la serie.
+        """
+        if not self.__enabled:
+            return
+        with self.__lock:
+            self.__gauges[(name, tuple(sorted(labels.items())))] = value
+            if help_text:
+                self.__gauge_help[name] = help_text
+
+    def recent(self, limit: int = 50, kind: Optional[str] = None) -> List[Dict]:
+        """
+        Devuelve los últimos registros, del más reciente al más antiguo.
+
+        Parámetros
+        ----------
+        limit : int, opcional
+            Número máximo de registros. Por defecto es 50.
+        kind : str, opcional
+            Filtra por tipo ("llm_call" o "span").
+
+        Retorna
+        -------
+        List[Dict]
+            Registros recientes.
+        """
+        with self.__lock:
+            records = list(self.__records)
+        records.reverse()
+        if kind is not None:
+            records = [record for record in records if record["type"] == kind]
+        return records[:limit]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Resume las llamadas al modelo agrupadas por propósito.
+
+        Retorna
+        -------
+        Dict[str, Dict[str, float]]
+            Por propósito: llamadas, aciertos de caché, peticiones agrupadas, errores, cortes
+            anticipados, tokens y latencia media.
+        """
+        with self.__lock:
+            items = [(key, dict(value)) for key, value in self.__llm.items()]
+        summary: Dict[str, Dict[str, float]] = {}
+        for (purpose, cache, status), aggregate in items:
+            row = summary.setdefault(purpose, {
+                "calls": 0, "cache_hits": 0, "coalesced": 0, "errors": 0, "early_stops": 0, "prompt_tokens": 0,
+                "completion_tokens": 0, "duration_sum": 0.0,
+            })
+            row["calls"] += aggregate["calls"]
+            row["cache_hits"] += aggregate["calls"] if cache == "hit" else 0
+            row["coalesced"] += aggregate["calls"] if cache == "coalesced" else 0
+            row["errors"] += aggregate["calls"] if status == "error" else 0
+            row["early_stops"] += aggregate["early_stops"]
+            row["prompt_tokens"] += aggregate["prompt_tokens"]
+            row["completion_tokens"] += aggregate["completion_tokens"]
+            row["duration_sum"] += aggregate["duration_sum"]
+        for row in summary.values():
+            row["mean_duration_s"] = row.pop("duration_sum") / row["calls"] if row["calls"] else 0.0
+        return summary
+
+    def prometheus(self) -> str:
+        """
+        Exporta los agregados en el formato de texto de Prometheus.
+
+        Retorna
+        -------
+        str
+            Métricas listas para servir en /metrics.
+        """
+        with self.__lock:
+            llm = {key: dict(value) for key, value in self.__llm.items()}
+            latency = {key: list(value) for key, value in self.__latency.items()}
+            ttft = {key: list(value) for key, value in self.__ttft.items()}
+            spans = {key: dict(value) for key, value in self.__spans.items()}
+            queue = dict(self.__queue)
+            queue_wait = {key: list(value) for key, value in self.__queue_wait.items()}
+            gauges = dict(self.__gauges)
+            gauge_help = dict(self.__gauge_help)
+
+        lines = [
+            "# HELP rol_llm_requests_total Llamadas al modelo.",
+            "# TYPE rol_llm_requests_total counter",
+        ]
+        for (purpose, cache, status), aggregate in sorted(llm.items()):
+            lines.append(f'rol_llm_requests_total{{purpose="{purpose}",cache="{cache}",status="{status}"}} {aggregate["calls"]}')
+
+        lines += ["# HELP rol_llm_tokens_total Tokens procesados por el modelo.", "# TYPE rol_llm_tokens_total counter"]
+        tokens: Dict[Tuple[str, str], int] = {}
+        for (purpose, _, _), aggregate in llm.items():
+            for kind in ("prompt", "completion"):
+                tokens[(purpose, kind)] = tokens.get((purpose, kind), 0) + aggregate[f"{kind}_tokens"]
+        for (purpose, kind), value in sorted(tokens.items()):
+            lines.append(f'rol_llm_tokens_total{{purpose="{purpose}",kind="{kind}"}} {value}')
+
+        lines += ["# HELP rol_llm_early_stops_total Streamings cerrados en cuanto la respuesta estuvo completa.",
+                  "# TYPE rol_llm_early_stops_total counter"]
+        early_stops: Dict[str, int] = {}
+        for (purpose, _, _), aggregate in llm.items():
+            early_stops[purpose] = early_stops.get(purpose, 0) + aggregate["early_stops"]
+        for purpose, value in sorted(early_stops.items()):
+            lines.append(f'rol_llm_early_stops_total{{purpose="{purpose}"}} {value}')
+
+        lines += self.__histogram_lines("rol_llm_request_duration_seconds",
+                                        "Duración de las llamadas al modelo (sin caché).", latency)
+        lines += self.__histogram_lines("rol_llm_ttft_seconds",
+                                        "Tiempo hasta el primer token (sin caché).", ttft)
+
+        lines += ["# HELP rol_span_duration_seconds Duración de las etapas del juego.",
+                  "# TYPE rol_span_duration_seconds summary"]
+        for (name, status), aggregate in sorted(spans.items()):
+            labels = f'name="{name}",status="{status}"'
+            lines.append(f"rol_span_duration_seconds_count{{{labels}}} {aggregate['count']}")
+            lines.append(f"rol_span_duration_seconds_sum{{{labels}}} {aggregate['sum']:.6f}")
+
+        if queue:
+            lines += ["# HELP rol_scheduler_requests_total Llamadas que pasaron por la cola del modelo.",
+                      "# TYPE rol_scheduler_requests_total counter"]
+            for (priority, status), count in sorted(queue.items()):
+                lines.append(f'rol_scheduler_requests_total{{priority="{priority}",status="{status}"}} {count}')
+            lines += self.__histogram_lines("rol_scheduler_wait_seconds",
+                                            "Espera en la cola del modelo hasta obtener turno.", queue_wait,
+                                            label="priority")
+        previous = None
+        for (name, labels), value in sorted(gauges.items()):
+            if name != previous:
+                lines += [f"# HELP {name} {gauge_help.get(name, name)}", f"# TYPE {name} gauge"]
+                previous = name
+            series = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"{name}{{{series}}} {value:g}" if series else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve_metrics(self, host: str = "127.0.0.1", port: int = 9464) -> ThreadingHTTPServer:
+        """
+        Sirve /metrics en un hilo en segundo plano (una sola vez por instancia).
+
+        Parámetros
+        ----------
+        host : str, opcional
+            Dirección donde escuchar. Por defecto es "127.0.0.1".
+        port : int, opcional
+            Puerto donde escuchar. Por defecto es 9464.
+
+        Retorna
+        -------
+        ThreadingHTTPServer
+            Servidor de métricas en ejecución.
+        """
+        with self.__lock:
+            if self.__metrics_server is None:
+                server = ThreadingHTTPServer((host, port), _MetricsHandler)
+                server.daemon_threads = True
+                server.telemetry = self
+                threading.Thread(target=server.serve_forever, name="rol-metrics", daemon=True).start()
+                self.__metrics_server = server
+            return self.__metrics_server
+
+    def __record(self, record: Dict) -> None:
+        """
+        Guarda un registro en memoria y, si está configurado, en el archivo JSONL.
+
+        Parámetros
+        ----------
+        record : Dict
+            Registro a guardar.
+        """
+        line = json.dumps(record, ensure_ascii=False, default=str) if self.__trace_file is not None else None
+        with self.__lock:
+            self.__records.append(record)
+            if line is not None and self.__trace_file is not None:
+                self.__trace_file.write(line + "\n")
+                self.__trace_file.flush()
+
+    @staticmethod
+    def __observe(histogram: Dict[str, List[int]], label: str, value: float) -> None:
+        """
+        Añade una observación a un histograma (la última casilla es +Inf y la suma va aparte).
+
+        Parámetros
+        ----------
+        histogram : Dict[str, List[int]]
+            Histograma por etiqueta: recuentos por casilla, más la suma en microsegundos.
+        label : str
+            Etiqueta (propósito de la llamada).
+        value : float
+            Segundos observados.
+        """
+        counts = histogram.setdefault(label, [0] * (len(LATENCY_BUCKETS) + 2))
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[len(LATENCY_BUCKETS)] += 1
+        counts[-1] += int(value * 1_000_000)
+
+    @staticmethod
+    def __histogram_lines(name: str, help_text: str, histogram: Dict[str, List[int]],
+                          label: str = "purpose") -> List[str]:
+        """
+        Formatea un histograma en líneas de Prometheus (casillas acumuladas).
+
+        Parámetros
+        ----------
+        name : str
+            Nombre de la métrica.
+        help_text : str
+            Descripción de la métrica.
+        histogram : Dict[str, List[int]]
+            Histograma por valor de la etiqueta.
+        label : str, opcional
+            Nombre de la etiqueta. Por defecto es "purpose".
+
+        Retorna
+        -------
+        List[str]
+            Líneas de la métrica.
+        """
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for value, counts in sorted(histogram.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {cumulative}')
+            cumulative += counts[len(LATENCY_BUCKETS)]
+            lines.append(f'{name}_bucket{{{label}="{value}",le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label}="{value}"}} {counts[-1] / 1_000_000:.6f}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {cumulative}')
+        return lines
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Manejador mínimo que sirve las métricas en /metrics.
+    """
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0].rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.telemetry.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
@@ -0,0 +1,444 @@
+from typing import Dict, List, Optional, Tuple, Union
+from openai import OpenAI
+from config.model_config import ModelConfig
+from agents.profiles import ModelProfile
+from agents.telemetry import Telemetry
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+# Segundos entre reintentos si el backend no responde al calentamiento
+RETRY_SECONDS = 30.0
+
+
+class ModelWarmup:
+    """
+    Carga el modelo en el backend al arrancar y lo mantiene cargado entre jugadores.
+
+    Con Ollama se usa la API nativa (`/api/generate` con prompt vacío), que
+    carga el modelo en memoria sin generar nada y admite `keep_alive`. Como
+    cada petición a la API compatible con OpenAI vuelve a poner el keep-alive
+    por defecto del servidor, un hilo en segundo plano repite la carga cada
+    `refresh_seconds` para que el modelo no se descargue. Con otros backends
+    se envía una petición de un solo token y no se refresca.
+
+    El estado ("cold", "warming", "ready" o "failed") sirve como señal de
+    disponibilidad para la interfaz y para la ruta /ready de la API HTTP.
+
+    Hay un calentador por backend y modelo: si los perfiles de narración y
+    resumen ([Profile.<tarea>]) usan modelos distintos, `start_all` carga
+    los dos. La petición de calentamiento usa el perfil "warmup".
+
+    Atributos
+    ----------
+    url : str
+        URL base (/v1) del backend.
+    model : str
+        Nombre del modelo a precargar.
+    keep_alive : str or int
+        Tiempo que Ollama mantiene el modelo cargado ("30m", -1 = siempre).
+    refresh_seconds : float
+        Intervalo entre recargas del keep-alive (0 = sin refresco).
+    state : str
+        Estado actual del calentamiento.
+    load_seconds : float or None
+        Segundos que tardó el backend en cargar el modelo (si lo informa).
+    warmup_seconds : float or None
+        Duración total de la última petición de calentamiento.
+    """
+
+    __instances: Dict[Tuple[str, str, str], "ModelWarmup"] = {}
+    __instances_lock = threading.Lock()
+
+    def __init__(self, url: str, api_key: str, model: Optional[str] = None,
+                 keep_alive: Optional[Union[str, int]] = None, refresh_seconds: Optional[float] = None):
+        """
+        Inicializa la clase ModelWarmup.
+
+        Parámetros
+        ----------
+        url : str
+            URL base (/v1) de la API compatible con OpenAI.
+        api_key : str
+            Clave de API.
+        model : str, opcional
+            Modelo a precargar. Si es None se usa el del perfil "warmup" (por defecto el de [Model] name).
+        keep_alive : str or int, opcional
+            Keep-alive de Ollama. Si es None se lee de la sección [Warmup].
+        refresh_seconds : float, opcional
+            Intervalo de refresco. Si es None se lee de la sección [Warmup].
+        """
+        config = ModelConfig.shared()
+        self.__url = url
+        self.__api_key = api_key
+        self.__model = model or ModelProfile.for_task("warmup").model
+        if keep_alive is None:
+            keep_alive = config.get("Warmup", "keep_alive", fallback="30m")
+        self.__keep_alive = self.__parse_keep_alive(keep_alive)
+        if refresh_seconds is None:
+            refresh_seconds = config.getfloat("Warmup", "refresh_seconds", fallback=240.0)
+        self.__refresh_seconds = refresh_seconds
+        self.__state = COLD
+        self.__error: Optional[str] = None
+        self.__load_seconds: Optional[float] = None
+        self.__warmup_seconds: Optional[float] = None
+        self.__native: Optional[bool] = None
+        self.__ready_event = threading.Event()
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+        self.__lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """
+        str: Obtiene la URL base del backend.
+        """
+        return self.__url
+
+    @property
+    def model(self) -> str:
+        """
+        str: Obtiene el nombre del modelo a precargar.
+        """
+        return self.__model
+
+    @property
+    def keep_alive(self) -> Union[str, int]:
+        """
+        str or int: Obtiene el keep-alive enviado a Ollama.
+        """
+        return self.__keep_alive
+
+    @property
+    def refresh_seconds(self) -> float:
+        """
+        float: Obtiene el intervalo entre recargas del keep-alive.
+        """
+        return self.__refresh_seconds
+
+    @property
+    def state(self) -> str:
+        """
+        str: Obtiene el estado del calentamiento.
+        """
+        return self.__state
+
+    @property
+    def ready(self) -> bool:
+        """
+        bool: Indica si el modelo ya está cargado.
+        """
+        return self.__state == READY
+
+    @property
+    def error(self) -> Optional[str]:
+        """
+        str or None: Obtiene el último error del calentamiento.
+        """
+        return self.__error
+
+    @property
+    def load_seconds(self) -> Optional[float]:
+        """
+        float or None: Obtiene el tiempo de carga informado por el backend.
+        """
+        return self.__load_seconds
+
+    @property
+    def warmup_seconds(self) -> Optional[float]:
+        """
+        float or None: Obtiene la duración de la última petición de calentamiento.
+        """
+        return self.__warmup_seconds
+
+    @classmethod
+    def shared(cls, url: str, api_key: str, model: Optional[str] = None) -> "ModelWarmup":
+        """
+        Devuelve el calentador del proceso para un backend y modelo, creándolo la primera vez.
+
+        Parámetros
+        ----------
+        url : str
+            URL base (/v1) del backend.
+        api_key : str
+            Clave de API.
+        model : str, opcional
+            Modelo a precargar. Por defecto el del perfil "warmup".
+
+        Retorna
+        -------
+        ModelWarmup
+            Calentador compartido.
+        """
+        model = model or ModelProfile.for_task("warmup").model
+        key = (url, api_key, model)
+        instance = cls.__instances.get(key)
+        if instance is None:
+            with cls.__instances_lock:
+                instance = cls.__instances.get(key)
+                if instance is None:
+                    instance = cls(url=url, api_key=api_key, model=model)
+                    cls.__instances[key] = instance
+        return instance
+
+    @classmethod
+    def start_all(cls, backends: List[str], api_key: str) -> List["ModelWarmup"]:
+        """
+        Arranca un calentador por cada backend y modelo de los perfiles de narración, resumen y calentamiento.
+
+        Un perfil con `url` propia solo se carga en ese backend; los demás se
+        cargan en todos los `backends`.
+
+        Parámetros
+        ----------
+        backends : List[str]
+            URLs base (/v1) de los backends del Llm, con la principal la primera.
+        api_key : str
+            Clave de API.
+
+        Retorna
+        -------
+        List[ModelWarmup]
+            Calentadores arrancados; el primero es el de la narración en el backend principal.
+        """
+        targets: List[Tuple[str, str]] = []
+        for task in ("narration", "summary", "warmup"):
+            profile = ModelProfile.for_task(task)
+            for url in ([profile.url] if profile.url else backends):
+                if (url, profile.model) not in targets:
+                    targets.append((url, profile.model))
+        return [cls.shared(url, api_key, model).start() for url, model in targets]
+
+    @classmethod
+    def ready_for(cls, url: str, model: Optional[str] = None) -> Optional[bool]:
+        """
+        Indica si el modelo de un backend está precargado.
+
+        Parámetros
+        ----------
+        url : str
+            URL base (/v1) del backend.
+        model : str, opcional
+            Modelo a consultar. Si es None vale cualquier calentador del backend.
+
+        Retorna
+        -------
+        bool or None
+            True o False según el estado, o None si no hay calentador para esa URL y modelo.
+        """
+        for (instance_url, _, instance_model), instance in list(cls.__instances.items()):
+            if instance_url == url and model in (None, instance_model):
+                return instance.ready
+        return None
+
+    @staticmethod
+    def enabled() -> bool:
+        """
+        Indica si el calentamiento al arrancar está activado en la sección [Warmup].
+
+        Retorna
+        -------
+        bool
+            True si `enabled=true`.
+        """
+        return ModelConfig.shared().getboolean("Warmup", "enabled", fallback=False)
+
+    def start(self) -> "ModelWarmup":
+        """
+        Lanza el calentamiento y el refresco del keep-alive en un hilo en segundo plano.
+
+        Solo arranca el hilo la primera vez; las siguientes llamadas (por
+        ejemplo en cada re-ejecución de Streamlit) no hacen nada.
+
+        Retorna
+        -------
+        ModelWarmup
+            La propia instancia.
+        """
+        with self.__lock:
+            if self.__thread is None:
+                self.__state = WARMING
+                self.__thread = threading.Thread(target=self.__run, name="model-warmup", daemon=True)
+                self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Detiene el refresco del keep-alive.
+        """
+        self.__stop_event.set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Espera a que el modelo esté cargado.
+
+        Parámetros
+        ----------
+        timeout : float, opcional
+            Segundos máximos de espera. Si es None se espera indefinidamente.
+
+        Retorna
+        -------
+        bool
+            True si el modelo está listo.
+        """
+        self.__ready_event.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict:
+        """
+        Devuelve el estado del calentamiento en un diccionario serializable.
+
+        Retorna
+        -------
+        Dict
+            Modelo, estado, tiempos de carga y último error.
+        """
+        return {
+            "model": self.__model,
+            "state": self.__state,
+            "load_seconds": self.__load_seconds,
+            "warmup_seconds": self.__warmup_seconds,
+            "keep_alive": self.__keep_alive,
+            "error": self.__error,
+        }
+
+    def warm(self) -> float:
+        """
+        Carga el modelo en el backend de forma síncrona.
+
+        Retorna
+        -------
+        float
+            Segundos que tardó la petición de calentamiento.
+
+        Raises
+        ------
+        Exception
+            Si el backend no responde; el estado pasa a "failed".
+        """
+        self.__state = WARMING if not self.ready else READY
+        start = time.perf_counter()
+        try:
+            with Telemetry.shared().span("warmup", model=self.__model) as span:
+                if self.__native is False:
+                    load_seconds = None
+                    self.__openai_ping()
+                else:
+                    load_seconds = self.__ollama_load(self.__keep_alive)
+                span["backend"] = "ollama" if self.__native else "openai"
+                span["load_seconds"] = load_seconds
+        except Exception as e:
+            self.__state = FAILED
+            self.__error = str(e)
+            print(f"[Error] No se pudo precargar el modelo {self.__model}: {e}")
+            raise
+        self.__warmup_seconds = time.perf_counter() - start
+        self.__load_seconds = load_seconds
+        self.__error = None
+        self.__state = READY
+        self.__ready_event.set()
+        return self.__warmup_seconds
+
+    def unload(self) -> None:
+        """
+        Pide a Ollama que descargue el modelo (keep_alive=0), por ejemplo para medir un arranque en frío.
+        """
+        if self.__native is not False:
+            self.__ollama_load(0)
+        self.__state = COLD
+        self.__ready_event.clear()
+
+    def __run(self) -> None:
+        """
+        Bucle del hilo en segundo plano: calienta el modelo y refresca su keep-alive.
+        """
+        delay = 0.0
+        while not self.__stop_event.wait(delay):
+            try:
+                self.warm()
+            except Exception:
+                # Despierta a quien espera para que vea el estado "failed" y reintenta más tarde
+                self.__ready_event.set()
+                delay = RETRY_SECONDS
+                continue
+            if not self.__native or self.__refresh_seconds <= 0:
+                return
+            delay = self.__refresh_seconds
+
+    def __ollama_load(self, keep_alive: Union[str, int]) -> Optional[float]:
+        """
+        Carga (o descarga) el modelo con la API nativa de Ollama.
+
+        Parámetros
+        ----------
+        keep_alive : str or int
+            Tiempo que el modelo debe seguir cargado (0 lo descarga).
+
+        Retorna
+        -------
+        float or None
+            Segundos de carga informados por Ollama, o None si el backend no
+            es Ollama (en cuyo caso se recurre a la API de OpenAI).
+        """
+        root = self.__url.rstrip("/")
+        if root.endswith("/v1"):
+            root = root[:-3]
+        body = json.dumps({"model": self.__model, "prompt": "", "keep_alive": keep_alive, "stream": False}).encode("utf-8")
+        request = urllib.request.Request(f"{root}/api/generate", data=body, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=600) as response:
+                payload = json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            if e.code in (404, 405, 501):
+                self.__native = False
+                if keep_alive != 0:
+                    self.__openai_ping()
+                return None
+            raise
+        self.__native = True
+        load_duration = payload.get("load_duration")
+        return load_duration / 1e9 if load_duration else None
+
+    def __openai_ping(self) -> None:
+        """
+        Envía una petición mínima (un token, o el `max_tokens` del perfil "warmup") con la API compatible con OpenAI.
+        """
+        options = {"max_tokens": 1, **ModelProfile.for_task("warmup").options()}
+        client = OpenAI(base_url=self.__url, api_key=self.__api_key)
+        try:
+            client.chat.completions.create(model=self.__model, messages=[{"role": "user", "content": "Hola"}],
+                                           **options)
+        finally:
+            client.close()
+
+    @staticmethod
+    def __parse_keep_alive(value: Union[str, int]) -> Union[str, int]:
+        """
+        Convierte el keep-alive de la configuración al formato de Ollama.
+
+        Parámetros
+        ----------
+        value : str or int
+            Duración ("30m", "1h") o número de segundos (-1 = siempre).
+
+        Retorna
+        -------
+        str or int
+            Valor listo para enviar a Ollama.
+        """
+        if isinstance(value, int):
+            return value
+        value = str(value).strip()
+        try:
+            return int(value)
+        except ValueError:
+            return value
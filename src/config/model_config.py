@@ -0,0 +1,267 @@
+from configparser import ConfigParser, Error as ConfigError
+from typing import Dict, Optional, Tuple
+import os
+import threading
+import time
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model.config")
+
+# Segundos entre comprobaciones de si el archivo ha cambiado
+RELOAD_SECONDS = 1.0
+
+
+class ModelConfig:
+    """
+    Configuración del modelo leída una sola vez y compartida por todo el proceso.
+
+    Cada ruta se analiza la primera vez que se pide con `shared` y el resultado
+    se reutiliza en las siguientes ejecuciones del script de Streamlit. Como
+    mucho una vez cada `RELOAD_SECONDS`, `shared` comprueba si el archivo ha
+    cambiado (fecha de modificación y tamaño) y, si es así, lo vuelve a leer
+    en la misma instancia: las opciones que se consultan en cada llamada
+    (perfiles de modelo, [Pipeline]...) se aplican sin reiniciar. Las que se
+    leen al crear un objeto compartido (cachés, routers, pools) siguen
+    necesitando su `reset_shared`. Si el archivo nuevo no se puede analizar
+    se conserva la configuración anterior. `invalidate` descarta la instancia.
+
+    Atributos
+    ----------
+    path : str
+        Ruta del archivo de configuración.
+    parser : ConfigParser
+        Contenido ya analizado del archivo.
+    version : int
+        Número de veces que se ha leído el archivo (empieza en 1).
+    """
+
+    __instances: Dict[str, "ModelConfig"] = {}
+    __lock = threading.Lock()
+
+    def __init__(self, path: str = DEFAULT_CONFIG_PATH):
+        """
+        Inicializa la clase ModelConfig leyendo el archivo indicado.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del archivo de configuración. Por defecto es el model.config junto a este módulo.
+
+        Raises
+        ------
+        FileNotFoundError
+            Si el archivo de configuración no existe.
+        """
+        self.__path = path
+        self.__stamp = self.__file_stamp()
+        self.__parser = self.__read()
+        self.__version = 1
+        self.__checked = time.monotonic()
+        self.__reload_lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        """
+        str: Obtiene la ruta del archivo de configuración.
+        """
+        return self.__path
+
+    @property
+    def parser(self) -> ConfigParser:
+        """
+        ConfigParser: Obtiene el contenido analizado del archivo.
+        """
+        return self.__parser
+
+    @property
+    def version(self) -> int:
+        """
+        int: Obtiene el número de veces que se ha leído el archivo.
+        """
+        return self.__version
+
+    @classmethod
+    def shared(cls, path: str = DEFAULT_CONFIG_PATH) -> "ModelConfig":
+        """
+        Devuelve la instancia compartida para una ruta, leyéndola si aún no existe.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del archivo de configuración. Por defecto es el model.config junto a este módulo.
+
+        Retorna
+        -------
+        ModelConfig
+            Configuración compartida por el proceso, releída si el archivo ha cambiado.
+        """
+        instance = cls.__instances.get(path)
+        if instance is None:
+            with cls.__lock:
+                instance = cls.__instances.get(path)
+                if instance is None:
+                    instance = cls(path)
+                    cls.__instances[path] = instance
+        elif time.monotonic() - instance.__checked >= RELOAD_SECONDS:
+            instance.reload()
+        return instance
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Vuelve a leer el archivo si ha cambiado desde la última lectura.
+
+        Parámetros
+        ----------
+        force : bool, opcional
+            Si es True se lee aunque no haya cambiado. Por defecto es False.
+
+        Retorna
+        -------
+        bool
+            True si se ha cargado una configuración nueva.
+        """
+        with self.__reload_lock:
+            self.__checked = time.monotonic()
+            stamp = self.__file_stamp()
+            if stamp == self.__stamp and not force:
+                return False
+            try:
+                parser = self.__read()
+            except (OSError, ConfigError) as e:
+                # Archivo a medio escribir o borrado: se sigue con la configuración anterior
+                print(f"[Error] No se pudo recargar {self.__path}: {e}")
+                return False
+            self.__stamp = stamp
+            self.__parser = parser
+            self.__version += 1
+        return True
+
+    @classmethod
+    def invalidate(cls, path: Optional[str] = None) -> None:
+        """
+        Descarta la configuración compartida para que se vuelva a leer.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta a invalidar. Si es None se invalidan todas.
+        """
+        with cls.__lock:
+            if path is None:
+                cls.__instances.clear()
+            else:
+                cls.__instances.pop(path, None)
+
+    def get(self, section: str, option: str, **kwargs) -> str:
+        """
+        Obtiene un valor de la configuración.
+
+        Parámetros
+        ----------
+        section : str
+            Sección del archivo.
+        option : str
+            Opción dentro de la sección.
+        **kwargs
+            Argumentos adicionales de `ConfigParser.get` (por ejemplo `fallback`).
+
+        Retorna
+        -------
+        str
+            Valor de la opción.
+        """
+        return self.__parser.get(section, option, **kwargs)
+
+    def getint(self, section: str, option: str, **kwargs) -> int:
+        """
+        Obtiene un valor entero de la configuración.
+
+        Parámetros
+        ----------
+        section : str
+            Sección del archivo.
+        option : str
+            Opción dentro de la sección.
+        **kwargs
+            Argumentos adicionales de `ConfigParser.getint` (por ejemplo `fallback`).
+
+        Retorna
+        -------
+        int
+            Valor de la opción.
+        """
+        return self.__parser.getint(section, option, **kwargs)
+
+    def getfloat(self, section: str, option: str, **kwargs) -> float:
+        """
+        Obtiene un valor decimal de la configuración.
+
+        Parámetros
+        ----------
+        section : str
+            Sección del archivo.
+        option : str
+            Opción dentro de la sección.
+        **kwargs
+            Argumentos adicionales de `ConfigParser.getfloat` (por ejemplo `fallback`).
+
+        Retorna
+        -------
+        float
+            Valor de la opción.
+        """
+        return self.__parser.getfloat(section, option, **kwargs)
+
+    def getboolean(self, section: str, option: str, **kwargs) -> bool:
+        """
+        Obtiene un valor booleano de la configuración.
+
+        Parámetros
+        ----------
+        section : str
+            Sección del archivo.
+        option : str
+            Opción dentro de la sección.
+        **kwargs
+            Argumentos adicionales de `ConfigParser.getboolean` (por ejemplo `fallback`).
+
+        Retorna
+        -------
+        bool
+            Valor de la opción.
+        """
+        return self.__parser.getboolean(section, option, **kwargs)
+
+    def __file_stamp(self) -> Optional[Tuple[int, int]]:
+        """
+        Obtiene la fecha de modificación y el tamaño del archivo.
+
+        Retorna
+        -------
+        Tuple[int, int] or None
+            Fecha de modificación (ns) y tamaño, o None si el archivo no existe.
+        """
+        try:
+            stat = os.stat(self.__path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def __read(self) -> ConfigParser:
+        """
+        Lee y analiza el archivo de configuración.
+
+        Retorna
+        -------
+        ConfigParser
+            Contenido del archivo.
+
+        Raises
+        ------
+        FileNotFoundError
+            Si el archivo de configuración no existe.
+        """
+        if not os.path.exists(self.__path):
+            raise FileNotFoundError(f"El archivo '{self.__path}' no existe.")
+        config = ConfigParser()
+        config.read(self.__path)
+        return config
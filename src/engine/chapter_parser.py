@@ -0,0 +1,246 @@
+from typing import Optional
+import re
+
+GAME_OVER = "FIN DEL JUEGO"
+
+# Línea de opción tal y como la pide `story_teller` ("A - ..."), tolerando markdown y otros separadores
+OPTION_LINE = re.compile(r"^[\s*#]*([AB])\s*[-–—:.)]\s*(.+)$")
+
+
+class ParsedChapter:
+    """
+    Capítulo generado separado en narración, opciones y final de partida.
+
+    Atributos
+    ----------
+    narrative : str
+        Texto del capítulo hasta las opciones (todo el texto si no las tiene).
+    option_a : str
+        Descripción de la opción A, o "" si no aparece.
+    option_b : str
+        Descripción de la opción B, o "" si no aparece.
+    game_over : bool
+        Indica si el capítulo termina con "FIN DEL JUEGO".
+    complete : bool
+        Indica si el capítulo tiene las dos opciones o termina la partida.
+    """
+
+    def __init__(self, narrative: str, option_a: str = "", option_b: str = "", game_over: bool = False):
+        """
+        Inicializa la clase ParsedChapter.
+
+        Parámetros
+        ----------
+        narrative : str
+            Texto del capítulo hasta las opciones.
+        option_a : str, opcional
+            Descripción de la opción A. Por defecto es "".
+        option_b : str, opcional
+            Descripción de la opción B. Por defecto es "".
+        game_over : bool, opcional
+            Si la partida termina en este capítulo. Por defecto es False.
+        """
+        self.__narrative = narrative
+        self.__option_a = option_a
+        self.__option_b = option_b
+        self.__game_over = game_over
+
+    @property
+    def narrative(self) -> str:
+        """
+        str: Obtiene el texto del capítulo hasta las opciones.
+        """
+        return self.__narrative
+
+    @property
+    def option_a(self) -> str:
+        """
+        str: Obtiene la descripción de la opción A.
+        """
+        return self.__option_a
+
+    @property
+    def option_b(self) -> str:
+        """
+        str: Obtiene la descripción de la opción B.
+        """
+        return self.__option_b
+
+    @property
+    def game_over(self) -> bool:
+        """
+        bool: Indica si la partida termina en este capítulo.
+        """
+        return self.__game_over
+
+    @property
+    def complete(self) -> bool:
+        """
+        bool: Indica si el capítulo tiene las dos opciones o termina la partida.
+        """
+        return self.__game_over or bool(self.__option_a and self.__option_b)
+
+    def option(self, letter: str) -> str:
+        """
+        Devuelve la descripción de una opción.
+
+        Parámetros
+        ----------
+        letter : str
+            Letra de la opción ("A" o "B").
+
+        Retorna
+        -------
+        str
+            Descripción de la opción, o "" si no aparece en el capítulo.
+        """
+        letter = letter.strip().upper()
+        if letter == "A":
+            return self.__option_a
+        if letter == "B":
+            return self.__option_b
+        return ""
+
+
+def is_game_over(text: str) -> bool:
+    """
+    Indica si un capítulo termina la partida (contiene "FIN DEL JUEGO").
+
+    Parámetros
+    ----------
+    text : str
+        Texto del capítulo.
+
+    Retorna
+    -------
+    bool
+        True si el jugador ha muerto o la historia ha terminado.
+    """
+    return GAME_OVER in text
+
+
+def parse_chapter(text: str) -> ParsedChapter:
+    """
+    Separa un capítulo en narración, opciones A y B y final de partida.
+
+    Si el modelo repite las opciones se toman las últimas; si escribe algo
+    después de ellas se ignora.
+
+    Parámetros
+    ----------
+    text : str
+        Texto del capítulo generado.
+
+    Retorna
+    -------
+    ParsedChapter
+        Capítulo analizado.
+    """
+    lines = text.splitlines(keepends=True)
+    options = {}
+    narrative_end = len(text)
+    offset = 0
+    for line in lines:
+        match = OPTION_LINE.match(line.rstrip("\r\n"))
+        if match:
+            letter = match.group(1)
+            if letter == "A":
+                options = {}
+                narrative_end = offset
+            if letter == "A" or "A" in options:
+                options[letter] = match.group(2).strip(" *")
+        offset += len(line)
+    if "A" not in options:
+        narrative_end = len(text)
+    return ParsedChapter(text[:narrative_end].strip(), options.get("A", ""), options.get("B", ""),
+                         is_game_over(text))
+
+
+def cut_after_options(text: str) -> str:
+    """
+    Recorta lo que el modelo haya escrito después de la opción B o de "FIN DEL JUEGO".
+
+    Parámetros
+    ----------
+    text : str
+        Texto completo del capítulo.
+
+    Retorna
+    -------
+    str
+        Texto hasta el final de la línea de la opción B o de "FIN DEL JUEGO".
+    """
+    keep = OptionsCutoff()(text)
+    return text if keep is None else text[:keep]
+
+
+class OptionsCutoff:
+    """
+    Detecta en un streaming el punto en que el capítulo ya está completo.
+
+    Recibe los fragmentos en orden y avisa en cuanto termina la línea de la
+    opción B (después de una opción A) o la línea con "FIN DEL JUEGO", para
+    cerrar la petición y no pagar los tokens que el modelo escriba después.
+    Solo analiza cada línea una vez, al llegar su salto de línea; si el
+    modelo termina justo tras la opción B el streaming acaba por sí solo.
+
+    Una instancia sirve para un único streaming.
+    """
+
+    def __init__(self):
+        """
+        Inicializa la clase OptionsCutoff.
+        """
+        self.__line = ""
+        self.__option_a = False
+
+    def __call__(self, chunk: str) -> Optional[int]:
+        """
+        Procesa el siguiente fragmento del streaming.
+
+        Parámetros
+        ----------
+        chunk : str
+            Fragmento de texto recién recibido.
+
+        Retorna
+        -------
+        int or None
+            None para seguir leyendo, o el número de caracteres del fragmento
+            que hay que conservar antes de cortar (sin el salto de línea final).
+        """
+        start = 0
+        while True:
+            newline = chunk.find("\n", start)
+            if newline == -1:
+                self.__line += chunk[start:]
+                return None
+            line = self.__line + chunk[start:newline]
+            self.__line = ""
+            if self.__ends(line):
+                return newline
+            start = newline + 1
+
+    def __ends(self, line: str) -> bool:
+        """
+        Indica si una línea completa cierra el capítulo.
+
+        Parámetros
+        ----------
+        line : str
+            Línea sin el salto de línea.
+
+        Retorna
+        -------
+        bool
+            True si es la opción B tras la A o contiene "FIN DEL JUEGO".
+        """
+        if GAME_OVER in line:
+            return True
+        match = OPTION_LINE.match(line.rstrip("\r"))
+        if match is None:
+            return False
+        if match.group(1) == "A":
+            self.__option_a = True
+            return False
+        return self.__option_a
@@ -0,0 +1,377 @@
+from typing import Dict, Optional
+from config.model_config import ModelConfig
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+CONTENT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "prerendered.db")
+
+
+class ContentStore:
+    """
+    Almacén de capítulos pre-generados (SQLite, textos comprimidos con zlib).
+
+    Cada nodo del árbol de decisiones se identifica por su contenido: la
+    historia, el número de capítulo, el texto del capítulo anterior y la
+    opción elegida. Es la misma información que recibe `Narrator.narrate`,
+    de modo que en tiempo de ejecución basta con calcular la clave para saber
+    si el capítulo ya está generado, sin seguir la pista del camino de cada
+    partida. Si un capítulo anterior se generó en vivo, sus hijos no están en
+    el almacén y la partida sigue en vivo.
+
+    Junto a cada capítulo se guarda, si se conoce, el resumen de su texto,
+    que es lo que necesita el prompt del capítulo siguiente.
+
+    Atributos
+    ----------
+    path : str
+        Ruta del archivo SQLite.
+    hits : int
+        Consultas resueltas desde el almacén.
+    misses : int
+        Consultas que no estaban en el almacén.
+    """
+
+    __shared: Optional["ContentStore"] = None
+    __shared_loaded = False
+    __shared_lock = threading.Lock()
+
+    def __init__(self, path: str = CONTENT_PATH, create: bool = True):
+        """
+        Inicializa la clase ContentStore.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del archivo SQLite. Por defecto `data/prerendered.db`.
+        create : bool, opcional
+            Si es False y el archivo no existe se lanza FileNotFoundError. Por defecto es True.
+
+        Raises
+        ------
+        FileNotFoundError
+            Si `create` es False y el archivo no existe.
+        """
+        if not create and not os.path.exists(path):
+            print(f"[Error] No existe el almacén de capítulos pre-generados: {path}")
+            raise FileNotFoundError(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            "key BLOB PRIMARY KEY, story INTEGER NOT NULL, chapter INTEGER NOT NULL, path TEXT NOT NULL, "
+            "text_key BLOB NOT NULL, text BLOB NOT NULL, summary BLOB, finished INTEGER NOT NULL, "
+            "model TEXT, created REAL NOT NULL) WITHOUT ROWID"
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS nodes_text_key ON nodes (text_key)")
+        self.__connection.commit()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def path(self) -> str:
+        """
+        str: Obtiene la ruta del archivo SQLite.
+        """
+        return self.__path
+
+    @property
+    def hits(self) -> int:
+        """
+        int: Obtiene las consultas resueltas desde el almacén.
+        """
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """
+        int: Obtiene las consultas que no estaban en el almacén.
+        """
+        return self.__misses
+
+    @classmethod
+    def shared(cls) -> Optional["ContentStore"]:
+        """
+        Devuelve el almacén configurado en la sección [Prerender] de model.config.
+
+        No crea el archivo: si aún no se ha ejecutado `python -m engine.prerender`
+        todas las partidas se narran en vivo.
+
+        Retorna
+        -------
+        ContentStore or None
+            Almacén del proceso, o None si está desactivado o no existe.
+        """
+        if cls.__shared_loaded:
+            return cls.__shared
+        with cls.__shared_lock:
+            if not cls.__shared_loaded:
+                config = ModelConfig.shared()
+                path = cls.configured_path()
+                if config.getboolean("Prerender", "enabled", fallback=False) and os.path.exists(path):
+                    try:
+                        cls.__shared = cls(path, create=False)
+                    except (FileNotFoundError, sqlite3.Error) as e:
+                        print(f"[Error] No se pudo abrir el almacén de capítulos: {e}")
+                cls.__shared_loaded = True
+        return cls.__shared
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Cierra el almacén compartido para que se vuelva a abrir con la configuración actual.
+        """
+        with cls.__shared_lock:
+            if cls.__shared is not None:
+                cls.__shared.close()
+            cls.__shared = None
+            cls.__shared_loaded = False
+
+    @staticmethod
+    def configured_path() -> str:
+        """
+        Lee la ruta del almacén de la sección [Prerender] de model.config.
+
+        Las rutas relativas se resuelven desde la carpeta src.
+
+        Retorna
+        -------
+        str
+            Ruta del archivo SQLite.
+        """
+        path = ModelConfig.shared().get("Prerender", "path", fallback="") or CONTENT_PATH
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        return path
+
+    @staticmethod
+    def node_key(story_number: int, chapter: int, previous: str = "", choice: str = "") -> bytes:
+        """
+        Calcula la clave de un capítulo.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        chapter : int
+            Número del capítulo.
+        previous : str, opcional
+            Texto del capítulo anterior ("" para el primero).
+        choice : str, opcional
+            Opción elegida en el capítulo anterior ("" para el primero).
+
+        Retorna
+        -------
+        bytes
+            Resumen SHA-1 (20 bytes).
+        """
+        return hashlib.sha1(f"{story_number}\x00{chapter}\x00{previous}\x00{choice}".encode("utf-8")).digest()
+
+    @staticmethod
+    def text_key(story_number: int, text: str) -> bytes:
+        """
+        Calcula la clave del texto de un capítulo, para buscar su resumen.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        text : str
+            Texto del capítulo.
+
+        Retorna
+        -------
+        bytes
+            Resumen SHA-1 (20 bytes).
+        """
+        return hashlib.sha1(f"{story_number}\x00{text}".encode("utf-8")).digest()
+
+    def get(self, story_number: int, chapter: int, previous: str = "", choice: str = "") -> Optional[str]:
+        """
+        Busca un capítulo pre-generado.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        chapter : int
+            Número del capítulo.
+        previous : str, opcional
+            Texto del capítulo anterior.
+        choice : str, opcional
+            Opción elegida en el capítulo anterior.
+
+        Retorna
+        -------
+        str or None
+            Texto del capítulo, o None si no está en el almacén.
+        """
+        key = self.node_key(story_number, chapter, previous, choice)
+        row = self.__fetchone("SELECT text FROM nodes WHERE key = ?", (key,))
+        with self.__lock:
+            if row is None:
+                self.__misses += 1
+                return None
+            self.__hits += 1
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def contains(self, story_number: int, chapter: int, previous: str = "", choice: str = "") -> bool:
+        """
+        Indica si un capítulo está en el almacén, sin leer su texto ni contar la consulta.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        chapter : int
+            Número del capítulo.
+        previous : str, opcional
+            Texto del capítulo anterior.
+        choice : str, opcional
+            Opción elegida en el capítulo anterior.
+
+        Retorna
+        -------
+        bool
+            True si el capítulo ya está generado.
+        """
+        key = self.node_key(story_number, chapter, previous, choice)
+        return self.__fetchone("SELECT 1 FROM nodes WHERE key = ?", (key,)) is not None
+
+    def summary(self, story_number: int, text: str) -> Optional[str]:
+        """
+        Busca el resumen guardado de un capítulo pre-generado.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        text : str
+            Texto del capítulo.
+
+        Retorna
+        -------
+        str or None
+            Resumen, o None si el capítulo no está en el almacén o no tiene resumen.
+        """
+        row = self.__fetchone("SELECT summary FROM nodes WHERE text_key = ? AND summary IS NOT NULL LIMIT 1",
+                              (self.text_key(story_number, text),))
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def put(self, story_number: int, chapter: int, previous: str, choice: str, text: str, path: str = "",
+            finished: bool = False, model: Optional[str] = None) -> None:
+        """
+        Guarda un capítulo pre-generado.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        chapter : int
+            Número del capítulo.
+        previous : str
+            Texto del capítulo anterior.
+        choice : str
+            Opción elegida en el capítulo anterior.
+        text : str
+            Texto del capítulo.
+        path : str, opcional
+            Opciones elegidas desde el primer capítulo ("AB"...), como referencia.
+        finished : bool, opcional
+            Si la partida termina en este capítulo. Por defecto es False.
+        model : str, opcional
+            Modelo que generó el capítulo.
+        """
+        row = (self.node_key(story_number, chapter, previous, choice), story_number, chapter, path,
+               self.text_key(story_number, text), zlib.compress(text.encode("utf-8"), 9),
+               int(finished), model, time.time())
+        self.__execute(
+            "INSERT INTO nodes (key, story, chapter, path, text_key, text, finished, model, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET text = excluded.text, "
+            "text_key = excluded.text_key, summary = NULL, finished = excluded.finished, model = excluded.model, "
+            "created = excluded.created", row)
+
+    def set_summary(self, story_number: int, text: str, summary: str) -> None:
+        """
+        Guarda el resumen de un capítulo ya almacenado.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        text : str
+            Texto del capítulo.
+        summary : str
+            Resumen del capítulo.
+        """
+        self.__execute("UPDATE nodes SET summary = ? WHERE text_key = ?",
+                       (zlib.compress(summary.encode("utf-8"), 9), self.text_key(story_number, text)))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve el tamaño del almacén y los contadores de consultas.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Capítulos, historias, resúmenes, bytes comprimidos, aciertos y fallos.
+        """
+        row = self.__fetchone(
+            "SELECT COUNT(*), COUNT(DISTINCT story), COUNT(summary), "
+            "COALESCE(SUM(LENGTH(text)), 0) + COALESCE(SUM(LENGTH(summary)), 0) FROM nodes", ()) or (0, 0, 0, 0)
+        with self.__lock:
+            return {"nodes": row[0], "stories": row[1], "summaries": row[2], "bytes": row[3],
+                    "hits": self.__hits, "misses": self.__misses}
+
+    def close(self) -> None:
+        """
+        Cierra la conexión con el archivo SQLite.
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def __fetchone(self, query: str, parameters: tuple) -> Optional[tuple]:
+        """
+        Ejecuta una consulta de lectura y devuelve la primera fila.
+
+        Parámetros
+        ----------
+        query : str
+            Consulta SQL.
+        parameters : tuple
+            Parámetros de la consulta.
+
+        Retorna
+        -------
+        tuple or None
+            Primera fila, o None si no hay resultados o la lectura falla.
+        """
+        try:
+            with self.__lock:
+                return self.__connection.execute(query, parameters).fetchone()
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo leyendo el almacén de capítulos: {e}")
+            return None
+
+    def __execute(self, query: str, parameters: tuple) -> None:
+        """
+        Ejecuta una escritura y la confirma.
+
+        Parámetros
+        ----------
+        query : str
+            Consulta SQL.
+        parameters : tuple
+            Parámetros de la consulta.
+        """
+        with self.__lock:
+            self.__connection.execute(query, parameters)
+            self.__connection.commit()
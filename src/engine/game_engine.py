@@ -0,0 +1,290 @@
+from typing import Dict, Iterator, List, Optional
+from functools import lru_cache, partial
+from agents.llm import Llm
+from agents.scheduler import LlmScheduler
+from agents.speculation import BranchSpeculator
+from engine.chapter_parser import is_game_over
+from engine.game_session import GameSession
+from engine.narrator import Narrator
+from engine.story_recall import StoryRecall
+
+VALID_CHOICES = ("A", "B")
+
+
+class GameEngine:
+    """
+    Motor de juego sin interfaz: hace avanzar partidas (GameSession) capítulo a capítulo.
+
+    Es el punto de entrada común para la aplicación de Streamlit, la API HTTP
+    y cualquier otro cliente. No guarda partidas: recibe la GameSession en
+    cada llamada y la actualiza al terminar de narrar el capítulo.
+
+    Las llamadas al modelo de cada partida se identifican ante el
+    planificador (`LlmScheduler`) con su session_id, para repartir el
+    backend con justicia entre jugadores. Lo que el jugador espera se trata
+    como interactivo; lo que se adelanta en `prepare_next`, como trabajo de
+    resumen o de fondo.
+
+    Con [Recall] activado, el motor busca en los capítulos de la partida los
+    pasajes relevantes para el siguiente (`StoryRecall`) y se los pasa al
+    narrador. La búsqueda no depende de la opción elegida, así que las ramas
+    especulativas y la narración en vivo usan el mismo prompt.
+
+    Atributos
+    ----------
+    narrator : Narrator
+        Lógica de narración utilizada por el motor.
+    """
+
+    def __init__(self, model: Llm):
+        """
+        Inicializa la clase GameEngine.
+
+        Parámetros
+        ----------
+        model : Llm
+            Instancia de la clase Llm para la generación de texto.
+        """
+        self.__narrator = Narrator(model=model)
+
+    @property
+    def narrator(self) -> Narrator:
+        """
+        Narrator: Obtiene la lógica de narración del motor.
+        """
+        return self.__narrator
+
+    def stories(self, page: int = 0, page_size: Optional[int] = None) -> List[Dict]:
+        """
+        Devuelve el catálogo de historias disponibles, por páginas.
+
+        Parámetros
+        ----------
+        page : int, opcional
+            Número de página, empezando en 0. Por defecto es 0.
+        page_size : int, opcional
+            Historias por página. Si es None se devuelven todas.
+
+        Retorna
+        -------
+        List[Dict]
+            Lista con el id, título y sinopsis de cada historia de la página.
+
+        Raises
+        ------
+        ValueError
+            Si `page_size` es menor que 1.
+        """
+        catalog = self.__narrator.stories
+        return catalog.page(page, max(len(catalog), 1) if page_size is None else page_size)
+
+    def new_session(self, story_number: int, session_id: Optional[str] = None) -> GameSession:
+        """
+        Crea una partida nueva sin narrar todavía ningún capítulo.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia elegida.
+        session_id : str, opcional
+            Identificador de la partida. Si es None se genera uno nuevo.
+
+        Retorna
+        -------
+        GameSession
+            Partida nueva.
+
+        Raises
+        ------
+        ValueError
+            Si la historia no existe.
+        """
+        if self.__narrator.chapter_count(story_number) == 0:
+            raise ValueError(f"La historia {story_number} no existe.")
+        return GameSession(story_number=story_number, session_id=session_id)
+
+    def start(self, session: GameSession) -> str:
+        """
+        Narra el primer capítulo de la partida.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida sin empezar; se actualiza con el capítulo narrado.
+
+        Retorna
+        -------
+        str
+            Texto del primer capítulo.
+        """
+        return "".join(self.start_stream(session))
+
+    def start_stream(self, session: GameSession) -> Iterator[str]:
+        """
+        Narra el primer capítulo de la partida en streaming.
+
+        La partida solo se actualiza cuando se ha consumido la respuesta completa.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida sin empezar.
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto del primer capítulo.
+
+        Raises
+        ------
+        ValueError
+            Si la partida ya había empezado.
+        """
+        if session.started:
+            raise ValueError("La partida ya ha empezado.")
+        parts = []
+        with LlmScheduler.context(session.session_id, urgent=True):
+            for token in self.__narrator.narrate_stream(session.story_number, session.chapter):
+                parts.append(token)
+                yield token
+        text = "".join(parts)
+        session.record_chapter(text, finished=self.__is_finished(session, text))
+
+    def choose(self, session: GameSession, choice: str, speculator: Optional[BranchSpeculator] = None) -> str:
+        """
+        Aplica la decisión del jugador y narra el siguiente capítulo.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida en curso; se actualiza con el capítulo narrado.
+        choice : str
+            Opción elegida ("A" o "B").
+        speculator : BranchSpeculator, opcional
+            Especulador de la sesión. Por defecto es None.
+
+        Retorna
+        -------
+        str
+            Texto del nuevo capítulo.
+        """
+        return "".join(self.choose_stream(session, choice, speculator))
+
+    def choose_stream(self, session: GameSession, choice: str,
+                      speculator: Optional[BranchSpeculator] = None) -> Iterator[str]:
+        """
+        Aplica la decisión del jugador y narra el siguiente capítulo en streaming.
+
+        La partida solo se actualiza cuando se ha consumido la respuesta completa.
+        Si con este capítulo termina la partida se cancelan las ramas
+        especulativas que queden en curso: una partida terminada no vuelve a
+        llamar al modelo.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida en curso.
+        choice : str
+            Opción elegida ("A" o "B").
+        speculator : BranchSpeculator, opcional
+            Especulador de la sesión. Por defecto es None.
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto del nuevo capítulo.
+
+        Raises
+        ------
+        ValueError
+            Si la opción no es válida, la partida no ha empezado o ya ha terminado.
+        """
+        if choice not in VALID_CHOICES:
+            raise ValueError(f"Opción no válida: {choice!r}.")
+        if not session.started:
+            raise ValueError("La partida aún no ha empezado.")
+        if session.finished:
+            raise ValueError("La partida ya ha terminado.")
+
+        previous = session.story_text
+        recall = self.__recall(session)
+        parts = []
+        # Contexto del capítulo: lo usa el prompt si hay que narrar en vivo y se guarda como resumen
+        context = lru_cache(maxsize=None)(partial(self.__narrator.memory_for, session.story_number, session.chapter,
+                                                  session.memory, previous, choice))
+        with LlmScheduler.context(session.session_id, urgent=True):
+            for token in self.__narrator.narrate_stream(session.story_number, session.chapter, previous, choice,
+                                                        speculator, memory=session.memory, recall=recall,
+                                                        context=context):
+                parts.append(token)
+                yield token
+            summary = context()
+        text = "".join(parts)
+        session.record_chapter(text, choice=choice, summary=summary, finished=self.__is_finished(session, text))
+        if session.finished:
+            if speculator is not None:
+                speculator.cancel()
+            store = StoryRecall.shared()
+            if store is not None:
+                store.discard(session.session_id)
+
+    def prepare_next(self, session: GameSession, speculator: Optional[BranchSpeculator] = None) -> None:
+        """
+        Adelanta en segundo plano el trabajo del siguiente capítulo mientras el jugador lee.
+
+        Lanza el resumen del capítulo actual (o la condensación de la memoria,
+        si le toca) y, si hay especulador, las dos ramas posibles.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida en curso.
+        speculator : BranchSpeculator, opcional
+            Especulador de la sesión. Por defecto es None.
+        """
+        if not session.started or session.finished:
+            return
+        with LlmScheduler.context(session.session_id):
+            self.__narrator.prefetch_memory(session.story_number, session.chapter, session.memory,
+                                            session.story_text)
+            if speculator is not None:
+                self.__narrator.speculate(speculator, session.story_number, session.chapter, session.story_text,
+                                          memory=session.memory, recall=self.__recall(session))
+
+    def __recall(self, session: GameSession) -> str:
+        """
+        Busca los pasajes de capítulos anteriores relevantes para el siguiente capítulo de la partida.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida en curso.
+
+        Retorna
+        -------
+        str
+            Pasajes para el prompt de narración, o "" si [Recall] está desactivado o no hay ninguno.
+        """
+        store = StoryRecall.shared()
+        story = self.__narrator.stories.get(session.story_number)
+        if store is None or story is None or session.chapter > story.chapter_count:
+            return ""
+        return store.recall(session.session_id, session.chapters, story.chapter(session.chapter))
+
+    def __is_finished(self, session: GameSession, text: str) -> bool:
+        """
+        Indica si la partida termina con el capítulo recién narrado.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida en curso (antes de registrar el capítulo).
+        text : str
+            Texto del capítulo recién narrado.
+
+        Retorna
+        -------
+        bool
+            True si era el último capítulo o el jugador ha muerto.
+        """
+        return session.chapter >= self.__narrator.chapter_count(session.story_number) or is_game_over(text)
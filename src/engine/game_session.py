@@ -0,0 +1,275 @@
+from typing import Dict, List, Optional
+import json
+import sys
+import uuid
+import zlib
+
+# Nivel de zlib de los capítulos y resúmenes antiguos (el mismo que usa el almacén de partidas)
+COMPRESS_LEVEL = 6
+
+
+class GameSession:
+    """
+    Estado serializable de una partida, independiente de la interfaz.
+
+    Guarda la historia elegida, el siguiente capítulo a narrar y, por cada
+    capítulo ya narrado, su texto, la opción elegida al final y el resumen
+    con el que se generó el siguiente. `to_dict` y `from_dict` permiten
+    guardarlo o enviarlo entre procesos.
+
+    Para que muchas partidas abiertas a la vez ocupen poco, el estado es
+    compacto: la historia se guarda solo por su ID (el catálogo es compartido
+    por el proceso), la clase usa `__slots__`, las opciones elegidas se
+    internan y solo el último capítulo y el último resumen, los que se leen
+    en cada re-ejecución, se guardan como texto; los anteriores se guardan
+    juntos en un solo bloque comprimido con zlib (comparten vocabulario y se
+    comprimen mejor que uno a uno) y se descomprimen al pedir `chapters` o
+    `summaries`.
+
+    Atributos
+    ----------
+    session_id : str
+        Identificador de la partida.
+    story_number : int
+        ID de la historia que se está jugando.
+    chapter : int
+        Número del siguiente capítulo a narrar (1 si aún no ha empezado).
+    story_text : str
+        Texto del último capítulo narrado, o "" si aún no ha empezado.
+    chapters : List[str]
+        Textos de los capítulos narrados, en orden.
+    choices : List[str]
+        Opciones elegidas por el jugador, una por cada capítulo superado.
+    summaries : List[str]
+        Resúmenes usados para narrar cada capítulo a partir del segundo.
+    memory : str
+        Memoria de la partida con la que se narró el último capítulo.
+    finished : bool
+        Indica si la partida ha terminado.
+    """
+
+    __slots__ = ("__session_id", "__story_number", "__chapter", "__story_text", "__old_chapters", "__choices",
+                 "__memory", "__old_summaries", "__finished")
+
+    def __init__(self, story_number: int, session_id: Optional[str] = None, chapter: int = 1,
+                 chapters: Optional[List[str]] = None, choices: Optional[List[str]] = None,
+                 summaries: Optional[List[str]] = None, finished: bool = False):
+        """
+        Inicializa la clase GameSession.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está jugando.
+        session_id : str, opcional
+            Identificador de la partida. Si es None se genera uno nuevo.
+        chapter : int, opcional
+            Siguiente capítulo a narrar. Por defecto es 1.
+        chapters : List[str], opcional
+            Textos de los capítulos ya narrados.
+        choices : List[str], opcional
+            Opciones ya elegidas.
+        summaries : List[str], opcional
+            Resúmenes ya calculados.
+        finished : bool, opcional
+            Si la partida ya ha terminado. Por defecto es False.
+        """
+        self.__session_id = session_id or uuid.uuid4().hex
+        self.__story_number = story_number
+        self.__chapter = chapter
+        chapters = list(chapters or [])
+        summaries = list(summaries or [])
+        # Último capítulo y último resumen como texto (None si aún no hay); los anteriores, comprimidos
+        self.__story_text: Optional[str] = chapters.pop() if chapters else None
+        self.__old_chapters = self.__compress(chapters)
+        self.__memory: Optional[str] = summaries.pop() if summaries else None
+        self.__old_summaries = self.__compress(summaries)
+        self.__choices: List[str] = [sys.intern(choice) for choice in choices or []]
+        self.__finished = finished
+
+    @property
+    def session_id(self) -> str:
+        """
+        str: Obtiene el identificador de la partida.
+        """
+        return self.__session_id
+
+    @property
+    def story_number(self) -> int:
+        """
+        int: Obtiene el ID de la historia.
+        """
+        return self.__story_number
+
+    @property
+    def chapter(self) -> int:
+        """
+        int: Obtiene el número del siguiente capítulo a narrar.
+        """
+        return self.__chapter
+
+    @property
+    def story_text(self) -> str:
+        """
+        str: Obtiene el texto del último capítulo narrado.
+        """
+        return self.__story_text or ""
+
+    @property
+    def chapters(self) -> List[str]:
+        """
+        List[str]: Obtiene los textos de los capítulos narrados (descomprime los anteriores al último).
+        """
+        return self.__expand(self.__old_chapters, self.__story_text)
+
+    @property
+    def choices(self) -> List[str]:
+        """
+        List[str]: Obtiene una copia de las opciones elegidas.
+        """
+        return list(self.__choices)
+
+    @property
+    def summaries(self) -> List[str]:
+        """
+        List[str]: Obtiene los resúmenes calculados (descomprime los anteriores al último).
+        """
+        return self.__expand(self.__old_summaries, self.__memory)
+
+    @property
+    def memory(self) -> str:
+        """
+        str: Obtiene la memoria de la partida: el último resumen usado, o "" si aún no hay.
+        """
+        return self.__memory or ""
+
+    @property
+    def finished(self) -> bool:
+        """
+        bool: Indica si la partida ha terminado.
+        """
+        return self.__finished
+
+    @property
+    def started(self) -> bool:
+        """
+        bool: Indica si ya se ha narrado el primer capítulo.
+        """
+        return self.__story_text is not None
+
+    def record_chapter(self, text: str, choice: str = "", summary: str = "", finished: bool = False) -> None:
+        """
+        Registra un capítulo recién narrado y avanza el contador.
+
+        Parámetros
+        ----------
+        text : str
+            Texto del nuevo capítulo.
+        choice : str, opcional
+            Opción elegida en el capítulo anterior que llevó a este. Por defecto es "".
+        summary : str, opcional
+            Resumen usado para narrarlo. Por defecto es "".
+        finished : bool, opcional
+            Si con este capítulo termina la partida. Por defecto es False.
+        """
+        if choice:
+            self.__choices.append(sys.intern(choice))
+            if self.__memory is not None:
+                self.__old_summaries = self.__compress(self.__expand(self.__old_summaries, self.__memory))
+            self.__memory = summary
+        if self.__story_text is not None:
+            # Se recomprime todo el bloque: con diez capítulos cuesta alrededor de un milisegundo
+            self.__old_chapters = self.__compress(self.__expand(self.__old_chapters, self.__story_text))
+        self.__story_text = text
+        self.__chapter += 1
+        self.__finished = finished
+
+    def to_dict(self) -> Dict:
+        """
+        Convierte el estado en un diccionario serializable a JSON.
+
+        Retorna
+        -------
+        Dict
+            Estado completo de la partida.
+        """
+        return {
+            "session_id": self.__session_id,
+            "story_number": self.__story_number,
+            "chapter": self.__chapter,
+            "chapters": self.chapters,
+            "choices": list(self.__choices),
+            "summaries": self.summaries,
+            "finished": self.__finished,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GameSession":
+        """
+        Reconstruye una partida a partir de `to_dict`.
+
+        Parámetros
+        ----------
+        data : Dict
+            Estado de la partida.
+
+        Retorna
+        -------
+        GameSession
+            Partida reconstruida.
+
+        Raises
+        ------
+        KeyError
+            Si falta el campo obligatorio 'story_number'.
+        """
+        return cls(
+            story_number=int(data["story_number"]),
+            session_id=data.get("session_id"),
+            chapter=int(data.get("chapter", 1)),
+            chapters=data.get("chapters"),
+            choices=data.get("choices"),
+            summaries=data.get("summaries"),
+            finished=bool(data.get("finished", False)),
+        )
+
+    @staticmethod
+    def __compress(texts: List[str]) -> bytes:
+        """
+        Comprime los textos antiguos de la partida en un solo bloque.
+
+        Parámetros
+        ----------
+        texts : List[str]
+            Textos a comprimir, en orden.
+
+        Retorna
+        -------
+        bytes
+            Lista en JSON comprimida con zlib, o b"" si está vacía.
+        """
+        if not texts:
+            return b""
+        return zlib.compress(json.dumps(texts, ensure_ascii=False).encode("utf-8"), COMPRESS_LEVEL)
+
+    @staticmethod
+    def __expand(old: bytes, last: Optional[str]) -> List[str]:
+        """
+        Reconstruye una lista de textos a partir del bloque comprimido y el último.
+
+        Parámetros
+        ----------
+        old : bytes
+            Textos anteriores al último, comprimidos con `__compress`.
+        last : str or None
+            Último texto, o None si la lista está vacía.
+
+        Retorna
+        -------
+        List[str]
+            Textos en orden.
+        """
+        texts: List[str] = json.loads(zlib.decompress(old).decode("utf-8")) if old else []
+        if last is not None:
+            texts.append(last)
+        return texts
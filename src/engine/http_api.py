@@ -0,0 +1,471 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from agents.llm import Llm
+from agents.scheduler import LlmScheduler, SchedulerBusy
+from agents.telemetry import Telemetry
+from agents.warmup import ModelWarmup
+from data.sys_prompts import story_teller
+from engine.game_engine import GameEngine
+from engine.game_session import GameSession
+from engine.session_store import MemorySessionStore, SessionStore, SqliteSessionStore
+from engine.story_recall import StoryRecall
+import argparse
+import json
+import threading
+
+# Segundos que se sugiere esperar (cabecera Retry-After) cuando el modelo está saturado
+RETRY_AFTER_SECONDS = 5
+
+
+class NotFound(KeyError):
+    """
+    La ruta o la partida pedida no existe; la API responde 404.
+
+    Solo esta excepción se traduce en 404: cualquier otro KeyError es un
+    fallo interno y se responde con 500.
+    """
+
+
+class GameApi:
+    """
+    API JSON del motor de juego, independiente del servidor HTTP.
+
+    Rutas disponibles:
+
+    - GET /health: estado del servicio, del calentamiento del modelo y de cada backend.
+    - GET /ready: 200 si el modelo ya está cargado, 503 si no (para balanceadores);
+      incluye "busy" si la cola del modelo está saturada.
+    - GET /stories?page=0&page_size=100: catálogo de historias, por páginas.
+    - GET /metrics: métricas de las llamadas al modelo en formato Prometheus
+      (texto; lo sirve directamente GameApiHandler).
+    - POST /sessions {"story_number": 1}: crea una partida y narra el primer capítulo.
+    - GET /sessions/<id>: estado de una partida.
+    - POST /sessions/<id>/choice {"choice": "A"}: aplica la decisión y narra el siguiente capítulo.
+    - DELETE /sessions/<id>: elimina una partida.
+    - POST /advance {"session": {...}, "choice": "A"}: versión sin estado en el
+      servidor; el cliente envía la partida completa y recibe la actualizada,
+      lo que permite repartir peticiones entre varios procesos.
+
+    Si el planificador de llamadas al modelo rechaza una narración porque el
+    backend está saturado (`SchedulerBusy`), la respuesta es 503 con la
+    cabecera Retry-After; la partida queda como estaba.
+
+    Atributos
+    ----------
+    engine : GameEngine
+        Motor de juego.
+    store : SessionStore
+        Almacén de partidas (en memoria o en SQLite).
+    """
+
+    def __init__(self, engine: GameEngine, store: SessionStore, warmup: Optional[ModelWarmup] = None):
+        """
+        Inicializa la clase GameApi.
+
+        Parámetros
+        ----------
+        engine : GameEngine
+            Motor de juego.
+        store : SessionStore
+            Almacén de partidas.
+        warmup : ModelWarmup, opcional
+            Calentador del modelo; si es None la API se considera siempre lista.
+        """
+        self.__engine = engine
+        self.__store = store
+        self.__warmup = warmup
+        self.__locks: Dict[str, threading.Lock] = {}
+        self.__locks_lock = threading.Lock()
+
+    @property
+    def engine(self) -> GameEngine:
+        """
+        GameEngine: Obtiene el motor de juego.
+        """
+        return self.__engine
+
+    @property
+    def store(self) -> SessionStore:
+        """
+        SessionStore: Obtiene el almacén de partidas.
+        """
+        return self.__store
+
+    def handle(self, method: str, parts: List[str], body: Dict) -> Tuple[int, Dict]:
+        """
+        Resuelve una petición.
+
+        Parámetros
+        ----------
+        method : str
+            Método HTTP.
+        parts : List[str]
+            Segmentos de la ruta (sin barras).
+        body : Dict
+            Cuerpo JSON de la petición ({} si no hay); en las peticiones GET,
+            los parámetros de la query string.
+
+        Retorna
+        -------
+        Tuple[int, Dict]
+            Código de estado HTTP y respuesta JSON.
+
+        Raises
+        ------
+        ValueError
+            Si la petición no es válida.
+        NotFound
+            Si la ruta o la partida no existen.
+        """
+        if method == "GET" and parts == ["health"]:
+            model = self.__warmup.status() if self.__warmup else None
+            scheduler = LlmScheduler.shared()
+            recall = StoryRecall.shared()
+            return 200, {"status": "ok", "sessions": self.__store.size, "model": model,
+                         "backends": self.__engine.narrator.model.backend_stats(),
+                         "scheduler": scheduler.stats() if scheduler else None,
+                         "recall": recall.stats() if recall else None}
+        if method == "GET" and parts == ["ready"]:
+            ready = self.__warmup is None or self.__warmup.ready
+            scheduler = LlmScheduler.shared()
+            return (200 if ready else 503), {"ready": ready, "model": self.__warmup.status() if self.__warmup else None,
+                                             "busy": scheduler.busy if scheduler else False}
+        if method == "GET" and parts == ["stories"]:
+            page, page_size = int(body.get("page", 0)), int(body.get("page_size", 100))
+            catalog = self.__engine.narrator.stories
+            return 200, {"stories": self.__engine.stories(page, page_size), "page": page,
+                         "pages": catalog.page_count(page_size), "total": len(catalog)}
+        if method == "POST" and parts == ["sessions"]:
+            return self.__create(body)
+        if method == "POST" and parts == ["advance"]:
+            return self.__advance(body)
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session_id = parts[1]
+            if method == "GET" and len(parts) == 2:
+                return 200, {"session": self.__load(session_id).to_dict()}
+            if method == "DELETE" and len(parts) == 2:
+                if not self.__store.delete(session_id):
+                    raise NotFound(session_id)
+                with self.__locks_lock:
+                    self.__locks.pop(session_id, None)
+                return 200, {"deleted": session_id}
+            if method == "POST" and parts[2:] == ["choice"]:
+                return self.__choose(session_id, body)
+        raise NotFound("/".join(parts))
+
+    def __create(self, body: Dict) -> Tuple[int, Dict]:
+        """
+        Crea una partida y narra su primer capítulo.
+
+        Parámetros
+        ----------
+        body : Dict
+            Debe contener "story_number".
+
+        Retorna
+        -------
+        Tuple[int, Dict]
+            201 y la partida creada junto al texto del capítulo.
+        """
+        if "story_number" not in body:
+            raise ValueError("Falta 'story_number'.")
+        session = self.__engine.new_session(int(body["story_number"]))
+        text = self.__engine.start(session)
+        self.__store.put(session)
+        return 201, {"session": session.to_dict(), "text": text}
+
+    def __choose(self, session_id: str, body: Dict) -> Tuple[int, Dict]:
+        """
+        Aplica la decisión del jugador a una partida guardada.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+        body : Dict
+            Debe contener "choice".
+
+        Retorna
+        -------
+        Tuple[int, Dict]
+            200 y la partida actualizada junto al texto del capítulo.
+        """
+        with self.__session_lock(session_id):
+            session = self.__load(session_id)
+            text = self.__engine.choose(session, str(body.get("choice", "")))
+            self.__store.put(session)
+        self.__engine.prepare_next(session)
+        return 200, {"session": session.to_dict(), "text": text}
+
+    def __advance(self, body: Dict) -> Tuple[int, Dict]:
+        """
+        Avanza una partida enviada por el cliente, sin guardarla en el servidor.
+
+        Parámetros
+        ----------
+        body : Dict
+            Debe contener "session" y, si la partida ya empezó, "choice".
+
+        Retorna
+        -------
+        Tuple[int, Dict]
+            200 y la partida actualizada junto al texto del capítulo.
+        """
+        if "session" not in body:
+            raise ValueError("Falta 'session'.")
+        try:
+            session = GameSession.from_dict(body["session"])
+        except (KeyError, TypeError, AttributeError) as e:
+            # La partida la envía el cliente: si está incompleta es un error de la petición
+            raise ValueError(f"Partida no válida: falta o sobra {e}.")
+        if session.started:
+            text = self.__engine.choose(session, str(body.get("choice", "")))
+        else:
+            text = self.__engine.start(session)
+        return 200, {"session": session.to_dict(), "text": text}
+
+    def __load(self, session_id: str) -> GameSession:
+        """
+        Recupera una partida guardada.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        GameSession
+            Partida guardada.
+
+        Raises
+        ------
+        NotFound
+            Si la partida no existe.
+        """
+        session = self.__store.get(session_id)
+        if session is None:
+            raise NotFound(session_id)
+        return session
+
+    def __session_lock(self, session_id: str) -> threading.Lock:
+        """
+        Devuelve el cerrojo que serializa las decisiones sobre una misma partida.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        threading.Lock
+            Cerrojo de la partida.
+        """
+        with self.__locks_lock:
+            return self.__locks.setdefault(session_id, threading.Lock())
+
+
+class GameApiHandler(BaseHTTPRequestHandler):
+    """
+    Manejador HTTP que traduce las peticiones a llamadas de GameApi.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.__dispatch("GET")
+
+    def do_POST(self) -> None:
+        self.__dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self.__dispatch("DELETE")
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def __dispatch(self, method: str) -> None:
+        """
+        Lee la petición, la resuelve con GameApi y escribe la respuesta JSON.
+
+        Parámetros
+        ----------
+        method : str
+            Método HTTP.
+        """
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if method == "GET" and parts == ["metrics"]:
+            self.__send_text(200, Telemetry.shared().prometheus())
+            return
+        try:
+            if method == "GET":
+                body = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            else:
+                body = self.__read_json()
+            status, payload = self.server.api.handle(method, parts, body)
+        except SchedulerBusy as e:
+            self.__send_json(503, {"error": str(e), "busy": True}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+            return
+        except ValueError as e:
+            status, payload = 400, {"error": str(e)}
+        except NotFound as e:
+            status, payload = 404, {"error": f"No encontrado: {e}"}
+        except Exception as e:
+            print(f"[Error] Fallo atendiendo {method} {self.path}: {e}")
+            status, payload = 500, {"error": "Error interno del servidor."}
+        self.__send_json(status, payload)
+
+    def __read_json(self) -> Dict:
+        """
+        Lee el cuerpo JSON de la petición.
+
+        Retorna
+        -------
+        Dict
+            Cuerpo de la petición, o {} si está vacío.
+
+        Raises
+        ------
+        ValueError
+            Si el cuerpo no es un objeto JSON válido.
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("El cuerpo debe ser un objeto JSON.")
+        return body
+
+    def __send_text(self, status: int, text: str) -> None:
+        """
+        Escribe una respuesta de texto en el formato de exposición de Prometheus.
+
+        Parámetros
+        ----------
+        status : int
+            Código de estado HTTP.
+        text : str
+            Cuerpo de la respuesta.
+        """
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def __send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Escribe una respuesta JSON.
+
+        Parámetros
+        ----------
+        status : int
+            Código de estado HTTP.
+        payload : Dict
+            Respuesta a serializar.
+        headers : Dict[str, str], opcional
+            Cabeceras adicionales.
+        """
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class GameApiServer(ThreadingHTTPServer):
+    """
+    Servidor HTTP de la API que atiende las peticiones con un pool de hilos acotado.
+
+    Atributos
+    ----------
+    api : GameApi
+        API que resuelve las peticiones.
+    workers : int
+        Número de hilos del pool.
+    verbose : bool
+        Si es True se registra cada petición.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], api: GameApi, workers: int = 8, verbose: bool = False):
+        """
+        Inicializa la clase GameApiServer.
+
+        Parámetros
+        ----------
+        address : Tuple[str, int]
+            Host y puerto donde escuchar.
+        api : GameApi
+            API que resuelve las peticiones.
+        workers : int, opcional
+            Número de hilos del pool. Por defecto es 8.
+        verbose : bool, opcional
+            Si es True se registra cada petición. Por defecto es False.
+        """
+        super().__init__(address, GameApiHandler)
+        self.api = api
+        self.workers = workers
+        self.verbose = verbose
+        self.__pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="game-api")
+
+    def process_request(self, request, client_address) -> None:
+        # En lugar de un hilo por conexión, se reparte en el pool acotado
+        self.__pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Arranca la API HTTP del motor de juego.
+
+    Parámetros
+    ----------
+    argv : List[str], opcional
+        Argumentos de línea de comandos. Por defecto se usan los del proceso.
+    """
+    parser = argparse.ArgumentParser(description="API HTTP JSON del motor de juego.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--url", action="append", default=None,
+                        help="URL base de una API compatible con OpenAI; se puede repetir para repartir "
+                             "las peticiones entre varios backends. Por defecto Ollama en localhost.")
+    parser.add_argument("--api-key", default="ollama")
+    parser.add_argument("--memory-sessions", action="store_true",
+                        help="Guarda las partidas solo en memoria aunque [Sessions] esté activado.")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    urls = args.url or ["http://localhost:11434/v1"]
+    model = Llm(url=urls[0], api_key=args.api_key, system_prompt=story_teller, backends=args.url)
+    warmups = ModelWarmup.start_all(model.backends, args.api_key) if ModelWarmup.enabled() else []
+    warmup = warmups[0] if warmups else None
+    store = None if args.memory_sessions else SqliteSessionStore.shared()
+    api = GameApi(engine=GameEngine(model=model), store=store or MemorySessionStore(), warmup=warmup)
+    server = GameApiServer((args.host, args.port), api, workers=args.workers, verbose=args.verbose)
+    print(f"API escuchando en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,919 @@
+import hashlib
+import threading
+from functools import partial
+from typing import Callable, Dict, Iterator, Optional
+from agents.context_budget import approximate_tokens
+from agents.llm import Llm
+from agents.prefetch import SummaryPrefetcher
+from agents.speculation import BranchSpeculator
+from agents.telemetry import Telemetry
+from agents.warmup import ModelWarmup
+from config.model_config import ModelConfig
+from data.sys_prompts import summarizator, story_teller
+from engine.chapter_parser import OptionsCutoff, is_game_over, parse_chapter
+from engine.content_store import ContentStore
+from engine.story_catalog import Story, StoryCatalog
+from engine.story_memory import StoryMemory
+
+
+class Narrator:
+    """
+    Lógica de narración independiente de la interfaz.
+
+    Construye los prompts a partir del catálogo de historias, resume los
+    capítulos anteriores y genera los nuevos con el modelo de lenguaje. No
+    guarda estado de partida: el capítulo a narrar se recibe en cada llamada,
+    de modo que una instancia puede atender a cualquier sesión, ya sea desde
+    Streamlit, desde la API HTTP o desde un banco de pruebas.
+
+    Atributos
+    ----------
+    stories : StoryCatalog
+        Catálogo de historias indexado por id.
+    model : Llm
+        Instancia de la clase Llm para interactuar con el modelo de lenguaje.
+    content : ContentStore or None
+        Capítulos pre-generados (`python -m engine.prerender`), si hay almacén.
+
+    Notas
+    -----
+    El catálogo de historias se carga una sola vez por proceso y lo comparten
+    todas las instancias; `reload_stories` lo vuelve a leer del disco.
+
+    Los capítulos y resúmenes que están en el almacén de pre-generados se
+    sirven sin llamar al modelo; por debajo de la profundidad pre-generada
+    la narración sigue en vivo.
+
+    Con `early_stop` (sección [Pipeline]) cada capítulo se pide en streaming
+    y la petición se cierra en cuanto el modelo termina la línea de la opción
+    B o escribe "FIN DEL JUEGO", de modo que no se generan tokens que luego
+    no se muestran.
+
+    Con `summary_mode=rolling` el contexto de cada capítulo es la memoria de
+    la partida (`StoryMemory`): crece sin llamar al modelo con las últimas
+    frases de cada capítulo y la decisión tomada, y solo se condensa con una
+    llamada de resumen cuando supera su presupuesto de tokens.
+
+    Con [Recall] el prompt de narración incluye además unos pocos pasajes de
+    capítulos anteriores relevantes para el siguiente (`StoryRecall`); los
+    busca el motor de juego, que conoce los capítulos de la partida, y los
+    pasa en el argumento `recall`.
+    """
+
+    def __init__(self, model: Llm, content: Optional[ContentStore] = None):
+        """
+        Inicializa la clase Narrator.
+
+        Parámetros
+        ----------
+        model : Llm
+            Instancia de la clase Llm para la generación de texto.
+        content : ContentStore, opcional
+            Almacén de capítulos pre-generados. Si es None se usa el de la
+            sección [Prerender] de model.config, si existe.
+        """
+        self.__stories = StoryCatalog.shared()
+        self.__model: Llm = model
+        self.__content: Optional[ContentStore] = content if content is not None else ContentStore.shared()
+
+    @property
+    def stories(self) -> StoryCatalog:
+        """
+        StoryCatalog: Obtiene el catálogo de historias.
+        """
+        return self.__stories
+
+    @property
+    def model(self) -> Llm:
+        """
+        Llm: Obtiene la instancia del modelo de lenguaje.
+        """
+        return self.__model
+
+    @property
+    def content(self) -> Optional[ContentStore]:
+        """
+        ContentStore or None: Obtiene el almacén de capítulos pre-generados.
+        """
+        return self.__content
+
+    def chapter_count(self, story_number: int) -> int:
+        """
+        Devuelve el número de capítulos de una historia.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+
+        Retorna
+        -------
+        int
+            Número de capítulos, o 0 si la historia no existe.
+        """
+        story = self.__stories.get(story_number)
+        return story.chapter_count if story else 0
+
+    @staticmethod
+    def reload_stories() -> StoryCatalog:
+        """
+        Descarta el catálogo compartido y lo vuelve a cargar.
+
+        Las instancias ya creadas conservan el catálogo anterior.
+
+        Retorna
+        -------
+        StoryCatalog
+            Catálogo recién cargado.
+        """
+        StoryCatalog.invalidate()
+        return StoryCatalog.shared()
+
+    def narrate(self, story_number: int, chapter: int, text_response_ai: str = "", user_response: str = "",
+                speculator: Optional[BranchSpeculator] = None, memory: Optional[str] = None,
+                recall: str = "", context: Optional[Callable[[], str]] = None) -> str:
+        """
+        Genera un capítulo de la historia utilizando el modelo de lenguaje.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo a narrar.
+        text_response_ai : str, opcional
+            Texto del capítulo anterior generado por la IA. Por defecto es "".
+        user_response : str, opcional
+            Elección del usuario en el capítulo anterior. Por defecto es "".
+        speculator : BranchSpeculator, opcional
+            Especulador de la sesión; si ya tiene la rama elegida se usa sin
+            volver a llamar al modelo. Por defecto es None.
+        memory : str, opcional
+            Memoria de la partida hasta el capítulo anterior a `text_response_ai`
+            (`GameSession.memory`), para el modo "rolling". Por defecto es None.
+        recall : str, opcional
+            Pasajes de capítulos anteriores para el prompt (`StoryRecall.recall`). Por defecto es "".
+        context : Callable[[], str], opcional
+            Devuelve el contexto del capítulo ya calculado por quien llama
+            (`memory_for`), para no calcularlo dos veces. Solo se llama si hay
+            que construir el prompt, no si el capítulo está pre-generado o
+            especulado. Por defecto se calcula con `memory_for`.
+
+        Retorna
+        -------
+        str
+            Texto del nuevo capítulo generado por el modelo.
+
+        Raises
+        ------
+        ValueError
+            Si la historia no existe.
+        """
+        with Telemetry.shared().span("narrate", story=story_number, chapter=chapter, stream=False,
+                                     model_ready=self.__model_ready()) as span:
+            response = self.__prerendered(story_number, chapter, text_response_ai, user_response)
+            span["prerendered"] = response is not None
+            if response is None:
+                response = self.__take_speculation(speculator, story_number, chapter, text_response_ai, user_response)
+                span["speculated"] = response is not None
+            if response is None:
+                prompt = self.__compose_prompt(story_number, chapter, text_response_ai, user_response, memory,
+                                               recall, context)
+                span["prompt_tokens"] = approximate_tokens(prompt)
+                limits = self.__generation_limits()
+                if limits["cutoff"] is None:
+                    response = self.__model.generate_response(user_message=prompt, system_prompt=story_teller,
+                                                              purpose="narration")
+                else:
+                    # En streaming para poder cerrar la petición tras las opciones
+                    response = "".join(self.__model.generate_response_stream(
+                        user_message=prompt, system_prompt=story_teller, purpose="narration", **limits))
+        return response
+
+    def narrate_stream(self, story_number: int, chapter: int, text_response_ai: str = "", user_response: str = "",
+                       speculator: Optional[BranchSpeculator] = None, memory: Optional[str] = None,
+                       recall: str = "", context: Optional[Callable[[], str]] = None) -> Iterator[str]:
+        """
+        Genera un capítulo de la historia devolviendo el texto en streaming.
+
+        El resumen del capítulo anterior se obtiene antes de emitir el primer token.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo a narrar.
+        text_response_ai : str, opcional
+            Texto del capítulo anterior generado por la IA. Por defecto es "".
+        user_response : str, opcional
+            Elección del usuario en el capítulo anterior. Por defecto es "".
+        speculator : BranchSpeculator, opcional
+            Especulador de la sesión; si ya tiene la rama elegida se emite
+            completa de una vez, igual que un capítulo pre-generado. Por defecto es None.
+        memory : str, opcional
+            Memoria de la partida hasta el capítulo anterior a `text_response_ai`
+            (`GameSession.memory`), para el modo "rolling". Por defecto es None.
+        recall : str, opcional
+            Pasajes de capítulos anteriores para el prompt (`StoryRecall.recall`). Por defecto es "".
+        context : Callable[[], str], opcional
+            Devuelve el contexto del capítulo ya calculado por quien llama
+            (`memory_for`), para no calcularlo dos veces. Solo se llama si hay
+            que construir el prompt, no si el capítulo está pre-generado o
+            especulado. Por defecto se calcula con `memory_for`.
+
+        Retorna
+        -------
+        Iterator[str]
+            Fragmentos de texto del nuevo capítulo según los genera el modelo.
+
+        Raises
+        ------
+        ValueError
+            Si la historia no existe.
+        """
+        with Telemetry.shared().span("narrate", story=story_number, chapter=chapter, stream=True,
+                                     model_ready=self.__model_ready()) as span:
+            response = self.__prerendered(story_number, chapter, text_response_ai, user_response)
+            span["prerendered"] = response is not None
+            if response is None:
+                response = self.__take_speculation(speculator, story_number, chapter, text_response_ai, user_response)
+                span["speculated"] = response is not None
+            if response is not None:
+                yield response
+                return
+            prompt = self.__compose_prompt(story_number, chapter, text_response_ai, user_response, memory, recall,
+                                           context)
+            span["prompt_tokens"] = approximate_tokens(prompt)
+            yield from self.__model.generate_response_stream(user_message=prompt, system_prompt=story_teller,
+                                                             purpose="narration", **self.__generation_limits())
+
+    def speculate(self, speculator: BranchSpeculator, story_number: int, chapter: int, text_response_ai: str,
+                  memory: Optional[str] = None, recall: str = "") -> int:
+        """
+        Lanza en segundo plano el siguiente capítulo para las opciones A y B.
+
+        No hace nada si la historia ha terminado, si ya se especuló desde
+        este mismo capítulo o si las dos ramas están pre-generadas.
+
+        Parámetros
+        ----------
+        speculator : BranchSpeculator
+            Especulador de la sesión.
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo que se generará a continuación.
+        text_response_ai : str
+            Texto del capítulo que el jugador está leyendo.
+        memory : str, opcional
+            Memoria de la partida hasta el capítulo anterior (modo "rolling").
+        recall : str, opcional
+            Pasajes de capítulos anteriores para el prompt. Igual para las dos ramas.
+
+        Retorna
+        -------
+        int
+            Número de ramas lanzadas.
+        """
+        story = self.__stories.get(story_number)
+        if story is None or chapter > story.chapter_count or is_game_over(text_response_ai):
+            return 0
+        if self.__content is not None and all(
+                self.__content.contains(story_number, chapter, text_response_ai, choice) for choice in ("A", "B")):
+            return 0
+
+        key = BranchSpeculator.make_key(story_number, chapter, text_response_ai)
+        generators = {
+            choice: partial(self.__speculative_chapter, story_number, chapter, text_response_ai, choice, memory, recall)
+            for choice in ("A", "B")
+        }
+        return speculator.start(key, generators)
+
+    def prefetch_summary(self, story_number: int, text_response_ai: str) -> None:
+        """
+        Lanza en segundo plano el resumen del capítulo que el jugador está leyendo.
+
+        Así, al elegir opción, la narración del siguiente capítulo solo tiene
+        que esperar a una llamada al modelo en lugar de dos.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        text_response_ai : str
+            Texto del capítulo mostrado.
+        """
+        if not text_response_ai or self.__summary_mode() != "prefetch":
+            return
+        story = self.__stories.get(story_number)
+        if story is None or self.__stored_summary(story_number, text_response_ai) is not None:
+            return
+        key = self.__summary_key(story_number, text_response_ai)
+        SummaryPrefetcher.shared().prefetch(key, partial(self.__summarize_chapter, story, text_response_ai))
+
+    def summary_for(self, story_number: int, text_response_ai: str, sinopsis: Optional[str] = None) -> str:
+        """
+        Obtiene el resumen de la historia hasta el capítulo anterior.
+
+        En modo "prefetch" se usa el resumen pre-generado si el capítulo está
+        en el almacén, o el resumen adelantado (esperándolo si sigue en
+        curso); en modo "fold" no se llama al modelo y el capítulo anterior
+        se pasa tal cual a la narración.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        text_response_ai : str
+            Texto del capítulo anterior.
+        sinopsis : str, opcional
+            Sinopsis de la historia. Si es None se busca en el catálogo.
+
+        Retorna
+        -------
+        str
+            Resumen (o texto) con los sucesos previos.
+
+        Raises
+        ------
+        ValueError
+            Si la historia no existe.
+        """
+        if self.__summary_mode() == "fold":
+            return text_response_ai
+        story = self.__story(story_number)
+        if sinopsis is not None:
+            story = Story(story.id, story.titulo, sinopsis, story.chapters)
+        else:
+            stored = self.__stored_summary(story_number, text_response_ai)
+            if stored is not None:
+                return stored
+        key = self.__summary_key(story_number, text_response_ai)
+        return SummaryPrefetcher.shared().get(key, partial(self.__summarize_chapter, story, text_response_ai))
+
+    def memory_for(self, story_number: int, chapter: int, memory: str, text_response_ai: str,
+                   user_response: str) -> str:
+        """
+        Obtiene el contexto con el que se narra un capítulo: la memoria de la partida o el resumen.
+
+        En modo "rolling" añade a la memoria la entrada del capítulo anterior
+        y la decisión del jugador, y solo llama al modelo si con ello supera
+        su presupuesto y hay que condensarla (usando el resultado adelantado
+        por `prefetch_memory` si existe). En los demás modos equivale a
+        `summary_for`.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo que se va a narrar.
+        memory : str
+            Memoria de la partida hasta el capítulo anterior a `text_response_ai`
+            ("" si este es el primero).
+        text_response_ai : str
+            Texto del capítulo anterior.
+        user_response : str
+            Elección del usuario.
+
+        Retorna
+        -------
+        str
+            Memoria actualizada (o resumen) para el prompt de narración.
+
+        Raises
+        ------
+        ValueError
+            Si la historia no existe.
+        """
+        if self.__summary_mode() != "rolling":
+            return self.summary_for(story_number, text_response_ai)
+        store = StoryMemory.shared()
+        merged = self.__merge_memory(store, chapter, memory, text_response_ai)
+        if store.over_budget(merged):
+            story = self.__story(story_number)
+            merged = SummaryPrefetcher.shared().get(self.__memory_key(story_number, merged),
+                                                    partial(self.__condense_memory, story, merged))
+        return store.with_choice(merged, self.__choice_text(text_response_ai, user_response))
+
+    def prefetch_memory(self, story_number: int, chapter: int, memory: str, text_response_ai: str) -> None:
+        """
+        Adelanta en segundo plano el trabajo de contexto del siguiente capítulo mientras el jugador lee.
+
+        En modo "rolling" solo hay trabajo si el capítulo mostrado hace que la
+        memoria supere su presupuesto: entonces se condensa ya, porque no
+        depende de la opción que se elija. En modo "prefetch" se adelanta el
+        resumen del capítulo (`prefetch_summary`).
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo que se narrará a continuación.
+        memory : str
+            Memoria de la partida hasta el capítulo anterior al mostrado.
+        text_response_ai : str
+            Texto del capítulo mostrado.
+        """
+        if self.__summary_mode() != "rolling":
+            self.prefetch_summary(story_number, text_response_ai)
+            return
+        story = self.__stories.get(story_number)
+        if not text_response_ai or story is None:
+            return
+        store = StoryMemory.shared()
+        merged = self.__merge_memory(store, chapter, memory, text_response_ai)
+        if store.over_budget(merged):
+            SummaryPrefetcher.shared().prefetch(self.__memory_key(story_number, merged),
+                                                partial(self.__condense_memory, story, merged))
+
+    @staticmethod
+    def __merge_memory(store: StoryMemory, chapter: int, memory: str, text_response_ai: str) -> str:
+        """
+        Añade a la memoria la entrada del capítulo anterior, sin condensarla.
+
+        Parámetros
+        ----------
+        store : StoryMemory
+            Configuración de la memoria.
+        chapter : int
+            Número del capítulo que se va a narrar.
+        memory : str
+            Memoria hasta el capítulo anterior a `text_response_ai`.
+        text_response_ai : str
+            Texto del capítulo anterior.
+
+        Retorna
+        -------
+        str
+            Memoria con la entrada añadida.
+        """
+        return store.merge(memory, store.entry(chapter - 1, text_response_ai))
+
+    def __condense_memory(self, story: Story, memory: str) -> str:
+        """
+        Condensa con el modelo la memoria de una partida que ha superado su presupuesto.
+
+        Parámetros
+        ----------
+        story : Story
+            Historia del catálogo.
+        memory : str
+            Memoria a condensar, con la entrada del último capítulo.
+
+        Retorna
+        -------
+        str
+            Resumen acotado a `StoryMemory.max_tokens - entry_tokens`.
+        """
+        store = StoryMemory.shared()
+        words = store.compact_tokens * 2 // 3
+        instructions = (f"Condensa en un único resumen de no más de {words} palabras todo lo ocurrido en la partida. "
+                        f"Conserva los hechos importantes, las decisiones del jugador y la situación en la que se "
+                        f"encuentra al final.")
+        if self.__prompt_layout() == "prefix":
+            message = (f"{self.__story_header(story)}No narres ni continúes la historia. {instructions}\n\n"
+                       f"Memoria de la partida:\n{memory}")
+            summary = self.__summarize(message, system_prompt=story_teller)
+        else:
+            message = (f"SINOPSIS para que entiendas todo el contexto (No lo repitas, es solo como información): \n "
+                       f"{story.sinopsis}\nMemoria de la partida:\n{memory}\n{instructions}")
+            summary = self.__summarize(message, system_prompt=summarizator)
+        return store.bound(summary)
+
+    def __prerendered(self, story_number: int, chapter: int, text_response_ai: str,
+                      user_response: str) -> Optional[str]:
+        """
+        Busca el capítulo en el almacén de pre-generados.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo a narrar.
+        text_response_ai : str
+            Texto del capítulo anterior.
+        user_response : str
+            Elección del usuario.
+
+        Retorna
+        -------
+        str or None
+            Capítulo pre-generado o None si hay que generarlo.
+        """
+        if self.__content is None:
+            return None
+        return self.__content.get(story_number, chapter, text_response_ai, user_response)
+
+    def __stored_summary(self, story_number: int, text_response_ai: str) -> Optional[str]:
+        """
+        Busca el resumen pre-generado de un capítulo.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        text_response_ai : str
+            Texto del capítulo.
+
+        Retorna
+        -------
+        str or None
+            Resumen guardado, o None si no hay.
+        """
+        if self.__content is None or not text_response_ai:
+            return None
+        return self.__content.summary(story_number, text_response_ai)
+
+    def __take_speculation(self, speculator: Optional[BranchSpeculator], story_number: int, chapter: int,
+                           text_response_ai: str, user_response: str) -> Optional[str]:
+        """
+        Recupera del especulador la rama elegida por el jugador, si existe.
+
+        Parámetros
+        ----------
+        speculator : BranchSpeculator or None
+            Especulador de la sesión.
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo a narrar.
+        text_response_ai : str
+            Texto del capítulo anterior.
+        user_response : str
+            Elección del usuario.
+
+        Retorna
+        -------
+        str or None
+            Capítulo pre-generado o None si hay que generarlo ahora.
+        """
+        if speculator is None or not user_response:
+            return None
+        key = BranchSpeculator.make_key(story_number, chapter, text_response_ai)
+        return speculator.take(key, user_response)
+
+    def __speculative_chapter(self, story_number: int, chapter: int, text_response_ai: str,
+                              user_response: str, memory: Optional[str], recall: str,
+                              cancel: threading.Event) -> Optional[str]:
+        """
+        Genera una rama especulativa, abandonándola en cuanto se cancela.
+
+        Se usa el modo streaming para poder cortar la conexión (y con ella la
+        generación en el backend) entre token y token.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo a generar.
+        text_response_ai : str
+            Texto del capítulo anterior.
+        user_response : str
+            Opción de esta rama.
+        memory : str or None
+            Memoria de la partida hasta el capítulo anterior (modo "rolling").
+        recall : str
+            Pasajes de capítulos anteriores para el prompt.
+        cancel : threading.Event
+            Evento que se activa cuando la rama se descarta.
+
+        Retorna
+        -------
+        str or None
+            Texto del capítulo, o None si se canceló.
+        """
+        prompt = self.__compose_prompt(story_number, chapter, text_response_ai, user_response, memory, recall)
+        if cancel.is_set():
+            return None
+
+        parts = []
+        stream = self.__model.generate_response_stream(user_message=prompt, system_prompt=story_teller,
+                                                       purpose="speculation", **self.__generation_limits())
+        try:
+            for token in stream:
+                if cancel.is_set():
+                    return None
+                parts.append(token)
+        finally:
+            stream.close()
+        return "".join(parts)
+
+    def __compose_prompt(self, story_number: int, chapter: int, text_response_ai: str, user_response: str,
+                         memory: Optional[str] = None, recall: str = "",
+                         context: Optional[Callable[[], str]] = None) -> str:
+        """
+        Construye el prompt de narración con el resumen del capítulo anterior y la decisión tomada.
+
+        No modifica el estado de la instancia ni el prompt de sistema del
+        modelo, por lo que puede ejecutarse desde hilos en segundo plano.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia que se está narrando.
+        chapter : int
+            Número del capítulo a narrar.
+        text_response_ai : str
+            Texto del capítulo anterior generado por la IA.
+        user_response : str
+            Elección del usuario en el capítulo anterior.
+        memory : str, opcional
+            Memoria de la partida hasta el capítulo anterior (modo "rolling").
+        recall : str, opcional
+            Pasajes de capítulos anteriores. Por defecto es "".
+        context : Callable[[], str], opcional
+            Devuelve el contexto ya calculado. Por defecto se calcula con `memory_for`.
+
+        Retorna
+        -------
+        str
+            Prompt listo para enviar al modelo.
+        """
+        story = self.__story(story_number)
+        if chapter == 1 and text_response_ai == "" and user_response == "":
+            return self.__create_narration_promtp(story=story, chapter=chapter, summary="")
+
+        if context is not None:
+            resume = context()
+        else:
+            resume = self.memory_for(story_number, chapter, memory or "", text_response_ai, user_response)
+        choice = self.__choice_text(text_response_ai, user_response)
+        return self.__create_narration_promtp(story=story, chapter=chapter, summary=resume, choice=choice,
+                                              recall=recall)
+
+    def __story(self, story_number: int) -> Story:
+        """
+        Busca una historia en el catálogo.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+
+        Retorna
+        -------
+        Story
+            Historia del catálogo.
+
+        Raises
+        ------
+        ValueError
+            Si la historia no existe (por ejemplo, una partida guardada de una
+            historia que ya no está en el catálogo).
+        """
+        story = self.__stories.get(story_number)
+        if story is None:
+            print(f"[Error] La historia {story_number} no existe.")
+            raise ValueError(f"La historia {story_number} no existe.")
+        return story
+
+    def __create_narration_promtp(self, story: Story, chapter: int, summary: str = "", choice: str = "",
+                                  recall: str = "") -> str:
+        """
+        Crea el prompt de narración para el modelo de lenguaje.
+
+        En el modo "prefix" (sección [Pipeline], opción prompt_layout) el
+        prompt empieza por la cabecera fija de la historia y lo que cambia de
+        un capítulo a otro va al final; en el modo "legacy" se usa el formato
+        original.
+
+        Parámetros
+        ----------
+        story : Story
+            Historia del catálogo.
+        chapter : int
+            Número del capítulo a narrar.
+        summary : str, opcional
+            Resumen de los eventos previos de la historia. Por defecto es "".
+        choice : str, opcional
+            Decisión tomada por el jugador al final del capítulo anterior. Por defecto es "".
+        recall : str, opcional
+            Pasajes de capítulos anteriores que pueden volver a importar. Por defecto es "".
+
+        Retorna
+        -------
+        str
+            Prompt formateado para la generación de la narración.
+        """
+        title = story.chapter(chapter)
+        if recall:
+            summary = f"{summary}\n\nDetalles de capítulos anteriores que pueden volver a importar:\n{recall}"
+        if self.__prompt_layout() == "prefix":
+            header = self.__story_header(story)
+            if chapter == 1:
+                return f"{header}Comienza a explicar el primer capítulo de la historia, que se titula: {title}."
+            return (f"{header}Tienes que empezar así: \nExplicas lo que ocurrió por la decisión del usuario. "
+                    f"Enlazas esto con el nuevo capítulo, lo explicas y llegas a la nueva pregunta.\n\n"
+                    f"El usuario está en el capítulo {chapter}, que se titula: {title}.\n\n"
+                    f"Hasta ahora pasaron los siguientes sucesos: {summary}\n\n"
+                    f"La decisión que ha tomado el jugador es: {choice}.\n")
+
+        if chapter == 1:
+            prompt = f'''La sinopsis de la historia es: {story.sinopsis}\n Comienza a explicar el primer capítulo de la historia que es: {story.chapter(1)}.'''
+            return prompt
+        else:
+            prompt = f'''La sinopsis de la historia es: {story.sinopsis}\n El usuario está en el capítulo:{chapter}. \n\n             Hasta ahora pasaron los siguientes sucesos {summary}.\n\n            La decisión que ha tomado el jugador es: {choice}.\n\n            El siguiente capítulo es el número {chapter} y se titula así: {title}.\n Tienes que empezar así: \nExplicas lo que ocurrió por la decisión del usuario.Enlazas esto con el nuevo capítulo, lo explicas y llegas a la nueva pregunta.:\n'''
+            return prompt
+
+    @staticmethod
+    def __story_header(story: Story) -> str:
+        """
+        Construye la cabecera fija de una historia: sinopsis e índice completo de capítulos.
+
+        Es idéntica byte a byte en todas las peticiones de la misma historia,
+        de modo que el backend (Ollama/llama.cpp) puede reutilizar la caché KV
+        del prefijo y solo evaluar la parte final del prompt.
+
+        Parámetros
+        ----------
+        story : Story
+            Historia del catálogo.
+
+        Retorna
+        -------
+        str
+            Cabecera de la historia, terminada en línea en blanco.
+        """
+        outline = "\n".join(
+            f"{number}. {title}" for number, title in enumerate(story.chapters, start=1)
+        )
+        return f"La sinopsis de la historia es: {story.sinopsis}\n\nCapítulos de la historia (solo como referencia, no adelantes acontecimientos):\n{outline}\n\n"
+
+    def __summarize_chapter(self, story: Story, text_response_ai: str) -> str:
+        """
+        Resume el capítulo anterior junto con la sinopsis.
+
+        Parámetros
+        ----------
+        story : Story
+            Historia del catálogo.
+        text_response_ai : str
+            Texto del capítulo anterior.
+
+        Retorna
+        -------
+        str
+            Resumen de la historia hasta el momento de la decisión.
+        """
+        if self.__prompt_layout() == "prefix":
+            # Mismo prompt de sistema y misma cabecera que la narración: el resumen
+            # comparte con ella el prefijo ya evaluado en el backend
+            message = (f"{self.__story_header(story)}No narres ni continúes la historia. {summarizator}\n\n"
+                       f"Capítulo a resumir:\n{text_response_ai}\n Resume todo esto hasta el momento en que el jugador "
+                       f"debe decidir. Céntrate en la situación en la que queda el jugador y en las opciones que se le plantean.")
+            return self.__summarize(message, system_prompt=story_teller)
+
+        text_response_ai = f'SINOPSIS para que entiendas todo el contexto (No lo repitas, es solo como información, tampoco adelantes acontecimientos): \n {story.sinopsis}\n{text_response_ai}\n Resume todo esto hasta el momento en que el jugador debe decidir.'
+        message = f'''{text_response_ai}\n Céntrate en la situación en la que queda el jugador y en las opciones que se le plantean.'''
+        return self.__summarize(message, system_prompt=summarizator)
+
+    def __summarize(self, message: str, system_prompt: str) -> str:
+        """
+        Resume el estado actual de la historia para mantener la continuidad.
+
+        No depende de la elección del jugador, de modo que puede calcularse
+        mientras este lee el capítulo; la decisión se añade en el prompt de
+        narración.
+
+        Parámetros
+        ----------
+        message : str
+            Prompt de resumen ya construido.
+        system_prompt : str
+            Prompt de sistema de la llamada.
+
+        Retorna
+        -------
+        str
+            Resumen de la historia hasta el momento.
+        """
+        with Telemetry.shared().span("summarize", chars=len(message)):
+            resume = self.__model.generate_response(user_message=message, system_prompt=system_prompt,
+                                                    purpose="summary")
+        return resume
+
+    @staticmethod
+    def __memory_key(story_number: int, memory: str) -> str:
+        """
+        Calcula la clave de la condensación de una memoria.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        memory : str
+            Memoria a condensar.
+
+        Retorna
+        -------
+        str
+            Resumen hexadecimal, distinto del de `__summary_key` para el mismo texto.
+        """
+        return hashlib.sha1(f"memoria\x00{story_number}\x00{memory}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def __summary_key(story_number: int, text_response_ai: str) -> str:
+        """
+        Calcula la clave del resumen de un capítulo.
+
+        Parámetros
+        ----------
+        story_number : int
+            ID de la historia.
+        text_response_ai : str
+            Texto del capítulo.
+
+        Retorna
+        -------
+        str
+            Resumen hexadecimal de la historia y el texto.
+        """
+        return hashlib.sha1(f"{story_number}\x00{text_response_ai}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def __summary_mode() -> str:
+        """
+        Lee el modo de resumen de la sección [Pipeline] de model.config.
+
+        Retorna
+        -------
+        str
+            "prefetch" (por defecto), "fold" o "rolling".
+        """
+        return ModelConfig.shared().get("Pipeline", "summary_mode", fallback="prefetch")
+
+    @staticmethod
+    def __prompt_layout() -> str:
+        """
+        Lee la disposición de los prompts de la sección [Pipeline] de model.config.
+
+        Retorna
+        -------
+        str
+            "prefix" (por defecto) o "legacy".
+        """
+        return ModelConfig.shared().get("Pipeline", "prompt_layout", fallback="prefix")
+
+    @staticmethod
+    def __generation_limits() -> Dict:
+        """
+        Lee el corte tras las opciones de la sección [Pipeline] de model.config.
+
+        Narración y especulación usan el mismo (y el mismo perfil de modelo,
+        [Profile.narration], con su `max_tokens`), para que la caché de
+        respuestas guarde el mismo texto venga de donde venga.
+
+        Retorna
+        -------
+        Dict
+            `cutoff` (`OptionsCutoff`, o None si `early_stop` está
+            desactivado), listo para `generate_response_stream`.
+        """
+        early_stop = ModelConfig.shared().getboolean("Pipeline", "early_stop", fallback=True)
+        return {"cutoff": OptionsCutoff if early_stop else None}
+
+    def __model_ready(self) -> Optional[bool]:
+        """
+        Indica si el modelo de narración está precargado en los backends que puede usar la llamada.
+
+        Son el backend propio del perfil de narración o, si no tiene, todos
+        los del Llm, que son los que calienta `ModelWarmup.start_all`.
+
+        Retorna
+        -------
+        bool or None
+            True si todos los calentadores de esos backends están listos,
+            False si alguno no lo está, o None si no hay ningún calentador.
+        """
+        profile = self.__model.profile("narration")
+        states = [ModelWarmup.ready_for(url, profile.model)
+                  for url in ([profile.url] if profile.url else self.__model.backends)]
+        states = [state for state in states if state is not None]
+        return all(states) if states else None
+
+    @staticmethod
+    def __choice_text(text_response_ai: str, user_response: str) -> str:
+        """
+        Recupera del capítulo anterior el texto de la opción elegida.
+
+        Parámetros
+        ----------
+        text_response_ai : str
+            Texto del capítulo anterior, que termina con las opciones A y B.
+        user_response : str
+            Opción elegida ("A" o "B").
+
+        Retorna
+        -------
+        str
+            Opción con su descripción, o solo la letra si no se encuentra.
+        """
+        option = parse_chapter(text_response_ai).option(user_response)
+        if not option:
+            return user_response
+        return f"{user_response} - {option}"
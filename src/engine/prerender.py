@@ -0,0 +1,332 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from agents.llm import Llm
+from agents.telemetry import Telemetry
+from config.model_config import ModelConfig
+from data.sys_prompts import story_teller
+from engine.chapter_parser import is_game_over
+from engine.content_store import ContentStore
+from engine.narrator import Narrator
+import argparse
+import itertools
+import threading
+import time
+
+# Nodo del árbol: historia, capítulo, texto del capítulo anterior, opción, camino ("", "A", "AB"...)
+# y memoria de la partida hasta el capítulo anterior (solo en modo "rolling")
+Node = Tuple[int, int, str, str, str, str]
+
+
+class Prerenderer:
+    """
+    Pre-genera el primer capítulo de cada historia y los primeros niveles del árbol A/B.
+
+    Recorre el árbol de decisiones hasta `depth` elecciones (depth=0 solo el
+    primer capítulo; depth=2 los capítulos 1 a 3, 7 nodos por historia) con
+    un pool de hilos acotado. Cada nodo se genera con la misma lógica de
+    prompts que una partida (`Narrator.narrate`) y se guarda en el
+    `ContentStore` en cuanto termina, así que una ejecución interrumpida se
+    retoma sin repetir trabajo: los nodos que ya están en el almacén se leen
+    y solo se generan los que faltan.
+
+    Con varios narradores las peticiones se reparten entre ellos por turnos;
+    desde la línea de comandos se usa uno solo cuyo `LlmRouter` reparte las
+    peticiones entre los backends según su carga y reintenta en otro si uno
+    falla.
+
+    Atributos
+    ----------
+    store : ContentStore
+        Almacén donde se guardan los capítulos.
+    depth : int
+        Número de elecciones que se pre-generan tras el primer capítulo.
+    workers : int
+        Peticiones simultáneas como máximo.
+    summaries : bool
+        Si se guardan también los resúmenes de los capítulos hoja.
+    """
+
+    def __init__(self, narrators: List[Narrator], store: ContentStore, depth: int = 2, workers: int = 4,
+                 summaries: bool = True):
+        """
+        Inicializa la clase Prerenderer.
+
+        Parámetros
+        ----------
+        narrators : List[Narrator]
+            Narradores a usar, normalmente uno por backend.
+        store : ContentStore
+            Almacén de capítulos.
+        depth : int, opcional
+            Elecciones a pre-generar tras el primer capítulo. Por defecto es 2.
+        workers : int, opcional
+            Peticiones simultáneas como máximo. Por defecto es 4.
+        summaries : bool, opcional
+            Si se resumen también las hojas, para que el primer capítulo en
+            vivo solo necesite una llamada al modelo. Por defecto es True.
+
+        Raises
+        ------
+        ValueError
+            Si no se indica ningún narrador.
+        """
+        if not narrators:
+            print("[Error] Prerenderer necesita al menos un narrador.")
+            raise ValueError("Prerenderer necesita al menos un narrador.")
+        self.__narrators = itertools.cycle(narrators)
+        self.__narrators_lock = threading.Lock()
+        self.__store = store
+        self.__depth = max(depth, 0)
+        self.__workers = max(workers, 1)
+        self.__summaries = summaries
+        self.__stats_lock = threading.Lock()
+        self.__stats: Dict[str, int] = {}
+
+    @property
+    def store(self) -> ContentStore:
+        """
+        ContentStore: Obtiene el almacén de capítulos.
+        """
+        return self.__store
+
+    @property
+    def depth(self) -> int:
+        """
+        int: Obtiene el número de elecciones pre-generadas.
+        """
+        return self.__depth
+
+    @property
+    def workers(self) -> int:
+        """
+        int: Obtiene el número máximo de peticiones simultáneas.
+        """
+        return self.__workers
+
+    @property
+    def summaries(self) -> bool:
+        """
+        bool: Indica si se resumen también los capítulos hoja.
+        """
+        return self.__summaries
+
+    def run(self, story_ids: Iterable[int]) -> Dict[str, float]:
+        """
+        Pre-genera los árboles de las historias indicadas.
+
+        Parámetros
+        ----------
+        story_ids : Iterable[int]
+            Historias a pre-generar.
+
+        Retorna
+        -------
+        Dict[str, float]
+            Nodos generados, ya existentes y fallidos, resúmenes generados y segundos.
+        """
+        self.__stats = {"rendered": 0, "skipped": 0, "failed": 0, "summaries": 0}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix="prerender") as pool:
+            pending: Set[Future] = set()
+            for story_id in story_ids:
+                pending.add(pool.submit(self.__visit, (story_id, 1, "", "", "", "")))
+            # Los hijos se encolan en cuanto termina su padre, sin esperar al resto del nivel
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for child in future.result():
+                        pending.add(pool.submit(self.__visit, child))
+        with self.__stats_lock:
+            stats = dict(self.__stats)
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def __visit(self, node: Node) -> List[Node]:
+        """
+        Asegura que un nodo está en el almacén y devuelve sus hijos pendientes de visitar.
+
+        Parámetros
+        ----------
+        node : Node
+            Historia, capítulo, texto anterior, opción, camino y memoria del nodo.
+
+        Retorna
+        -------
+        List[Node]
+            Nodos hijos (opciones A y B), o lista vacía si es una hoja, la
+            partida termina aquí o la generación falló.
+        """
+        story_id, chapter, previous, choice, path, memory = node
+        narrator = self.__next_narrator()
+        text = self.__store.get(story_id, chapter, previous, choice)
+        try:
+            if text is None:
+                with Telemetry.shared().span("prerender", story=story_id, chapter=chapter, path=path):
+                    text = narrator.narrate(story_id, chapter, previous, choice, memory=memory)
+                finished = self.__is_finished(narrator, story_id, chapter, text)
+                self.__store.put(story_id, chapter, previous, choice, text, path=path, finished=finished,
+                                 model=narrator.model.model)
+                self.__count("rendered")
+            else:
+                finished = self.__is_finished(narrator, story_id, chapter, text)
+                self.__count("skipped")
+            if finished:
+                return []
+            # En modo "fold" la narración usa el capítulo tal cual y no hay resumen que guardar
+            wants_summary = len(path) < self.__depth or self.__summaries
+            if wants_summary and self.__summary_mode() == "prefetch" and self.__store.summary(story_id, text) is None:
+                self.__store.set_summary(story_id, text, narrator.summary_for(story_id, text))
+                self.__count("summaries")
+        except Exception as e:
+            print(f"[Error] No se pudo pre-generar la historia {story_id}, camino {path or '-'}: {e}")
+            self.__count("failed")
+            return []
+        if len(path) >= self.__depth:
+            return []
+        if choice and self.__summary_mode() == "rolling":
+            # Misma memoria que guardará la partida al llegar a este nodo (GameSession.memory)
+            memory = narrator.memory_for(story_id, chapter, memory, previous, choice)
+        return [(story_id, chapter + 1, text, option, path + option, memory) for option in ("A", "B")]
+
+    @staticmethod
+    def __is_finished(narrator: Narrator, story_id: int, chapter: int, text: str) -> bool:
+        """
+        Indica si la partida termina en un capítulo (mismo criterio que GameEngine).
+
+        Parámetros
+        ----------
+        narrator : Narrator
+            Narrador, para consultar el número de capítulos.
+        story_id : int
+            ID de la historia.
+        chapter : int
+            Número del capítulo.
+        text : str
+            Texto del capítulo.
+
+        Retorna
+        -------
+        bool
+            True si era el último capítulo o el jugador ha muerto.
+        """
+        return chapter >= narrator.chapter_count(story_id) or is_game_over(text)
+
+    @staticmethod
+    def __summary_mode() -> str:
+        """
+        Lee el modo de resumen de la sección [Pipeline] de model.config.
+
+        Retorna
+        -------
+        str
+            "prefetch" (por defecto), "fold" o "rolling".
+        """
+        return ModelConfig.shared().get("Pipeline", "summary_mode", fallback="prefetch")
+
+    def __next_narrator(self) -> Narrator:
+        """
+        Elige el narrador (backend) de la siguiente petición, por turnos.
+
+        Retorna
+        -------
+        Narrator
+            Narrador a usar.
+        """
+        with self.__narrators_lock:
+            return next(self.__narrators)
+
+    def __count(self, name: str) -> None:
+        """
+        Incrementa un contador de la ejecución.
+
+        Parámetros
+        ----------
+        name : str
+            Nombre del contador.
+        """
+        with self.__stats_lock:
+            self.__stats[name] += 1
+
+
+def parse_story_ids(value: Optional[str], available: Iterable[int]) -> List[int]:
+    """
+    Interpreta la lista de historias de la línea de comandos ("1,3,5-8").
+
+    Parámetros
+    ----------
+    value : str or None
+        Lista de ids y rangos separados por comas. Si es None se usan todas.
+    available : Iterable[int]
+        Ids del catálogo.
+
+    Retorna
+    -------
+    List[int]
+        Ids a pre-generar, en el orden del catálogo.
+
+    Raises
+    ------
+    ValueError
+        Si algún id no existe en el catálogo.
+    """
+    available = list(available)
+    if not value:
+        return available
+    wanted: Set[int] = set()
+    for part in value.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = (int(bound) for bound in part.split("-", 1))
+            wanted.update(range(first, last + 1))
+        elif part:
+            wanted.add(int(part))
+    missing = wanted.difference(available)
+    if missing:
+        print(f"[Error] Historias que no existen en el catálogo: {sorted(missing)}")
+        raise ValueError(f"Historias que no existen en el catálogo: {sorted(missing)}")
+    return [story_id for story_id in available if story_id in wanted]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Pre-genera capítulos en el almacén de contenido (`python -m engine.prerender`).
+
+    Parámetros
+    ----------
+    argv : List[str], opcional
+        Argumentos de línea de comandos. Por defecto se usan los del proceso.
+    """
+    config = ModelConfig.shared()
+    parser = argparse.ArgumentParser(description="Pre-genera los primeros capítulos y ramas de cada historia.")
+    parser.add_argument("--url", action="append", default=None,
+                        help="URL base (/v1) de un backend; se puede repetir. Por defecto Ollama en localhost.")
+    parser.add_argument("--api-key", default="ollama")
+    parser.add_argument("--depth", type=int, default=config.getint("Prerender", "depth", fallback=2),
+                        help="Elecciones a pre-generar tras el primer capítulo.")
+    parser.add_argument("--workers", type=int, default=config.getint("Prerender", "workers", fallback=4),
+                        help="Peticiones simultáneas como máximo (entre todos los backends).")
+    parser.add_argument("--stories", default=None, help="Historias a pre-generar (\"1,3,5-8\"). Por defecto todas.")
+    parser.add_argument("--no-summaries", action="store_true", help="No resumir los capítulos hoja.")
+    parser.add_argument("--store", default=None, help="Archivo SQLite (por defecto el de [Prerender] path).")
+    args = parser.parse_args(argv)
+
+    store = ContentStore(args.store or ContentStore.configured_path())
+    urls = args.url or ["http://localhost:11434/v1"]
+    narrator = Narrator(Llm(url=urls[0], api_key=args.api_key, system_prompt=story_teller, backends=args.url),
+                        content=store)
+    story_ids = parse_story_ids(args.stories, narrator.stories.ids)
+    prerenderer = Prerenderer([narrator], store, depth=args.depth, workers=args.workers,
+                              summaries=not args.no_summaries)
+    print(f"Pre-generando {len(story_ids)} historias hasta {prerenderer.depth} elecciones "
+          f"con {prerenderer.workers} peticiones simultáneas en {len(narrator.model.backends)} backend(s)...")
+    stats = prerenderer.run(story_ids)
+    totals = store.stats()
+    print(f"Generados {stats['rendered']}, ya existentes {stats['skipped']}, fallidos {stats['failed']}, "
+          f"resúmenes {stats['summaries']} en {stats['seconds']:.1f}s. "
+          f"Almacén: {totals['nodes']} capítulos de {totals['stories']} historias, {totals['bytes'] / 1e6:.2f} MB "
+          f"({store.path}).")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
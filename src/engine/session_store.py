@@ -0,0 +1,574 @@
+from typing import Dict, List, Optional, Tuple, Union
+from config.model_config import ModelConfig
+from engine.game_session import GameSession
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+SESSIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sessions.db")
+
+
+class MemorySessionStore:
+    """
+    Almacén de partidas en memoria para la API HTTP.
+
+    Guarda el estado serializado de cada partida, de modo que los objetos
+    GameSession que se devuelven son copias independientes.
+
+    Atributos
+    ----------
+    size : int
+        Número de partidas guardadas.
+    """
+
+    def __init__(self):
+        """
+        Inicializa la clase MemorySessionStore.
+        """
+        self.__sessions: Dict[str, Dict] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """
+        int: Obtiene el número de partidas guardadas.
+        """
+        return len(self.__sessions)
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        """
+        Recupera una partida.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        GameSession or None
+            Partida guardada, o None si no existe.
+        """
+        with self.__lock:
+            data = self.__sessions.get(session_id)
+        return GameSession.from_dict(data) if data is not None else None
+
+    def put(self, session: GameSession) -> None:
+        """
+        Guarda (o reemplaza) una partida.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida a guardar.
+        """
+        data = session.to_dict()
+        with self.__lock:
+            self.__sessions[session.session_id] = data
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Elimina una partida.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        bool
+            True si la partida existía.
+        """
+        with self.__lock:
+            return self.__sessions.pop(session_id, None) is not None
+
+
+class SqliteSessionStore:
+    """
+    Almacén de partidas persistente en un archivo SQLite (modo WAL).
+
+    Tiene la misma interfaz que MemorySessionStore, pero las partidas
+    sobreviven a una recarga del navegador o a un reinicio del proceso y se
+    pueden retomar con su identificador. `put` no escribe en el disco ni
+    serializa: deja la última partida guardada en memoria y un hilo en
+    segundo plano las serializa y las guarda todas juntas, en una sola
+    transacción, cada `flush_interval` segundos. `get` consulta antes lo
+    pendiente (y devuelve una copia), así que siempre devuelve el último
+    estado guardado.
+
+    El estado se guarda como JSON comprimido con zlib. Cada `compact_interval`
+    segundos se borran las partidas que llevan más de `ttl` segundos sin
+    cambios y, si aún quedan más de `max_sessions`, las más antiguas.
+
+    Atributos
+    ----------
+    path : str
+        Ruta del archivo SQLite.
+    size : int
+        Número de partidas guardadas (incluidas las pendientes de escribir).
+    ttl : float
+        Segundos sin cambios tras los que se borra una partida (0 = nunca).
+    max_sessions : int
+        Partidas guardadas como máximo (0 = sin límite).
+    flush_interval : float
+        Segundos entre escrituras en el disco (0 = escritura inmediata).
+    """
+
+    __shared: Optional["SqliteSessionStore"] = None
+    __shared_loaded = False
+    __shared_lock = threading.Lock()
+
+    def __init__(self, path: str = SESSIONS_PATH, ttl: float = 7 * 24 * 3600, max_sessions: int = 10000,
+                 flush_interval: float = 1.0, compact_interval: float = 600.0):
+        """
+        Inicializa la clase SqliteSessionStore.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del archivo SQLite. Por defecto `data/sessions.db`.
+        ttl : float, opcional
+            Segundos sin cambios tras los que se borra una partida. Por defecto una semana.
+        max_sessions : int, opcional
+            Partidas guardadas como máximo. Por defecto es 10000.
+        flush_interval : float, opcional
+            Segundos entre escrituras en el disco. Por defecto es 1.
+        compact_interval : float, opcional
+            Segundos entre compactaciones. Por defecto es 600.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__path = path
+        self.__ttl = max(ttl, 0.0)
+        self.__max_sessions = max(max_sessions, 0)
+        self.__flush_interval = max(flush_interval, 0.0)
+        self.__compact_interval = max(compact_interval, 0.0)
+        self.__lock = threading.Lock()
+        self.__db_lock = threading.Lock()
+        # Última partida pendiente de escribir por session_id; None marca un borrado
+        self.__pending: Dict[str, Optional[Tuple[GameSession, float]]] = {}
+        # Lo que se está escribiendo, para que `get` lo siga viendo hasta que esté en el disco
+        self.__writing: Dict[str, Optional[Tuple[GameSession, float]]] = {}
+        self.__flush_lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+        self.__last_compact = time.monotonic()
+        self.__flushes = 0
+        self.__compacted = 0
+        self.__connection = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, story INTEGER NOT NULL, chapter INTEGER NOT NULL, "
+            "finished INTEGER NOT NULL, data BLOB NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+        )
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self.__connection.commit()
+
+    @property
+    def path(self) -> str:
+        """
+        str: Obtiene la ruta del archivo SQLite.
+        """
+        return self.__path
+
+    @property
+    def size(self) -> int:
+        """
+        int: Obtiene el número de partidas guardadas, incluidas las pendientes de escribir.
+
+        No escribe lo pendiente: cuenta las filas del disco y corrige con los
+        cambios pendientes (partidas nuevas y borrados de partidas que sí
+        están en el disco).
+        """
+        # Sin escritura en curso, lo que no está en el disco está en __pending
+        with self.__flush_lock:
+            with self.__lock:
+                changes = dict(self.__pending)
+            row = self.__fetchone("SELECT COUNT(*) FROM sessions", ())
+            count = row[0] if row else 0
+            ids = list(changes)
+            stored = set()
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                stored.update(row[0] for row in self.__fetchall(
+                    f"SELECT session_id FROM sessions WHERE session_id IN ({', '.join('?' * len(chunk))})",
+                    tuple(chunk)))
+        for session_id, entry in changes.items():
+            if entry is None and session_id in stored:
+                count -= 1
+            elif entry is not None and session_id not in stored:
+                count += 1
+        return count
+
+    @property
+    def ttl(self) -> float:
+        """
+        float: Obtiene los segundos sin cambios tras los que se borra una partida.
+        """
+        return self.__ttl
+
+    @property
+    def max_sessions(self) -> int:
+        """
+        int: Obtiene el número máximo de partidas guardadas.
+        """
+        return self.__max_sessions
+
+    @property
+    def flush_interval(self) -> float:
+        """
+        float: Obtiene los segundos entre escrituras en el disco.
+        """
+        return self.__flush_interval
+
+    @classmethod
+    def shared(cls) -> Optional["SqliteSessionStore"]:
+        """
+        Devuelve el almacén configurado en la sección [Sessions] de model.config.
+
+        Las partidas pendientes se escriben al salir del proceso.
+
+        Retorna
+        -------
+        SqliteSessionStore or None
+            Almacén del proceso, o None si está desactivado o no se puede abrir.
+        """
+        if cls.__shared_loaded:
+            return cls.__shared
+        with cls.__shared_lock:
+            if not cls.__shared_loaded:
+                config = ModelConfig.shared()
+                if config.getboolean("Sessions", "enabled", fallback=False):
+                    try:
+                        cls.__shared = cls(
+                            cls.configured_path(),
+                            ttl=config.getfloat("Sessions", "ttl_hours", fallback=168.0) * 3600,
+                            max_sessions=config.getint("Sessions", "max_sessions", fallback=10000),
+                            flush_interval=config.getfloat("Sessions", "flush_seconds", fallback=1.0),
+                            compact_interval=config.getfloat("Sessions", "compact_seconds", fallback=600.0),
+                        )
+                        atexit.register(cls.__shared.close)
+                    except sqlite3.Error as e:
+                        print(f"[Error] No se pudo abrir el almacén de partidas: {e}")
+                cls.__shared_loaded = True
+        return cls.__shared
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Cierra el almacén compartido para que se vuelva a abrir con la configuración actual.
+        """
+        with cls.__shared_lock:
+            if cls.__shared is not None:
+                atexit.unregister(cls.__shared.close)
+                cls.__shared.close()
+            cls.__shared = None
+            cls.__shared_loaded = False
+
+    @staticmethod
+    def configured_path() -> str:
+        """
+        Lee la ruta del almacén de la sección [Sessions] de model.config.
+
+        Las rutas relativas se resuelven desde la carpeta src.
+
+        Retorna
+        -------
+        str
+            Ruta del archivo SQLite.
+        """
+        path = ModelConfig.shared().get("Sessions", "path", fallback="") or SESSIONS_PATH
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+        return path
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        """
+        Recupera una partida.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        GameSession or None
+            Partida guardada, o None si no existe, ha caducado o no se puede leer.
+        """
+        known, entry = self.__unwritten(session_id)
+        if known:
+            # Copia, para que quien la modifique no cambie la partida pendiente
+            return GameSession.from_dict(entry[0].to_dict()) if entry is not None else None
+        row = self.__fetchone("SELECT data FROM sessions WHERE session_id = ?", (session_id,))
+        if row is None:
+            return None
+        try:
+            return GameSession.from_dict(json.loads(zlib.decompress(row[0]).decode("utf-8")))
+        except (zlib.error, ValueError, KeyError) as e:
+            print(f"[Error] Partida {session_id} dañada en el almacén: {e}")
+            return None
+
+    def put(self, session: GameSession) -> None:
+        """
+        Guarda (o reemplaza) una partida.
+
+        La partida se serializa y se escribe en el disco en segundo plano; si
+        se guarda la misma partida varias veces antes de escribirla solo se
+        escribe el último estado. Quien la modifique después debe volver a
+        guardarla con `put`.
+
+        Parámetros
+        ----------
+        session : GameSession
+            Partida a guardar.
+        """
+        with self.__lock:
+            self.__pending[session.session_id] = (session, time.time())
+        self.__after_change()
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Elimina una partida.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        bool
+            True si la partida existía.
+        """
+        known, entry = self.__unwritten(session_id)
+        existed = entry is not None if known else \
+            self.__fetchone("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)) is not None
+        with self.__lock:
+            self.__pending[session_id] = None
+        self.__after_change()
+        return existed
+
+    def flush(self) -> int:
+        """
+        Escribe en el disco las partidas pendientes, en una sola transacción.
+
+        Retorna
+        -------
+        int
+            Partidas escritas o borradas.
+        """
+        with self.__flush_lock:
+            with self.__lock:
+                pending, self.__pending = self.__pending, {}
+                self.__writing = pending
+            try:
+                return self.__write(pending)
+            finally:
+                with self.__lock:
+                    self.__writing = {}
+
+    def __write(self, pending: Dict[str, Optional[Tuple[GameSession, float]]]) -> int:
+        """
+        Serializa y escribe un lote de partidas (o borrados) en una sola transacción.
+
+        Si la escritura falla se vuelven a encolar, salvo las que entretanto
+        tengan un estado más reciente.
+
+        Parámetros
+        ----------
+        pending : Dict[str, Optional[Tuple[GameSession, float]]]
+            Partida y fecha de cada session_id, o None para borrarla.
+
+        Retorna
+        -------
+        int
+            Partidas escritas o borradas.
+        """
+        if not pending:
+            return 0
+        rows = []
+        deleted = []
+        for session_id, entry in pending.items():
+            if entry is None:
+                deleted.append((session_id,))
+                continue
+            session, updated = entry
+            data = session.to_dict()
+            blob = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"), 6)
+            rows.append((session_id, data["story_number"], data["chapter"], int(data["finished"]), blob, updated))
+        try:
+            with self.__db_lock:
+                with self.__connection:
+                    self.__connection.executemany(
+                        "INSERT INTO sessions (session_id, story, chapter, finished, data, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET story = excluded.story, "
+                        "chapter = excluded.chapter, finished = excluded.finished, data = excluded.data, "
+                        "updated = excluded.updated", rows)
+                    self.__connection.executemany("DELETE FROM sessions WHERE session_id = ?", deleted)
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo escribiendo el almacén de partidas: {e}")
+            with self.__lock:
+                for session_id, entry in pending.items():
+                    self.__pending.setdefault(session_id, entry)
+            return 0
+        self.__flushes += 1
+        return len(pending)
+
+    def compact(self) -> int:
+        """
+        Borra las partidas caducadas y, si sobran, las más antiguas.
+
+        Retorna
+        -------
+        int
+            Partidas borradas.
+        """
+        self.flush()
+        removed = 0
+        try:
+            with self.__db_lock:
+                with self.__connection:
+                    if self.__ttl:
+                        removed += self.__connection.execute(
+                            "DELETE FROM sessions WHERE updated < ?", (time.time() - self.__ttl,)).rowcount
+                    if self.__max_sessions:
+                        removed += self.__connection.execute(
+                            "DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions "
+                            "ORDER BY updated DESC LIMIT -1 OFFSET ?)", (self.__max_sessions,)).rowcount
+                if removed:
+                    # Devuelve al sistema el espacio del registro WAL
+                    self.__connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo compactando el almacén de partidas: {e}")
+        self.__last_compact = time.monotonic()
+        self.__compacted += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve el tamaño del almacén y los contadores de escritura.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Partidas, terminadas, pendientes, bytes comprimidos, escrituras y partidas compactadas.
+        """
+        with self.__lock:
+            pending = len(self.__pending)
+        row = self.__fetchone(
+            "SELECT COUNT(*), COALESCE(SUM(finished), 0), COALESCE(SUM(LENGTH(data)), 0) FROM sessions", ()
+        ) or (0, 0, 0)
+        return {"sessions": row[0], "finished": row[1], "pending": pending, "bytes": row[2],
+                "flushes": self.__flushes, "compacted": self.__compacted}
+
+    def close(self) -> None:
+        """
+        Detiene el hilo de escritura, escribe lo pendiente y cierra la conexión.
+        """
+        self.__stop_event.set()
+        thread = self.__thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+        with self.__db_lock:
+            self.__connection.close()
+
+    def __unwritten(self, session_id: str) -> Tuple[bool, Optional[Tuple[GameSession, float]]]:
+        """
+        Busca una partida entre los cambios que aún no están en el disco.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+
+        Retorna
+        -------
+        Tuple[bool, Optional[Tuple[GameSession, float]]]
+            Si hay un cambio sin escribir y su partida (None si es un borrado).
+        """
+        with self.__lock:
+            for changes in (self.__pending, self.__writing):
+                if session_id in changes:
+                    return True, changes[session_id]
+        return False, None
+
+    def __after_change(self) -> None:
+        """
+        Escribe ya si no hay intervalo de escritura; si no, se asegura de que el hilo de escritura esté en marcha.
+        """
+        if self.__flush_interval <= 0:
+            self.flush()
+            return
+        with self.__lock:
+            if self.__thread is None and not self.__stop_event.is_set():
+                self.__thread = threading.Thread(target=self.__run, name="session-writer", daemon=True)
+                self.__thread.start()
+
+    def __run(self) -> None:
+        """
+        Bucle del hilo de escritura: escribe lo pendiente y compacta de vez en cuando.
+        """
+        while not self.__stop_event.wait(self.__flush_interval):
+            self.flush()
+            if self.__compact_interval and time.monotonic() - self.__last_compact >= self.__compact_interval:
+                self.compact()
+
+    def __fetchone(self, query: str, parameters: tuple) -> Optional[tuple]:
+        """
+        Ejecuta una consulta de lectura y devuelve la primera fila.
+
+        Parámetros
+        ----------
+        query : str
+            Consulta SQL.
+        parameters : tuple
+            Parámetros de la consulta.
+
+        Retorna
+        -------
+        tuple or None
+            Primera fila, o None si no hay resultados o la lectura falla.
+        """
+        try:
+            with self.__db_lock:
+                return self.__connection.execute(query, parameters).fetchone()
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo leyendo el almacén de partidas: {e}")
+            return None
+
+    def __fetchall(self, query: str, parameters: tuple) -> List[tuple]:
+        """
+        Ejecuta una consulta de lectura y devuelve todas las filas.
+
+        Parámetros
+        ----------
+        query : str
+            Consulta SQL.
+        parameters : tuple
+            Parámetros de la consulta.
+
+        Retorna
+        -------
+        List[tuple]
+            Filas del resultado (vacía si la lectura falla).
+        """
+        try:
+            with self.__db_lock:
+                return self.__connection.execute(query, parameters).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Error] Fallo leyendo el almacén de partidas: {e}")
+            return []
+
+
+# Cualquiera de los dos almacenes: tienen la misma interfaz (get, put, delete, size)
+SessionStore = Union[MemorySessionStore, SqliteSessionStore]
@@ -0,0 +1,664 @@
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import threading
+
+STORIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "historias_fantasticas.csv")
+
+# Formato compilado: MAGIC, longitud de la cabecera JSON, cabecera, relleno hasta
+# múltiplo de 8, ids (int64), desplazamientos de cada campo (uint64) y textos UTF-8.
+# Los enteros se guardan en el orden de bytes de la máquina que compila.
+MAGIC = b"RGCAT001"
+COMPILED_SUFFIX = ".catalog"
+
+
+class Story:
+    """
+    Registro compacto de una historia del catálogo.
+
+    Atributos
+    ----------
+    id : int
+        Identificador de la historia.
+    titulo : str
+        Título de la historia.
+    sinopsis : str
+        Sinopsis de la historia.
+    chapters : Tuple[str, ...]
+        Títulos de los capítulos, en orden.
+    """
+
+    __slots__ = ("id", "titulo", "sinopsis", "chapters")
+
+    def __init__(self, id: int, titulo: str, sinopsis: str, chapters: Tuple[str, ...]):
+        """
+        Inicializa la clase Story.
+
+        Parámetros
+        ----------
+        id : int
+            Identificador de la historia.
+        titulo : str
+            Título de la historia.
+        sinopsis : str
+            Sinopsis de la historia.
+        chapters : Tuple[str, ...]
+            Títulos de los capítulos, en orden (sin capítulos vacíos al final).
+        """
+        self.id = id
+        self.titulo = titulo
+        self.sinopsis = sinopsis
+        self.chapters = chapters
+
+    @property
+    def chapter_count(self) -> int:
+        """
+        int: Obtiene el número de capítulos de la historia.
+        """
+        return len(self.chapters)
+
+    def chapter(self, number: int) -> str:
+        """
+        Devuelve el título de un capítulo.
+
+        Parámetros
+        ----------
+        number : int
+            Número del capítulo (empezando en 1).
+
+        Retorna
+        -------
+        str
+            Título del capítulo.
+
+        Raises
+        ------
+        KeyError
+            Si la historia no tiene ese capítulo.
+        """
+        if not 1 <= number <= len(self.chapters):
+            raise KeyError(f"cap_{number}")
+        return self.chapters[number - 1]
+
+    def to_dict(self) -> Dict:
+        """
+        Convierte la historia en un diccionario con el formato de las columnas del CSV.
+
+        Retorna
+        -------
+        Dict
+            Id, título, sinopsis y capítulos ("cap_1", "cap_2"...).
+        """
+        return {
+            "id": self.id, "titulo": self.titulo, "sinopsis": self.sinopsis,
+            "chapters": {f"cap_{number}": title for number, title in enumerate(self.chapters, start=1)},
+        }
+
+
+class StoryCatalog:
+    """
+    Catálogo de historias con índice por id y registros compactos.
+
+    Las búsquedas por id son O(1) (diccionario id -> posición) y las listas
+    se sirven por páginas. Se puede cargar de dos formas:
+
+    - Desde el CSV: se analiza con el módulo `csv` y los textos quedan en
+      memoria en tuplas compactas (adecuado para catálogos pequeños).
+    - Desde el archivo compilado (`<csv>.catalog`, ver `compile`): se abre con
+      mmap y solo se decodifican los textos de las historias consultadas, de
+      modo que el arranque no depende del tamaño del catálogo.
+
+    `load` usa el archivo compilado si existe y está al día con el CSV.
+
+    Atributos
+    ----------
+    path : str
+        Archivo del que se cargó el catálogo.
+    compiled : bool
+        True si se cargó desde el formato compilado.
+    ids : array
+        Ids de las historias en el orden del archivo.
+    """
+
+    __shared: Dict[str, "StoryCatalog"] = {}
+    __shared_lock = threading.Lock()
+
+    def __init__(self, path: str, ids: array, fields: Tuple[str, ...], records: Optional[List[Tuple[str, ...]]] = None,
+                 buffer: Optional[mmap.mmap] = None, offsets: Optional[memoryview] = None, blob_start: int = 0,
+                 source: Optional[Dict] = None, max_cached: int = 256):
+        """
+        Inicializa la clase StoryCatalog. Normalmente se crea con `load`, `from_csv` o `from_compiled`.
+
+        Parámetros
+        ----------
+        path : str
+            Archivo de origen.
+        ids : array
+            Ids de las historias.
+        fields : Tuple[str, ...]
+            Nombres de los campos de texto ("titulo", "sinopsis", "cap_1"...).
+        records : List[Tuple[str, ...]], opcional
+            Textos de cada historia (modo CSV).
+        buffer : mmap.mmap, opcional
+            Archivo compilado mapeado en memoria (modo compilado).
+        offsets : memoryview, opcional
+            Desplazamientos de cada campo dentro de los textos (modo compilado).
+        blob_start : int, opcional
+            Posición donde empiezan los textos en el archivo compilado.
+        source : Dict, opcional
+            Tamaño y fecha del CSV a partir del que se compiló (modo compilado).
+        max_cached : int, opcional
+            Historias decodificadas que se conservan en memoria. Por defecto es 256.
+        """
+        self.__path = path
+        self.__ids = ids
+        self.__fields = fields
+        self.__records = records
+        self.__buffer = buffer
+        self.__offsets = offsets
+        self.__blob_start = blob_start
+        self.__source = source or {}
+        self.__index: Dict[int, int] = {story_id: position for position, story_id in enumerate(ids)}
+        self.__cache: "OrderedDict[int, Story]" = OrderedDict()
+        self.__max_cached = max_cached
+        self.__lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        """
+        str: Obtiene el archivo del que se cargó el catálogo.
+        """
+        return self.__path
+
+    @property
+    def compiled(self) -> bool:
+        """
+        bool: Indica si el catálogo se cargó desde el formato compilado.
+        """
+        return self.__buffer is not None
+
+    @property
+    def ids(self) -> array:
+        """
+        array: Obtiene los ids de las historias.
+        """
+        return self.__ids
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def __contains__(self, story_id: int) -> bool:
+        return story_id in self.__index
+
+    def __iter__(self) -> Iterator[Story]:
+        for position in range(len(self.__ids)):
+            yield self.__story_at(position)
+
+    @classmethod
+    def shared(cls, path: str = STORIES_PATH) -> "StoryCatalog":
+        """
+        Devuelve el catálogo del proceso para un CSV, cargándolo la primera vez.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del CSV. Por defecto es data/historias_fantasticas.csv.
+
+        Retorna
+        -------
+        StoryCatalog
+            Catálogo compartido.
+        """
+        catalog = cls.__shared.get(path)
+        if catalog is None:
+            with cls.__shared_lock:
+                catalog = cls.__shared.get(path)
+                if catalog is None:
+                    catalog = cls.load(path)
+                    cls.__shared[path] = catalog
+        return catalog
+
+    @classmethod
+    def invalidate(cls, path: Optional[str] = None) -> None:
+        """
+        Descarta el catálogo compartido para que se vuelva a cargar.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del CSV a descartar. Si es None se descartan todos.
+        """
+        with cls.__shared_lock:
+            if path is None:
+                cls.__shared.clear()
+            else:
+                cls.__shared.pop(path, None)
+
+    @classmethod
+    def load(cls, path: str = STORIES_PATH) -> "StoryCatalog":
+        """
+        Carga el catálogo, usando el archivo compilado si está al día con el CSV.
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del CSV. Por defecto es data/historias_fantasticas.csv.
+
+        Retorna
+        -------
+        StoryCatalog
+            Catálogo cargado.
+        """
+        compiled_path = cls.compiled_path(path)
+        if os.path.exists(compiled_path):
+            try:
+                catalog = cls.from_compiled(compiled_path)
+                if catalog.__is_fresh(path):
+                    return catalog
+                catalog.close()
+            except (OSError, ValueError) as e:
+                print(f"[Error] Catálogo compilado no válido, se usa el CSV: {e}")
+        return cls.from_csv(path)
+
+    @staticmethod
+    def compiled_path(path: str) -> str:
+        """
+        Devuelve la ruta del archivo compilado correspondiente a un CSV.
+
+        Parámetros
+        ----------
+        path : str
+            Ruta del CSV.
+
+        Retorna
+        -------
+        str
+            Ruta del archivo compilado.
+        """
+        return os.path.splitext(path)[0] + COMPILED_SUFFIX
+
+    @classmethod
+    def from_csv(cls, path: str = STORIES_PATH) -> "StoryCatalog":
+        """
+        Carga el catálogo desde un CSV con columnas id, titulo, sinopsis, cap_1, cap_2...
+
+        Parámetros
+        ----------
+        path : str, opcional
+            Ruta del CSV.
+
+        Retorna
+        -------
+        StoryCatalog
+            Catálogo con los textos en memoria.
+
+        Raises
+        ------
+        FileNotFoundError
+            Si el archivo no existe.
+        ValueError
+            Si faltan columnas o hay ids no válidos o repetidos.
+        """
+        fields, rows = cls.__read_csv(path)
+        ids = array("q", (story_id for story_id, _ in rows))
+        return cls(path, ids, fields, records=[record for _, record in rows])
+
+    @classmethod
+    def from_compiled(cls, path: str) -> "StoryCatalog":
+        """
+        Abre un catálogo compilado con mmap.
+
+        Parámetros
+        ----------
+        path : str
+            Ruta del archivo compilado.
+
+        Retorna
+        -------
+        StoryCatalog
+            Catálogo que decodifica los textos bajo demanda.
+
+        Raises
+        ------
+        ValueError
+            Si el archivo no tiene el formato esperado.
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(MAGIC)] != MAGIC:
+            buffer.close()
+            raise ValueError(f"{path} no es un catálogo compilado.")
+        (header_length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]).decode("utf-8"))
+        count, fields = header["count"], tuple(header["fields"])
+        position = (header_start + header_length + 7) // 8 * 8
+
+        view = memoryview(buffer)
+        ids = array("q")
+        ids.frombytes(view[position:position + 8 * count])
+        position += 8 * count
+        offsets_length = 8 * (count * len(fields) + 1)
+        offsets = view[position:position + offsets_length].cast("Q")
+        return cls(path, ids, fields, buffer=buffer, offsets=offsets, blob_start=position + offsets_length,
+                   source=header.get("source"))
+
+    @classmethod
+    def compile(cls, csv_path: str = STORIES_PATH, output_path: Optional[str] = None) -> str:
+        """
+        Convierte un CSV al formato compilado para arrancar rápido con catálogos grandes.
+
+        Parámetros
+        ----------
+        csv_path : str, opcional
+            Ruta del CSV.
+        output_path : str, opcional
+            Archivo de salida. Por defecto es el CSV con extensión .catalog.
+
+        Retorna
+        -------
+        str
+            Ruta del archivo escrito.
+        """
+        output_path = output_path or cls.compiled_path(csv_path)
+        fields, rows = cls.__read_csv(csv_path)
+        stat = os.stat(csv_path)
+        header = json.dumps({
+            "count": len(rows), "fields": list(fields),
+            "source": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        }).encode("utf-8")
+
+        offsets = array("Q", [0])
+        chunks = []
+        for _, record in rows:
+            for value in record:
+                data = value.encode("utf-8")
+                chunks.append(data)
+                offsets.append(offsets[-1] + len(data))
+        ids = array("q", (story_id for story_id, _ in rows))
+
+        prefix = MAGIC + struct.pack("<I", len(header)) + header
+        temporary = output_path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(prefix + b"\0" * (-len(prefix) % 8))
+            file.write(ids.tobytes())
+            file.write(offsets.tobytes())
+            for chunk in chunks:
+                file.write(chunk)
+        os.replace(temporary, output_path)
+        return output_path
+
+    def close(self) -> None:
+        """
+        Libera el archivo mapeado en memoria (solo en modo compilado).
+        """
+        if self.__buffer is not None:
+            self.__offsets.release()
+            self.__offsets = None
+            buffer, self.__buffer = self.__buffer, None
+            try:
+                buffer.close()
+            except BufferError:
+                # Todavía hay vistas abiertas; el mapeo se libera con el recolector
+                pass
+
+    def get(self, story_id: int) -> Optional[Story]:
+        """
+        Busca una historia por id.
+
+        Parámetros
+        ----------
+        story_id : int
+            Identificador de la historia.
+
+        Retorna
+        -------
+        Story or None
+            Historia encontrada, o None si no existe.
+        """
+        position = self.__index.get(story_id)
+        if position is None:
+            return None
+        return self.__story_at(position)
+
+    def title(self, story_id: int) -> Optional[str]:
+        """
+        Devuelve el título de una historia sin decodificar el resto del registro.
+
+        Parámetros
+        ----------
+        story_id : int
+            Identificador de la historia.
+
+        Retorna
+        -------
+        str or None
+            Título, o None si la historia no existe.
+        """
+        position = self.__index.get(story_id)
+        if position is None:
+            return None
+        return self.__field(position, 0)
+
+    def page(self, page: int = 0, page_size: int = 20, fields: Tuple[str, ...] = ("id", "titulo", "sinopsis")) -> List[Dict]:
+        """
+        Devuelve una página de historias para las vistas de lista.
+
+        Parámetros
+        ----------
+        page : int, opcional
+            Número de página, empezando en 0. Por defecto es 0.
+        page_size : int, opcional
+            Historias por página. Por defecto es 20.
+        fields : Tuple[str, ...], opcional
+            Campos a incluir. Por defecto id, titulo y sinopsis.
+
+        Retorna
+        -------
+        List[Dict]
+            Historias de la página (vacía si la página no existe).
+
+        Raises
+        ------
+        ValueError
+            Si `page_size` es menor que 1.
+        """
+        self.__check_page_size(page_size)
+        start = max(page, 0) * page_size
+        rows = []
+        for position in range(start, min(start + page_size, len(self.__ids))):
+            row = {}
+            for name in fields:
+                row[name] = self.__ids[position] if name == "id" else self.__field(position, self.__fields.index(name))
+            rows.append(row)
+        return rows
+
+    def page_count(self, page_size: int = 20) -> int:
+        """
+        Devuelve el número de páginas del catálogo.
+
+        Parámetros
+        ----------
+        page_size : int, opcional
+            Historias por página. Por defecto es 20.
+
+        Retorna
+        -------
+        int
+            Número de páginas (al menos 1).
+
+        Raises
+        ------
+        ValueError
+            Si `page_size` es menor que 1.
+        """
+        self.__check_page_size(page_size)
+        return max(1, -(-len(self.__ids) // page_size))
+
+    @staticmethod
+    def __check_page_size(page_size: int) -> None:
+        """
+        Comprueba que el tamaño de página sea válido.
+
+        Parámetros
+        ----------
+        page_size : int
+            Historias por página.
+
+        Raises
+        ------
+        ValueError
+            Si `page_size` es menor que 1.
+        """
+        if page_size < 1:
+            print(f"[Error] Tamaño de página no válido: {page_size}.")
+            raise ValueError(f"page_size debe ser al menos 1 (recibido {page_size}).")
+
+    def __story_at(self, position: int) -> Story:
+        """
+        Construye (o recupera de la caché) la historia de una posición.
+
+        Parámetros
+        ----------
+        position : int
+            Posición de la historia en el catálogo.
+
+        Retorna
+        -------
+        Story
+            Historia decodificada.
+        """
+        with self.__lock:
+            story = self.__cache.get(position)
+            if story is not None:
+                self.__cache.move_to_end(position)
+                return story
+        values = [self.__field(position, index) for index in range(len(self.__fields))]
+        chapters = values[2:]
+        while chapters and not chapters[-1]:
+            chapters.pop()
+        story = Story(self.__ids[position], values[0], values[1], tuple(chapters))
+        with self.__lock:
+            self.__cache[position] = story
+            if len(self.__cache) > self.__max_cached:
+                self.__cache.popitem(last=False)
+        return story
+
+    def __field(self, position: int, index: int) -> str:
+        """
+        Lee un campo de texto de una historia.
+
+        Parámetros
+        ----------
+        position : int
+            Posición de la historia.
+        index : int
+            Índice del campo en `fields`.
+
+        Retorna
+        -------
+        str
+            Texto del campo.
+        """
+        if self.__records is not None:
+            return self.__records[position][index]
+        slot = position * len(self.__fields) + index
+        start = self.__blob_start + self.__offsets[slot]
+        end = self.__blob_start + self.__offsets[slot + 1]
+        return self.__buffer[start:end].decode("utf-8")
+
+    def __is_fresh(self, csv_path: str) -> bool:
+        """
+        Comprueba si el catálogo compilado corresponde a la versión actual del CSV.
+
+        Parámetros
+        ----------
+        csv_path : str
+            Ruta del CSV de origen.
+
+        Retorna
+        -------
+        bool
+            True si no hay CSV o si su tamaño y fecha coinciden con los compilados.
+        """
+        if not os.path.exists(csv_path):
+            return True
+        stat = os.stat(csv_path)
+        return self.__source.get("size") == stat.st_size and self.__source.get("mtime_ns") == stat.st_mtime_ns
+
+    @staticmethod
+    def __read_csv(path: str) -> Tuple[Tuple[str, ...], List[Tuple[int, Tuple[str, ...]]]]:
+        """
+        Lee el CSV de historias.
+
+        Parámetros
+        ----------
+        path : str
+            Ruta del CSV.
+
+        Retorna
+        -------
+        Tuple[Tuple[str, ...], List[Tuple[int, Tuple[str, ...]]]]
+            Nombres de los campos de texto y, por historia, su id y sus textos.
+
+        Raises
+        ------
+        FileNotFoundError
+            Si el archivo no existe.
+        ValueError
+            Si faltan columnas o hay ids no válidos o repetidos.
+        """
+        try:
+            with open(path, encoding="utf-8", newline="") as file:
+                reader = csv.reader(file)
+                header = next(reader, None)
+                if not header or header[:3] != ["id", "titulo", "sinopsis"]:
+                    raise ValueError(f"Cabecera no válida en {path}: se esperaba id,titulo,sinopsis,cap_1,...")
+                chapters = sorted((column for column in header if column.startswith("cap_")),
+                                  key=lambda column: int(column[4:]))
+                fields = ("titulo", "sinopsis", *chapters)
+                columns = [header.index(name) for name in fields]
+                rows, seen = [], set()
+                for line in reader:
+                    if not line:
+                        continue
+                    story_id = int(line[0])
+                    if story_id in seen:
+                        raise ValueError(f"Id de historia repetido en {path}: {story_id}")
+                    seen.add(story_id)
+                    line += [""] * (len(header) - len(line))
+                    rows.append((story_id, tuple(line[column].strip() for column in columns)))
+        except FileNotFoundError as e:
+            print(f"[Error] Archivo no encontrado: {e}")
+            raise
+        except ValueError as e:
+            print(f"[Error] Fallo al analizar el archivo CSV: {e}")
+            raise
+        return fields, rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Compila el catálogo CSV al formato binario (`python -m engine.story_catalog`).
+
+    Parámetros
+    ----------
+    argv : List[str], opcional
+        Argumentos de línea de comandos. Por defecto se usan los del proceso.
+    """
+    parser = argparse.ArgumentParser(description="Compila el catálogo de historias para un arranque rápido.")
+    parser.add_argument("csv", nargs="?", default=STORIES_PATH, help="CSV de historias.")
+    parser.add_argument("--output", default=None, help="Archivo de salida (por defecto <csv>.catalog).")
+    args = parser.parse_args(argv)
+    output = StoryCatalog.compile(args.csv, args.output)
+    print(f"Catálogo compilado: {output} ({len(StoryCatalog.from_compiled(output))} historias)")
+
+
+if __name__ == "__main__":
+    main()
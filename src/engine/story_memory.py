@@ -0,0 +1,264 @@
+from typing import Callable, List, Optional
+from agents.context_budget import approximate_tokens
+from config.model_config import ModelConfig
+from engine.chapter_parser import parse_chapter
+import re
+import threading
+
+# Fin de frase: puntuación tras una letra (no corta "Capítulo 3. ...")
+_SENTENCE_END = re.compile(r"(?<=[^\W\d][.!?…])\s+")
+
+
+class StoryMemory:
+    """
+    Memoria acotada de una partida que se actualiza capítulo a capítulo sin llamar al modelo.
+
+    Por cada capítulo superado se añade una entrada breve: las últimas frases
+    de la narración (la situación en la que queda el jugador, hasta
+    `entry_tokens`) y la decisión tomada. Solo cuando la memoria supera
+    `max_tokens` hay que pedir al modelo que la condense en un resumen de
+    unos `compact_tokens`; entre tanto, cada capítulo nuevo cuesta cero
+    llamadas de resumen. Así el prompt de narración no crece con la partida.
+
+    La clase no guarda estado de ninguna partida: la memoria es un texto que
+    se guarda en la propia GameSession (ver `GameSession.memory`).
+
+    Atributos
+    ----------
+    max_tokens : int
+        Tokens a partir de los cuales hay que condensar la memoria. No
+        incluye la línea con la decisión del último capítulo, que se añade
+        después porque la condensación se adelanta antes de conocerla.
+    entry_tokens : int
+        Tokens máximos de la entrada de cada capítulo.
+    compact_tokens : int
+        Tokens objetivo del resumen condensado.
+    """
+
+    __shared: Optional["StoryMemory"] = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, max_tokens: int = 800, entry_tokens: int = 80, compact_tokens: int = 250,
+                 tokenizer: Optional[Callable[[str], int]] = None):
+        """
+        Inicializa la clase StoryMemory.
+
+        Parámetros
+        ----------
+        max_tokens : int, opcional
+            Tokens a partir de los cuales se condensa la memoria. Por defecto es 800.
+        entry_tokens : int, opcional
+            Tokens máximos de la entrada de cada capítulo. Por defecto es 80.
+        compact_tokens : int, opcional
+            Tokens objetivo del resumen condensado. Por defecto es 250.
+        tokenizer : Callable[[str], int], opcional
+            Función que cuenta los tokens de un texto. Por defecto `approximate_tokens`.
+
+        Raises
+        ------
+        ValueError
+            Si `compact_tokens` o `entry_tokens` no caben en `max_tokens`.
+        """
+        if compact_tokens + entry_tokens > max_tokens:
+            print("[Error] compact_tokens + entry_tokens debe ser menor o igual que max_tokens.")
+            raise ValueError("compact_tokens + entry_tokens debe ser menor o igual que max_tokens.")
+        self.__max_tokens = max_tokens
+        self.__entry_tokens = entry_tokens
+        self.__compact_tokens = compact_tokens
+        self.__tokenizer = tokenizer or approximate_tokens
+
+    @property
+    def max_tokens(self) -> int:
+        """
+        int: Obtiene los tokens a partir de los cuales se condensa la memoria.
+        """
+        return self.__max_tokens
+
+    @property
+    def entry_tokens(self) -> int:
+        """
+        int: Obtiene los tokens máximos de la entrada de cada capítulo.
+        """
+        return self.__entry_tokens
+
+    @property
+    def compact_tokens(self) -> int:
+        """
+        int: Obtiene los tokens objetivo del resumen condensado.
+        """
+        return self.__compact_tokens
+
+    @classmethod
+    def shared(cls) -> "StoryMemory":
+        """
+        Devuelve la instancia configurada en la sección [Memory] de model.config.
+
+        Retorna
+        -------
+        StoryMemory
+            Memoria compartida por el proceso.
+        """
+        if cls.__shared is None:
+            with cls.__shared_lock:
+                if cls.__shared is None:
+                    config = ModelConfig.shared()
+                    cls.__shared = cls(
+                        max_tokens=config.getint("Memory", "max_tokens", fallback=800),
+                        entry_tokens=config.getint("Memory", "entry_tokens", fallback=80),
+                        compact_tokens=config.getint("Memory", "compact_tokens", fallback=250),
+                    )
+        return cls.__shared
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Descarta la instancia compartida para que se vuelva a leer la configuración.
+        """
+        with cls.__shared_lock:
+            cls.__shared = None
+
+    def count(self, text: str) -> int:
+        """
+        Cuenta los tokens de un texto.
+
+        Parámetros
+        ----------
+        text : str
+            Texto a medir.
+
+        Retorna
+        -------
+        int
+            Tokens del texto.
+        """
+        return self.__tokenizer(text)
+
+    def entry(self, chapter: int, text: str) -> str:
+        """
+        Construye la entrada de un capítulo: las últimas frases de su narración.
+
+        Parámetros
+        ----------
+        chapter : int
+            Número del capítulo.
+        text : str
+            Texto del capítulo, con o sin las opciones.
+
+        Retorna
+        -------
+        str
+            Entrada del capítulo, de `entry_tokens` como máximo.
+        """
+        label = f"Capítulo {chapter}: "
+        return label + self.tail(parse_chapter(text).narrative, self.__entry_tokens - self.count(label))
+
+    def merge(self, memory: str, entry: str) -> str:
+        """
+        Añade una entrada al final de la memoria.
+
+        Parámetros
+        ----------
+        memory : str
+            Memoria actual ("" al empezar la partida).
+        entry : str
+            Entrada del último capítulo.
+
+        Retorna
+        -------
+        str
+            Memoria con la entrada añadida.
+        """
+        return f"{memory}\n{entry}" if memory else entry
+
+    def with_choice(self, memory: str, choice: str) -> str:
+        """
+        Añade a la memoria la decisión del jugador.
+
+        Parámetros
+        ----------
+        memory : str
+            Memoria con la entrada del último capítulo.
+        choice : str
+            Opción elegida, con su descripción.
+
+        Retorna
+        -------
+        str
+            Memoria terminada en la decisión.
+        """
+        return f"{memory}\nDecisión del jugador: {choice}."
+
+    def over_budget(self, memory: str) -> bool:
+        """
+        Indica si la memoria ya no cabe en `max_tokens` y hay que condensarla.
+
+        Parámetros
+        ----------
+        memory : str
+            Memoria a medir.
+
+        Retorna
+        -------
+        bool
+            True si supera `max_tokens`.
+        """
+        return self.count(memory) > self.__max_tokens
+
+    def bound(self, summary: str) -> str:
+        """
+        Recorta un resumen condensado a `max_tokens - entry_tokens`, conservando las últimas frases.
+
+        El modelo no siempre respeta la longitud pedida; así la memoria queda
+        acotada aunque se pase.
+
+        Parámetros
+        ----------
+        summary : str
+            Resumen devuelto por el modelo.
+
+        Retorna
+        -------
+        str
+            Resumen que deja sitio para la entrada del siguiente capítulo.
+        """
+        return self.tail(summary.strip(), self.__max_tokens - self.__entry_tokens)
+
+    def tail(self, text: str, max_tokens: int) -> str:
+        """
+        Devuelve las últimas frases completas de un texto que caben en un número de tokens.
+
+        Si ni siquiera cabe la última frase se devuelven sus últimas palabras.
+
+        Parámetros
+        ----------
+        text : str
+            Texto a recortar.
+        max_tokens : int
+            Tokens máximos del resultado.
+
+        Retorna
+        -------
+        str
+            Final del texto, con los espacios normalizados.
+        """
+        text = " ".join(text.split())
+        if self.count(text) <= max_tokens:
+            return text
+        kept: List[str] = []
+        budget = max_tokens
+        for sentence in reversed(_SENTENCE_END.split(text)):
+            tokens = self.count(sentence) + (1 if kept else 0)
+            if tokens > budget:
+                break
+            budget -= tokens
+            kept.append(sentence)
+        if kept:
+            return " ".join(reversed(kept))
+        words: List[str] = []
+        budget = max_tokens
+        for word in reversed(text.split()):
+            budget -= self.count(word)
+            if budget < 0:
+                break
+            words.append(word)
+        return " ".join(reversed(words))
@@ -0,0 +1,505 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+from agents.context_budget import approximate_tokens
+from agents.telemetry import Telemetry
+from config.model_config import ModelConfig
+from engine.chapter_parser import parse_chapter
+import re
+import threading
+import zlib
+
+if TYPE_CHECKING:
+    # NumPy solo se importa al crear el primer índice: con [Recall] desactivado no se carga
+    import numpy as np
+
+# Palabras de un texto (sin números ni signos)
+_WORD = re.compile(r"[^\W\d_]+")
+# Fin de frase, como en StoryMemory: puntuación tras una letra
+_SENTENCE_END = re.compile(r"(?<=[^\W\d][.!?…])\s+")
+# Letras con las que se compara cada palabra: "espada" y "espadas" cuentan como la misma
+STEM_LETTERS = 6
+# Palabras demasiado frecuentes para distinguir un pasaje de otro
+STOPWORDS = frozenset("""
+    algo algún alguna alguno antes aquel aquella aquí así aunque cada como con cuando del desde donde durante
+    ella ellas ellos entre era eran esa esas ese eso esos esta está están estas este esto estos fue fueron
+    hacia hasta hay las les los más mientras mismo muy nada nos nuestro otra otro para pero poco por porque
+    puede qué que quien sea ser sin sobre son sólo solo también tan tanto todo toda todas todos tras tus una
+    uno unos unas vez jugador capítulo decisión opción
+""".split())
+
+
+@lru_cache(maxsize=65536)
+def _feature(word: str) -> int:
+    """
+    Calcula el hash estable (igual en todos los procesos) de la raíz de una palabra.
+
+    Parámetros
+    ----------
+    word : str
+        Palabra en minúsculas.
+
+    Retorna
+    -------
+    int
+        CRC32 de las primeras `STEM_LETTERS` letras.
+    """
+    return zlib.crc32(word[:STEM_LETTERS].encode("utf-8"))
+
+
+def embed(texts: Sequence[str], dimensions: int = 256) -> "np.ndarray":
+    """
+    Convierte textos en vectores normalizados con el truco del hashing, sin modelo ni red.
+
+    Cada palabra significativa suma ±1 en la dimensión que indica el hash de
+    su raíz, así que dos pasajes que nombran a los mismos personajes,
+    objetos o lugares tienen vectores cercanos. Todos los textos se
+    convierten de una vez en una matriz.
+
+    Parámetros
+    ----------
+    texts : Sequence[str]
+        Textos a convertir.
+    dimensions : int, opcional
+        Dimensiones de los vectores. Por defecto es 256.
+
+    Retorna
+    -------
+    np.ndarray
+        Matriz float32 de forma (len(texts), dimensions) con filas de norma 1
+        (o 0 si el texto no tiene palabras significativas).
+    """
+    import numpy as np
+
+    rows: List[int] = []
+    columns: List[int] = []
+    signs: List[float] = []
+    for row, text in enumerate(texts):
+        for word in _WORD.findall(text.lower()):
+            if len(word) < 3 or word in STOPWORDS:
+                continue
+            feature = _feature(word)
+            rows.append(row)
+            columns.append(feature % dimensions)
+            signs.append(1.0 if feature & 0x80000000 else -1.0)
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    if rows:
+        np.add.at(matrix, (np.array(rows), np.array(columns)), np.array(signs, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class RecallIndex:
+    """
+    Índice vectorial de los pasajes de los capítulos de una partida.
+
+    Cada capítulo se parte en pasajes de frases completas de hasta
+    `passage_tokens` tokens, que se convierten en vectores con `embed` y se
+    guardan en una matriz de NumPy en float16 (la mitad de memoria; la
+    precisión sobra para ordenar pasajes). `search` compara la consulta con
+    todos los pasajes en un solo producto de matriz por vector, en float32.
+
+    Atributos
+    ----------
+    dimensions : int
+        Dimensiones de los vectores.
+    passage_tokens : int
+        Tokens máximos de cada pasaje.
+    size : int
+        Pasajes guardados.
+    chapter_count : int
+        Capítulos añadidos.
+    """
+
+    def __init__(self, dimensions: int = 256, passage_tokens: int = 60):
+        """
+        Inicializa la clase RecallIndex.
+
+        Parámetros
+        ----------
+        dimensions : int, opcional
+            Dimensiones de los vectores. Por defecto es 256.
+        passage_tokens : int, opcional
+            Tokens máximos de cada pasaje. Por defecto es 60.
+        """
+        import numpy as np
+
+        self.__dimensions = dimensions
+        self.__passage_tokens = passage_tokens
+        # Una fila por pasaje; crece una vez por capítulo, así que no se reserva de más
+        self.__vectors = np.zeros((0, dimensions), dtype=np.float16)
+        self.__chapters = np.zeros(0, dtype=np.int32)
+        self.__passages: List[str] = []
+        self.__chapter_count = 0
+
+    @property
+    def dimensions(self) -> int:
+        """
+        int: Obtiene las dimensiones de los vectores.
+        """
+        return self.__dimensions
+
+    @property
+    def passage_tokens(self) -> int:
+        """
+        int: Obtiene los tokens máximos de cada pasaje.
+        """
+        return self.__passage_tokens
+
+    @property
+    def size(self) -> int:
+        """
+        int: Obtiene el número de pasajes guardados.
+        """
+        return len(self.__passages)
+
+    @property
+    def chapter_count(self) -> int:
+        """
+        int: Obtiene el número de capítulos añadidos.
+        """
+        return self.__chapter_count
+
+    @property
+    def nbytes(self) -> int:
+        """
+        int: Obtiene los bytes reservados por los vectores.
+        """
+        return self.__vectors.nbytes + self.__chapters.nbytes
+
+    def add(self, text: str) -> int:
+        """
+        Añade el siguiente capítulo de la partida.
+
+        Parámetros
+        ----------
+        text : str
+            Texto del capítulo, con o sin las opciones.
+
+        Retorna
+        -------
+        int
+            Pasajes añadidos.
+        """
+        import numpy as np
+
+        self.__chapter_count += 1
+        passages = self.split(text)
+        if not passages:
+            return 0
+        self.__vectors = np.concatenate([self.__vectors, embed(passages, self.__dimensions).astype(np.float16)])
+        self.__chapters = np.concatenate([self.__chapters, np.full(len(passages), self.__chapter_count, np.int32)])
+        self.__passages.extend(passages)
+        return len(passages)
+
+    def split(self, text: str) -> List[str]:
+        """
+        Parte la narración de un capítulo en pasajes de frases completas.
+
+        Parámetros
+        ----------
+        text : str
+            Texto del capítulo, con o sin las opciones.
+
+        Retorna
+        -------
+        List[str]
+            Pasajes de hasta `passage_tokens` tokens. Una frase más larga se
+            parte entre palabras, para que el prompt siga acotado.
+        """
+        narrative = " ".join(parse_chapter(text).narrative.split())
+        passages: List[str] = []
+        current: List[str] = []
+        tokens = 0
+        for sentence in _SENTENCE_END.split(narrative):
+            pieces = [sentence] if approximate_tokens(sentence) <= self.__passage_tokens else sentence.split()
+            for piece in pieces:
+                if not piece:
+                    continue
+                length = approximate_tokens(piece)
+                if current and tokens + length > self.__passage_tokens:
+                    passages.append(" ".join(current))
+                    current, tokens = [], 0
+                current.append(piece)
+                tokens += length
+        if current:
+            passages.append(" ".join(current))
+        return passages
+
+    def search(self, query: str, k: int, before: Optional[int] = None,
+               min_score: float = 0.0) -> List[Tuple[int, str, float]]:
+        """
+        Busca los pasajes más parecidos a una consulta.
+
+        Parámetros
+        ----------
+        query : str
+            Texto de la consulta.
+        k : int
+            Pasajes devueltos como máximo.
+        before : int, opcional
+            Si se indica, solo se buscan pasajes de capítulos anteriores a este.
+        min_score : float, opcional
+            Similitud del coseno mínima de un pasaje. Por defecto es 0.
+
+        Retorna
+        -------
+        List[Tuple[int, str, float]]
+            Capítulo, pasaje y similitud de cada resultado, en el orden de la partida.
+        """
+        import numpy as np
+
+        size = len(self.__passages)
+        if size == 0 or k <= 0:
+            return []
+        scores = self.__vectors.astype(np.float32) @ embed([query], self.__dimensions)[0]
+        if before is not None:
+            scores[self.__chapters >= before] = -np.inf
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = np.sort(top[scores[top] > min_score])
+        return [(int(self.__chapters[i]), self.__passages[i], float(scores[i])) for i in top]
+
+
+class StoryRecall:
+    """
+    Memoria de recuerdos: pasajes de capítulos anteriores relevantes para el siguiente.
+
+    El resumen o la memoria de la partida pierden detalles (personajes,
+    objetos, promesas) que pueden volver a importar más adelante. Para no
+    tener que enviar más texto al modelo, cada partida tiene un índice
+    (`RecallIndex`) con los pasajes de sus capítulos, y al narrar el
+    siguiente solo se añaden al prompt los `top_k` pasajes más parecidos al
+    capítulo que el jugador acaba de leer y al título del siguiente. El
+    prompt tiene así un tamaño acotado por larga que sea la partida.
+
+    Los índices se guardan en memoria por session_id, como mucho
+    `max_sessions` (se descartan los menos usados). Si falta el de una
+    partida, por ejemplo tras un reinicio, se reconstruye con sus capítulos.
+    El último resultado de cada partida se guarda con su número de capítulos
+    y su título, así que volver a pedirlo (por ejemplo, en cada re-ejecución
+    de la interfaz mientras el jugador lee) no repite la búsqueda.
+
+    Atributos
+    ----------
+    top_k : int
+        Pasajes añadidos al prompt como máximo.
+    passage_tokens : int
+        Tokens máximos de cada pasaje.
+    dimensions : int
+        Dimensiones de los vectores.
+    min_score : float
+        Similitud mínima de un pasaje para recordarlo.
+    max_sessions : int
+        Índices guardados como máximo.
+    """
+
+    __shared: Optional["StoryRecall"] = None
+    __shared_loaded = False
+    __shared_lock = threading.Lock()
+
+    def __init__(self, top_k: int = 3, passage_tokens: int = 60, dimensions: int = 256, min_score: float = 0.15,
+                 max_sessions: int = 256):
+        """
+        Inicializa la clase StoryRecall.
+
+        Parámetros
+        ----------
+        top_k : int, opcional
+            Pasajes añadidos al prompt como máximo. Por defecto es 3.
+        passage_tokens : int, opcional
+            Tokens máximos de cada pasaje. Por defecto es 60.
+        dimensions : int, opcional
+            Dimensiones de los vectores. Por defecto es 256.
+        min_score : float, opcional
+            Similitud mínima de un pasaje para recordarlo. Por defecto es 0.15.
+        max_sessions : int, opcional
+            Índices guardados como máximo. Por defecto es 256.
+        """
+        self.__top_k = top_k
+        self.__passage_tokens = passage_tokens
+        self.__dimensions = dimensions
+        self.__min_score = min_score
+        self.__max_sessions = max(max_sessions, 1)
+        self.__indexes: "OrderedDict[str, RecallIndex]" = OrderedDict()
+        # session_id -> (capítulos, título, pasajes) de la última búsqueda
+        self.__recalled: Dict[str, Tuple[int, str, str]] = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def top_k(self) -> int:
+        """
+        int: Obtiene los pasajes añadidos al prompt como máximo.
+        """
+        return self.__top_k
+
+    @property
+    def passage_tokens(self) -> int:
+        """
+        int: Obtiene los tokens máximos de cada pasaje.
+        """
+        return self.__passage_tokens
+
+    @property
+    def dimensions(self) -> int:
+        """
+        int: Obtiene las dimensiones de los vectores.
+        """
+        return self.__dimensions
+
+    @property
+    def min_score(self) -> float:
+        """
+        float: Obtiene la similitud mínima de un pasaje para recordarlo.
+        """
+        return self.__min_score
+
+    @property
+    def max_sessions(self) -> int:
+        """
+        int: Obtiene el número máximo de índices guardados.
+        """
+        return self.__max_sessions
+
+    @classmethod
+    def shared(cls) -> Optional["StoryRecall"]:
+        """
+        Devuelve la instancia configurada en la sección [Recall] de model.config.
+
+        Retorna
+        -------
+        StoryRecall or None
+            Memoria de recuerdos del proceso, o None si está desactivada o
+            falta NumPy.
+        """
+        if cls.__shared_loaded:
+            return cls.__shared
+        with cls.__shared_lock:
+            if not cls.__shared_loaded:
+                config = ModelConfig.shared()
+                enabled = config.getboolean("Recall", "enabled", fallback=False)
+                if enabled:
+                    try:
+                        import numpy  # noqa: F401
+                    except ImportError:
+                        print("[Error] [Recall] necesita NumPy (pip install numpy); se desactivan los recuerdos.")
+                        enabled = False
+                if enabled:
+                    cls.__shared = cls(
+                        top_k=config.getint("Recall", "top_k", fallback=3),
+                        passage_tokens=config.getint("Recall", "passage_tokens", fallback=60),
+                        dimensions=config.getint("Recall", "dimensions", fallback=256),
+                        min_score=config.getfloat("Recall", "min_score", fallback=0.15),
+                        max_sessions=config.getint("Recall", "max_sessions", fallback=256),
+                    )
+                cls.__shared_loaded = True
+        return cls.__shared
+
+    @classmethod
+    def reset_shared(cls) -> None:
+        """
+        Descarta la instancia compartida para que se vuelva a leer la configuración.
+        """
+        with cls.__shared_lock:
+            cls.__shared = None
+            cls.__shared_loaded = False
+
+    def recall(self, session_id: str, chapters: List[str], title: str = "") -> str:
+        """
+        Busca los pasajes de capítulos anteriores relevantes para narrar el siguiente.
+
+        Añade antes al índice de la partida los capítulos que aún no tiene. La
+        consulta es el último capítulo más el título del siguiente; el último
+        capítulo no se busca, porque ya llega al prompt con la memoria.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+        chapters : List[str]
+            Textos de los capítulos narrados, en orden (`GameSession.chapters`).
+        title : str, opcional
+            Título del capítulo que se va a narrar. Por defecto es "".
+
+        Retorna
+        -------
+        str
+            Un pasaje por línea con su capítulo, o "" si no hay ninguno relevante.
+        """
+        if len(chapters) < 2:
+            return ""
+        with self.__lock:
+            cached = self.__recalled.get(session_id)
+            if cached is not None and cached[:2] == (len(chapters), title) and session_id in self.__indexes:
+                self.__indexes.move_to_end(session_id)
+                return cached[2]
+        with Telemetry.shared().span("recall", chapters=len(chapters)) as span:
+            query = f"{parse_chapter(chapters[-1]).narrative}\n{title}"
+            with self.__lock:
+                index = self.__index(session_id, len(chapters))
+                for text in chapters[index.chapter_count:]:
+                    index.add(text)
+                hits = index.search(query, self.__top_k, before=len(chapters), min_score=self.__min_score)
+                span["passages"] = index.size
+            span["hits"] = len(hits)
+        result = "\n".join(f"- Capítulo {chapter}: {passage}" for chapter, passage, _ in hits)
+        with self.__lock:
+            if session_id in self.__indexes:
+                self.__recalled[session_id] = (len(chapters), title, result)
+        return result
+
+    def discard(self, session_id: str) -> None:
+        """
+        Descarta el índice de una partida (por ejemplo, al terminarla).
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+        """
+        with self.__lock:
+            self.__indexes.pop(session_id, None)
+            self.__recalled.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve el número de índices guardados, sus pasajes y la memoria que ocupan.
+
+        Retorna
+        -------
+        Dict[str, int]
+            Partidas, pasajes y bytes de los vectores.
+        """
+        with self.__lock:
+            indexes = list(self.__indexes.values())
+        return {"sessions": len(indexes), "passages": sum(index.size for index in indexes),
+                "bytes": sum(index.nbytes for index in indexes)}
+
+    def __index(self, session_id: str, chapters: int) -> RecallIndex:
+        """
+        Devuelve el índice de una partida, creándolo si falta o no corresponde a sus capítulos.
+
+        Debe llamarse con el cerrojo tomado.
+
+        Parámetros
+        ----------
+        session_id : str
+            Identificador de la partida.
+        chapters : int
+            Capítulos narrados en la partida.
+
+        Retorna
+        -------
+        RecallIndex
+            Índice de la partida, marcado como el más reciente.
+        """
+        index = self.__indexes.get(session_id)
+        if index is None or index.chapter_count > chapters:
+            index = RecallIndex(dimensions=self.__dimensions, passage_tokens=self.__passage_tokens)
+            self.__indexes[session_id] = index
+        self.__indexes.move_to_end(session_id)
+        while len(self.__indexes) > self.__max_sessions:
+            evicted, _ = self.__indexes.popitem(last=False)
+            self.__recalled.pop(evicted, None)
+        return index
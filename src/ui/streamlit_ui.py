@@ -1,23 +1,33 @@
 import streamlit as st
-import pandas as pd
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from agents.llm import Llm
-from data.sys_prompts import summarizator, story_teller
+from agents.scheduler import LlmScheduler
+from agents.telemetry import Telemetry
+from config.model_config import ModelConfig
+from engine.story_catalog import StoryCatalog
+
+# Páginas del catálogo guardadas por st.cache_data (compartidas entre sesiones y re-ejecuciones)
+CACHED_PAGES = 256
+
 
 class Ui:
     """
     Gestiona la interfaz de usuario de la aplicación de historias interactivas.
 
-    Esta clase es responsable de cargar los datos de las historias, renderizar
-    los componentes de la interfaz de usuario con Streamlit y manejar la lógica
-    de interacción con el usuario.
+    Esta clase es responsable de renderizar los componentes de la interfaz de
+    usuario con Streamlit y manejar la interacción con el usuario. Solo
+    pinta: la narración y el estado de la partida viven en `engine`
+    (`GameEngine` y `GameSession`).
+
+    El catálogo (`story_browser`) es un fragmento de Streamlit: cambiar de
+    página solo vuelve a ejecutar el fragmento, y las páginas se guardan con
+    `st.cache_data`, de modo que no se vuelven a recortar ni a serializar en
+    cada interacción.
 
     Atributos
     ----------
-    stories : pd.DataFrame
-        DataFrame con las historias cargadas desde el archivo CSV.
-    chapter : int
-        Número del capítulo actual en la historia.
+    stories : StoryCatalog
+        Catálogo de historias indexado por id.
     model : Llm
         Instancia de la clase Llm para interactuar con el modelo de lenguaje.
     """
@@ -31,33 +41,14 @@ class Ui:
         model : Llm
             Instancia de la clase Llm para la generación de texto.
         """
-        self.__stories = self.__load_csv()
-        self.__chapter: int = 1
         self.__model: Llm = model
 
     @property
-    def stories(self) -> pd.DataFrame:
-        """
-        pd.DataFrame: Obtiene el DataFrame con las historias.
-        """
-        return self.__stories
-
-    @property
-    def chapter(self) -> int:
-        """
-        int: Obtiene o establece el número del capítulo actual.
-        """
-        return self.__chapter
-
-    @chapter.setter
-    def chapter(self, new_chapter: int) -> None:
-        self.__chapter = new_chapter
-
-    def chapter_add(self) -> None:
+    def stories(self) -> StoryCatalog:
         """
-        Incrementa el contador de capítulos en uno.
+        StoryCatalog: Obtiene el catálogo de historias (el compartido del proceso).
         """
-        self.__chapter += 1
+        return StoryCatalog.shared()
 
     @property
     def model(self) -> Llm:
@@ -66,84 +57,19 @@ class Ui:
         """
         return self.__model
 
-    def __load_csv(self) -> pd.DataFrame:
-        """
-        Carga las historias desde un archivo CSV.
-
-        Retorna
-        -------
-        pd.DataFrame
-            DataFrame con los datos de las historias.
-
-        Raises
-        ------
-        FileNotFoundError
-            Si el archivo 'data/historias_fantasticas.csv' no se encuentra.
-        pd.errors.ParserError
-            Si ocurre un error al parsear el archivo CSV.
-        """
-        try:
-            return pd.read_csv("data/historias_fantasticas.csv")
-        except FileNotFoundError as e:
-            print(f"[Error] Archivo no encontrado: {e}")
-            raise
-        except pd.errors.ParserError as e:
-            print(f"[Error] Fallo al analizar el archivo CSV: {e}")
-            raise
-
-    def __extract_row_information(self, story_number: int) -> Dict:
-        """
-        Extrae la información de una historia específica del DataFrame.
-
-        Parámetros
-        ----------
-        story_number : int
-            ID de la historia a extraer.
-
-        Retorna
-        -------
-        Dict
-            Diccionario con el título, sinopsis y capítulos de la historia.
-        """
-        row = self.stories[self.stories["id"] == story_number]
-        if row.empty:
-            return {}
-
-        fila = row.iloc[0]
-
-        dict_return = {
-            "id": fila["id"],
-            "titulo": fila["titulo"],
-            "sinopsis": fila["sinopsis"],
-        }
-
-        chapters_cols = [col for col in self.stories.columns if col.startswith("cap_")]
-        dict_return["chapters"] = fila[chapters_cols].to_dict()
-
-        return dict_return
-
-    def __create_narration_promtp(self, dict_row_parsed: Dict, summary: str = "") -> str:
+    @staticmethod
+    def reload_stories() -> StoryCatalog:
         """
-        Crea el prompt de narración para el modelo de lenguaje.
-
-        Parámetros
-        ----------
-        dict_row_parsed : Dict
-            Diccionario con la información de la historia.
-        summary : str, opcional
-            Resumen de los eventos previos de la historia. Por defecto es "".
+        Descarta el catálogo compartido y lo vuelve a cargar.
 
         Retorna
         -------
-        str
-            Prompt formateado para la generación de la narración.
+        StoryCatalog
+            Catálogo recién cargado.
         """
-        if self.chapter == 1:
-            prompt = f'''La sinopsis de la historia es: {dict_row_parsed["sinopsis"]}\n Comienza a explicar el primer capítulo de la historia que es: {dict_row_parsed["chapters"]["cap_1"]}.'''
-            return prompt
-        else:
-            prompt = f'''La sinopsis de la historia es: {dict_row_parsed["sinopsis"]}\n El usuario está en el capítulo:{self.chapter}. \n\n             Hasta ahora pasaron los siguientes sucesos {summary}.\n\n            El siguiente capítulo es el número {self.chapter} y se titula así: {dict_row_parsed["chapters"][f"cap_{self.chapter}"]}.\n Tienes que empezar así: \nExplicas lo que ocurrió por la decisión del usuario.Enlazas esto con el nuevo capítulo, lo explicas y llegas a la nueva pregunta.:\n'''
-            return prompt
+        Ui.__story_page.clear()
+        StoryCatalog.invalidate()
+        return StoryCatalog.shared()
 
     @staticmethod
     def header() -> None:
@@ -171,63 +97,124 @@ class Ui:
 
     def show_stories(self) -> None:
         """
-        Muestra la lista de historias disponibles en un DataFrame de Streamlit.
+        Muestra una página de las historias disponibles en un DataFrame de Streamlit.
+
+        Si el catálogo no cabe en una página ([Catalog] page_size en
+        model.config) se muestra también un selector de página.
         """
         st.divider()
-        df = self.stories
-        df = df[["id", "titulo", "sinopsis"]]
-        st.dataframe(df)
-
-    def user_story_selection(self) -> int:
+        catalog = self.stories
+        page_size = self.__page_size()
+        pages = catalog.page_count(page_size)
+        if pages > 1:
+            st.number_input(label=f"Página (de {pages})", min_value=1, max_value=pages, value=1, step=1,
+                            key="stories_page")
+        st.dataframe(self.__story_page(catalog, catalog.path, len(catalog), self.__current_page(), page_size))
+
+    def user_story_selection(self, current: Optional[int] = None) -> int:
         """
-        Muestra un selector para que el usuario elija una historia.
+        Muestra un selector para que el usuario elija una historia de la página actual.
+
+        Parámetros
+        ----------
+        current : int, opcional
+            Historia de la partida en curso; se mantiene seleccionada aunque
+            no esté en la página mostrada, para no reiniciar la partida al
+            cambiar de página.
 
         Retorna
         -------
         int
             ID de la historia seleccionada por el usuario.
         """
-        list_id = self.stories['id'].tolist()
+        catalog = self.stories
+        rows = self.__story_page(catalog, catalog.path, len(catalog), self.__current_page(), self.__page_size(),
+                                 ("id",))
+        list_id = [row["id"] for row in rows]
+        if current is not None and current not in list_id:
+            list_id.insert(0, current)
 
         option = st.selectbox(
             label="Selecciona tu historia:",
-            options=list_id
+            options=list_id,
+            index=list_id.index(current) if current in list_id else 0,
+            format_func=lambda story_id: f"{story_id} - {catalog.title(story_id)}"
         )
         return option
 
-    def narrate(self, story_number: int, text_response_ai: str = "", user_response: str = "") -> str:
+    @st.fragment
+    def story_browser(self, current: Optional[int] = None) -> None:
+        """
+        Muestra el catálogo y el selector de historia como un fragmento independiente.
+
+        Cambiar de página solo vuelve a ejecutar este fragmento. Si el
+        jugador elige otra historia, se guarda en `st.session_state.selected_story`
+        y se vuelve a ejecutar la página entera para empezar la partida.
+
+        Parámetros
+        ----------
+        current : int, opcional
+            Historia de la partida en curso.
+        """
+        self.show_stories()
+        selected = self.user_story_selection(current=current)
+        if selected and selected != current:
+            st.session_state.selected_story = selected
+            st.rerun()
+
+    @staticmethod
+    @st.cache_data(max_entries=CACHED_PAGES, show_spinner=False)
+    def __story_page(_catalog: StoryCatalog, path: str, size: int, page: int, page_size: int,
+                     fields: Tuple[str, ...] = ("id", "titulo", "sinopsis")) -> List[Dict]:
         """
-        Genera el siguiente capítulo de la historia utilizando el modelo de lenguaje.
+        Devuelve una página del catálogo, guardada entre re-ejecuciones y sesiones.
 
         Parámetros
         ----------
-        story_number : int
-            ID de la historia que se está narrando.
-        text_response_ai : str, opcional
-            Texto del capítulo anterior generado por la IA. Por defecto es "".
-        user_response : str, opcional
-            Elección del usuario en el capítulo anterior. Por defecto es "".
+        _catalog : StoryCatalog
+            Catálogo del que se lee la página (no forma parte de la clave de la caché).
+        path : str
+            Archivo del catálogo.
+        size : int
+            Número de historias; forma parte de la clave para no servir
+            páginas de un catálogo que ha cambiado.
+        page : int
+            Número de página, empezando en 0.
+        page_size : int
+            Historias por página.
+        fields : Tuple[str, ...], opcional
+            Campos de cada fila. Por defecto id, título y sinopsis.
 
         Retorna
         -------
-        str
-            Texto del nuevo capítulo generado por el modelo.
+        List[Dict]
+            Filas de la página.
         """
-        self.__model.system_prompt = story_teller
-        actual_chapter = self.chapter
+        return _catalog.page(page, page_size, fields=fields)
 
-        dict_row = self.__extract_row_information(story_number=story_number)
-        if actual_chapter == 1 and text_response_ai == "" and user_response == "":
-            response = self.__model.generate_response(user_message=self.__create_narration_promtp(dict_row_parsed=dict_row, summary=""))
-        else:
-            sinopsis = dict_row["sinopsis"]
-            text_response_ai = f'SINOPSIS para que entiendas todo el contexto (No lo repitas, es solo como información, tampoco adelantes acontecimientos): \n {sinopsis}\n{text_response_ai}\n Resume todo esto, la decisión que ha tomado el jugador es la siguiente: '
-            resume = self.__summarize(text_response_ai=text_response_ai, user_response=user_response)
-            self.__model.system_prompt = story_teller
-            response = self.__model.generate_response(user_message=self.__create_narration_promtp(dict_row_parsed=dict_row, summary=resume))
+    @staticmethod
+    def __page_size() -> int:
+        """
+        Lee el tamaño de página del catálogo de la sección [Catalog] de model.config.
 
-        self.chapter_add()  # Le añadimos 1 al capítulo
-        return response
+        Retorna
+        -------
+        int
+            Historias por página.
+        """
+        return max(ModelConfig.shared().getint("Catalog", "page_size", fallback=20), 1)
+
+    @staticmethod
+    def __current_page() -> int:
+        """
+        Devuelve la página del catálogo elegida por el usuario.
+
+        Retorna
+        -------
+        int
+            Número de página, empezando en 0.
+        """
+        return int(st.session_state.get("stories_page", 1)) - 1
 
     @staticmethod
     def button_choice() -> str:
@@ -246,23 +233,62 @@ class Ui:
         if right.button(label="B", use_container_width=True):
             return "B"
 
-    def __summarize(self, text_response_ai: str, user_response: str) -> str:
+    @staticmethod
+    def busy_notice() -> None:
+        """
+        Avisa al jugador si el modelo está saturado y los capítulos van a tardar más.
         """
-        Resume el estado actual de la historia para mantener la continuidad.
+        scheduler = LlmScheduler.shared()
+        if scheduler is not None and scheduler.busy:
+            st.warning("Hay muchos jugadores a la vez: el narrador puede tardar un poco más de lo habitual.")
+
+    @staticmethod
+    def game_over() -> None:
+        """
+        Muestra el final de la partida en lugar de los botones de elección.
+        """
+        st.divider()
+        st.info("La partida ha terminado. Elige otra historia para volver a jugar.")
+
+    def debug_panel(self, limit: int = 20) -> None:
+        """
+        Muestra en la barra lateral las métricas de las llamadas al modelo.
+
+        Incluye el estado de cada backend, el perfil de modelo de cada tarea,
+        la cola del planificador, un resumen por propósito (llamadas, aciertos de caché, tokens y
+        latencia media) y las últimas llamadas y etapas registradas.
 
         Parámetros
         ----------
-        text_response_ai : str
-            Texto del capítulo anterior generado por la IA.
-        user_response : str
-            Elección del usuario en el capítulo anterior.
-
-        Retorna
-        -------
-        str
-            Resumen de la historia hasta el momento.
+        limit : int, opcional
+            Número de registros recientes a mostrar. Por defecto es 20.
         """
-        self.__model.system_prompt = summarizator  # Ahora le cambié el comportamiento
-        message = f'''{text_response_ai}\n El usuario ha tomado el camino: {user_response}\n Explica las consecuencias de su acción y continúa la historia desde este punto.'''
-        resume = self.__model.generate_response(user_message=message)
-        return resume
+        telemetry = Telemetry.shared()
+        with st.sidebar.expander("Depuración: métricas del modelo", expanded=False):
+            if not telemetry.enabled:
+                st.caption("La telemetría está desactivada en model.config ([Telemetry] enabled).")
+                return
+            # Listas de diccionarios: st.dataframe las acepta sin importar pandas aquí
+            columns = ["url", "healthy", "outstanding", "requests", "errors", "retries", "hedges", "hedge_wins",
+                       "p95_s", "ttft_p95_s"]
+            st.dataframe([{column: backend.get(column) for column in columns}
+                          for backend in self.__model.backend_stats()])
+            st.dataframe([self.__model.profile(task).describe() for task in ("narration", "summary", "warmup")])
+            scheduler = LlmScheduler.shared()
+            if scheduler is not None:
+                stats = scheduler.stats()
+                queued = stats.pop("queued_by_priority")
+                st.dataframe([{**stats, **{f"queued_{name}": depth for name, depth in queued.items()}}])
+            summary = telemetry.summary()
+            if summary:
+                st.dataframe([{"purpose": purpose, **values} for purpose, values in summary.items()])
+            calls = telemetry.recent(limit=limit, kind="llm_call")
+            if calls:
+                columns = ["purpose", "model", "cache", "status", "duration_s", "ttft_s", "prompt_tokens",
+                           "completion_tokens"]
+                st.dataframe([{column: call.get(column) for column in columns} for call in calls])
+            spans = telemetry.recent(limit=limit, kind="span")
+            if spans:
+                st.dataframe([{"name": span.get("name"), "status": span.get("status"),
+                               "duration_s": span.get("duration_s"), "attributes": str(span.get("attributes"))}
+                              for span in spans])
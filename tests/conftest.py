@@ -0,0 +1,32 @@
+"""
+Configuración común de las pruebas.
+
+Añade `src` (la app) y `benchmarks` (el servidor OpenAI simulado) al
+sys.path, como hacen los bancos de pruebas, y ofrece un servidor simulado
+por prueba.
+"""
+from typing import Iterator
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("src", "benchmarks"):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+
+@pytest.fixture
+def mock_server() -> Iterator[MockOpenAIServer]:
+    """
+    Arranca un servidor OpenAI simulado en un puerto libre y lo detiene al terminar.
+    """
+    server = MockOpenAIServer(("127.0.0.1", 0), ttft=0.3, tokens_per_second=200.0, tokens=20)
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,82 @@
+"""
+Pruebas de la concurrencia, el tiempo máximo y la cancelación de AsyncLlm.
+"""
+from typing import List
+import asyncio
+import time
+
+import pytest
+
+from agents.async_llm import AsyncLlm
+from mock_openai_server import MockOpenAIServer
+
+
+def test_max_concurrency_limits_requests_in_flight(mock_server):
+    """Con max_concurrency=2 nunca hay más de dos peticiones a la vez contra el backend."""
+    async def run() -> List[int]:
+        llm = AsyncLlm(url=mock_server.url, api_key="mock", max_concurrency=2, timeout=10.0)
+        seen: List[int] = []
+        calls = asyncio.gather(*(llm.generate_response(f"Capítulo {n}", use_cache=False) for n in range(5)))
+        task = asyncio.ensure_future(calls)
+        while not task.done():
+            seen.append(llm.in_flight)
+            await asyncio.sleep(0.01)
+        texts = await task
+        await llm.close()
+        assert all(texts)
+        assert llm.in_flight == 0 and llm.waiting == 0
+        return seen
+
+    seen = asyncio.run(run())
+    assert max(seen) == 2
+    assert mock_server.snapshot()["requests"] == 5
+
+
+def test_timeout_raises_and_frees_the_slot(mock_server):
+    """Una llamada que supera su tiempo máximo lanza asyncio.TimeoutError y libera su hueco."""
+    async def run() -> AsyncLlm:
+        llm = AsyncLlm(url=mock_server.url, api_key="mock", max_concurrency=1)
+        with pytest.raises(asyncio.TimeoutError):
+            await llm.generate_response("Capítulo", timeout=0.05, use_cache=False)
+        # El hueco vuelve a estar libre: la siguiente llamada sin límite termina
+        assert await llm.generate_response("Capítulo", use_cache=False)
+        await llm.close()
+        return llm
+
+    llm = asyncio.run(run())
+    assert llm.in_flight == 0 and llm.waiting == 0
+
+
+def test_cancel_closes_the_backend_stream():
+    """Cancelar la tarea que lee un streaming cierra la conexión con el backend."""
+    # Si se leyera entero el streaming tardaría 10 s
+    server = MockOpenAIServer(("127.0.0.1", 0), ttft=0.0, tokens_per_second=20.0, tokens=200)
+    server.start_background()
+
+    async def run() -> AsyncLlm:
+        llm = AsyncLlm(url=server.url, api_key="mock", max_concurrency=1)
+        first = asyncio.Event()
+
+        async def read() -> None:
+            async for _ in llm.generate_response_stream("Capítulo", use_cache=False):
+                first.set()
+
+        task = asyncio.ensure_future(read())
+        await asyncio.wait_for(first.wait(), 5.0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await llm.close()
+        return llm
+
+    try:
+        llm = asyncio.run(run())
+        assert llm.in_flight == 0
+        deadline = time.monotonic() + 2.0
+        while not server.snapshot().get("cancelled") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.snapshot().get("cancelled", 0) == 1
+        assert server.snapshot()["generated_tokens"] < 200
+    finally:
+        server.shutdown()
+        server.server_close()
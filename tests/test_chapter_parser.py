@@ -0,0 +1,81 @@
+"""
+Pruebas del análisis de capítulos (parse_chapter) y del corte tras las opciones (OptionsCutoff).
+"""
+from typing import List, Optional
+import uuid
+
+from agents.llm import Llm
+from engine.chapter_parser import OptionsCutoff, cut_after_options, parse_chapter
+from mock_openai_server import MockOpenAIServer
+
+CHAPTER = "El puente cruje bajo tus pies.\n\nA - Cruzar el puente\nB - Volver al bosque\n"
+
+
+def feed(chunks: List[str]) -> Optional[str]:
+    """
+    Pasa los fragmentos a un OptionsCutoff y devuelve el texto conservado al cortar, o None si no corta.
+    """
+    cutoff = OptionsCutoff()
+    kept = ""
+    for chunk in chunks:
+        keep = cutoff(chunk)
+        if keep is not None:
+            return kept + chunk[:keep]
+        kept += chunk
+    return None
+
+
+def test_parse_chapter_splits_narrative_and_options():
+    """La narración termina antes de la opción A y las opciones se leen sin el marcado."""
+    chapter = parse_chapter("El puente cruje.\n\n**A - Cruzar el puente**\n**B) Volver al bosque**\nTexto de más")
+    assert chapter.narrative == "El puente cruje."
+    assert chapter.option("a") == "Cruzar el puente"
+    assert chapter.option("B") == "Volver al bosque"
+    assert chapter.complete and not chapter.game_over
+
+
+def test_parse_chapter_keeps_the_last_repeated_options():
+    """Si el modelo repite las opciones se toman las últimas."""
+    chapter = parse_chapter("Texto.\nA - Uno\nB - Dos\nMás texto.\nA - Tres\nB - Cuatro")
+    assert (chapter.option_a, chapter.option_b) == ("Tres", "Cuatro")
+    assert chapter.narrative.endswith("Más texto.")
+
+
+def test_parse_chapter_without_options_or_with_game_over():
+    """Sin opciones todo es narración; "FIN DEL JUEGO" completa el capítulo sin ellas."""
+    unfinished = parse_chapter("Solo narración.\nB - Opción suelta")
+    assert unfinished.narrative == "Solo narración.\nB - Opción suelta"
+    assert not unfinished.complete
+    ending = parse_chapter("Caes al río.\n\nFIN DEL JUEGO")
+    assert ending.game_over and ending.complete
+
+
+def test_cutoff_stops_at_the_end_of_option_b_across_chunks():
+    """El corte llega al terminar la línea de la opción B aunque venga partida en varios fragmentos."""
+    chunks = ["El puente cruje bajo tus pies.\n\nA", " - Cruzar el ", "puente\nB - Volver", " al bosque", "\nY luego", "..."]
+    assert feed(chunks) == "El puente cruje bajo tus pies.\n\nA - Cruzar el puente\nB - Volver al bosque"
+
+
+def test_cutoff_needs_option_a_before_b_and_stops_on_game_over():
+    """Una opción B sin A no corta; una línea con "FIN DEL JUEGO" sí."""
+    assert feed(["B - Volver\n", "más texto\n"]) is None
+    assert feed(["Caes al río. FIN DEL JUEGO\n", "Epílogo\n"]) == "Caes al río. FIN DEL JUEGO"
+    assert cut_after_options(CHAPTER + "Texto de más\n") == CHAPTER.rstrip("\n")
+
+
+def test_llm_stream_closes_after_options():
+    """Con el corte, Llm deja de leer el streaming tras la opción B y no recibe el texto sobrante."""
+    server = MockOpenAIServer(("127.0.0.1", 0), ttft=0.0, tokens_per_second=200.0, tokens=10, tail_tokens=200)
+    server.start_background()
+    try:
+        model = Llm(url=server.url, api_key="mock", system_prompt="Narrador", backends=[server.url])
+        text = "".join(model.generate_response_stream(f"Capítulo {uuid.uuid4()}", purpose="narration",
+                                                      use_cache=False, cutoff=OptionsCutoff))
+        chapter = parse_chapter(text)
+        assert text.endswith("B - Volver al bosque")
+        assert chapter.option_a == "Cruzar el puente" and chapter.complete
+        server.wait_idle()
+        assert server.snapshot()["generated_tokens"] < 10 + 8 + 200
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,76 @@
+"""
+Pruebas del ajuste del historial al presupuesto de tokens (ContextBudget.fit).
+"""
+from typing import Dict, List
+
+import pytest
+
+from agents.context_budget import MESSAGE_OVERHEAD, ContextBudget
+
+SYSTEM = [{"role": "system", "content": "Narrador"}]
+NEW = [{"role": "user", "content": "Sigue"}]
+
+
+def words(text: str) -> int:
+    """
+    Tokenizador de prueba: una palabra es un token.
+    """
+    return len(text.split())
+
+
+def make_history(turns: int) -> List[Dict[str, str]]:
+    """
+    Crea un historial de `turns` mensajes de once palabras cada uno.
+    """
+    return [{"role": "user" if n % 2 == 0 else "assistant",
+             "content": f"Mensaje {n} con texto. " + "palabra " * 6 + "final"} for n in range(turns)]
+
+
+def test_history_that_fits_is_returned_unchanged():
+    """Si todo cabe no se recorta nada."""
+    budget = ContextBudget(max_tokens=1000, tokenizer=words)
+    history = make_history(6)
+    assert budget.fit(SYSTEM, history, NEW) == SYSTEM + history + NEW
+    assert budget.stats()["trims"] == 0
+
+
+def test_trim_drops_oldest_messages_in_steps_and_keeps_recent():
+    """En modo "trim" se descartan los más antiguos de `trim_step` en `trim_step` y nunca los recientes."""
+    size = 11 + MESSAGE_OVERHEAD
+    budget = ContextBudget(max_tokens=2 * (1 + MESSAGE_OVERHEAD) + 5 * size, keep_recent=2, mode="trim",
+                           trim_step=4, tokenizer=words)
+    history = make_history(12)
+    messages = budget.fit(SYSTEM, history, NEW)
+    # Caben 5 mensajes, pero el corte avanza de 4 en 4: se descartan 8
+    assert messages == SYSTEM + history[8:] + NEW
+    assert budget.stats()["dropped_messages"] == 8
+
+
+def test_recent_messages_are_kept_even_over_budget():
+    """Los `keep_recent` mensajes más recientes se conservan aunque no quepan."""
+    budget = ContextBudget(max_tokens=10, keep_recent=3, mode="trim", trim_step=1, tokenizer=words)
+    history = make_history(6)
+    assert budget.fit(SYSTEM, history, NEW) == SYSTEM + history[3:] + NEW
+
+
+def test_compact_replaces_dropped_messages_with_their_first_sentences():
+    """En modo "compact" lo descartado se resume en un mensaje de sistema con la primera frase de cada uno."""
+    size = 11 + MESSAGE_OVERHEAD
+    budget = ContextBudget(max_tokens=2 * (1 + MESSAGE_OVERHEAD) + 40 + MESSAGE_OVERHEAD + 4 * size,
+                           keep_recent=2, mode="compact", compact_tokens=40, trim_step=2, tokenizer=words)
+    history = make_history(8)
+    messages = budget.fit(SYSTEM, history, NEW)
+    assert messages[0] == SYSTEM[0] and messages[-1] == NEW[0]
+    assert messages[2:-1] == history[4:]
+    digest = messages[1]
+    assert digest["role"] == "system"
+    assert digest["content"].splitlines() == ["Resumen de la conversación anterior:",
+                                              "- user: Mensaje 0 con texto.", "- assistant: Mensaje 1 con texto.",
+                                              "- user: Mensaje 2 con texto.", "- assistant: Mensaje 3 con texto."]
+    assert words(digest["content"]) <= 40
+
+
+def test_unknown_mode_is_rejected():
+    """Un modo que no es "compact" ni "trim" lanza ValueError."""
+    with pytest.raises(ValueError):
+        ContextBudget(mode="resumir")
@@ -0,0 +1,59 @@
+"""
+Pruebas del estado compacto de la partida (GameSession) y de su ida y vuelta por diccionario.
+"""
+import json
+
+from engine.game_session import GameSession
+
+CHAPTER = "El viento sopla sobre el valle y el héroe duda. " * 20
+
+
+def play(chapters: int) -> GameSession:
+    """
+    Juega una partida de `chapters` capítulos eligiendo A y B alternativamente.
+    """
+    session = GameSession(story_number=4, session_id="partida")
+    session.record_chapter(f"Capítulo 1. {CHAPTER}\nA - Subir\nB - Bajar")
+    for number in range(2, chapters + 1):
+        session.record_chapter(f"Capítulo {number}. {CHAPTER}\nA - Subir\nB - Bajar", choice="AB"[number % 2],
+                               summary=f"Resumen hasta el capítulo {number - 1}.",
+                               finished=number == chapters)
+    return session
+
+
+def test_record_chapter_keeps_every_chapter_and_summary_in_order():
+    """Los capítulos y resúmenes anteriores al último se recuperan del bloque comprimido, en orden."""
+    session = play(6)
+    assert session.chapter == 7 and session.finished
+    assert [text.split(".")[0] for text in session.chapters] == [f"Capítulo {n}" for n in range(1, 7)]
+    assert session.story_text == session.chapters[-1]
+    assert session.summaries == [f"Resumen hasta el capítulo {n}." for n in range(1, 6)]
+    assert session.memory == session.summaries[-1]
+    assert session.choices == ["A", "B", "A", "B", "A"]
+
+
+def test_old_chapters_are_stored_compressed():
+    """Los capítulos anteriores al último ocupan mucho menos que su texto."""
+    session = play(10)
+    old = session._GameSession__old_chapters
+    assert isinstance(old, bytes)
+    raw = sum(len(text.encode("utf-8")) for text in session.chapters[:-1])
+    assert len(old) < raw / 5
+
+
+def test_dict_round_trip_through_json():
+    """`to_dict`, JSON y `from_dict` devuelven la misma partida, también sin empezar."""
+    for session in (play(5), GameSession(story_number=2)):
+        restored = GameSession.from_dict(json.loads(json.dumps(session.to_dict())))
+        assert restored.to_dict() == session.to_dict()
+        assert restored.started == session.started
+        assert restored.memory == session.memory and restored.story_text == session.story_text
+
+
+def test_restored_session_keeps_playing():
+    """Una partida restaurada sigue registrando capítulos sobre el bloque comprimido."""
+    restored = GameSession.from_dict(play(3).to_dict())
+    restored.record_chapter("Capítulo 4.", choice="A", summary="Resumen hasta el capítulo 3.")
+    assert len(restored.chapters) == 4 and restored.chapters[-1] == "Capítulo 4."
+    assert restored.summaries[-2:] == ["Resumen hasta el capítulo 2.", "Resumen hasta el capítulo 3."]
+    assert not restored.finished
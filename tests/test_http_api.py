@@ -0,0 +1,118 @@
+"""
+Pruebas de los códigos de estado de la API HTTP (GameApi y GameApiHandler).
+"""
+from typing import Dict, Iterator, Optional, Tuple
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from agents.llm import Llm
+from data.sys_prompts import story_teller
+from engine.game_engine import GameEngine
+from engine.game_session import GameSession
+from engine.http_api import GameApi, GameApiServer, NotFound
+from engine.session_store import MemorySessionStore
+
+
+def serve(game_api) -> Iterator[str]:
+    """
+    Sirve `game_api` en un puerto libre y devuelve su URL base hasta cerrarlo.
+    """
+    server = GameApiServer(("127.0.0.1", 0), game_api, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def api(mock_server) -> Iterator[str]:
+    """
+    Arranca la API sobre el servidor simulado y devuelve su URL base.
+    """
+    model = Llm(url=mock_server.url, api_key="mock", system_prompt=story_teller, backends=[mock_server.url])
+    yield from serve(GameApi(engine=GameEngine(model=model), store=MemorySessionStore()))
+
+
+def request(url: str, method: str = "GET", body: Optional[Dict] = None) -> Tuple[int, Dict]:
+    """
+    Envía una petición JSON y devuelve el código de estado y la respuesta.
+    """
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_start_stream_rejects_story_missing_from_catalog(mock_server):
+    """Una partida de una historia que ya no está en el catálogo da ValueError, no AttributeError."""
+    model = Llm(url=mock_server.url, api_key="mock", system_prompt=story_teller, backends=[mock_server.url])
+    engine = GameEngine(model=model)
+    with pytest.raises(ValueError):
+        list(engine.start_stream(GameSession(story_number=99999)))
+    assert mock_server.snapshot()["requests"] == 0
+
+
+def test_advance_with_unknown_story_returns_400(api):
+    """POST /advance con una partida de una historia inexistente responde 400."""
+    status, payload = request(f"{api}/advance", "POST", {"session": GameSession(story_number=99999).to_dict()})
+    assert status == 400
+    assert "99999" in payload["error"]
+
+
+@pytest.mark.parametrize("page_size", ["0", "-1"])
+def test_stories_with_invalid_page_size_returns_400(api, page_size):
+    """GET /stories con page_size menor que 1 responde 400, no 500 ni una página vacía."""
+    status, payload = request(f"{api}/stories?page_size={page_size}")
+    assert status == 400
+    assert "page_size" in payload["error"]
+
+
+def test_stories_pages(api):
+    """GET /stories devuelve la página pedida y el número de páginas."""
+    status, payload = request(f"{api}/stories?page=0&page_size=2")
+    assert status == 200
+    assert len(payload["stories"]) == 2
+    assert payload["pages"] == -(-payload["total"] // 2)
+
+
+@pytest.mark.parametrize("method, path", [("GET", "/sessions/nada"), ("DELETE", "/sessions/nada"),
+                                          ("GET", "/no/existe")])
+def test_missing_session_or_route_returns_404(api, method, path):
+    """Las partidas y rutas que no existen responden 404."""
+    status, payload = request(f"{api}{path}", method)
+    assert status == 404
+    assert "No encontrado" in payload["error"]
+
+
+def test_advance_with_incomplete_session_returns_400(api):
+    """POST /advance con una partida sin 'story_number' es un error de la petición, no un 404."""
+    status, payload = request(f"{api}/advance", "POST", {"session": {"chapter": 2}})
+    assert status == 400
+    assert "story_number" in payload["error"]
+
+
+class BrokenApi:
+    """
+    API que falla con el KeyError indicado, como un error interno de GameApi.
+    """
+
+    def __init__(self, error: KeyError):
+        self.error = error
+
+    def handle(self, method, parts, body):
+        raise self.error
+
+
+@pytest.mark.parametrize("error, status", [(KeyError("campo"), 500), (NotFound("partida"), 404)])
+def test_only_not_found_maps_to_404(error, status):
+    """Un KeyError interno responde 500; solo NotFound responde 404."""
+    for url in serve(BrokenApi(error)):
+        assert request(f"{url}/health")[0] == status
@@ -0,0 +1,131 @@
+"""
+Pruebas de la caché de respuestas (ResponseCache) en memoria y en disco.
+"""
+import os
+import sqlite3
+
+import pytest
+
+from agents import response_cache
+from agents.response_cache import ResponseCache
+
+
+class FakeClock:
+    """
+    Sustituye al módulo time de response_cache con un reloj que se avanza a mano.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """
+    Reloj falso de la caché.
+    """
+    fake = FakeClock()
+    monkeypatch.setattr(response_cache, "time", fake)
+    return fake
+
+
+def disk_rows(path: str) -> int:
+    """
+    Cuenta las respuestas guardadas en el archivo de la caché.
+    """
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def test_expired_disk_rows_are_purged_while_running(tmp_path, clock):
+    """Las filas caducadas del disco se borran al guardar pasado `purge_interval`, sin reabrir el archivo."""
+    path = os.path.join(tmp_path, "cache.db")
+    cache = ResponseCache(ttl=100.0, disk_path=path, purge_interval=150.0)
+    for n in range(3):
+        cache.set(f"vieja-{n}", "respuesta")
+    assert disk_rows(path) == 3
+
+    # Caducadas, pero aún no toca purgar
+    clock.now += 120.0
+    cache.set("nueva", "respuesta")
+    assert disk_rows(path) == 4
+
+    clock.now += 40.0
+    cache.set("otra", "respuesta")
+    assert disk_rows(path) == 2
+    assert cache.stats()["purged"] == 3
+    assert cache.get("otra") == "respuesta"
+
+
+def test_purge_interval_zero_purges_only_on_open(tmp_path, clock):
+    """Con `purge_interval=0` las filas caducadas solo se borran al abrir el archivo."""
+    path = os.path.join(tmp_path, "cache.db")
+    cache = ResponseCache(ttl=60.0, disk_path=path, purge_interval=0)
+    cache.set("vieja", "respuesta")
+    clock.now += 1000.0
+    cache.set("nueva", "respuesta")
+    assert disk_rows(path) == 2
+
+    reopened = ResponseCache(ttl=60.0, disk_path=path, purge_interval=0)
+    assert disk_rows(path) == 1
+    assert reopened.stats()["purged"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    """Una respuesta deja de servirse pasado el TTL y cuenta como fallo."""
+    cache = ResponseCache(ttl=60.0)
+    cache.set("clave", "respuesta")
+    clock.now += 59.0
+    assert cache.get("clave") == "respuesta"
+    clock.now += 2.0
+    assert cache.get("clave") is None
+    assert cache.stats() == {"hits": 1, "disk_hits": 0, "misses": 1, "entries": 0, "purged": 0}
+
+
+def test_max_age_rejects_older_entries_without_dropping_them(clock):
+    """`max_age` exige respuestas más recientes en esa consulta, pero la entrada sigue para las demás."""
+    cache = ResponseCache(ttl=3600.0)
+    cache.set("clave", "respuesta")
+    clock.now += 30.0
+    assert cache.get("clave", max_age=10.0) is None
+    assert cache.get("clave", max_age=60.0) == "respuesta"
+    assert cache.get("clave") == "respuesta"
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Al llenarse la memoria sale la respuesta menos usada, no la más antigua."""
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_serves_entries_evicted_from_memory(tmp_path):
+    """Una respuesta expulsada de memoria se recupera del disco y vuelve a memoria."""
+    cache = ResponseCache(max_entries=1, disk_path=os.path.join(tmp_path, "cache.db"))
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_key_depends_on_generation_options():
+    """Las peticiones con otras opciones de generación o con corte no comparten respuesta."""
+    messages = [{"role": "system", "content": "Narrador"}, {"role": "user", "content": "Capítulo 1"}]
+    base = ResponseCache.make_key("modelo", messages, {"max_tokens": 1024})
+    assert base == ResponseCache.make_key("modelo", [dict(m) for m in messages], {"max_tokens": 1024})
+    assert base != ResponseCache.make_key("modelo", messages, {"max_tokens": 400})
+    assert base != ResponseCache.make_key("modelo", messages, {"max_tokens": 1024, "temperature": 0.2})
+    assert base != ResponseCache.make_key("modelo", messages, {"max_tokens": 1024}, cutoff=True)
+    assert base != ResponseCache.make_key("otro", messages, {"max_tokens": 1024})
+    assert ResponseCache.make_key("modelo", messages) == ResponseCache.make_key("modelo", messages, {})
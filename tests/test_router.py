@@ -0,0 +1,44 @@
+"""
+Pruebas de las peticiones duplicadas (hedging) del router de backends.
+"""
+import time
+
+from agents.router import LlmRouter
+from mock_openai_server import MockOpenAIServer
+
+
+def test_hedge_winner_ends_the_loser():
+    """Cuando la petición duplicada gana, la del backend lento se cierra sin contar como error."""
+    # Si el lento terminase su respuesta tardaría 0.6 s más 4 s de tokens
+    slow = MockOpenAIServer(("127.0.0.1", 0), ttft=0.6, tokens_per_second=50.0, tokens=200)
+    fast = MockOpenAIServer(("127.0.0.1", 0), ttft=0.0, tokens_per_second=200.0, tokens=10)
+    for server in (slow, fast):
+        server.start_background()
+    router = LlmRouter([slow.url, fast.url], "mock", health_interval=0, hedge=True, hedge_percentile=0,
+                       hedge_min_samples=1, hedge_min_seconds=0.05)
+    try:
+        # Las peticiones se reparten por turnos: en pocas, alguna empieza en el backend lento
+        for _ in range(4):
+            chunks = list(router.stream("mock", [{"role": "user", "content": "hola"}]))
+            assert chunks
+            if router.stats()[1]["hedge_wins"]:
+                break
+        slow_stats, fast_stats = router.stats()
+        assert fast_stats["hedge_wins"] >= 1
+
+        # El perdedor termina en cuanto llega su respuesta, mucho antes de los 4.6 s de la completa
+        deadline = time.monotonic() + 2.0
+        while (router.stats()[0]["outstanding"] or not slow.snapshot().get("cancelled")) \
+                and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert slow.snapshot().get("cancelled", 0) >= 1
+        assert slow.snapshot()["generated_tokens"] < 200
+        slow_stats = router.stats()[0]
+        assert slow_stats["outstanding"] == 0
+        assert slow_stats["errors"] == 0
+        assert slow_stats["healthy"] and not slow_stats["cooling_down"]
+    finally:
+        router.close()
+        for server in (slow, fast):
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,115 @@
+"""
+Pruebas del planificador de llamadas al modelo (LlmScheduler).
+"""
+from typing import Callable, List
+import threading
+import time
+
+import pytest
+
+from agents.scheduler import LlmScheduler, SchedulerBusy
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    """
+    Espera a que se cumpla una condición o falla la prueba.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("La condición no se cumplió a tiempo.")
+        time.sleep(0.005)
+
+
+def occupy(scheduler: LlmScheduler, purpose: str, release: threading.Event) -> threading.Thread:
+    """
+    Pide un turno en otro hilo y, cuando lo obtiene, lo retiene hasta que se activa `release`.
+    """
+    def hold() -> None:
+        with scheduler.slot(purpose):
+            release.wait(5.0)
+
+    thread = threading.Thread(target=hold, daemon=True)
+    thread.start()
+    return thread
+
+
+def hold_slot(scheduler: LlmScheduler, release: threading.Event) -> threading.Thread:
+    """
+    Ocupa el único turno del planificador hasta que se activa `release`.
+    """
+    thread = occupy(scheduler, "narration", release)
+    wait_until(lambda: scheduler.in_flight == 1)
+    return thread
+
+
+def test_interactive_call_goes_before_queued_background_work():
+    """La narración que llega después adelanta al trabajo de fondo que ya esperaba."""
+    scheduler = LlmScheduler(max_concurrency=1, max_queue=4)
+    release = threading.Event()
+    holder = hold_slot(scheduler, release)
+    order: List[str] = []
+
+    def call(purpose: str) -> None:
+        with scheduler.slot(purpose):
+            order.append(purpose)
+
+    threads = []
+    for purpose in ("speculation", "summary", "narration"):
+        thread = threading.Thread(target=call, args=(purpose,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        queued = len(threads)
+        wait_until(lambda: scheduler.queued == queued)
+    release.set()
+    for thread in [holder] + threads:
+        thread.join(5.0)
+
+    assert order == ["narration", "summary", "speculation"]
+    assert scheduler.in_flight == 0 and scheduler.queued == 0
+
+
+def test_full_queue_rejects_with_scheduler_busy():
+    """Con la cola llena de llamadas de igual prioridad, la siguiente se rechaza."""
+    scheduler = LlmScheduler(max_concurrency=1, max_queue=1)
+    release = threading.Event()
+    holder = hold_slot(scheduler, release)
+    waiter = occupy(scheduler, "narration", release)
+    wait_until(lambda: scheduler.queued == 1)
+
+    with pytest.raises(SchedulerBusy):
+        with scheduler.slot("narration"):
+            pass
+    assert scheduler.busy
+
+    release.set()
+    for thread in (holder, waiter):
+        thread.join(5.0)
+
+
+def test_full_queue_sheds_lower_priority_call():
+    """Con la cola llena, una llamada interactiva desplaza a la de fondo que esperaba."""
+    scheduler = LlmScheduler(max_concurrency=1, max_queue=1)
+    release = threading.Event()
+    holder = hold_slot(scheduler, release)
+    errors: List[BaseException] = []
+
+    def background() -> None:
+        try:
+            with scheduler.slot("speculation"):
+                pass
+        except SchedulerBusy as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=background, daemon=True)
+    thread.start()
+    wait_until(lambda: scheduler.queued == 1)
+    served = occupy(scheduler, "narration", release)
+    thread.join(5.0)
+
+    assert len(errors) == 1
+    assert scheduler.stats()["queued_by_priority"] == {"interactive": 1, "summary": 0, "background": 0}
+
+    release.set()
+    for thread in (holder, served):
+        thread.join(5.0)
@@ -0,0 +1,56 @@
+"""
+Pruebas del almacén persistente de partidas (SqliteSessionStore).
+"""
+import os
+
+from engine.game_session import GameSession
+from engine.session_store import SqliteSessionStore
+
+
+def make_session(session_id: str) -> GameSession:
+    """
+    Crea una partida con dos capítulos narrados.
+    """
+    return GameSession(story_number=1, session_id=session_id, chapter=3,
+                       chapters=["Capítulo uno.\n\nA - Ir\nB - Volver", "Capítulo dos."],
+                       choices=["A"], summaries=["Resumen del uno."])
+
+
+def test_put_flush_get_round_trip(tmp_path):
+    """Una partida guardada se recupera igual antes de escribirla, después y tras reabrir el archivo."""
+    path = os.path.join(tmp_path, "sessions.db")
+    store = SqliteSessionStore(path, flush_interval=60)
+    session = make_session("partida")
+    store.put(session)
+
+    pending = store.get("partida")
+    assert pending is not session
+    assert pending.to_dict() == session.to_dict()
+    assert store.stats()["pending"] == 1
+
+    assert store.flush() == 1
+    assert store.stats()["pending"] == 0
+    assert store.get("partida").to_dict() == session.to_dict()
+    store.close()
+
+    reopened = SqliteSessionStore(path, flush_interval=60)
+    assert reopened.get("partida").to_dict() == session.to_dict()
+    reopened.close()
+
+
+def test_size_counts_pending_changes_without_writing(tmp_path):
+    """`size` suma las partidas nuevas pendientes y resta los borrados sin escribirlos."""
+    store = SqliteSessionStore(os.path.join(tmp_path, "sessions.db"), flush_interval=60)
+    store.put(make_session("a"))
+    store.put(make_session("b"))
+    assert store.size == 2
+    assert store.stats()["pending"] == 2
+
+    store.flush()
+    store.put(make_session("a"))
+    store.delete("b")
+    store.put(make_session("c"))
+    assert store.size == 2
+    assert store.stats()["pending"] == 3
+    assert store.get("b") is None
+    store.close()
@@ -0,0 +1,59 @@
+"""
+Pruebas del agrupador de peticiones idénticas (SingleFlight) y de su uso en Llm.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import threading
+import time
+import uuid
+
+from agents.llm import Llm
+from agents.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def test_concurrent_identical_calls_run_once():
+    """Las llamadas iguales que llegan mientras la primera sigue en curso comparten su resultado."""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls: List[int] = []
+
+    def request() -> str:
+        calls.append(1)
+        started.set()
+        release.wait(5.0)
+        return "capítulo"
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        leader = pool.submit(flights.call, "clave", request)
+        started.wait(5.0)
+        followers = [pool.submit(flights.call, "clave", request) for _ in range(CALLERS - 1)]
+        deadline = time.monotonic() + 5.0
+        while flights.coalesced < CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        release.set()
+        results = [leader.result(5.0)] + [future.result(5.0) for future in followers]
+
+    assert len(calls) == 1
+    assert results[0] == ("capítulo", False)
+    assert all(result == ("capítulo", True) for result in results[1:])
+    assert flights.in_flight == 0
+
+
+def test_concurrent_identical_llm_calls_reach_backend_once(mock_server):
+    """N jugadores que piden el mismo capítulo a la vez generan una sola petición al backend."""
+    model = Llm(url=mock_server.url, api_key="mock", system_prompt="Narrador", backends=[mock_server.url])
+    prompt = f"Primer capítulo {uuid.uuid4()}"
+    barrier = threading.Barrier(CALLERS)
+
+    def play(_: int) -> str:
+        barrier.wait(5.0)
+        return "".join(model.generate_response_stream(prompt, purpose="narration"))
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        texts = list(pool.map(play, range(CALLERS)))
+
+    assert mock_server.snapshot()["stream_requests"] == 1
+    assert texts[0] and all(text == texts[0] for text in texts)
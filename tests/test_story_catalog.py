@@ -0,0 +1,64 @@
+"""
+Pruebas del catálogo de historias compilado (mmap) y de su comprobación de frescura.
+"""
+import os
+
+from engine.story_catalog import StoryCatalog
+
+CSV = ("id,titulo,sinopsis,cap_1,cap_2\n"
+       "7,La cueva,Un héroe entra en la cueva,La entrada,El dragón\n"
+       "3,El bosque,\"Una joven, sola\",El claro,\n"
+       "12,Ñandú de fuego,Historia con tildes: áéíóú,Uno,Dos\n")
+
+
+def write_csv(folder, text: str = CSV) -> str:
+    """
+    Escribe el CSV de prueba y devuelve su ruta.
+    """
+    path = os.path.join(folder, "historias.csv")
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(text)
+    return path
+
+
+def test_compiled_catalog_matches_csv(tmp_path):
+    """El catálogo compilado devuelve las mismas historias y páginas que el CSV."""
+    path = write_csv(tmp_path)
+    from_csv = StoryCatalog.from_csv(path)
+    compiled = StoryCatalog.from_compiled(StoryCatalog.compile(path))
+    try:
+        assert compiled.compiled and not from_csv.compiled
+        assert list(compiled.ids) == [7, 3, 12]
+        for story_id in compiled.ids:
+            assert compiled.get(story_id).to_dict() == from_csv.get(story_id).to_dict()
+        assert compiled.get(12).titulo == "Ñandú de fuego"
+        assert compiled.get(3).chapter_count == 1
+        assert compiled.get(99) is None and 99 not in compiled
+        assert compiled.page(1, 2) == from_csv.page(1, 2) == [{"id": 12, "titulo": "Ñandú de fuego",
+                                                                "sinopsis": "Historia con tildes: áéíóú"}]
+        assert compiled.page_count(2) == 2
+    finally:
+        compiled.close()
+
+
+def test_load_uses_compiled_only_while_fresh(tmp_path):
+    """`load` usa el compilado mientras el CSV no cambia y vuelve al CSV en cuanto cambia."""
+    path = write_csv(tmp_path)
+    StoryCatalog.compile(path)
+    catalog = StoryCatalog.load(path)
+    assert catalog.compiled
+    catalog.close()
+
+    write_csv(tmp_path, CSV + "20,Nueva,Otra historia,Uno,Dos\n")
+    stale = StoryCatalog.load(path)
+    assert not stale.compiled
+    assert 20 in stale and len(stale) == 4
+
+
+def test_load_falls_back_to_csv_when_compiled_file_is_broken(tmp_path):
+    """Un archivo compilado no válido se ignora y se lee el CSV."""
+    path = write_csv(tmp_path)
+    with open(StoryCatalog.compiled_path(path), "wb") as file:
+        file.write(b"basura")
+    catalog = StoryCatalog.load(path)
+    assert not catalog.compiled and len(catalog) == 3